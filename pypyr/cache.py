@@ -0,0 +1,260 @@
+"""pypyr step result cache.
+
+Memoize step outputs on disk, keyed by the step's inputs and the source of
+the step module. The cache is a directory with one file per entry. Each hit
+touches the entry's modified time, so evicting the oldest modified entries
+first is least recently used.
+"""
+from collections.abc import Mapping, Set
+import functools
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import time
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# default max size of the cache directory.
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+# fixed protocol, so values that can only key as pickles are at least
+# stable across python versions.
+_KEY_PROTOCOL = 4
+
+_ENTRY_SUFFIX = '.cache'
+
+
+def get_cache_dir(working_dir):
+    """Get default cache dir in working_dir.
+
+    Args:
+        working_dir: path. pypyr working dir.
+
+    Returns:
+        str. working_dir/.pypyr/cache
+    """
+    return os.path.join(working_dir or '', '.pypyr', 'cache')
+
+
+@functools.lru_cache(maxsize=256)
+def _get_file_hash(path, mtime_ns, size):
+    """Hash file at path. mtime_ns & size make the lru cache key."""
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def get_module_hash(module):
+    """Get hash of the source of module, to tell when the step changed.
+
+    Only reads the source again if the file changed.
+
+    Args:
+        module: module. The step module.
+
+    Returns:
+        str. hex digest. The module name if the module has no source file.
+    """
+    path = getattr(module, '__file__', None)
+    if not path:
+        return module.__name__
+
+    stat = os.stat(path)
+    return _get_file_hash(path, stat.st_mtime_ns, stat.st_size)
+
+
+def get_cache_key(step_name, module_hash, inputs):
+    """Get the cache key for the step with these inputs.
+
+    The same inputs get the same key in any process, see get_key_value.
+
+    Args:
+        step_name: str. Name of step.
+        module_hash: str. Hash of the step module source.
+        inputs: dict. Input context key: value.
+
+    Returns:
+        str. hex digest.
+
+    Raises:
+        pickle.PicklingError, TypeError etc.: inputs can't serialize.
+    """
+    key_value = get_key_value({'step': step_name,
+                               'module': module_hash,
+                               'inputs': inputs})
+    return hashlib.sha256(
+        json.dumps(key_value, separators=(',', ':')).encode()).hexdigest()
+
+
+def get_key_value(value):
+    """Get value as plain json types, the same way in every process.
+
+    Pickles aren't deterministic: a set pickles in hash order, which
+    changes from process to process for str items. So dicts & sets sort
+    here, & each container tags its type, so that {'a': 1} & [['a', 1]]
+    don't key the same. Lists & tuples key the same, so a compacted input
+    hits the same entries as the plain one.
+
+    Values that aren't json types or containers of them key as their
+    pickle, as a last resort.
+
+    Args:
+        value: Anything.
+
+    Returns:
+        Plain json types.
+
+    Raises:
+        pickle.PicklingError, TypeError etc.: value can't serialize.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+
+    if isinstance(value, Mapping):
+        items = [[get_key_value(key), get_key_value(item)]
+                 for key, item in value.items()]
+        return ['dict', sorted(items, key=json.dumps)]
+
+    if isinstance(value, (list, tuple)):
+        return ['list', [get_key_value(item) for item in value]]
+
+    if isinstance(value, Set):
+        return ['set', sorted((get_key_value(item) for item in value),
+                              key=json.dumps)]
+
+    if isinstance(value, bytes):
+        return ['bytes', value.hex()]
+
+    return ['pickle', pickle.dumps(value, _KEY_PROTOCOL).hex()]
+
+
+class DiskCache(object):
+    """Size bounded cache of pickled values in a directory.
+
+    Attributes:
+        path: (str) cache directory.
+        max_bytes: (int) evict least recently used entries once the cache is
+                   bigger than this. None or 0 means no limit.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        """Initialize the cache. Creates path if it doesn't exist yet."""
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def _get_entry_path(self, key):
+        """Get file path of entry for key."""
+        return os.path.join(self.path, key + _ENTRY_SUFFIX)
+
+    def get(self, key, ttl=None):
+        """Get the value for key.
+
+        Args:
+            key: str. Cache key.
+            ttl: float. Entries older than this many seconds are misses, and
+                 deleted. None means entries don't expire.
+
+        Returns:
+            The cached value. None if not in cache or expired.
+        """
+        entry_path = self._get_entry_path(key)
+        try:
+            with open(entry_path, 'rb') as file:
+                created, value = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except Exception as err:
+            # a corrupt entry is just a miss.
+            logger.warning(f"ignoring unreadable cache entry {entry_path}: "
+                           f"{type(err).__name__}: {err}")
+            self._remove(entry_path)
+            return None
+
+        if ttl is not None and time.time() - created > ttl:
+            logger.debug(f"cache entry {key} expired.")
+            self._remove(entry_path)
+            return None
+
+        # modified time is the last used time for the lru eviction.
+        try:
+            os.utime(entry_path)
+        except FileNotFoundError:
+            # evicted by someone else in the meantime. still have value.
+            pass
+
+        return value
+
+    def set(self, key, value):
+        """Save value for key, then evict entries over max_bytes.
+
+        Writes atomically, so parallel pipelines using the same cache don't
+        read half-written entries.
+
+        Args:
+            key: str. Cache key.
+            value: Anything that pickles.
+
+        Raises:
+            pickle.PicklingError, TypeError etc.: value can't serialize.
+        """
+        data = pickle.dumps((time.time(), value),
+                            protocol=pickle.HIGHEST_PROTOCOL)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.path,
+                                                      suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                file.write(data)
+
+            os.replace(temp_path, self._get_entry_path(key))
+        except BaseException:
+            self._remove(temp_path)
+            raise
+
+        if self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until under max_bytes.
+
+        Returns:
+            int. Number of entries deleted.
+        """
+        entries = []
+        total_bytes = 0
+        with os.scandir(self.path) as scanner:
+            for entry in scanner:
+                if not entry.name.endswith(_ENTRY_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+
+        evicted = 0
+        if total_bytes > self.max_bytes:
+            entries.sort()
+            for _, size, entry_path in entries:
+                if total_bytes <= self.max_bytes:
+                    break
+
+                self._remove(entry_path)
+                total_bytes -= size
+                evicted += 1
+
+            logger.debug(f"evicted {evicted} cache entries from {self.path}")
+
+        return evicted
+
+    def _remove(self, path):
+        """Delete path, if it exists."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,279 @@
+"""pypyr pipeline checkpoints.
+
+Save pipeline progress after each step, so that a failed pipeline can resume
+from the last step that completed rather than from the start.
+
+A checkpoint file is an append-only log of binary records. The 1st record
+after the header is a full context snapshot. Each step after that appends
+only the context keys that changed. Once the changes outgrow the snapshot,
+the file compacts to a single new snapshot.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import struct
+from pypyr.errors import CheckpointError
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# 1st bytes of every checkpoint file. Bump the version if the format changes.
+MAGIC = b'PYPYRCK1'
+
+# each record is prefixed by its length as unsigned 4 byte int.
+_record_length = struct.Struct('>I')
+
+
+def get_checkpoint_path(working_dir, pipeline_name):
+    """Get path of the checkpoint file for pipeline_name.
+
+    Args:
+        working_dir: path. pypyr working dir.
+        pipeline_name: str. Name of pipeline. Can have / for sub-dirs.
+
+    Returns:
+        str. working_dir/.pypyr/checkpoints/pipeline_name.ckpt
+    """
+    return os.path.join(working_dir or '',
+                        '.pypyr',
+                        'checkpoints',
+                        *pipeline_name.split('/')) + '.ckpt'
+
+
+def get_pipeline_hash(pipeline_definition):
+    """Get hash of pipeline definition, to tell if it changed.
+
+    Args:
+        pipeline_definition: dict. Parsed pipeline yaml.
+
+    Returns:
+        str. hex digest.
+    """
+    serialized = json.dumps(pipeline_definition, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def _digest(data):
+    """Get short digest of bytes, to tell if a context value changed."""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class Checkpoint(object):
+    """Checkpoint file for a pipeline run.
+
+    Call start once before the 1st step, then save after each step
+    completes. Call delete once the pipeline succeeds.
+
+    Attributes:
+        path: (str) path of checkpoint file.
+        pipeline_name: (str) name of pipeline.
+        pipeline_hash: (str) hash of pipeline definition.
+    """
+
+    def __init__(self, path, pipeline_name, pipeline_hash):
+        """Initialize the checkpoint. Doesn't touch the file yet."""
+        self.path = path
+        self.pipeline_name = pipeline_name
+        self.pipeline_hash = pipeline_hash
+        # key: digest of pickled value at last checkpoint.
+        self._digests = {}
+        # keys already warned about because they can't pickle.
+        self._unpicklable = set()
+        self._snapshot_size = 0
+        self._diff_size = 0
+        self._file = None
+
+    def _pickle_values(self, context):
+        """Pickle each value in context, skipping ones that can't pickle.
+
+        Returns:
+            dict of key: pickled bytes.
+        """
+        pickled = {}
+        for key, value in context.items():
+            try:
+                pickled[key] = pickle.dumps(value,
+                                            protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as err:
+                if key not in self._unpicklable:
+                    self._unpicklable.add(key)
+                    logger.warning(
+                        f"context['{key}'] can't serialize, so it won't be "
+                        "in the checkpoint. On resume it will be missing. "
+                        f"{type(err).__name__}: {err}")
+
+        return pickled
+
+    def _write_record(self, record):
+        """Write length-prefixed pickled record & flush it.
+
+        Returns:
+            int. bytes written.
+        """
+        data = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.write(_record_length.pack(len(data)))
+        self._file.write(data)
+        self._file.flush()
+        return _record_length.size + len(data)
+
+    def start(self, context, step_index=-1):
+        """Write a new checkpoint file with a full snapshot of context.
+
+        Replaces any existing checkpoint file atomically.
+
+        Args:
+            context: dict. Context to snapshot.
+            step_index: int. Index of last completed step. -1 means none.
+        """
+        logger.debug("starting")
+        self.close()
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+
+        pickled = self._pickle_values(context)
+        self._file = open(temp_path, 'wb')
+        self._file.write(MAGIC)
+        self._write_record(('header', self.pipeline_name, self.pipeline_hash))
+        self._snapshot_size = self._write_record(('full', step_index,
+                                                  pickled))
+        self._file.close()
+        os.replace(temp_path, self.path)
+
+        self._file = open(self.path, 'ab')
+        self._digests = {key: _digest(data) for key, data in pickled.items()}
+        self._diff_size = 0
+        logger.debug(f"checkpoint snapshot of {len(pickled)} keys at "
+                     f"{self.path}")
+        logger.debug("done")
+
+    def save(self, step_index, context):
+        """Append what changed in context since the last checkpoint.
+
+        Args:
+            step_index: int. Index of the step that just completed.
+            context: dict. Context after the step.
+        """
+        pickled = self._pickle_values(context)
+        updated = {}
+        for key, data in pickled.items():
+            digest = _digest(data)
+            if self._digests.get(key) != digest:
+                updated[key] = data
+                self._digests[key] = digest
+
+        removed = [key for key in self._digests if key not in pickled]
+        for key in removed:
+            del self._digests[key]
+
+        if self._diff_size > self._snapshot_size:
+            # replaying lots of diffs costs more than 1 snapshot.
+            logger.debug("compacting checkpoint")
+            self.start(context, step_index)
+            return
+
+        self._diff_size += self._write_record(('diff', step_index, updated,
+                                               removed))
+        logger.debug(f"checkpoint after step {step_index}: {len(updated)} "
+                     f"updated, {len(removed)} removed keys.")
+
+    def load(self):
+        """Load the last checkpoint from the checkpoint file.
+
+        An incomplete record at the end, like from a crash mid-write, is
+        ignored.
+
+        Returns:
+            tuple (step_index, context_dict). None if there's no checkpoint
+            file.
+
+        Raises:
+            CheckpointError: not a checkpoint file, or it's for a different
+                             pipeline or a pipeline that changed since.
+        """
+        logger.debug("starting")
+        try:
+            with open(self.path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            logger.debug(f"no checkpoint at {self.path}")
+            return None
+
+        if not data.startswith(MAGIC):
+            raise CheckpointError(f"{self.path} is not a pypyr checkpoint "
+                                  "file.")
+
+        records = _read_records(data, len(MAGIC))
+        header = next(records, None)
+        if header is None or header[0] != 'header':
+            raise CheckpointError(f"{self.path} has no checkpoint header.")
+
+        _, pipeline_name, pipeline_hash = header
+        if pipeline_name != self.pipeline_name:
+            raise CheckpointError(
+                f"{self.path} is a checkpoint for pipeline {pipeline_name}, "
+                f"not {self.pipeline_name}.")
+
+        if pipeline_hash != self.pipeline_hash:
+            raise CheckpointError(
+                f"pipeline {self.pipeline_name} changed since the checkpoint "
+                f"at {self.path}, so the steps might not line up any more. "
+                "Run without --resume to start over.")
+
+        step_index = -1
+        pickled = {}
+        for record in records:
+            if record[0] == 'full':
+                _, step_index, pickled = record
+                pickled = dict(pickled)
+            else:
+                _, step_index, updated, removed = record
+                pickled.update(updated)
+                for key in removed:
+                    pickled.pop(key, None)
+
+        context = {key: pickle.loads(value) for key, value in pickled.items()}
+        logger.debug(f"loaded checkpoint after step {step_index} with "
+                     f"{len(context)} keys.")
+        logger.debug("done")
+        return step_index, context
+
+    def close(self):
+        """Close the checkpoint file, if open."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def delete(self):
+        """Close & delete the checkpoint file, if it exists."""
+        self.close()
+        try:
+            os.remove(self.path)
+            logger.debug(f"deleted checkpoint {self.path}")
+        except FileNotFoundError:
+            pass
+
+
+def _read_records(data, offset):
+    """Yield each complete record in data from offset.
+
+    Args:
+        data: bytes. Checkpoint file contents.
+        offset: int. Start reading here.
+
+    Yields:
+        tuple. Each unpickled record.
+    """
+    while offset + _record_length.size <= len(data):
+        (length,) = _record_length.unpack_from(data, offset)
+        start = offset + _record_length.size
+        end = start + length
+        if end > len(data):
+            logger.warning("checkpoint ends with an incomplete record. "
+                           "Ignoring it.")
+            return
+
+        yield pickle.loads(data[start:end])
+        offset = end
@@ -5,6 +5,7 @@ Parse command line arguments in, invoke pipelinerunner.
 import argparse
 import os
 import pypyr.pipelinerunner
+import pypyr.plan
 import pypyr.version
 import signal
 import sys
@@ -35,6 +36,32 @@ def get_parser():
                         help='Integer log level. Defaults to 20 (INFO). '
                         '10=DEBUG\n20=INFO\n30=WARNING\n40=ERROR\n50=CRITICAL'
                         '.\n Log Level < 10 gives full traceback on errors.')
+    parser.add_argument('--jsonlog', dest='log_json', action='store_true',
+                        help='Log structured json lines, with pipeline, step '
+                        'and iteration fields. Writes from a background '
+                        'queue, so logging does not block step execution.')
+    parser.add_argument('--preload', dest='preload', action='store_true',
+                        help='Import all step modules in the pipeline in '
+                        'parallel before running it. Reports all missing '
+                        'step modules up front.')
+    parser.add_argument('--checkpoint', dest='checkpoint',
+                        action='store_true',
+                        help='Save progress after each step to '
+                        '.pypyr/checkpoints in the working dir, so a failed '
+                        'run can --resume.')
+    parser.add_argument('--resume', dest='resume', action='store_true',
+                        help='Resume from the step after the last one that '
+                        'completed in the checkpoint. Starts at the '
+                        'beginning if there is no checkpoint.')
+    parser.add_argument('--plan', dest='plan', action='store_true',
+                        help='Print what the pipeline would do, with '
+                        'child pipelines & estimated step runs, without '
+                        'running any steps. Checks that all step modules '
+                        'load.')
+    parser.add_argument('--memstats', dest='memstats', action='store_true',
+                        help='Print how much memory each top-level context '
+                        'key takes once the pipeline is done, biggest '
+                        'first.')
     parser.add_argument('--version', action='version',
                         help='Echo version number.',
                         version=f'{pypyr.version.get_version()}')
@@ -54,11 +81,23 @@ def main(args=None):
     parsed_args = get_args(args)
 
     try:
+        if parsed_args.plan:
+            return pypyr.plan.main(
+                pipeline_name=parsed_args.pipeline_name,
+                working_dir=parsed_args.working_dir,
+                log_level=parsed_args.log_level,
+                log_json=parsed_args.log_json)
+
         return pypyr.pipelinerunner.main(
             pipeline_name=parsed_args.pipeline_name,
             pipeline_context_input=parsed_args.pipeline_context,
             working_dir=parsed_args.working_dir,
-            log_level=parsed_args.log_level)
+            log_level=parsed_args.log_level,
+            log_json=parsed_args.log_json,
+            preload=parsed_args.preload,
+            checkpoint=parsed_args.checkpoint,
+            resume=parsed_args.resume,
+            memstats=parsed_args.memstats)
     except KeyboardInterrupt:
         # Shell standard is 128 + signum = 130 (SIGINT = 2)
         sys.stdout.write("\n")
@@ -1,9 +1,14 @@
 """pypyr context class. Dictionary ahoy."""
 from collections import namedtuple
 from collections.abc import Mapping, Set, Sequence
+import copy
 from string import Formatter
-from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
+import threading
+from pypyr.errors import (ContextError,
+                          KeyInContextHasNoValueError,
+                          KeyNotInContextError)
 from pypyr.utils import types
+from pypyr.utils.compact import CompactDict
 
 ContextItemInfo = namedtuple('ContextItemInfo',
                              ['key',
@@ -18,6 +23,12 @@ ContextItemInfo = namedtuple('ContextItemInfo',
 # https://github.com/python/cpython/blob/master/Lib/string.py
 formatter = Formatter()
 
+# types that never need formatting.
+_SCALAR_TYPES = frozenset((int, float, bool, type(None)))
+
+# guards creating each context's lock on 1st use.
+_lock_guard = threading.Lock()
+
 
 class Context(dict):
     """The pypyr context.
@@ -28,9 +39,14 @@ class Context(dict):
     This class only adds functionality on top of dictionary, it should not
     override anything in dict.
 
+    For tasks that run concurrently, give each task its own fork of the
+    context, then join the fork back once the task is done. See fork.
+
     Attributes:
         working_dir (path-like): working directory path. Either CWD or
                                  initialized from the cli --dir arg.
+        lock (threading.RLock): hold this to change a context shared between
+                                threads.
     """
 
     def __missing__(self, key):
@@ -41,6 +57,36 @@ class Context(dict):
         """
         raise KeyNotInContextError(f"{key} not found in the pypyr context.")
 
+    def __getstate__(self):
+        """Get instance attributes to pickle or copy, without the lock.
+
+        Locks don't pickle. An unpickled or copied context gets its own lock
+        when it 1st needs one.
+        """
+        state = self.__dict__.copy()
+        state.pop('_lock', None)
+        return state
+
+    @property
+    def lock(self):
+        """Get the re-entrant lock for changing this context across threads.
+
+        Hold it for read-modify-write on a context that concurrent tasks
+        share, like incrementing a counter:
+
+            with context.lock:
+                context['count'] += 1
+
+        Returns:
+            threading.RLock. Always the same lock for the same context.
+        """
+        lock = self.__dict__.get('_lock', None)
+        if lock is None:
+            with _lock_guard:
+                lock = self.__dict__.setdefault('_lock', threading.RLock())
+
+        return lock
+
     def assert_key_exists(self, key, caller):
         """Assert that context contains key.
 
@@ -176,6 +222,85 @@ class Context(dict):
         for context_item in context_items:
             self.assert_key_type_value(context_item, caller, extra_error_text)
 
+    def fork(self, deep=False):
+        """Get a copy of context for a task that runs concurrently.
+
+        The fork is a shallow copy. The task can add, replace & delete
+        top-level keys in its fork, like the step's in parameters, foreach's
+        i or while's whileCounter, without racing other tasks. Call join with
+        the fork once the task is done to merge its changes back.
+
+        Nested values are the same objects as in this context, so changing
+        them in place isn't isolated. Replace the top-level key instead, or
+        hold lock while changing them. Or fork deep, for tasks like child
+        pipelines that might change anything.
+
+        Args:
+            deep: bool. Deep copy the values too, so the task can change
+                  nested values in place without touching this context. Join
+                  then compares values with == rather than checking whether
+                  they're the same object, so it finds nested changes too.
+
+        Returns:
+            pypyr.context.Context. The fork, with the same attributes as this
+            context, like working_dir.
+        """
+        with self.lock:
+            base = dict(self)
+            forked = Context(copy.deepcopy(base) if deep else base)
+
+        forked.__dict__.update(self.__getstate__())
+        forked._fork_base = base
+        forked._fork_deep = deep
+        return forked
+
+    def join(self, forked):
+        """Merge what the task changed in its fork back into this context.
+
+        Only top-level keys the task added, replaced or deleted in forked
+        since fork (or since the last join) merge back, so concurrent tasks
+        don't overwrite each other's changes with stale values. If tasks
+        change the same key, the last to join wins.
+
+        Safe to call from many threads at once.
+
+        Args:
+            forked: pypyr.context.Context. Fork of this context from fork.
+
+        Returns:
+            tuple (updated, removed) where updated is a dict of keys added or
+            replaced, and removed is a list of keys deleted.
+
+        Raises:
+            ContextError: forked isn't a fork.
+        """
+        base = forked.__dict__.get('_fork_base', None)
+        if base is None:
+            raise ContextError("can only join a context from fork.")
+
+        deep = forked.__dict__.get('_fork_deep', False)
+        if deep:
+            updated = {key: value for key, value in forked.items()
+                       if key not in base or base[key] != value}
+        else:
+            updated = {key: value for key, value in forked.items()
+                       if key not in base or base[key] is not value}
+
+        removed = [key for key in base if key not in forked]
+
+        with self.lock:
+            self.update(updated)
+            for key in removed:
+                self.pop(key, None)
+
+        if deep:
+            # the fork's values change in place, so compare with a copy.
+            forked._fork_base = copy.deepcopy(dict(forked))
+        else:
+            forked._fork_base = dict(forked)
+
+        return updated, removed
+
     def get_formatted(self, key):
         """Returns formatted value for context[key].
 
@@ -232,6 +357,10 @@ class Context(dict):
         For dicts: format key. If value str, format it.
         For sets/tuples: if type str, format it.
 
+        tuples, frozensets & pypyr.utils.compact.CompactDict are read-only,
+        so if nothing in them changes when formatted, returns the same
+        instance rather than a copy.
+
         This is what formatting or interpolating a string means:
         So where a string like this 'Piping {key1} the {key2} wild'
         And context={'key1': 'down', 'key2': 'valleys', 'key3': 'value3'}
@@ -248,6 +377,9 @@ class Context(dict):
         Returns:
             Iterable identical in structure to the input iterable.
         """
+        # fast path for the most common leaves in big nested data.
+        if type(obj) in _SCALAR_TYPES:
+            return obj
 
         if memo is None:
             memo = {}
@@ -261,6 +393,24 @@ class Context(dict):
             new = self.get_formatted_string(obj)
         elif isinstance(obj, (bytes, bytearray)):
             new = obj
+        elif isinstance(obj, CompactDict):
+            # read-only, so share it rather than copy it unless something in
+            # it formats to something else.
+            items = [(self.get_formatted_iterable(k, memo),
+                      self.get_formatted_iterable(v, memo))
+                     for k, v in obj.items()]
+            if all(k is old_k and v is old_v
+                   for (k, v), (old_k, old_v) in zip(items, obj.items())):
+                new = obj
+            else:
+                new = CompactDict(items)
+        elif type(obj) is tuple or type(obj) is frozenset:
+            # same as CompactDict - immutable, so share it if unchanged.
+            items = [self.get_formatted_iterable(v, memo) for v in obj]
+            if all(v is old_v for v, old_v in zip(items, obj)):
+                new = obj
+            else:
+                new = obj.__class__(items)
         elif isinstance(obj, Mapping):
             # dicts
             new = obj.__class__()
@@ -408,6 +558,9 @@ class Context(dict):
         """
         if input_string[: 6] == '[sic]"':
             return input_string[6: -1]
+        elif '{' not in input_string and '}' not in input_string:
+            # nothing to format, so skip parsing & keep the same str.
+            return input_string
         else:
             # is this a special one field formatstring? i.e "{field}", with
             # nothing else?
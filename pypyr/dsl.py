@@ -1,9 +1,22 @@
 """pypyr pipeline yaml definition classes - domain specific language"""
 
+from collections.abc import Sized
 import logging
-from pypyr.errors import LoopMaxExhaustedError, PipelineDefinitionError
+import math
+import random
+from pypyr.errors import (KeyNotInContextError,
+                          LoopMaxExhaustedError,
+                          PipelineDefinitionError,
+                          StepTimeoutError)
+import pypyr.cache
+import pypyr.executors
+import pypyr.log.logger
 import pypyr.moduleloader
+import pypyr.resources
+import pypyr.utils.foreach
 import pypyr.utils.poll
+import pypyr.utils.worker
+from pypyr.utils.worker import Worker, check_cancelled
 
 # use pypyr logger to ensure loglevel is set correctly
 logger = logging.getLogger(__name__)
@@ -30,16 +43,39 @@ class Step(object):
         module: (importlib module) the dynamically loaded module that the
                 step will execute. this module will have the run_step
                 function that implements the actual step execution.
+        executor: (str) defaults None. None runs the step in the pipeline's
+                  own thread. 'process' runs the step in a worker process
+                  from a persistent process pool.
+        executor_keys: (list) defaults None. Only pass these context keys to
+                       the step when it runs in a worker process. None passes
+                       the entire context.
         foreach_items: (list) defaults None. Execute step once for each item in
                     list, using iterator i.
+        batch_size: (int) defaults None. Split foreach_items into batches of
+                    up to this many items, and execute step once per batch,
+                    with iterator i as the list of items in the batch.
         in_parameters: (dict) defaults None. The in step decorator - i.e dict
                        to add to context before step execution.
         run_me: (bool) defaults True. step runs if this is true.
         skip_me: (bool) defaults False. step does not run if this is true.
         swallow_me: (bool) defaults False. swallow any errors during step run
                     and continue processing if true.
+        timeout: (float) defaults None. Stop waiting for the step after this
+                 many seconds & raise StepTimeoutError. None means no limit.
+        uses: (list) defaults None. Names of resources the step needs a slot
+              in to run. See pypyr.resources.
+        retry_decorator: (RetryDecorator) defaults None. run step again if
+                         it fails.
         while_decorator: (WhileDecorator) defaults None. execute step in while
                          loop.
+        cache_decorator: (CacheDecorator) defaults None. memoize step outputs
+                         for the same inputs.
+        static_conditionals: (tuple) (run_me, skip_me, swallow_me) as bools
+                             if none of these contain formatting expressions,
+                             else None.
+        is_static: (bool) True if the step has no in, foreach or while
+                   decorators and static_conditionals. run_step takes a fast
+                   path straight to execution for these.
     """
 
     def __init__(self, step):
@@ -57,15 +93,22 @@ class Step(object):
 
         # defaults for decorators
         self.foreach_items = None
+        self.batch_size = None
         self.in_parameters = None
         self.run_me = True
         self.skip_me = False
         self.swallow_me = False
         self.name = None
         self.while_decorator = None
+        self.retry_decorator = None
+        self.cache_decorator = None
+        self.executor = None
+        self.executor_keys = None
+        self.timeout = None
+        self.uses = None
 
         if isinstance(step, dict):
-            self.name = step['name']
+            self.name = self.get_step_name(step)
             logger.debug(f"{self.name} is complex.")
 
             self.in_parameters = step.get('in', None)
@@ -73,6 +116,14 @@ class Step(object):
             # foreach: optional value. None by default.
             self.foreach_items = step.get('foreach', None)
 
+            # batchSize: optional value. None by default. Allow substitution.
+            self.batch_size = step.get('batchSize', None)
+            if self.batch_size is not None and not self.foreach_items:
+                logger.error(f"{self.name} has batchSize without foreach.")
+                raise PipelineDefinitionError(
+                    f"{self.name} batchSize only works with foreach. Set "
+                    "foreach too, or remove batchSize.")
+
             # run: optional value, true by default. Allow substitution.
             self.run_me = step.get('run', True)
 
@@ -86,6 +137,35 @@ class Step(object):
             while_definition = step.get('while', None)
             if while_definition:
                 self.while_decorator = WhileDecorator(while_definition)
+
+            # retry: optional, defaults none.
+            retry_definition = step.get('retry', None)
+            if retry_definition is not None:
+                self.retry_decorator = RetryDecorator(retry_definition)
+
+            # cache: optional, defaults none.
+            cache_definition = step.get('cache', None)
+            if cache_definition is not None:
+                self.cache_decorator = CacheDecorator(cache_definition,
+                                                      self.name)
+
+            # executor: optional, defaults None i.e run in current thread.
+            self.executor = step.get('executor', None)
+            if self.executor not in (None, 'process'):
+                logger.error(f"{self.name} has unknown executor "
+                             f"{self.executor}.")
+                raise PipelineDefinitionError(
+                    f"{self.name} executor must be process, or not set at "
+                    f"all. {self.executor} is not a valid executor.")
+
+            # executorKeys: optional, defaults None i.e all of context.
+            self.executor_keys = step.get('executorKeys', None)
+
+            # timeout: optional, defaults None. Allow substitution.
+            self.timeout = step.get('timeout', None)
+
+            # uses: optional, defaults None. Allow substitution.
+            self.uses = step.get('uses', None)
         else:
             # of course, it might not be a string. in line with duck typing,
             # beg forgiveness later. as long as it loads the module, happy
@@ -95,40 +175,132 @@ class Step(object):
 
         self.module = pypyr.moduleloader.get_module(self.name)
 
+        # conditional decorators that aren't strings can't contain formatting
+        # expressions, so they're compile-time constants. Evaluate them once
+        # here rather than on every step run or loop iteration.
+        if any(isinstance(decorator, str) for decorator in
+               (self.run_me, self.skip_me, self.swallow_me)):
+            self.static_conditionals = None
+        else:
+            self.static_conditionals = (bool(self.run_me),
+                                        bool(self.skip_me),
+                                        bool(self.swallow_me))
+
+        # a step with no in, looping decorators or dynamic conditionals can
+        # go straight to execution.
+        self.is_static = all((self.static_conditionals is not None,
+                              not self.in_parameters,
+                              not self.foreach_items,
+                              not self.while_decorator))
+
         logger.debug("done")
 
     def foreach_loop(self, context):
         """Run step once for each item in foreach_items.
 
         On each iteration, the invoked step can use context['i'] to get the
-        current iterator value.
+        current iterator value. With batch_size, context['i'] is the list of
+        items in the current batch.
+
+        foreach_items can also be a streaming source like {file: path}, or
+        evaluate to an iterator like a generator. These iterate lazily, one
+        item at a time, without knowing up front how many items there are.
+        See pypyr.utils.foreach.
 
         Args:
             context: (pypyr.context.Context) The pypyr context. This arg will
                      mutate.
+
+        Raises:
+            PipelineDefinitionError: batch_size is less than 1, or invalid
+                                     streaming source.
         """
         logger.debug("starting")
 
         # Loop decorators only evaluated once, not for every step repeat
         # execution.
-        foreach = context.get_formatted_iterable(self.foreach_items)
+        foreach = pypyr.utils.foreach.get_foreach_iterable(context,
+                                                           self.foreach_items)
 
-        foreach_length = len(foreach)
+        # streaming sources don't know their length without consuming them.
+        foreach_length = len(foreach) if isinstance(foreach, Sized) else None
 
-        logger.info(f"foreach decorator will loop {foreach_length} times.")
+        if self.batch_size is not None:
+            batch_size = self.get_batch_size(context)
+            if foreach_length is not None:
+                foreach_length = math.ceil(foreach_length / batch_size)
+            foreach = pypyr.utils.foreach.iter_batches(foreach, batch_size)
 
-        for i in foreach:
-            logger.info(f"foreach: running step {i}")
+        if foreach_length is None:
+            logger.info("foreach decorator will loop until the foreach "
+                        "source runs out.")
+        else:
+            logger.info(f"foreach decorator will loop {foreach_length} times.")
+
+        counter = 0
+        for counter, i in enumerate(foreach, 1):
+            # stop looping once a timeout cancelled the step.
+            check_cancelled()
+            # a batch can be long, don't log all of it.
+            label = (i if self.batch_size is None
+                     else f"batch {counter} with {len(i)} items")
+            logger.info(f"foreach: running step {label}")
             # the iterator must be available to the step when it executes
             context['i'] = i
             # conditional operators apply to each iteration, so might be an
             # iteration run, skips or swallows.
-            self.run_conditional_decorators(context)
-            logger.debug(f"foreach: done step {i}")
+            with pypyr.log.logger.log_scope(iteration=counter):
+                self.run_conditional_decorators(context)
+            logger.debug(f"foreach: done step {label}")
 
-        logger.debug(f"foreach decorator looped {foreach_length} times.")
+        logger.debug(f"foreach decorator looped {counter} times.")
         logger.debug("done")
 
+    def get_batch_size(self, context):
+        """Get batch_size as int, formatting expressions from context.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. For
+                     formatting expressions in batch_size.
+
+        Returns:
+            int.
+
+        Raises:
+            PipelineDefinitionError: batch_size is less than 1.
+        """
+        batch_size = context.get_formatted_as_type(self.batch_size,
+                                                   out_type=int)
+        if batch_size < 1:
+            raise PipelineDefinitionError(
+                f"{self.name} batchSize must be 1 or more, not {batch_size}.")
+
+        logger.debug(f"foreach runs in batches of {batch_size}.")
+        return batch_size
+
+    @staticmethod
+    def get_step_name(step):
+        """Get the module name of step.
+
+        Args:
+            step: a string or a dict. The step as it is in the pipeline yaml.
+
+        Returns:
+            str. The step's module name.
+
+        Raises:
+            PipelineDefinitionError: complex step doesn't have a name.
+        """
+        if not isinstance(step, dict):
+            return step
+
+        name = step.get('name', None)
+        if not name:
+            raise PipelineDefinitionError(
+                f"complex step must have a name. Step is: {step}")
+
+        return name
+
     def invoke_step(self, context):
         """Invoke 'run_step' in the dynamically loaded step module.
 
@@ -146,16 +318,50 @@ class Step(object):
         logger.debug("starting")
 
         try:
-            logger.debug(f"running step {self.module}")
+            logger.debug(f"running step {self.name}")
 
-            self.module.run_step(context)
+            if self.uses:
+                with pypyr.resources.use(self.get_uses(context),
+                                         user=self.name):
+                    self.invoke_module(context)
+            else:
+                self.invoke_module(context)
 
-            logger.debug(f"step {self.module} done")
+            logger.debug(f"step {self.name} done")
         except AttributeError:
             logger.error(f"The step {self.name} doesn't have a "
                          "run_step(context) function.")
             raise
 
+    def get_uses(self, context):
+        """Evaluate the uses decorator.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context.
+
+        Returns:
+            list of str. Names of the resources the step uses.
+        """
+        uses = context.get_formatted_iterable(self.uses)
+        if isinstance(uses, str):
+            return [uses]
+
+        return uses
+
+    def invoke_module(self, context):
+        """Run the step module, here or with the step's executor.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. This arg will
+                     mutate.
+        """
+        if self.executor == 'process':
+            pypyr.executors.run_step_in_process(self.name,
+                                                context,
+                                                keys=self.executor_keys)
+        else:
+            self.module.run_step(context)
+
     def run_conditional_decorators(self, context):
         """Evaluate the step decorators to decide whether to run step or not.
 
@@ -168,19 +374,20 @@ class Step(object):
         """
         logger.debug("starting")
 
-        # The decorator attributes might contain formatting expressions that
-        # change whether they evaluate True or False, thus apply formatting at
-        # last possible instant.
-        run_me = context.get_formatted_as_type(self.run_me, out_type=bool)
-        skip_me = context.get_formatted_as_type(self.skip_me, out_type=bool)
-        swallow_me = context.get_formatted_as_type(self.swallow_me,
-                                                   out_type=bool)
+        run_me, skip_me, swallow_me = self.get_conditionals(context)
 
         if run_me:
             if not skip_me:
                 try:
-                    self.invoke_step(context=context)
+                    if self.retry_decorator:
+                        self.retry_decorator.retry_loop(
+                            context,
+                            self.run_cache_decorator)
+                    else:
+                        self.run_cache_decorator(context)
                 except Exception as ex_info:
+                    # a cancelled step's error is moot, don't swallow it.
+                    check_cancelled()
                     if swallow_me:
                         logger.error(
                             f"{self.name} Ignoring error because swallow "
@@ -196,6 +403,65 @@ class Step(object):
 
         logger.debug("done")
 
+    def run_cache_decorator(self, context):
+        """Invoke step, or get its outputs from the cache if it has one.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. This arg will
+                     mutate.
+        """
+        if self.cache_decorator:
+            self.cache_decorator.run_cached(context, self)
+        else:
+            self.invoke_step(context=context)
+
+    def get_conditionals(self, context):
+        """Evaluate the run, skip & swallow decorators.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context.
+
+        Returns:
+            tuple of bool (run_me, skip_me, swallow_me).
+        """
+        if self.static_conditionals:
+            # no formatting expressions, so already evaluated in init.
+            return self.static_conditionals
+
+        # The decorator attributes might contain formatting expressions
+        # that change whether they evaluate True or False, thus apply
+        # formatting at last possible instant.
+        return (context.get_formatted_as_type(self.run_me, out_type=bool),
+                context.get_formatted_as_type(self.skip_me, out_type=bool),
+                context.get_formatted_as_type(self.swallow_me,
+                                              out_type=bool))
+
+    def get_timeout(self, context):
+        """Evaluate the timeout decorator.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context.
+
+        Returns:
+            float. Timeout in seconds.
+
+        Raises:
+            PipelineDefinitionError: timeout isn't a number more than 0.
+        """
+        try:
+            timeout = context.get_formatted_as_type(self.timeout,
+                                                    out_type=float)
+        except (TypeError, ValueError):
+            timeout = None
+
+        if not timeout or timeout <= 0 or isinstance(self.timeout, bool):
+            logger.error(f"{self.name} has invalid timeout {self.timeout}.")
+            raise PipelineDefinitionError(
+                f"{self.name} timeout must be a number of seconds more than "
+                f"0, not {self.timeout}.")
+
+        return timeout
+
     def run_foreach_or_conditional(self, context):
         """Run the foreach sequence or the conditional evaluation.
 
@@ -221,15 +487,87 @@ class Step(object):
                      mutate.
         """
         logger.debug("starting")
-        # the in params should be added to context before step execution.
-        self.set_step_input_context(context)
+        with pypyr.log.logger.log_scope(step=self.name, iteration=None):
+            if self.timeout is not None:
+                self.run_with_timeout(context)
+            elif self.is_static:
+                # fast path: nothing to add to context, loop or evaluate.
+                self.run_conditional_decorators(context)
+            else:
+                # the in params should be added to context before step
+                # execution.
+                self.set_step_input_context(context)
+                self.run_loop_decorators(context)
 
+        logger.debug("done")
+
+    def run_loop_decorators(self, context):
+        """Run the while loop, the foreach loop or the step just once.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. This arg will
+                     mutate.
+        """
         if self.while_decorator:
             self.while_decorator.while_loop(context,
                                             self.run_foreach_or_conditional)
         else:
             self.run_foreach_or_conditional(context)
 
+    def run_with_timeout(self, context):
+        """Run step on a worker thread, waiting at most timeout seconds.
+
+        The timeout covers the whole step, including all its loop
+        iterations. The step runs in a fork of context, which joins back into
+        context if the step finishes in time, even if it raised. If it
+        doesn't finish in time, the step cancels: shell commands & process
+        executor steps stop, & loops stop at the next iteration. Anything
+        else runs on in the background until it finishes. Its top-level keys
+        never join context, but the fork is shallow, so nested values like
+        dicts & lists are the same objects as in context - if the step
+        changes those in place, context still sees the change.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. This arg will
+                     mutate.
+
+        Raises:
+            StepTimeoutError: step didn't finish in time, and swallow isn't
+                              True.
+        """
+        logger.debug("starting")
+        timeout = self.get_timeout(context)
+
+        # in params go into context, not only the fork, like without timeout.
+        self.set_step_input_context(context)
+
+        forked = context.fork()
+        worker = Worker(self.run_loop_decorators,
+                        forked,
+                        name=f"pypyr-{self.name}").start()
+
+        if worker.wait(timeout):
+            try:
+                worker.result()
+            finally:
+                # keep what the step set before it failed, like without
+                # timeout.
+                context.join(forked)
+
+            logger.debug("done")
+            return
+
+        worker.cancel()
+        message = (f"{self.name} didn't finish within its timeout of "
+                   f"{timeout} seconds.")
+
+        if self.get_conditionals(context)[2]:
+            logger.error(f"{self.name} Ignoring error because swallow is True "
+                         f"for this step.\nStepTimeoutError: {message}")
+        else:
+            logger.error(message)
+            raise StepTimeoutError(message)
+
         logger.debug("done")
 
     def set_step_input_context(self, context):
@@ -257,6 +595,339 @@ class Step(object):
         logger.debug("done")
 
 
+class CacheDecorator(object):
+    """Cache Decorator, as interpreted by the pypyr pipeline definition yaml.
+
+    Memoizes the outputs of a step that only depends on its inputs. The cache
+    key is a hash of the step name, the step module's source and the input
+    values, so changing the step code or an input runs the step again.
+
+    On a cache hit, the step doesn't run at all. The cached outputs write to
+    context instead.
+
+    Attributes:
+        inputs: (list) context keys that the step outputs depend on.
+        outputs: (list) context keys the step sets. These are what caches.
+        ttl: (float) defaults None. Cached outputs expire after this many
+             seconds. None never expires.
+        max_bytes: (int) defaults 100MiB. Evict the least recently used
+                   entries once the cache dir is bigger than this. 0 means
+                   no limit.
+        dir: (str) defaults None. Cache directory. None is
+             working_dir/.pypyr/cache.
+    """
+
+    def __init__(self, cache_definition, step_name):
+        """Initialize the class.
+
+        Args:
+            cache_definition: dict. The cache definition as it exists in the
+                              pipeline yaml.
+            step_name: str. Name of step, for error messages.
+
+        Raises:
+            PipelineDefinitionError: cache definition is invalid.
+        """
+        logger.debug("starting")
+
+        if not isinstance(cache_definition, dict):
+            logger.error("cache decorator definition incorrect.")
+            raise PipelineDefinitionError(
+                f"{step_name} cache decorator must be a dict (i.e a map) "
+                "type.")
+
+        # inputs: optional, defaults no inputs.
+        self.inputs = cache_definition.get('inputs', None) or []
+
+        # outputs: mandatory.
+        self.outputs = cache_definition.get('outputs', None)
+
+        if not isinstance(self.inputs, list):
+            logger.error("cache decorator inputs incorrect.")
+            raise PipelineDefinitionError(
+                f"{step_name} cache inputs must be a list of context keys.")
+
+        if not self.outputs or not isinstance(self.outputs, list):
+            logger.error("cache decorator outputs incorrect.")
+            raise PipelineDefinitionError(
+                f"{step_name} cache outputs must be a list of at least one "
+                "context key.")
+
+        # ttl: optional. defaults None i.e never expires.
+        self.ttl = cache_definition.get('ttl', None)
+
+        # maxBytes: optional. defaults 100MiB.
+        self.max_bytes = cache_definition.get('maxBytes',
+                                              pypyr.cache.DEFAULT_MAX_BYTES)
+
+        # dir: optional. defaults None i.e working_dir/.pypyr/cache
+        self.dir = cache_definition.get('dir', None)
+
+        logger.debug("done")
+
+    def get_cache(self, context):
+        """Get the disk cache, formatting expressions from context.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context.
+
+        Returns:
+            pypyr.cache.DiskCache
+        """
+        if self.dir:
+            cache_dir = context.get_formatted_string(self.dir)
+        else:
+            cache_dir = pypyr.cache.get_cache_dir(
+                getattr(context, 'working_dir', None))
+
+        max_bytes = context.get_formatted_as_type(self.max_bytes,
+                                                  out_type=int)
+        return pypyr.cache.DiskCache(cache_dir, max_bytes=max_bytes)
+
+    def run_cached(self, context, step):
+        """Write cached outputs to context, or run step & cache its outputs.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. This arg will
+                     mutate.
+            step: (pypyr.dsl.Step) Invoke this step on a cache miss.
+
+        Raises:
+            KeyNotInContextError: an input isn't in context before the step
+                                  runs, or an output isn't in context after.
+        """
+        logger.debug("starting")
+
+        for key in self.inputs:
+            context.assert_key_exists(key, f"{step.name} cache inputs")
+
+        try:
+            cache_key = pypyr.cache.get_cache_key(
+                step.name,
+                pypyr.cache.get_module_hash(step.module),
+                {key: context[key] for key in self.inputs})
+        except Exception as err:
+            logger.warning(f"{step.name} cache inputs can't serialize, so "
+                           "running the step without the cache. "
+                           f"{type(err).__name__}: {err}")
+            step.invoke_step(context=context)
+            logger.debug("done")
+            return
+
+        ttl = None
+        if self.ttl is not None:
+            ttl = context.get_formatted_as_type(self.ttl, out_type=float)
+
+        cache = self.get_cache(context)
+        outputs = cache.get(cache_key, ttl=ttl)
+
+        if outputs is not None:
+            logger.info(f"{step.name} cache hit, so not running step.")
+            context.update(outputs)
+            logger.debug("done")
+            return
+
+        logger.debug(f"{step.name} cache miss.")
+        step.invoke_step(context=context)
+
+        missing = [key for key in self.outputs if key not in context]
+        if missing:
+            raise KeyNotInContextError(
+                f"{step.name} cache outputs {', '.join(missing)} not in "
+                "context after the step ran. cache outputs must be keys the "
+                "step sets.")
+
+        try:
+            cache.set(cache_key, {key: context[key] for key in self.outputs})
+        except Exception as err:
+            logger.warning(f"{step.name} cache outputs can't serialize, so "
+                           "not caching them. "
+                           f"{type(err).__name__}: {err}")
+
+        logger.debug("done")
+
+
+class RetryDecorator(object):
+    """Retry Decorator, as interpreted by the pypyr pipeline definition yaml.
+
+    Runs the step again when it raises an error, sleeping a little longer
+    before each attempt. The settings evaluate once per step run, not on
+    every attempt.
+
+    In a normal world, Step invokes RetryDecorator. If you run it directly,
+    you're responsible for the context and surrounding control-of-flow.
+
+    Attributes:
+        backoff: (float) defaults 2. Multiply sleep by this after each
+                 attempt. 1 sleeps the same time between all attempts.
+        jitter: (float) defaults 0. Randomly take up to this fraction off
+                each sleep, so that many pipelines retrying the same thing
+                don't all retry at once. 1 sleeps anywhere between 0 & the
+                full sleep.
+        max: (int) defaults 3. Maximum attempts, including the 1st.
+        max_sleep: (float) defaults None. Never sleep longer than this
+                   between attempts. None is no limit.
+        retry_on: (list) defaults None. Only retry errors of these types.
+                  None retries any error.
+        sleep: (float) defaults 0. Seconds to sleep before the 2nd attempt.
+        stop_on: (list) defaults None. Never retry errors of these types.
+    """
+
+    def __init__(self, retry_definition):
+        """Initialize the class. No duh, huh?
+
+        Args:
+            retry_definition: dict. This is the actual retry definition as it
+                              exists in the pipeline yaml.
+        """
+        logger.debug("starting")
+
+        if not isinstance(retry_definition, dict):
+            logger.error("retry decorator definition incorrect.")
+            raise PipelineDefinitionError("retry decorator must be a dict "
+                                          "(i.e a map) type.")
+
+        self.max = retry_definition.get('max', 3)
+        self.sleep = retry_definition.get('sleep', 0)
+        self.backoff = retry_definition.get('backoff', 2)
+        self.max_sleep = retry_definition.get('maxSleep', None)
+        self.jitter = retry_definition.get('jitter', 0)
+        self.retry_on = retry_definition.get('retryOn', None)
+        self.stop_on = retry_definition.get('stopOn', None)
+
+        for name, value in (('retryOn', self.retry_on),
+                            ('stopOn', self.stop_on)):
+            if value is not None and not isinstance(value, (list, str)):
+                logger.error(f"retry {name} definition incorrect.")
+                raise PipelineDefinitionError(
+                    f"retry {name} must be a list of error names.")
+
+        logger.debug("done")
+
+    def get_sleeps(self, context, max):
+        """Get how long to sleep before each attempt after the 1st.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context.
+            max: int. Attempts in total.
+
+        Returns:
+            list of float seconds, with max - 1 items.
+        """
+        sleep = context.get_formatted_as_type(self.sleep, out_type=float)
+        backoff = context.get_formatted_as_type(self.backoff, out_type=float)
+        jitter = context.get_formatted_as_type(self.jitter, out_type=float)
+        max_sleep = (None if self.max_sleep is None else
+                     context.get_formatted_as_type(self.max_sleep,
+                                                   out_type=float))
+
+        sleeps = []
+        for _ in range(max - 1):
+            delay = sleep if max_sleep is None else min(sleep, max_sleep)
+            if jitter:
+                delay -= delay * jitter * random.random()
+
+            sleeps.append(delay)
+            sleep *= backoff
+
+        return sleeps
+
+    def get_error_names(self, context, names):
+        """Get the set of error names from retryOn or stopOn.
+
+        Returns:
+            frozenset of str. None if names is None.
+        """
+        if names is None:
+            return None
+
+        names = context.get_formatted_iterable(names)
+        if isinstance(names, str):
+            names = [names]
+
+        return frozenset(names)
+
+    def is_retryable(self, error, retry_on, stop_on):
+        """Is error one to retry?
+
+        An error matches a name if it, or any of its base classes, has that
+        class name, like CalledProcessError, or that full name, like
+        subprocess.CalledProcessError.
+
+        Args:
+            error: Exception. The error the step raised.
+            retry_on: frozenset of str. Only retry these. None retries any.
+            stop_on: frozenset of str. Never retry these.
+
+        Returns:
+            bool.
+        """
+        names = set()
+        for error_type in type(error).__mro__:
+            names.add(error_type.__name__)
+            names.add(f"{error_type.__module__}.{error_type.__qualname__}")
+
+        if stop_on and not names.isdisjoint(stop_on):
+            return False
+
+        return retry_on is None or not names.isdisjoint(retry_on)
+
+    def retry_loop(self, context, step_method):
+        """Run step, retrying on errors.
+
+        The attempt counter is context['retryCounter'], starting at 1.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. This arg will
+                     mutate - after method execution will contain the new
+                     updated context.
+            step_method: (method/function) This is the method/function that
+                         will execute on every attempt. Signature is:
+                         function(context)
+
+        Raises:
+            PipelineDefinitionError: max is less than 1.
+            The step's error once attempts run out, or if the error isn't
+            one to retry.
+        """
+        logger.debug("starting")
+
+        max = context.get_formatted_as_type(self.max, out_type=int)
+        if max < 1:
+            logger.error(f"retry max is {max}.")
+            raise PipelineDefinitionError(
+                f"retry max must be 1 or more, not {max}.")
+
+        sleeps = self.get_sleeps(context, max)
+        retry_on = self.get_error_names(context, self.retry_on)
+        stop_on = self.get_error_names(context, self.stop_on)
+
+        for counter in range(1, max + 1):
+            context['retryCounter'] = counter
+            try:
+                step_method(context)
+                break
+            except Exception as err:
+                if counter == max:
+                    logger.error(f"retry: attempt {counter} of {max} failed. "
+                                 "No attempts left.")
+                    raise
+
+                if not self.is_retryable(err, retry_on, stop_on):
+                    logger.error(f"retry: attempt {counter} of {max} failed "
+                                 f"with {type(err).__name__}, which isn't "
+                                 "an error to retry.")
+                    raise
+
+                delay = sleeps[counter - 1]
+                logger.warning(f"retry: attempt {counter} of {max} failed. "
+                               f"{type(err).__name__}: {err}. Retrying in "
+                               f"{delay:.3g}s.")
+                pypyr.utils.worker.sleep(delay)
+
+        logger.debug("done")
+
+
 class WhileDecorator(object):
     """While Decorator, as interpreted by the pypyr pipeline definition yaml.
 
@@ -342,10 +1013,13 @@ class WhileDecorator(object):
                   False otherwise.
         """
         logger.debug("starting")
+        # stop looping once a timeout cancelled the step.
+        check_cancelled()
         context['whileCounter'] = counter
 
         logger.info(f"while: running step with counter {counter}")
-        step_method(context)
+        with pypyr.log.logger.log_scope(iteration=counter):
+            step_method(context)
         logger.debug(f"while: done step {counter}")
 
         result = False
@@ -8,6 +8,10 @@ class Error(Exception):
     """Base class for all pypyr exceptions."""
 
 
+class CheckpointError(Error):
+    """Can't resume from the pipeline checkpoint."""
+
+
 class ContextError(Error):
     """Error in the pypyr context."""
 
@@ -20,6 +24,10 @@ class KeyNotInContextError(ContextError):
     """Key not found in the pypyr context."""
 
 
+class HttpError(Error):
+    """HTTP request failed or returned an error status."""
+
+
 class LoopMaxExhaustedError(Error):
     """Max attempts reached during looping."""
 
@@ -36,5 +44,17 @@ class PlugInError(Error):
     """Pypyr plug-ins should sub-class this."""
 
 
+class ProcessExecutorError(Error):
+    """Could not run step in a worker process."""
+
+
 class PyModuleNotFoundError(Error):
     """Could not load python module because it wasn't found."""
+
+
+class SnapshotError(Error):
+    """Context snapshot can't save or load."""
+
+
+class StepTimeoutError(Error):
+    """Step or step group didn't finish within its timeout."""
@@ -0,0 +1,286 @@
+"""pypyr step executors.
+
+Run steps somewhere other than the pipeline's own thread, like a worker
+process from a persistent process pool.
+"""
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import functools
+import logging
+import pickle
+import threading
+from pypyr.context import Context
+from pypyr.errors import ProcessExecutorError
+import pypyr.moduleloader
+import pypyr.utils.worker
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# persistent process pool, shared by all steps with executor: process.
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Get the shared process pool, creating it on 1st use.
+
+    Returns:
+        concurrent.futures.ProcessPoolExecutor
+    """
+    global _process_pool
+
+    with _process_pool_lock:
+        if _process_pool is None:
+            logger.debug("creating step process pool")
+            _process_pool = ProcessPoolExecutor()
+
+        return _process_pool
+
+
+def shutdown_process_pool(pool=None):
+    """Shut down the shared process pool, if it exists.
+
+    Waits for running steps to finish. The next get_process_pool creates a
+    new pool.
+
+    Args:
+        pool: ProcessPoolExecutor. Only shut down the shared pool if it's
+              still this pool, rather than a new pool since. None means
+              whichever pool is current.
+    """
+    global _process_pool
+
+    with _process_pool_lock:
+        if _process_pool is not None and pool in (None, _process_pool):
+            logger.debug("shutting down step process pool")
+            _process_pool.shutdown(wait=True)
+            _process_pool = None
+
+
+def kill_process_pool(pool):
+    """Kill the worker processes of pool right away.
+
+    A process pool can't kill just one of its workers, so this kills all of
+    them. Other steps running in the pool at the time fail with
+    ProcessExecutorError. If pool is the shared pool, the next
+    get_process_pool creates a new pool.
+
+    Args:
+        pool: ProcessPoolExecutor.
+    """
+    global _process_pool
+
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+
+    logger.debug("killing step process pool")
+    # the executor has no public way to get at its processes.
+    for process in list((getattr(pool, '_processes', None) or {}).values()):
+        process.kill()
+
+    pool.shutdown(wait=False)
+
+
+# don't leave worker processes hanging around once pypyr exits.
+atexit.register(shutdown_process_pool)
+
+
+def get_unpicklable_keys(mapping):
+    """Get the keys in mapping whose values can't pickle.
+
+    Args:
+        mapping: dict.
+
+    Returns:
+        list of (key, error) tuples where error is the pickling error str.
+    """
+    unpicklable = []
+    for key, value in mapping.items():
+        try:
+            pickle.dumps(value)
+        except Exception as err:
+            unpicklable.append((key, f"{type(err).__name__}: {err}"))
+
+    return unpicklable
+
+
+def pickle_context(mapping, description):
+    """Pickle mapping, raising a clear error on failure.
+
+    Args:
+        mapping: dict. Pickle this.
+        description: str. What mapping is, for error messages.
+
+    Returns:
+        bytes.
+
+    Raises:
+        ProcessExecutorError: mapping contains values that can't pickle.
+    """
+    try:
+        return pickle.dumps(mapping)
+    except Exception as err:
+        unpicklable = get_unpicklable_keys(mapping)
+        details = '\n'.join(f"  {key}: {key_err}"
+                            for key, key_err in unpicklable)
+
+        raise ProcessExecutorError(
+            f"{description} can't serialize to pass between processes. "
+            "Use executorKeys to pass only the keys the step needs, or "
+            "remove these keys from context:\n"
+            f"{details if details else err}") from err
+
+
+def get_context_snapshot(context, keys=None):
+    """Get a shallow snapshot of context as a plain dict.
+
+    Args:
+        context: pypyr.context.Context.
+        keys: list of str. Only include these keys. None means all keys.
+
+    Returns:
+        dict. Shallow - the values are the same objects as in context.
+
+    Raises:
+        KeyNotInContextError: keys contains a key that isn't in context.
+    """
+    if keys is None:
+        return dict(context)
+
+    context.assert_keys_exist(__name__, *keys)
+    return {key: context[key] for key in keys}
+
+
+def get_context_diff(before, after):
+    """Get what changed from before to after.
+
+    Args:
+        before: dict.
+        after: dict.
+
+    Returns:
+        tuple (updated, removed) where updated is a dict of new & changed
+        keys, and removed is a list of keys in before that are not in after.
+    """
+    updated = {key: value for key, value in after.items()
+               if key not in before or before[key] != value}
+    removed = [key for key in before if key not in after]
+
+    return updated, removed
+
+
+def _run_step_in_worker(module_name, payload, working_dir):
+    """Run step module_name in the worker process.
+
+    This is the function the process pool runs. Unpickles the context
+    snapshot, runs the step against it, and returns what changed.
+
+    Args:
+        module_name: str. Absolute name of step module.
+        payload: bytes. Pickled context snapshot dict.
+        working_dir: path. pypyr working dir. Goes onto sys.path so the
+                     worker can import the step module.
+
+    Returns:
+        tuple (updated_payload, removed) where updated_payload is the
+        pickled dict of new & changed keys, and removed is a list of keys
+        the step deleted.
+    """
+    if working_dir:
+        pypyr.moduleloader.set_working_directory(working_dir)
+
+    before = pickle.loads(payload)
+    context = Context(pickle.loads(payload))
+    context.working_dir = working_dir
+
+    step_module = pypyr.moduleloader.get_module(module_name)
+    step_module.run_step(context)
+
+    updated, removed = get_context_diff(before, context)
+    updated_payload = pickle_context(updated,
+                                     f"Context changes from {module_name}")
+    return updated_payload, removed
+
+
+def cancel_future(future, pool, module_name):
+    """Cancel step module_name running as future in pool.
+
+    A step that hasn't started yet just doesn't start. A step that's already
+    running can only stop by killing the pool's worker processes.
+
+    Args:
+        future: concurrent.futures.Future. The step running in pool.
+        pool: ProcessPoolExecutor.
+        module_name: str. Step name, for the logs.
+    """
+    if future.cancel():
+        logger.debug(f"cancelled {module_name} before it started.")
+        return
+
+    if not future.done():
+        logger.warning(f"killing the step process pool to stop "
+                       f"{module_name}. Any other steps running in the pool "
+                       "fail too.")
+        kill_process_pool(pool)
+
+
+def run_step_in_process(module_name, context, keys=None):
+    """Run step module's run_step in a worker process from the process pool.
+
+    Sends a snapshot of context (or just of keys) to the worker. The step
+    mutates its own copy of the snapshot in the worker. New, changed &
+    removed keys then merge back into context. Top-level keys replace
+    whatever is in context - there is no deep merge.
+
+    If this runs on a pypyr.utils.worker.Worker that cancels, like when the
+    step times out, the step stops. See cancel_future.
+
+    Args:
+        module_name: str. Absolute name of step module. The worker imports
+                     this itself - it needs to resolve from the working dir
+                     or python path.
+        context: pypyr.context.Context. Will mutate.
+        keys: list of str. Only pass these context keys to the step. None
+              means pass all of context.
+
+    Raises:
+        ProcessExecutorError: context or the step's context changes can't
+                              serialize, or the worker process died.
+        Anything the step itself raises.
+    """
+    logger.debug("starting")
+    snapshot = get_context_snapshot(context, keys)
+    payload = pickle_context(snapshot, f"Context for {module_name}")
+
+    logger.debug(f"running {module_name} in process pool with "
+                 f"{len(snapshot)} context keys.")
+    pool = get_process_pool()
+    future = pool.submit(_run_step_in_worker,
+                         module_name,
+                         payload,
+                         getattr(context, 'working_dir', None))
+    unregister = pypyr.utils.worker.on_cancel(
+        functools.partial(cancel_future, future, pool, module_name))
+
+    try:
+        updated_payload, removed = future.result()
+    except BrokenProcessPool as err:
+        # a broken pool can't run anything else, so start afresh next time.
+        shutdown_process_pool(pool)
+        raise ProcessExecutorError(
+            f"The worker process running {module_name} died unexpectedly."
+        ) from err
+    finally:
+        unregister()
+
+    updated = pickle.loads(updated_payload)
+    context.update(updated)
+    for key in removed:
+        del context[key]
+
+    logger.debug(f"merged {len(updated)} updated and {len(removed)} removed "
+                 f"keys from {module_name} into context.")
+    logger.debug("done")
@@ -2,28 +2,235 @@
 
 Configuration for the python logging library.
 """
+import json
 import logging
+import logging.handlers
+import queue
+import threading
 
+# fields that describe where in the pipeline a log record originated.
+LOG_SCOPE_FIELDS = ('pipeline', 'step', 'iteration')
 
-def set_logging_config(log_level):
+# scope is per thread, so that concurrent steps each report their own
+# pipeline/step/iteration.
+_log_scope = threading.local()
+
+# only track log scope when something consumes it.
+_log_scope_enabled = False
+
+# background thread that drains the log queue when structured logging is on.
+_queue_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as json lines - i.e one json object per line.
+
+    Adds the pipeline, step & iteration fields from the log scope to each
+    line, where these are set.
+    """
+
+    def format(self, record):
+        """Return record formatted as a single line json string."""
+        output = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'name': record.name,
+            'func': record.funcName,
+            'message': record.getMessage()
+        }
+
+        for field in LOG_SCOPE_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                output[field] = value
+
+        if record.exc_info:
+            output['exc_info'] = self.formatException(record.exc_info)
+
+        # default=str so arb objects in scope fields don't fail the log write
+        return json.dumps(output, default=str)
+
+
+class LogScopeFilter(logging.Filter):
+    """Stamp the current thread's log scope onto the log record.
+
+    This has to run on the thread that creates the log record, before the
+    record goes onto the log queue. The queue listener drains the queue on a
+    different thread, where the log scope isn't available.
+    """
+
+    def filter(self, record):
+        """Add log scope fields to record. Never filters anything out."""
+        for field in LOG_SCOPE_FIELDS:
+            setattr(record, field, getattr(_log_scope, field, None))
+
+        return True
+
+
+class LogScope(object):
+    """Context manager that sets the log scope for the duration of the block.
+
+    Restores the previous scope on exit, so nested scopes (like a child
+    pipeline invoked by pype) report correctly once they finish.
+
+    Use log_scope to get one of these - it only bothers creating one when
+    something actually consumes the log scope.
+    """
+
+    __slots__ = ('fields', 'previous')
+
+    def __init__(self, fields):
+        """Initialize with fields dict to set on enter."""
+        self.fields = fields
+        self.previous = None
+
+    def __enter__(self):
+        """Save current scope for fields and set the new values."""
+        self.previous = {field: getattr(_log_scope, field, None)
+                         for field in self.fields}
+        for field, value in self.fields.items():
+            setattr(_log_scope, field, value)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Restore previous scope. Don't swallow errors."""
+        for field, value in self.previous.items():
+            setattr(_log_scope, field, value)
+
+        return False
+
+
+class _NullLogScope(object):
+    """Do-nothing log scope for when nothing consumes the log scope."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        """Do nothing."""
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Do nothing. Don't swallow errors."""
+        return False
+
+
+_null_log_scope = _NullLogScope()
+
+
+def log_scope(**fields):
+    """Set pipeline/step/iteration log scope for the duration of a with block.
+
+    This runs for every step & loop iteration, so it's a no-op unless json
+    logging is on - nothing else uses the log scope.
+
+    Args:
+        **fields: Any of pipeline, step, iteration.
+
+    Returns:
+        Context manager.
+    """
+    if _log_scope_enabled:
+        return LogScope(fields)
+
+    return _null_log_scope
+
+
+def get_log_scope():
+    """Get the current thread's log scope, to carry it to another thread.
+
+    Returns:
+        dict. field: value for each of LOG_SCOPE_FIELDS. Empty if nothing
+        consumes the log scope.
+    """
+    if not _log_scope_enabled:
+        return {}
+
+    return {field: getattr(_log_scope, field, None)
+            for field in LOG_SCOPE_FIELDS}
+
+
+def set_logging_config(log_level, handlers=None):
     """Set python logging library config.
 
     Run this ONCE at the start of your process. It formats the python logging
     module's output.
     Defaults logging level to INFO = 20)
+
+    Args:
+        log_level: int. Standard python log level enumerated value.
+        handlers: iterable of logging.Handler. Use these handlers rather than
+                  the default stderr stream handler.
     """
     logging.basicConfig(
         format='%(asctime)s %(levelname)s:%(name)s:%(funcName)s: %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S',
-        level=log_level)
+        level=log_level,
+        handlers=handlers)
+
+
+def set_json_logging_config(log_level):
+    """Set python logging library config to write json lines via a queue.
 
+    Log calls just put the record on an in-memory queue, so step execution
+    never blocks on log i/o. A background listener thread drains the queue and
+    writes each record as a json line to stderr.
 
-def set_root_logger(root_log_level):
+    Run this ONCE at the start of your process. Call stop_queue_listener when
+    you're done to flush the queue.
+
+    Args:
+        log_level: int. Standard python log level enumerated value.
+    """
+    global _log_scope_enabled
+    global _queue_listener
+
+    log_queue = queue.Queue(-1)
+
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # the queue handler merges args & traceback into the message before it
+    # queues the record. Keep it to just that, the json formatter does the
+    # rest on the listener's side.
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    queue_handler.addFilter(LogScopeFilter())
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter(datefmt='%Y-%m-%d %H:%M:%S'))
+
+    set_logging_config(log_level, handlers=[queue_handler])
+
+    _queue_listener = logging.handlers.QueueListener(log_queue,
+                                                     stream_handler)
+    _queue_listener.start()
+    _log_scope_enabled = True
+
+
+def stop_queue_listener():
+    """Flush & stop the background log writer, if there is one.
+
+    Safe to call even if json logging isn't on.
+    """
+    global _log_scope_enabled
+    global _queue_listener
+
+    _log_scope_enabled = False
+    if _queue_listener:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+def set_root_logger(root_log_level, log_json=False):
     """Set the root logger 'pypyr'. Do this before you do anything else.
 
     Run once and only once at initialization.
+
+    Args:
+        root_log_level: int. Standard python log level enumerated value.
+        log_json: bool. Write structured json lines from a background queue
+                  rather than formatted text directly to stderr.
     """
-    set_logging_config(root_log_level)
+    if log_json:
+        set_json_logging_config(root_log_level)
+    else:
+        set_logging_config(root_log_level)
+
     root_logger = logging.getLogger("pypyr")
     root_logger.debug(
         f"Root logger {root_logger.name} configured with level "
@@ -3,6 +3,7 @@
 Load modules dynamically, find things on file-system.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 import importlib
 import logging
 import os
@@ -12,6 +13,25 @@ from pypyr.errors import PipelineNotFoundError, PyModuleNotFoundError
 # use pypyr logger to ensure loglevel is set correctly
 logger = logging.getLogger(__name__)
 
+# environment variable with extra directories in which to look for pipelines.
+PIPELINE_PATH_ENV_VAR = 'PYPYR_PIPELINE_PATH'
+
+# resolved modules, keyed by absolute import name.
+_module_cache = {}
+
+# absolute import names that did not resolve, with the error message. This
+# makes repeat lookups for the same missing module fail fast.
+_module_not_found_cache = {}
+
+# pipelines directory -> (names, dir_mtimes) as returned by scan_pipeline_dir.
+_pipeline_index = {}
+
+
+def clear_module_cache():
+    """Forget all previously resolved and failed module lookups."""
+    _module_cache.clear()
+    _module_not_found_cache.clear()
+
 
 def get_module(module_abs_import):
     """Use importlib to get the module dynamically.
@@ -19,16 +39,33 @@ def get_module(module_abs_import):
     Get instance of the module specified by the module_abs_import.
     This means that module_abs_import must be resolvable from this package.
 
+    Resolved modules go into a registry, so subsequent calls for the same
+    module_abs_import return straight from there. Failed lookups are cached
+    too - so every step pointing at the same missing module raises the same
+    error without looking for it all over again. Adding a new working
+    directory with set_working_directory clears the failed lookups.
+
     Args:
         module_abs_import: string. Absolute name of module to import.
 
     Raises:
         PyModuleNotFoundError: if module not found.
     """
+    imported_module = _module_cache.get(module_abs_import, None)
+    if imported_module is not None:
+        return imported_module
+
+    not_found_msg = _module_not_found_cache.get(module_abs_import, None)
+    if not_found_msg is not None:
+        logger.error(f"The module {module_abs_import} previously failed to "
+                     "load, not looking for it again.")
+        raise PyModuleNotFoundError(not_found_msg)
+
     logger.debug("starting")
     logger.debug(f"loading module {module_abs_import}")
     try:
         imported_module = importlib.import_module(module_abs_import)
+        _module_cache[module_abs_import] = imported_module
         logger.debug("done")
         return imported_module
     except ModuleNotFoundError as err:
@@ -45,59 +82,225 @@ def get_module(module_abs_import):
                         "must exist in your current python path - so you "
                         "should have run pip install or setup.py")
         logger.error(msg)
+        _module_not_found_cache[module_abs_import] = extended_msg
         raise PyModuleNotFoundError(extended_msg) from err
 
 
+def preload_modules(module_names, max_workers=None):
+    """Import all of module_names in parallel threads.
+
+    Use this to resolve all the modules a pipeline needs up front, before the
+    pipeline starts running. Subsequent get_module calls for these then come
+    straight out of the module registry.
+
+    This reports all the modules that do not resolve at once, rather than
+    only the 1st one.
+
+    Args:
+        module_names: iterable of str. Absolute names of modules to import.
+                      Duplicates only import once.
+        max_workers: int. Max threads to use for importing. Defaults to
+                     the concurrent.futures.ThreadPoolExecutor default.
+
+    Raises:
+        PyModuleNotFoundError: if any of the modules are not found.
+    """
+    logger.debug("starting")
+
+    # dict rather than set to keep the input order for error reporting.
+    unique_names = list(dict.fromkeys(module_names))
+    logger.debug(f"preloading {len(unique_names)} modules.")
+
+    not_found = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [(name, executor.submit(get_module, name))
+                   for name in unique_names]
+
+        for name, future in futures:
+            try:
+                future.result()
+            except PyModuleNotFoundError:
+                not_found.append(name)
+
+    if not_found:
+        raise PyModuleNotFoundError(
+            f"{len(not_found)} module(s) referenced by the pipeline could not "
+            f"load: {', '.join(not_found)}. These should be in your working "
+            "dir or installed to the python path.")
+
+    logger.debug("done")
+
+
+def clear_pipeline_index():
+    """Forget all indexed pipeline directories.
+
+    The next get_pipeline_path call re-scans the pipeline directories.
+    """
+    _pipeline_index.clear()
+
+
+def get_pipeline_search_dirs(working_directory):
+    """Get the directories to search for pipelines, in order of precedence.
+
+    1st {working_directory}/pipelines, then each directory in the
+    PYPYR_PIPELINE_PATH environment variable, then {pypyr install
+    dir}/pipelines. PYPYR_PIPELINE_PATH separates directories with
+    os.pathsep, i.e : on posix and ; on windows.
+
+    Args:
+        working_directory: string. Look in working_directory/pipelines 1st.
+
+    Returns:
+        list of str. Directory paths.
+    """
+    search_dirs = [os.path.join(working_directory, 'pipelines')]
+
+    env_path = os.environ.get(PIPELINE_PATH_ENV_VAR, None)
+    if env_path:
+        search_dirs.extend(d for d in env_path.split(os.pathsep) if d)
+
+    search_dirs.append(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                     'pipelines'))
+
+    return search_dirs
+
+
+def scan_pipeline_dir(pipelines_dir):
+    """Find all pipeline yaml files in pipelines_dir & its sub-directories.
+
+    A pipeline in a sub-directory is namespaced with its relative path, with
+    / as separator. So {pipelines_dir}/ns/sub/mypipe.yaml is ns/sub/mypipe.
+
+    Args:
+        pipelines_dir: string. Directory to scan.
+
+    Returns:
+        tuple (names, dir_mtimes) where names is a dict of pipeline name to
+        absolute path of the pipeline yaml, and dir_mtimes is a dict of every
+        directory scanned to its modified time. The modified time is None if
+        pipelines_dir doesn't exist.
+    """
+    logger.debug(f"scanning {pipelines_dir} for pipelines")
+    names = {}
+    dir_mtimes = {pipelines_dir: _get_dir_mtime(pipelines_dir)}
+
+    for dir_path, dir_names, file_names in os.walk(pipelines_dir):
+        dir_mtimes[dir_path] = _get_dir_mtime(dir_path)
+        rel_dir = os.path.relpath(dir_path, pipelines_dir)
+
+        for file_name in file_names:
+            if not file_name.endswith('.yaml'):
+                continue
+
+            name = file_name[:-len('.yaml')]
+            if rel_dir != os.curdir:
+                name = f"{rel_dir.replace(os.sep, '/')}/{name}"
+
+            names[name] = os.path.abspath(os.path.join(dir_path, file_name))
+
+    logger.debug(f"found {len(names)} pipelines in {pipelines_dir}")
+    return names, dir_mtimes
+
+
+def _get_dir_mtime(dir_path):
+    """Return modified time of dir_path, or None if it doesn't exist."""
+    try:
+        return os.stat(dir_path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _get_indexed_pipeline_dir(pipelines_dir, refresh_stale=False):
+    """Get the name->path index of pipelines_dir, scanning if necessary.
+
+    Args:
+        pipelines_dir: string. Directory to get index for.
+        refresh_stale: bool. If True, re-scan if any of the indexed
+                       directories changed since the last scan.
+
+    Returns:
+        dict of pipeline name to absolute path of the pipeline yaml.
+    """
+    indexed = _pipeline_index.get(pipelines_dir, None)
+
+    if indexed is not None and refresh_stale:
+        names, dir_mtimes = indexed
+        if any(_get_dir_mtime(d) != mtime for d, mtime in dir_mtimes.items()):
+            logger.debug(f"{pipelines_dir} changed since last scan.")
+            indexed = None
+
+    if indexed is None:
+        indexed = scan_pipeline_dir(pipelines_dir)
+        _pipeline_index[pipelines_dir] = indexed
+
+    return indexed[0]
+
+
 def get_pipeline_path(pipeline_name, working_directory):
     """Look for the pipeline in the various places it could be.
 
-    First checks the cwd. Then checks pypyr/pipelines dir.
+    First checks the cwd. Then checks the PYPYR_PIPELINE_PATH directories.
+    Then checks pypyr/pipelines dir.
+
+    pipeline_name can refer to a pipeline in a sub-directory of any of these,
+    like this: 'subdir/pipeline_name'.
+
+    Each pipelines directory is scanned once and indexed, so that repeat
+    lookups don't have to hit the file-system. A pipeline that isn't in the
+    index causes a re-scan of the directories that changed since the last scan.
+    An existing index entry is trusted as is - use clear_pipeline_index if you
+    add a pipeline that shadows an already indexed one during the same
+    process.
+
+    Names that aren't in the index, like a relative path out of the
+    pipelines directory or an absolute path, are checked on the file-system
+    directly, as a last resort.
 
     Args:
         pipeline_name: string. Name of pipeline to find
-        pipeline_name: string. Path in which to look for pipeline_name.yaml
+        working_directory: string. Path in which to look for
+                           pipelines/pipeline_name.yaml
 
     Returns:
         Absolute path to the pipeline_name.yaml file
 
     Raises:
-        PipelineNotFoundError: if pipeline_name.yaml not found in working_dir
-                               or in {pypyr install dir}/pipelines.
+        PipelineNotFoundError: if pipeline_name.yaml not found in working_dir,
+                               in PYPYR_PIPELINE_PATH or in
+                               {pypyr install dir}/pipelines.
     """
     logger.debug("starting")
 
     # look for name.yaml in the pipelines/ sub-directory
     logger.debug(f"current directory is {working_directory}")
+    search_dirs = get_pipeline_search_dirs(working_directory)
+    name = pipeline_name.replace(os.sep, '/')
 
-    # looking for {cwd}/pipelines/[pipeline_name].yaml
-    pipeline_path = os.path.abspath(os.path.join(
-        working_directory,
-        'pipelines',
-        pipeline_name + '.yaml'))
+    # 1st pass trusts the index, 2nd pass refreshes anything that changed.
+    for refresh_stale in (False, True):
+        for pipelines_dir in search_dirs:
+            names = _get_indexed_pipeline_dir(pipelines_dir, refresh_stale)
+            pipeline_path = names.get(name, None)
+            if pipeline_path:
+                logger.debug(f"Found {pipeline_path}")
+                logger.debug("done")
+                return pipeline_path
 
-    if os.path.isfile(pipeline_path):
-        logger.debug(f"Found {pipeline_path}")
-    else:
-        logger.debug(f"{pipeline_name} not found in current "
-                     "directory/pipelines folder. Looking in pypyr install "
-                     "directory instead.")
-        pypyr_dir = os.path.dirname(os.path.abspath(__file__))
-        logger.debug(f"pypyr installation directory is: {pypyr_dir}")
-        pipeline_path = os.path.abspath(os.path.join(
-            os.path.dirname(os.path.abspath(__file__)),
-            'pipelines',
-            pipeline_name + '.yaml'))
+        logger.debug(f"{pipeline_name} not found in the pipeline index.")
 
+    # names the index can't hold, like ../other/pipe or an absolute path.
+    for pipelines_dir in search_dirs:
+        pipeline_path = os.path.abspath(os.path.join(pipelines_dir,
+                                                     pipeline_name + '.yaml'))
         if os.path.isfile(pipeline_path):
-            logger.debug(f"Found {pipeline_path}")
-        else:
-            raise PipelineNotFoundError(f"{pipeline_name}.yaml not found in "
-                                        f"either "
-                                        f"{working_directory}/pipelines "
-                                        f"or {pypyr_dir}/pipelines")
+            logger.debug(f"Found {pipeline_path} outside the pipeline index.")
+            logger.debug("done")
+            return pipeline_path
 
-    logger.debug("done")
-    return pipeline_path
+    searched = f"{', '.join(search_dirs[:-1])} or {search_dirs[-1]}"
+    raise PipelineNotFoundError(f"{pipeline_name}.yaml not found in either "
+                                f"{searched}")
 
 
 def set_working_directory(working_directory):
@@ -105,12 +308,20 @@ def set_working_directory(working_directory):
 
     This allows dynamic loading of arbitrary python modules in cwd.
 
+    Only adds working_directory if it isn't on sys.paths already, so that
+    repeat calls don't keep growing the import search path.
+
     Args:
         working_directory: string. path to add to sys.paths
     """
     logger.debug("starting")
 
-    logger.debug(f"adding {working_directory} to sys.paths")
-    sys.path.append(working_directory)
+    if working_directory in sys.path:
+        logger.debug(f"{working_directory} already in sys.paths")
+    else:
+        logger.debug(f"adding {working_directory} to sys.paths")
+        sys.path.append(working_directory)
+        # a module that wasn't found before might well be in the new path.
+        _module_not_found_cache.clear()
 
     logger.debug("done")
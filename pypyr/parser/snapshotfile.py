@@ -0,0 +1,25 @@
+"""Context parser that returns a dictionary from a pypyr snapshot file."""
+
+import logging
+import pypyr.snapshot
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+
+def get_parsed_context(context_arg):
+    """Parse input context string and returns context as dictionary.
+
+    The snapshot memory-maps, so values unpickle straight from the file
+    without reading it into memory first. See pypyr.snapshot.
+    """
+    assert context_arg, ("pipeline must be invoked with context arg set. For "
+                         "this snapshot parser you're looking for something "
+                         "like: "
+                         "pypyr pipelinename './mysnapshot.ctx'")
+    logger.debug("starting")
+    logger.debug(f"attempting to open file: {context_arg}")
+    payload = pypyr.snapshot.load(context_arg)
+    logger.debug(f"snapshot file loaded into context. Count: {len(payload)}")
+    logger.debug("done")
+    return payload
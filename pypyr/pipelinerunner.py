@@ -3,16 +3,32 @@
 Runs the pipeline specified by the input pipeline_name parameter.
 Pipelines must have a "steps" list-like attribute.
 """
+import copy
 import logging
+import os
+import sys
+import pypyr.checkpoint
 import pypyr.context
 import pypyr.log.logger
 import pypyr.moduleloader
+import pypyr.resources
 import pypyr.stepsrunner
+import pypyr.utils.compact
+import pypyr.validator
 import ruamel.yaml as yaml
 
 # use pypyr logger to ensure loglevel is set correctly
 logger = logging.getLogger(__name__)
 
+# pipeline path: ((mtime_ns, size), pipeline definition). Parsed & validated
+# pipelines, so a pipeline only parses & validates again if its file changed.
+_pipeline_cache = {}
+
+
+def clear_pipeline_cache():
+    """Forget all parsed & validated pipelines."""
+    _pipeline_cache.clear()
+
 
 def get_parsed_context(pipeline, context_in_string):
     """Execute get_parsed_context handler if specified.
@@ -77,12 +93,16 @@ def get_pipeline_definition(pipeline_name, working_dir):
         working_dir: path. Start looking in
                            ./working_dir/pipelines/pipeline_name.yaml
 
+    Parsed pipelines are validated, then cached until the file changes.
+
     Returns:
-        dict describing the pipeline, parsed from the pipeline yaml.
+        dict describing the pipeline, parsed from the pipeline yaml. This is
+        a copy, so it's safe to mutate.
 
     Raises:
         FileNotFoundError: pipeline_name.yaml not found in the various pipeline
                            dirs.
+        PipelineDefinitionError: pipeline is invalid. Lists all the errors.
     """
     logger.debug("starting")
 
@@ -92,6 +112,15 @@ def get_pipeline_definition(pipeline_name, working_dir):
 
     logger.debug(f"Trying to open pipeline at path {pipeline_path}")
     try:
+        stat = os.stat(pipeline_path)
+        file_version = (stat.st_mtime_ns, stat.st_size)
+        cached = _pipeline_cache.get(pipeline_path, None)
+        if cached and cached[0] == file_version:
+            logger.debug("pipeline definition already loaded & validated.")
+            logger.debug("done")
+            # steps can mutate what in puts in context, so don't share it.
+            return copy.deepcopy(cached[1])
+
         with open(pipeline_path) as yaml_file:
             yaml_loader = yaml.YAML(typ='safe', pure=True)
             pipeline_definition = yaml_loader.load(yaml_file)
@@ -101,15 +130,30 @@ def get_pipeline_definition(pipeline_name, working_dir):
         logger.error(
             "The pipeline doesn't exist. Looking for a file here: "
             f"{pipeline_name}.yaml in the /pipelines sub directory.")
+        # the pipeline index is out of date if it pointed at a deleted file.
+        pypyr.moduleloader.clear_pipeline_index()
         raise
 
     logger.debug("pipeline definition loaded")
 
-    logger.debug("done")
-    return pipeline_definition
-
+    pypyr.validator.validate_pipeline(pipeline_definition,
+                                      pipeline_name=pipeline_name,
+                                      pipeline_path=pipeline_path)
+    _pipeline_cache[pipeline_path] = (file_version, pipeline_definition)
 
-def main(pipeline_name, pipeline_context_input, working_dir, log_level):
+    logger.debug("done")
+    return copy.deepcopy(pipeline_definition)
+
+
+def main(pipeline_name,
+         pipeline_context_input,
+         working_dir,
+         log_level,
+         log_json=False,
+         preload=False,
+         checkpoint=False,
+         resume=False,
+         memstats=False):
     """Entry point for pypyr pipeline runner.
 
     Call this once per pypyr run. Call me if you want to run a pypyr pipeline
@@ -124,24 +168,100 @@ def main(pipeline_name, pipeline_context_input, working_dir, log_level):
                                 string.
         working_dir: path. looks for ./pipelines and modules in this directory.
         log_level: int. Standard python log level enumerated value.
+        log_json: bool. Log structured json lines via a background queue.
+        preload: bool. Import all the pipeline's step modules in parallel
+                 before running the pipeline.
+        checkpoint: bool. Save progress after each step so a failed run can
+                    resume.
+        resume: bool. Resume from the last checkpoint. Implies checkpoint.
+        memstats: bool. Print how much memory each context key takes once
+                  the pipeline is done.
 
     Returns:
         None
     """
-    pypyr.log.logger.set_root_logger(log_level)
+    pypyr.log.logger.set_root_logger(log_level, log_json=log_json)
+
+    try:
+        logger.debug("starting pypyr")
 
-    logger.debug("starting pypyr")
+        # pipelines specify steps in python modules that load dynamically.
+        # make it easy for the operator so that the cwd is automatically
+        # included without needing to pip install a package 1st.
+        pypyr.moduleloader.set_working_directory(working_dir)
 
-    # pipelines specify steps in python modules that load dynamically.
-    # make it easy for the operator so that the cwd is automatically included
-    # without needing to pip install a package 1st.
-    pypyr.moduleloader.set_working_directory(working_dir)
+        run_pipeline(pipeline_name=pipeline_name,
+                     pipeline_context_input=pipeline_context_input,
+                     working_dir=working_dir,
+                     preload=preload,
+                     checkpoint=checkpoint,
+                     resume=resume,
+                     memstats=memstats)
 
-    run_pipeline(pipeline_name=pipeline_name,
-                 pipeline_context_input=pipeline_context_input,
-                 working_dir=working_dir)
+        logger.debug("pypyr done")
+    finally:
+        # flush whatever is still queued up for the background log writer.
+        pypyr.log.logger.stop_queue_listener()
 
-    logger.debug("pypyr done")
+
+def get_checkpoint(pipeline_name, pipeline_definition, working_dir):
+    """Get the checkpoint for pipeline_name in working_dir.
+
+    Args:
+        pipeline_name: str. Name of pipeline, sans .yaml at end.
+        pipeline_definition: dict. Dictionary representing the pipeline.
+        working_dir: path. Checkpoints go in working_dir/.pypyr/checkpoints.
+
+    Returns:
+        pypyr.checkpoint.Checkpoint
+    """
+    return pypyr.checkpoint.Checkpoint(
+        path=pypyr.checkpoint.get_checkpoint_path(working_dir, pipeline_name),
+        pipeline_name=pipeline_name,
+        pipeline_hash=pypyr.checkpoint.get_pipeline_hash(pipeline_definition))
+
+
+def resume_checkpoint(checkpointer, context):
+    """Restore context from the last checkpoint.
+
+    Args:
+        checkpointer: pypyr.checkpoint.Checkpoint.
+        context: pypyr.context.Context. Checkpoint context merges into this.
+
+    Returns:
+        int. Index of the step to start at. 0 if there's no checkpoint.
+
+    Raises:
+        pypyr.errors.CheckpointError: checkpoint is for a different version
+                                      of the pipeline.
+    """
+    loaded = checkpointer.load()
+    if loaded is None:
+        logger.info(f"no checkpoint at {checkpointer.path}, so starting at "
+                    "the beginning.")
+        return 0
+
+    step_index, checkpoint_context = loaded
+    context.update(checkpoint_context)
+    start_index = step_index + 1
+    logger.info(f"resuming from checkpoint at step {start_index}.")
+
+    # new snapshot, so the diffs from this run don't pile onto the last.
+    checkpointer.start(context, step_index)
+    return start_index
+
+
+def print_memstats(context):
+    """Print the memory context takes per top-level key to stdout.
+
+    Biggest keys 1st, so it's easy to see what to compact or clear.
+
+    Args:
+        context: pypyr.context.Context.
+    """
+    total, stats = pypyr.utils.compact.get_memstats(context)
+    lines = pypyr.utils.compact.format_memstats(total, stats)
+    sys.stdout.write('\n'.join(lines) + '\n')
 
 
 def prepare_context(pipeline, context_in_string, context):
@@ -172,7 +292,12 @@ def run_pipeline(pipeline_name,
                  pipeline_context_input=None,
                  working_dir=None,
                  context=None,
-                 parse_input=True):
+                 parse_input=True,
+                 preload=False,
+                 checkpoint=False,
+                 resume=False,
+                 memstats=False,
+                 pipeline_definition=None):
     """Run the specified pypyr pipeline.
 
     This function runs the actual pipeline. If you are running another
@@ -195,6 +320,21 @@ def run_pipeline(pipeline_name,
                  object for the child pipeline. Any mutations of the context by
                  the pipeline will be against this instance of it.
         parse_input (bool): run context_parser in pipeline.
+        preload (bool): import all step modules the pipeline references in
+                        parallel threads before running any steps. Any step
+                        modules that don't exist will raise an error before
+                        the pipeline runs.
+        checkpoint (bool): save the step index & context to
+                    working_dir/.pypyr/checkpoints after each step. The
+                    checkpoint is deleted once the pipeline succeeds.
+        resume (bool): if there is a checkpoint, restore its context & start
+                    at the step after the last one that completed. Skips the
+                    context_parser. Implies checkpoint.
+        memstats (bool): print the memory each top-level context key takes
+                    to stdout once the pipeline is done, even if it failed.
+        pipeline_definition (dict): run this already loaded definition of
+                    pipeline_name, rather than loading it. Its steps can
+                    mutate it, so don't share it between runs.
 
     Returns:
         None
@@ -214,40 +354,81 @@ def run_pipeline(pipeline_name,
     # try to run a failure-handler from the pipeline, but if the pipeline
     # doesn't exist there is no failure handler that can possibly run so this
     # is very much a fatal stop error.
-    pipeline_definition = get_pipeline_definition(pipeline_name=pipeline_name,
-                                                  working_dir=working_dir)
+    if pipeline_definition is None:
+        pipeline_definition = get_pipeline_definition(
+            pipeline_name=pipeline_name,
+            working_dir=working_dir)
+
+    if preload:
+        # also deliberately outside of try catch: if the steps can't load
+        # the failure handler can't either.
+        logger.debug("preloading step modules")
+        pypyr.stepsrunner.preload_step_modules(pipeline_definition)
+
+    checkpointer = None
+    start_index = 0
+    if checkpoint or resume:
+        checkpointer = get_checkpoint(pipeline_name=pipeline_name,
+                                      pipeline_definition=pipeline_definition,
+                                      working_dir=working_dir)
+
+        if resume:
+            # also outside try catch: a checkpoint for a changed pipeline
+            # shouldn't run the failure handler.
+            start_index = resume_checkpoint(checkpointer, context)
+            parse_input = parse_input and not start_index
+
+    # resources are for on_failure steps too, so declare them outside try.
+    with pypyr.log.logger.log_scope(pipeline=pipeline_name, step=None,
+                                    iteration=None), \
+            pypyr.resources.declare(pipeline_definition):
+        try:
+            if parse_input:
+                logger.debug("executing context_parser")
+                prepare_context(pipeline=pipeline_definition,
+                                context_in_string=pipeline_context_input,
+                                context=context)
+            else:
+                logger.debug("skipping context_parser")
+
+            if checkpointer and not start_index:
+                checkpointer.start(context)
+
+            # run main steps
+            pypyr.stepsrunner.run_step_group(
+                pipeline_definition=pipeline_definition,
+                step_group_name='steps',
+                context=context,
+                start_index=start_index,
+                checkpoint=checkpointer)
+
+            # if nothing went wrong, run on_success
+            logger.debug("pipeline steps complete. Running on_success steps "
+                         "now.")
+            pypyr.stepsrunner.run_step_group(
+                pipeline_definition=pipeline_definition,
+                step_group_name='on_success',
+                context=context)
+
+            if checkpointer:
+                checkpointer.delete()
+        except Exception:
+            # yes, yes, don't catch Exception. Have to, though, to run the
+            # failure handler. Also, it does raise it back up.
+            logger.error("Something went wrong. Will now try to run "
+                         "on_failure.")
+
+            # failure_step_group will log but swallow any errors
+            pypyr.stepsrunner.run_failure_step_group(
+                pipeline=pipeline_definition,
+                context=context)
+            logger.debug("Raising original exception to caller.")
+            raise
+        finally:
+            if checkpointer:
+                checkpointer.close()
 
-    try:
-        if parse_input:
-            logger.debug("executing context_parser")
-            prepare_context(pipeline=pipeline_definition,
-                            context_in_string=pipeline_context_input,
-                            context=context)
-        else:
-            logger.debug("skipping context_parser")
-
-        # run main steps
-        pypyr.stepsrunner.run_step_group(
-            pipeline_definition=pipeline_definition,
-            step_group_name='steps',
-            context=context)
-
-        # if nothing went wrong, run on_success
-        logger.debug("pipeline steps complete. Running on_success steps now.")
-        pypyr.stepsrunner.run_step_group(
-            pipeline_definition=pipeline_definition,
-            step_group_name='on_success',
-            context=context)
-    except Exception:
-        # yes, yes, don't catch Exception. Have to, though, to run the failure
-        # handler. Also, it does raise it back up.
-        logger.error("Something went wrong. Will now try to run on_failure.")
-
-        # failure_step_group will log but swallow any errors
-        pypyr.stepsrunner.run_failure_step_group(
-            pipeline=pipeline_definition,
-            context=context)
-        logger.debug("Raising original exception to caller.")
-        raise
+            if memstats:
+                print_memstats(context)
 
     logger.debug("done")
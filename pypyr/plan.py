@@ -0,0 +1,350 @@
+"""pypyr execution plan.
+
+Work out what a pipeline would do without running any of its steps: which
+steps in which order, which child pipelines the pype steps call, and how
+many times each step runs in its loops.
+
+Only what's static in the pipeline yaml goes into the plan. Anything that
+depends on a formatting expression or on what an earlier step does at
+runtime is unknown until the pipeline actually runs.
+"""
+import logging
+import math
+import sys
+from pypyr.dsl import Step
+import pypyr.log.logger
+import pypyr.moduleloader
+import pypyr.pipelinerunner
+import pypyr.stepsrunner
+import pypyr.utils.foreach
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# step groups in the order the plan shows them.
+STEP_GROUPS = ('steps', 'on_success', 'on_failure')
+
+# step groups that run when the pipeline succeeds, so count toward the cost.
+_COST_GROUPS = ('steps', 'on_success')
+
+
+def is_static(value):
+    """Return True if value has no formatting expressions.
+
+    Args:
+        value: anything from the pipeline yaml.
+
+    Returns:
+        bool. False if value is or contains a str with a {.
+    """
+    if isinstance(value, str):
+        return '{' not in value
+
+    if isinstance(value, dict):
+        return all(is_static(item) for item in value.values())
+
+    if isinstance(value, (list, tuple)):
+        return all(is_static(item) for item in value)
+
+    return True
+
+
+def get_foreach_count(foreach_items):
+    """Get how many items foreach iterates, if it's static.
+
+    Args:
+        foreach_items: foreach decorator value as it is in the pipeline.
+
+    Returns:
+        tuple (count, note). count is None if it's not known until runtime.
+    """
+    if not is_static(foreach_items):
+        return None, 'foreach items evaluate at runtime'
+
+    source = pypyr.utils.foreach.get_source_name(foreach_items)
+    if source is None:
+        if isinstance(foreach_items, (list, tuple)):
+            return len(foreach_items), f'foreach {len(foreach_items)} items'
+
+        return None, 'foreach items evaluate at runtime'
+
+    if source == 'range':
+        count = len(pypyr.utils.foreach.get_range(foreach_items['range']))
+        return count, f'foreach range of {count}'
+
+    return None, f"foreach streams from {source} {foreach_items[source]}"
+
+
+def get_step_plan(step, working_dir, parents):
+    """Get the plan for a single step.
+
+    Args:
+        step: pypyr.dsl.Step. Step, already initialized & so validated.
+        working_dir: path. Look for child pipelines in this directory.
+        parents: tuple of str. Names of pipelines calling this one. Used to
+                 stop at recursive pype calls.
+
+    Returns:
+        dict with keys name, runs, notes, pype & pypeRuns. runs is None if
+        it's not known until runtime. pype is the child pipeline plan or
+        None. pypeRuns is how many times the child pipeline runs each time
+        the step runs, None if it's not known until runtime or if the step
+        isn't pype.
+    """
+    runs = 1
+    notes = []
+
+    if step.static_conditionals is None:
+        notes.append('run, skip or swallow evaluate at runtime')
+    else:
+        run_me, skip_me, swallow_me = step.static_conditionals
+        if not run_me or skip_me:
+            notes.append('run is False' if not run_me else 'skip is True')
+            runs = 0
+
+        if swallow_me:
+            notes.append('swallows errors')
+
+    if runs and step.foreach_items:
+        count, note = get_foreach_count(step.foreach_items)
+        notes.append(note)
+
+        if step.batch_size is not None:
+            if is_static(step.batch_size) and count is not None:
+                count = math.ceil(count / int(step.batch_size))
+            notes.append(f'in batches of {step.batch_size}')
+
+        runs = count
+
+    if runs and step.while_decorator:
+        max = step.while_decorator.max
+        if max and is_static(max):
+            runs = runs * int(max) if runs is not None else None
+            stop = step.while_decorator.stop
+            notes.append(f'while up to {max} times until {stop}' if stop
+                         else f'while {max} times')
+        else:
+            runs = None
+            notes.append(f'while until {step.while_decorator.stop}')
+
+    if step.executor:
+        notes.append(f'in a {step.executor} executor')
+
+    if step.cache_decorator:
+        notes.append('cached, so might not run at all')
+
+    pype = None
+    pype_runs = None
+    if step.name == 'pypyr.steps.pype':
+        pype, note = get_pype_plan(step, working_dir, parents)
+        if note:
+            notes.append(note)
+
+        pype_runs, note = get_pype_runs(step)
+        if note:
+            notes.append(note)
+
+    return {'name': step.name,
+            'runs': runs,
+            'notes': notes,
+            'pype': pype,
+            'pypeRuns': pype_runs}
+
+
+def get_pype_plan(step, working_dir, parents):
+    """Get the plan of the child pipeline a pype step calls.
+
+    Only follows pype steps that set a static pype name with in.
+
+    Args:
+        step: pypyr.dsl.Step. pype step.
+        working_dir: path. Look for child pipelines in this directory.
+        parents: tuple of str. Names of pipelines calling this one.
+
+    Returns:
+        tuple (plan, note). plan is None if the child pipeline isn't
+        static. note explains why, otherwise it's None.
+    """
+    pype = (step.in_parameters or {}).get('pype', None)
+    name = pype.get('name', None) if isinstance(pype, dict) else None
+
+    if not name or not is_static(name):
+        return None, 'pype pipeline name evaluates at runtime'
+
+    if name in parents:
+        return None, f'pype {name} is recursive, so not expanded'
+
+    return get_plan(name, working_dir, parents), None
+
+
+def get_pype_runs(step):
+    """Get how many times a pype step runs its child pipeline per step run.
+
+    That's once, or once for each of foreachArgs if the step fans out.
+
+    Args:
+        step: pypyr.dsl.Step. pype step.
+
+    Returns:
+        tuple (count, note). count is None if it's not known until runtime.
+        note is None if the child runs once.
+    """
+    pype = (step.in_parameters or {}).get('pype', None)
+    foreach_args = (pype.get('foreachArgs', None) if isinstance(pype, dict)
+                    else None)
+    if foreach_args is None:
+        return 1, None
+
+    count, note = get_foreach_count(foreach_args)
+    return count, f"pype {note.replace('foreach', 'foreachArgs', 1)}"
+
+
+def get_plan(pipeline_name, working_dir, parents=()):
+    """Get the execution plan for pipeline_name, recursing into pype steps.
+
+    Loading the pipeline validates it. This also imports all the step
+    modules the pipeline uses & initializes each step, so a plan that comes
+    back has no modules that fail to import or invalid step decorators.
+    Doesn't run any steps or the context_parser.
+
+    Args:
+        pipeline_name: str. Name of pipeline, sans .yaml at end.
+        working_dir: path. Look for pipelines in this directory.
+        parents: tuple of str. Names of pipelines calling this one.
+
+    Returns:
+        dict with keys:
+            pipeline: str. pipeline_name.
+            groups: dict of step group name: list of step plans.
+            stepRuns: int. Estimated step runs, including child pipelines,
+                      if the pipeline succeeds. None if any step's runs
+                      aren't known until runtime.
+            minStepRuns: int. Step runs known before runtime. The same as
+                         stepRuns if nothing is unknown.
+
+    Raises:
+        PipelineDefinitionError: pipeline is invalid. Lists all the errors,
+                                 including step modules that don't exist.
+    """
+    logger.debug(f"starting {pipeline_name}")
+    pipeline_definition = pypyr.pipelinerunner.get_pipeline_definition(
+        pipeline_name=pipeline_name,
+        working_dir=working_dir)
+
+    # report all the missing modules at once, not just the 1st.
+    pypyr.stepsrunner.preload_step_modules(pipeline_definition)
+
+    parents = parents + (pipeline_name,)
+    groups = {}
+    step_runs = 0
+    min_step_runs = 0
+    for group in STEP_GROUPS:
+        steps = pipeline_definition.get(group, None) or []
+        group_plan = [get_step_plan(Step(step), working_dir, parents)
+                      for step in steps]
+        groups[group] = group_plan
+
+        if group in _COST_GROUPS:
+            for step_plan in group_plan:
+                runs, min_runs = get_total_runs(step_plan)
+                min_step_runs += min_runs
+                if step_runs is not None:
+                    step_runs = None if runs is None else step_runs + runs
+
+    logger.debug(f"done {pipeline_name}")
+    return {'pipeline': pipeline_name,
+            'groups': groups,
+            'stepRuns': step_runs,
+            'minStepRuns': min_step_runs}
+
+
+def get_total_runs(step_plan):
+    """Get the runs of step_plan, including its child pipeline's steps.
+
+    Args:
+        step_plan: dict. Step plan from get_step_plan.
+
+    Returns:
+        tuple (runs, min_runs). runs is None if unknown until runtime.
+        min_runs counts only what's known.
+    """
+    runs = step_plan['runs']
+    if step_plan['name'] != 'pypyr.steps.pype' or runs == 0:
+        return runs, runs or 0
+
+    child = step_plan['pype']
+    if child is None:
+        # the step itself runs, but what it calls is unknown.
+        return None, runs or 0
+
+    # the child pipeline runs pype_runs times each time the step runs.
+    pype_runs = step_plan['pypeRuns']
+    min_runs = (runs or 0) * (1 + (pype_runs or 0) * child['minStepRuns'])
+    if runs is None or pype_runs is None or child['stepRuns'] is None:
+        return None, min_runs
+
+    return runs * (1 + pype_runs * child['stepRuns']), min_runs
+
+
+def format_plan(plan, indent=0):
+    """Format plan as human readable lines.
+
+    Args:
+        plan: dict. Plan from get_plan.
+        indent: int. Indent all lines by this many spaces.
+
+    Returns:
+        list of str. One line each, without newline.
+    """
+    pad = ' ' * indent
+    if plan['stepRuns'] is None:
+        estimate = f"at least {plan['minStepRuns']}"
+    else:
+        estimate = plan['stepRuns']
+
+    lines = [f"{pad}pipeline {plan['pipeline']}: {estimate} step runs."]
+
+    for group, steps in plan['groups'].items():
+        if not steps:
+            continue
+
+        lines.append(f"{pad}  {group}:")
+        for number, step_plan in enumerate(steps, 1):
+            runs = '?' if step_plan['runs'] is None else step_plan['runs']
+            line = f"{pad}    {number}. {step_plan['name']} x{runs}"
+            if step_plan['notes']:
+                line += f" ({'; '.join(step_plan['notes'])})"
+
+            lines.append(line)
+            if step_plan['pype'] is not None:
+                lines.extend(format_plan(step_plan['pype'], indent + 6))
+
+    return lines
+
+
+def main(pipeline_name, working_dir, log_level, log_json=False):
+    """Entry point for pypyr --plan.
+
+    Print the execution plan of pipeline_name to stdout, without running it.
+
+    Args:
+        pipeline_name: string. Name of pipeline, sans .yaml at end.
+        working_dir: path. looks for ./pipelines and modules in this directory.
+        log_level: int. Standard python log level enumerated value.
+        log_json: bool. Log structured json lines via a background queue.
+
+    Returns:
+        None
+    """
+    pypyr.log.logger.set_root_logger(log_level, log_json=log_json)
+
+    try:
+        logger.debug("starting pypyr plan")
+        pypyr.moduleloader.set_working_directory(working_dir)
+
+        plan = get_plan(pipeline_name=pipeline_name, working_dir=working_dir)
+        sys.stdout.write('\n'.join(format_plan(plan)) + '\n')
+
+        logger.debug("pypyr plan done")
+    finally:
+        pypyr.log.logger.stop_queue_listener()
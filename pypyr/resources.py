@@ -0,0 +1,327 @@
+"""pypyr resources: named limits on how many steps use something at once.
+
+A pipeline declares its resources & their limits in its resources map:
+    resources:
+      db: 10
+      tar: 4
+
+A step with uses: [db] then waits for a free db slot before it runs. The
+limits are per process, so they hold across steps running in parallel &
+across child pipelines that pype runs in the same process.
+
+A thread that holds a slot & starts a Worker, like a pype step with
+uses: [db] that fans out its children, waits for the Worker rather than using
+the slot itself. So it lends its slot to its workers: 1 of them at a time can
+use it instead of taking a slot of its own. That way the limit counts the
+steps really using the resource, & the workers can't deadlock waiting for a
+slot their own parent holds.
+"""
+import contextlib
+import logging
+import threading
+import time
+from pypyr.errors import PipelineDefinitionError
+import pypyr.utils.worker
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# name: Resource. All the resources declared by running pipelines.
+_resources = {}
+_resources_lock = threading.Lock()
+
+# slots the current thread holds, so nested use of the same resource, like
+# a pype step with uses: [db] running a child step that uses db too, doesn't
+# wait for itself. Also the slots the thread can borrow from the thread that
+# started its Worker.
+_held = threading.local()
+
+
+class Slot(object):
+    """A slot in a resource that a thread holds.
+
+    Attributes:
+        lender: (Slot) the slot this one borrows. None if it's a slot of its
+                own.
+        borrowed: (bool) a worker is using this slot right now.
+        released: (bool) the holder is done with the slot. A borrowed slot
+                  only frees once the borrower is done too.
+    """
+
+    def __init__(self, lender=None):
+        """Initialize the slot."""
+        self.lender = lender
+        self.borrowed = False
+        self.released = False
+
+
+class Resource(object):
+    """A named resource with a limit on how many steps can use it at once.
+
+    Attributes:
+        name: (str) name of the resource.
+        limit: (int) how many steps can use it at once.
+        in_use: (int) how many of its slots are taken.
+        condition: (threading.Condition) guards in_use & the slots, &
+                   wakes threads waiting for a slot.
+        declarations: (int) how many running pipelines declared it. The
+                      resource goes away once none of them are running.
+    """
+
+    def __init__(self, name, limit):
+        """Initialize the resource."""
+        self.name = name
+        self.limit = limit
+        self.in_use = 0
+        self.condition = threading.Condition()
+        self.declarations = 0
+
+    def acquire(self, lendable=None, user=None):
+        """Get a slot, waiting until there is one.
+
+        Borrows lendable if nobody else is borrowing it, otherwise takes a
+        free slot of its own. If the worker this runs on cancels while it
+        waits, it stops waiting straight away.
+
+        Args:
+            lendable: Slot. The slot the thread that started this thread's
+                      Worker holds. None means there's nothing to borrow.
+            user: str. Who's using the resource, for the logs.
+
+        Returns:
+            Slot. Give it back to release once done.
+
+        Raises:
+            StepTimeoutError: the worker this runs on cancelled while waiting.
+        """
+        with self.condition:
+            slot = self._take(lendable)
+            if slot is None:
+                logger.debug(f"{user} waiting for resource {self.name}.")
+                start = time.perf_counter()
+                unregister = pypyr.utils.worker.on_cancel(self.wake)
+                try:
+                    while slot is None:
+                        pypyr.utils.worker.check_cancelled()
+                        self.condition.wait()
+                        slot = self._take(lendable)
+                finally:
+                    unregister()
+
+                logger.debug(f"{user} waited "
+                             f"{time.perf_counter() - start:.3f}s for "
+                             f"resource {self.name}.")
+
+            return slot
+
+    def wake(self):
+        """Wake the threads waiting for a slot, so they check again."""
+        with self.condition:
+            self.condition.notify_all()
+
+    def _take(self, lendable):
+        """Borrow lendable or take a free slot. None if neither is free."""
+        borrowable = lendable is not None and not lendable.released
+        if borrowable and not lendable.borrowed:
+            lendable.borrowed = True
+            return Slot(lender=lendable)
+
+        if self.in_use < self.limit:
+            self.in_use += 1
+            return Slot()
+
+        return None
+
+    def release(self, slot):
+        """Give back slot from acquire.
+
+        If a worker is borrowing slot, it only frees once the worker gives it
+        back. Giving back a borrowed slot might free its lender in turn.
+
+        Args:
+            slot: Slot. What acquire returned.
+        """
+        with self.condition:
+            slot.released = True
+            while slot is not None and slot.released and not slot.borrowed:
+                lender = slot.lender
+                if lender is None:
+                    self.in_use -= 1
+                else:
+                    lender.borrowed = False
+
+                slot = lender
+
+            self.condition.notify_all()
+
+
+def get_limits(resources):
+    """Get & check resource limits from the pipeline's resources map.
+
+    Args:
+        resources: dict. Name: limit, as in the pipeline yaml. None is fine.
+
+    Returns:
+        dict. Name: int limit.
+
+    Raises:
+        PipelineDefinitionError: resources isn't a map of name to integer
+                                 limit of 1 or more.
+    """
+    if not resources:
+        return {}
+
+    if not isinstance(resources, dict):
+        raise PipelineDefinitionError("resources must be a map of name to "
+                                      "how many steps can use it at once.")
+
+    limits = {}
+    for name, limit in resources.items():
+        try:
+            valid = not isinstance(limit, bool) and int(limit) >= 1
+        except (TypeError, ValueError):
+            valid = False
+
+        if not valid:
+            raise PipelineDefinitionError(
+                f"resources {name} must be an integer of 1 or more, not "
+                f"{limit}.")
+
+        limits[name] = int(limit)
+
+    return limits
+
+
+@contextlib.contextmanager
+def declare(pipeline):
+    """Declare the pipeline's resources for as long as the with block runs.
+
+    If a resource with the same name already exists, like when a child
+    pipeline declares the same resource as its parent, the existing limit
+    applies, since steps might be using it already.
+
+    Args:
+        pipeline: dict. Pipeline definition, with its resources map.
+
+    Raises:
+        PipelineDefinitionError: resources aren't valid.
+    """
+    limits = get_limits(pipeline.get('resources', None)
+                        if isinstance(pipeline, dict) else None)
+    if not limits:
+        yield
+        return
+
+    with _resources_lock:
+        for name, limit in limits.items():
+            resource = _resources.get(name, None)
+            if resource is None:
+                resource = _resources[name] = Resource(name, limit)
+                logger.debug(f"declared resource {name} with limit {limit}.")
+            elif resource.limit != limit:
+                logger.warning(f"resource {name} already has limit "
+                               f"{resource.limit}, so ignoring limit "
+                               f"{limit}.")
+
+            resource.declarations += 1
+
+    try:
+        yield
+    finally:
+        with _resources_lock:
+            for name in limits:
+                resource = _resources[name]
+                resource.declarations -= 1
+                if not resource.declarations:
+                    del _resources[name]
+
+
+def get_held():
+    """Get the names of the resources the current thread holds.
+
+    Returns:
+        set of str.
+    """
+    return set(_get_slots())
+
+
+def _get_slots():
+    """Get the current thread's dict of resource name: held Slot."""
+    slots = getattr(_held, 'slots', None)
+    if slots is None:
+        slots = _held.slots = {}
+
+    return slots
+
+
+def get_lendable():
+    """Get the slots a Worker the current thread starts can borrow.
+
+    That's the slots the current thread holds, & whatever it can borrow
+    itself, so a worker's worker can borrow from further up too.
+
+    Returns:
+        dict. Resource name: Slot.
+    """
+    lendable = dict(getattr(_held, 'lendable', None) or {})
+    lendable.update(_get_slots())
+    return lendable
+
+
+def set_lendable(lendable):
+    """Set the slots the current thread can borrow. Call on a new Worker.
+
+    Args:
+        lendable: dict. Resource name: Slot, from get_lendable on the thread
+                  that started the Worker.
+    """
+    _held.lendable = lendable
+
+
+@contextlib.contextmanager
+def use(names, user=None):
+    """Hold a slot in each of resources names for as long as the with block.
+
+    Waits for a free slot if the resource is at its limit. Takes the
+    resources in sorted order, so 2 steps that use the same resources can't
+    deadlock each waiting for the other.
+
+    Args:
+        names: list of str. Resource names.
+        user: str. Who's using the resources, for the logs.
+
+    Raises:
+        PipelineDefinitionError: no running pipeline declared a resource.
+        StepTimeoutError: the worker this runs on cancelled while waiting.
+    """
+    held = _get_slots()
+    wanted = sorted(set(names) - held.keys())
+    if not wanted:
+        yield
+        return
+
+    with _resources_lock:
+        missing = [name for name in wanted if name not in _resources]
+        if missing:
+            raise PipelineDefinitionError(
+                f"{user} uses resources that no running pipeline declared: "
+                f"{', '.join(missing)}. Declare them in the pipeline's "
+                "resources.")
+
+        resources = [_resources[name] for name in wanted]
+
+    lendable = getattr(_held, 'lendable', None) or {}
+    acquired = []
+    try:
+        for resource in resources:
+            slot = resource.acquire(lendable.get(resource.name, None), user)
+            acquired.append((resource, slot))
+            held[resource.name] = slot
+
+        # a timeout might have cancelled the step while it waited.
+        pypyr.utils.worker.check_cancelled()
+        yield
+    finally:
+        for resource, slot in reversed(acquired):
+            del held[resource.name]
+            resource.release(slot)
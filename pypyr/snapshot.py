@@ -0,0 +1,181 @@
+"""pypyr context snapshots.
+
+Save context to a compact binary file, to hand it to another pipeline run.
+Unlike json, values keep their python types, like tuples, sets, dates &
+bytes.
+
+A snapshot file has a header, an index & then each value pickled on its own.
+Loading memory-maps the file & only unpickles the values it needs, straight
+from the mapped pages, so loading a few keys from a big snapshot is cheap.
+
+Only load snapshots you trust. Like any pickle, a snapshot can run code when
+it loads.
+"""
+import logging
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+from pypyr.errors import SnapshotError
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# 1st bytes of every snapshot file. Bump the version if the format changes.
+MAGIC = b'PYPYRSN1'
+
+# magic, then length of the pickled index as unsigned 8 byte int.
+_header = struct.Struct(f'>{len(MAGIC)}sQ')
+
+
+def save(path, mapping, keys=None):
+    """Save mapping to a snapshot file at path.
+
+    Writes atomically, so a pipeline loading the snapshot never reads a
+    half-written file. Creates the parent directory if it doesn't exist yet.
+
+    Args:
+        path: path-like. Snapshot file.
+        mapping: dict. Like the pypyr context.
+        keys: list. Only save these keys. None means all keys.
+
+    Returns:
+        int. bytes written.
+
+    Raises:
+        KeyError: keys contains a key that isn't in mapping.
+        SnapshotError: values can't serialize. The message lists all of
+                       them.
+    """
+    logger.debug("starting")
+    if keys is None:
+        keys = list(mapping)
+
+    index = []
+    values = []
+    errors = []
+    offset = 0
+    for key in keys:
+        value = mapping[key]
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as err:
+            errors.append(f"  {key}: {type(err).__name__}: {err}")
+            continue
+
+        index.append((key, offset, len(data)))
+        values.append(data)
+        offset += len(data)
+
+    if errors:
+        details = '\n'.join(errors)
+        raise SnapshotError(f"can't save these keys to snapshot {path}, "
+                            f"because they can't serialize:\n{details}")
+
+    index_data = pickle.dumps(tuple(index), protocol=pickle.HIGHEST_PROTOCOL)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory,
+                                                  suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'wb') as file:
+            file.write(_header.pack(MAGIC, len(index_data)))
+            file.write(index_data)
+            file.writelines(values)
+
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    size = _header.size + len(index_data) + offset
+    logger.debug(f"saved {len(index)} keys to {path}: {size} bytes")
+    logger.debug("done")
+    return size
+
+
+def load(path, keys=None):
+    """Load snapshot file at path.
+
+    Args:
+        path: path-like. Snapshot file from save.
+        keys: list. Only load these keys. None means all keys.
+
+    Returns:
+        dict. Keys in the same order as when they saved.
+
+    Raises:
+        FileNotFoundError: take a guess.
+        SnapshotError: path isn't a pypyr snapshot, is corrupt, or doesn't
+                       have all of keys.
+    """
+    logger.debug("starting")
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size < _header.size:
+            raise SnapshotError(f"{path} is not a pypyr snapshot.")
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                payload = _load_view(path, view, keys)
+            finally:
+                # the mmap can't close while a view of it exists.
+                view.release()
+
+    logger.debug(f"loaded {len(payload)} keys from {path}")
+    logger.debug("done")
+    return payload
+
+
+def _load_view(path, view, keys):
+    """Unpickle index & values straight from the memory-mapped view.
+
+    Returns:
+        dict.
+    """
+    magic, index_length = _header.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise SnapshotError(f"{path} is not a pypyr snapshot.")
+
+    values_start = _header.size + index_length
+    if values_start > len(view):
+        raise SnapshotError(f"{path} is corrupt: the index is truncated.")
+
+    try:
+        with view[_header.size:values_start] as index_view:
+            index = pickle.loads(index_view)
+    except Exception as err:
+        raise SnapshotError(f"{path} is corrupt: can't read the index. "
+                            f"{type(err).__name__}: {err}") from err
+
+    if keys is not None:
+        wanted = set(keys)
+        index = [entry for entry in index if entry[0] in wanted]
+        if len(index) < len(wanted):
+            found = {entry[0] for entry in index}
+            missing = ', '.join(str(key) for key in keys
+                                if key not in found)
+            raise SnapshotError(f"snapshot {path} doesn't have these keys: "
+                                f"{missing}")
+
+    payload = {}
+    for key, offset, length in index:
+        start = values_start + offset
+        if start + length > len(view):
+            raise SnapshotError(f"{path} is corrupt: {key} is truncated.")
+
+        try:
+            # release each slice straight away, else the mmap can't close.
+            with view[start:start + length] as value_view:
+                payload[key] = pickle.loads(value_view)
+        except Exception as err:
+            raise SnapshotError(f"{path} is corrupt: can't read {key}. "
+                                f"{type(err).__name__}: {err}") from err
+
+    return payload
@@ -0,0 +1,52 @@
+"""pypyr step that makes big read-only context values take less memory.
+
+Use this after loading lots of data into context that later steps only read,
+like thousands of records from an api or a file.
+"""
+import logging
+import pypyr.utils.compact
+
+# logger means the log level will be set correctly
+logger = logging.getLogger(__name__)
+
+
+def run_step(context):
+    """Compact the specified keys' values in context.
+
+    Compacted values are read-only. dicts become CompactDict, lists become
+    tuples & sets become frozensets, all the way down. Formatting
+    expressions & steps that only read these values work as before. See
+    pypyr.utils.compact.
+
+    Args:
+        Context is a dictionary or dictionary-like.
+        context['contextCompact'] must exist. It's a list.
+        Will iterate context['contextCompact'] and compact the values of
+        those keys in context.
+
+    For example, say input context is:
+        key1:
+            - name: one
+              value: 1
+            - name: two
+              value: 2
+        key2: value2
+        contextCompact:
+            - key1
+
+    This will result in context['key1'] being a tuple of 2 CompactDicts,
+    with the same keys & values as before.
+
+    Raises:
+        pypyr.errors.KeyNotInContextError: a key in contextCompact isn't in
+                                           context.
+    """
+    logger.debug("started")
+    context.assert_key_has_value(key='contextCompact', caller=__name__)
+
+    for k in context['contextCompact']:
+        logger.debug(f"compacting {k}")
+        context[k] = pypyr.utils.compact.compact(context[k])
+        logger.info(f"compacted {k}")
+
+    logger.debug("done")
@@ -0,0 +1,51 @@
+"""pypyr step that loads a binary snapshot file into context.
+
+Loads snapshots that pypyr.steps.contextsave saved.
+"""
+import logging
+import pypyr.snapshot
+
+# logger means the log level will be set correctly
+logger = logging.getLogger(__name__)
+
+
+def run_step(context):
+    """Load a snapshot file into context.
+
+    The snapshot's keys overwrite the same keys in context. Only load
+    snapshots you trust, since loading a snapshot can run code. See
+    pypyr.snapshot.
+
+    Args:
+        context: pypyr.context.Context. Mandatory.
+                 The following context key must exist
+                - contextLoadPath. path-like. Snapshot file.
+                 Optional:
+                - contextLoadKeys. list. Only load these keys. The others
+                  don't deserialize at all. Default all keys.
+
+    Returns:
+        None. updates context arg.
+
+    Raises:
+        FileNotFoundError: take a guess.
+        pypyr.errors.KeyNotInContextError: contextLoadPath missing in
+                                           context.
+        pypyr.errors.KeyInContextHasNoValueError: contextLoadPath exists but
+                                                  is None.
+        pypyr.errors.SnapshotError: the file isn't a snapshot, is corrupt, or
+                                    doesn't have all of contextLoadKeys.
+    """
+    logger.debug("started")
+    context.assert_key_has_value(key='contextLoadPath', caller=__name__)
+
+    path = context.get_formatted('contextLoadPath')
+    keys = context.get('contextLoadKeys', None)
+    if keys is not None:
+        keys = context.get_formatted_iterable(keys)
+
+    payload = pypyr.snapshot.load(path, keys=keys)
+    context.update(payload)
+
+    logger.info(f"loaded {len(payload)} context keys from {path}")
+    logger.debug("done")
@@ -0,0 +1,51 @@
+"""pypyr step that saves context to a binary snapshot file.
+
+Use this to hand context to another pipeline run, which loads it with
+pypyr.steps.contextload or the pypyr.parser.snapshotfile context parser.
+"""
+import logging
+import pypyr.snapshot
+
+# logger means the log level will be set correctly
+logger = logging.getLogger(__name__)
+
+
+def run_step(context):
+    """Save context to a snapshot file.
+
+    Values keep their python types, unlike json. See pypyr.snapshot.
+
+    Args:
+        context: pypyr.context.Context. Mandatory.
+                 The following context key must exist
+                - contextSavePath. path-like. Write snapshot here. Overwrites
+                  the file if it exists already.
+                 Optional:
+                - contextSaveKeys. list. Only save these keys. Default all
+                  keys.
+
+    Returns:
+        None.
+
+    Raises:
+        pypyr.errors.KeyNotInContextError: contextSavePath missing in
+                                           context, or a key in
+                                           contextSaveKeys isn't in context.
+        pypyr.errors.KeyInContextHasNoValueError: contextSavePath exists but
+                                                  is None.
+        pypyr.errors.SnapshotError: values can't serialize.
+    """
+    logger.debug("started")
+    context.assert_key_has_value(key='contextSavePath', caller=__name__)
+
+    path = context.get_formatted('contextSavePath')
+    keys = context.get('contextSaveKeys', None)
+    if keys is not None:
+        keys = context.get_formatted_iterable(keys)
+        context.assert_keys_exist(__name__, *keys)
+
+    size = pypyr.snapshot.save(path, context, keys=keys)
+
+    logger.info(f"saved {len(context) if keys is None else len(keys)} "
+                f"context keys to {path}: {size} bytes")
+    logger.debug("done")
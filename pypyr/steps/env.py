@@ -72,9 +72,11 @@ def env_get(context):
     """
     logger.debug("start")
 
+    # 1 snapshot rather than a lookup in the live $ENV per key.
+    environ = dict(os.environ)
     for k, v in context['envGet'].items():
         logger.debug(f"setting context {k} to $ENV {v}")
-        context[k] = os.environ[v]
+        context[k] = environ[v]
 
     logger.debug("done")
 
@@ -106,12 +108,19 @@ def env_set(context):
     pypyr sub-processes, and as such for the following steps during this pypyr
     pipeline execution. If you set an $ENV here, don't expect to see it in your
     system environment variables after the pipeline finishes running.
+
+    To set $ENVs for only a single shell, safeshell or cmd step, use cmdEnv
+    on that step instead. That doesn't change $ENV for the rest of the
+    pipeline, so it's safe for steps running in parallel too.
     """
     logger.debug("started")
 
-    for k, v in context['envSet'].items():
-        logger.debug(f"setting ${k} to context[{v}]")
-        os.environ[k] = context.get_formatted_string(v)
+    # format all the values 1st, so a formatting error doesn't leave $ENV
+    # half set.
+    env_vars = {k: context.get_formatted_string(v)
+                for k, v in context['envSet'].items()}
+    logger.debug(f"setting ${', $'.join(env_vars)}")
+    os.environ.update(env_vars)
 
     logger.debug("done")
 
@@ -140,12 +149,10 @@ def env_unset(context):
 
     for env_var_name in context['envUnset']:
         logger.debug(f"unsetting ${env_var_name}")
-        try:
-            del os.environ[env_var_name]
-        except KeyError:
-            # If user is trying to get rid of the $ENV, if it doesn't exist, no
-            # real point in throwing up an error that the thing you're trying
-            # to be rid off isn't there anyway.
+        # If user is trying to get rid of the $ENV, if it doesn't exist, no
+        # real point in throwing up an error that the thing you're trying
+        # to be rid off isn't there anyway.
+        if os.environ.pop(env_var_name, None) is None:
             logger.debug(f"${env_var_name} doesn't exist anyway. As you were.")
 
     logger.debug("done")
@@ -1,13 +1,13 @@
 """pypyr step that loads json file into context."""
-import json
 import logging
+import pypyr.utils.fetch
 
 # logger means the log level will be set correctly
 logger = logging.getLogger(__name__)
 
 
 def run_step(context):
-    """Loads a json file into the pypyr context.
+    """Loads one or more json files into the pypyr context.
 
     json parsed from the file will be merged into the pypyr context. This will
     overwrite existing values if the same keys are already in there.
@@ -16,10 +16,25 @@ def run_step(context):
 
     The json should not be an array [] on the top level, but rather an Object.
 
+    With more than one file, parses the files in parallel, then merges them
+    into context in the order of fetchJsonPath. Each glob's files merge in
+    sorted order.
+
     Args:
         context: pypyr.context.Context. Mandatory.
                  The following context key must exist
-                - fetchJsonPath. path-like. Path to file on disk.
+                - fetchJsonPath. path-like, or list of path-like. Path to file
+                  on disk. Can be a glob like config/*.json.
+                 Optional:
+                - fetchJsonMerge. str. update or merge. update overwrites top
+                  level keys. merge merges nested maps & lists into existing
+                  values & formats strings, like pypyr.steps.contextmerge.
+                  Default update.
+                - fetchJsonParallel. bool. Parse more than one file in
+                  parallel. Default True.
+                - fetchJsonCompact. bool. Compact the loaded values, so big
+                  read-only data takes less memory. See
+                  pypyr.utils.compact. Default False.
 
     Returns:
         None. updates context arg.
@@ -29,17 +44,46 @@ def run_step(context):
         pypyr.errors.KeyNotInContextError: fetchJsonPath missing in context.
         pypyr.errors.KeyInContextHasNoValueError: fetchJsonPath exists but is
                                                 None.
+        TypeError: json in a file isn't an Object at the top level.
+        ValueError: fetchJsonMerge isn't update or merge.
     """
     logger.debug("started")
     context.assert_key_has_value(key='fetchJsonPath', caller=__name__)
 
-    file_path = context.get_formatted('fetchJsonPath')
+    paths = pypyr.utils.fetch.get_paths(
+        context.get_formatted('fetchJsonPath'))
+
+    strategy = context.get_formatted_as_type(
+        context.get('fetchJsonMerge', None),
+        default='update',
+        out_type=str)
+    if strategy not in pypyr.utils.fetch.MERGE_STRATEGIES:
+        raise ValueError(f"fetchJsonMerge must be update or merge, not "
+                         f"{strategy}.")
+
+    parallel = context.get_formatted_as_type(
+        context.get('fetchJsonParallel', None),
+        default=True,
+        out_type=bool)
+
+    logger.debug(f"attempting to open {len(paths)} file(s): {paths}")
+    # the json parser is in C, so threads are enough to overlap the file io.
+    payloads = pypyr.utils.fetch.load_all(
+        paths,
+        pypyr.utils.fetch.load_json,
+        executor='thread' if parallel else None)
 
-    logger.debug(f"attempting to open file: {file_path}")
-    with open(file_path) as json_file:
-        payload = json.load(json_file)
+    logger.debug("json file(s) loaded. Merging into pypyr context. . .")
+    count = pypyr.utils.fetch.merge_all(
+        context,
+        payloads,
+        paths,
+        strategy=strategy,
+        compact=context.get_formatted_as_type(
+            context.get('fetchJsonCompact', None),
+            default=False,
+            out_type=bool))
 
-    logger.debug("json file loaded. Merging into pypyr context. . .")
-    context.update(payload)
-    logger.info(f"json file merged into pypyr context. Count: {len(payload)}")
+    logger.info(f"{len(paths)} json file(s) merged into pypyr context. "
+                f"Count: {count}")
     logger.debug("done")
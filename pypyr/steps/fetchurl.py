@@ -0,0 +1,137 @@
+"""pypyr step that fetches json or yaml from urls into context."""
+import io
+import json
+import logging
+import pypyr.cache
+import pypyr.utils.fetch
+import pypyr.utils.http
+import ruamel.yaml as yaml
+
+# logger means the log level will be set correctly
+logger = logging.getLogger(__name__)
+
+# formats fetchUrlParse understands.
+_PARSE_FORMATS = ('json', 'yaml')
+
+
+def run_step(context):
+    """Fetch json or yaml from one or more urls into the pypyr context.
+
+    Each payload merges into the pypyr context in the same order as the urls,
+    so a later url's keys overwrite an earlier url's keys. This will
+    overwrite existing values if the same keys are already in there.
+
+    Fetches share a pool of keep-alive connections with all other fetches in
+    the same process, including child pipelines called with pype. With more
+    than one url, fetches up to fetchUrlParallel urls at the same time.
+
+    With fetchUrlCache, responses that have an ETag or Last-Modified header
+    save to working_dir/.pypyr/http. The next fetch asks the server whether
+    the url changed, and uses the saved response if it didn't.
+
+    Args:
+        context: pypyr.context.Context. Mandatory.
+                 The following context key must exist
+                - fetchUrl. str or list of str. http or https url(s).
+                 Optional:
+                - fetchUrlParse. str. json or yaml. Default json.
+                - fetchUrlMerge. str. update or merge. See
+                  pypyr.steps.fetchjson. Default update.
+                - fetchUrlHeaders. dict. Request headers.
+                - fetchUrlTimeout. float. Socket timeout in seconds. Default
+                  60.
+                - fetchUrlParallel. int. Fetch up to this many urls at the
+                  same time. Default 8.
+                - fetchUrlCache. bool. Save & revalidate responses with
+                  ETag & If-Modified-Since. Default True.
+                - fetchUrlCompact. bool. Compact the loaded values, so big
+                  read-only data takes less memory. See
+                  pypyr.utils.compact. Default False.
+
+    Returns:
+        None. updates context arg.
+
+    Raises:
+        pypyr.errors.KeyNotInContextError: fetchUrl missing in context.
+        pypyr.errors.KeyInContextHasNoValueError: fetchUrl exists but is
+                                                  None.
+        pypyr.errors.HttpError: response status isn't 2xx.
+        ValueError: fetchUrlParse isn't json or yaml, or fetchUrlMerge
+                    isn't update or merge.
+        TypeError: a payload isn't a map at the top level.
+        OSError: couldn't connect, or timed out.
+    """
+    logger.debug("started")
+    context.assert_key_has_value(key='fetchUrl', caller=__name__)
+
+    urls = context.get_formatted('fetchUrl')
+    if isinstance(urls, str):
+        urls = [urls]
+
+    parse = context.get_formatted_as_type(context.get('fetchUrlParse', None),
+                                          default='json',
+                                          out_type=str)
+    if parse not in _PARSE_FORMATS:
+        raise ValueError(f"fetchUrlParse must be json or yaml, not {parse}.")
+
+    strategy = context.get_formatted_as_type(
+        context.get('fetchUrlMerge', None),
+        default='update',
+        out_type=str)
+    if strategy not in pypyr.utils.fetch.MERGE_STRATEGIES:
+        raise ValueError(f"fetchUrlMerge must be update or merge, not "
+                         f"{strategy}.")
+
+    headers = context.get_formatted_iterable(
+        context.get('fetchUrlHeaders', None) or {})
+    timeout = context.get_formatted_as_type(
+        context.get('fetchUrlTimeout', None),
+        default=60.0,
+        out_type=float)
+    parallel = context.get_formatted_as_type(
+        context.get('fetchUrlParallel', None),
+        default=8,
+        out_type=int)
+
+    cache = None
+    if context.get_formatted_as_type(context.get('fetchUrlCache', None),
+                                     default=True,
+                                     out_type=bool):
+        cache = pypyr.cache.DiskCache(pypyr.utils.http.get_cache_dir(
+            getattr(context, 'working_dir', None)))
+
+    bodies = pypyr.utils.http.fetch_all(urls,
+                                        parallel=parallel,
+                                        headers=headers,
+                                        timeout=timeout,
+                                        cache=cache)
+
+    count = pypyr.utils.fetch.merge_all(
+        context,
+        [get_payload(body, parse) for body in bodies],
+        urls,
+        strategy=strategy,
+        compact=context.get_formatted_as_type(
+            context.get('fetchUrlCompact', None),
+            default=False,
+            out_type=bool))
+
+    logger.info(f"{len(urls)} url(s) merged into pypyr context. "
+                f"Count: {count}")
+    logger.debug("done")
+
+
+def get_payload(body, parse):
+    """Parse response body.
+
+    Args:
+        body: bytes. Response body.
+        parse: str. json or yaml.
+
+    Returns:
+        Parsed body.
+    """
+    if parse == 'json':
+        return json.loads(body)
+
+    return yaml.YAML(typ='safe', pure=True).load(io.BytesIO(body))
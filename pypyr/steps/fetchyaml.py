@@ -1,24 +1,39 @@
 """pypyr step that loads yaml file into context."""
-from collections.abc import MutableMapping
 import logging
-import ruamel.yaml as yaml
+import pypyr.utils.fetch
 
 # logger means the log level will be set correctly
 logger = logging.getLogger(__name__)
 
 
 def run_step(context):
-    """Loads a yaml file into the pypyr context.
+    """Loads one or more yaml files into the pypyr context.
 
     Yaml parsed from the file will be merged into the pypyr context. This will
     overwrite existing values if the same keys are already in there.
     I.e if file yaml has {'eggs' : 'boiled'} and context {'eggs': 'fried'}
     already exists, returned context['eggs'] will be 'boiled'.
 
+    With more than one file, parses the files in parallel on the shared step
+    process pool, since parsing yaml is cpu bound. Then merges them into
+    context in the order of fetchYamlPath. Each glob's files merge in sorted
+    order.
+
     Args:
         context: pypyr.context.Context. Mandatory.
                  The following context key must exist
-                - fetchYamlPath. path-like. Path to file on disk.
+                - fetchYamlPath. path-like, or list of path-like. Path to file
+                  on disk. Can be a glob like config/*.yaml.
+                 Optional:
+                - fetchYamlMerge. str. update or merge. update overwrites top
+                  level keys. merge merges nested maps & lists into existing
+                  values & formats strings, like pypyr.steps.contextmerge.
+                  Default update.
+                - fetchYamlParallel. bool. Parse more than one file in
+                  parallel. Default True.
+                - fetchYamlCompact. bool. Compact the loaded values, so big
+                  read-only data takes less memory. See
+                  pypyr.utils.compact. Default False.
 
     Returns:
         None. updates context arg.
@@ -28,24 +43,45 @@ def run_step(context):
         pypyr.errors.KeyNotInContextError: fetchYamlPath missing in context.
         pypyr.errors.KeyInContextHasNoValueError: fetchYamlPath exists but is
                                                   None.
+        TypeError: yaml in a file isn't a map at the top level.
+        ValueError: fetchYamlMerge isn't update or merge.
     """
     logger.debug("started")
     context.assert_key_has_value(key='fetchYamlPath', caller=__name__)
 
-    file_path = context.get_formatted('fetchYamlPath')
+    paths = pypyr.utils.fetch.get_paths(
+        context.get_formatted('fetchYamlPath'))
+
+    strategy = context.get_formatted_as_type(
+        context.get('fetchYamlMerge', None),
+        default='update',
+        out_type=str)
+    if strategy not in pypyr.utils.fetch.MERGE_STRATEGIES:
+        raise ValueError(f"fetchYamlMerge must be update or merge, not "
+                         f"{strategy}.")
+
+    parallel = context.get_formatted_as_type(
+        context.get('fetchYamlParallel', None),
+        default=True,
+        out_type=bool)
 
-    logger.debug(f"attempting to open file: {file_path}")
-    with open(file_path) as yaml_file:
-        yaml_loader = yaml.YAML(typ='safe', pure=True)
-        payload = yaml_loader.load(yaml_file)
+    logger.debug(f"attempting to open {len(paths)} file(s): {paths}")
+    payloads = pypyr.utils.fetch.load_all(
+        paths,
+        pypyr.utils.fetch.load_yaml,
+        executor='process' if parallel else None)
 
-    if not isinstance(payload, MutableMapping):
-        raise TypeError("yaml input should describe a dictionary at the top "
-                        "level. You should have something like "
-                        "\n'key1: value1'\n key2: value2'\n"
-                        "in the yaml top-level, not \n'- value1\n - value2'")
+    logger.debug("yaml file(s) loaded. Merging into pypyr context. . .")
+    count = pypyr.utils.fetch.merge_all(
+        context,
+        payloads,
+        paths,
+        strategy=strategy,
+        compact=context.get_formatted_as_type(
+            context.get('fetchYamlCompact', None),
+            default=False,
+            out_type=bool))
 
-    logger.debug("yaml file loaded. Merging into pypyr context. . .")
-    context.update(payload)
-    logger.info(f"yaml file merged into pypyr context. Count: {len(payload)}")
+    logger.info(f"{len(paths)} yaml file(s) merged into pypyr context. "
+                f"Count: {count}")
     logger.debug("done")
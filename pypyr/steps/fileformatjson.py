@@ -2,6 +2,7 @@
 import os
 import json
 import logging
+import pypyr.utils.compact
 
 # logger means the log level will be set correctly
 logger = logging.getLogger(__name__)
@@ -46,7 +47,11 @@ def run_step(context):
     os.makedirs(os.path.abspath(os.path.dirname(out_path)), exist_ok=True)
     with open(out_path, 'w') as outfile:
         formatted_iterable = context.get_formatted_iterable(payload)
-        json.dump(formatted_iterable, outfile, indent=4, ensure_ascii=False)
+        json.dump(formatted_iterable,
+                  outfile,
+                  indent=4,
+                  ensure_ascii=False,
+                  default=pypyr.utils.compact.to_dict)
 
     logger.info(f"Read {in_path}, formatted contents and wrote to {out_path}")
     logger.debug("done")
@@ -1,6 +1,7 @@
 """pypyr step that parses yaml for string substitutions, writes output."""
 import os
 import logging
+from pypyr.utils.compact import CompactDict
 import ruamel.yaml as yaml
 
 # logger means the log level will be set correctly
@@ -39,6 +40,10 @@ def run_step(context):
     out_path = context.get_formatted('fileFormatYamlOut')
 
     yaml_loader = yaml.YAML(typ='rt', pure=True)
+    # compacted context values can format into the output.
+    yaml_loader.representer.add_representer(
+        CompactDict,
+        yaml_loader.representer.__class__.represent_dict)
 
     logger.debug(f"opening yaml source file: {in_path}")
     with open(in_path) as infile:
@@ -1,7 +1,13 @@
 """pypyr step that runs another pipeline from within the current pipeline."""
+import copy
 import logging
+import threading
+from pypyr.context import Context
 from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
 import pypyr.pipelinerunner as pipelinerunner
+import pypyr.utils.foreach
+import pypyr.utils.worker
+from pypyr.utils.worker import Worker
 
 # logger means the log level will be set correctly
 logger = logging.getLogger(__name__)
@@ -33,6 +39,14 @@ def run_step(context):
                 - useParentContext. optional. bool. Defaults to True. Pass the
                   current (i.e parent) pipeline context to the invoked (child)
                   pipeline.
+                - foreachArgs. optional. list, or a foreach streaming source.
+                  Fan out: run the child pipeline once for each item, each
+                  in its own context with the item in context['i']. See
+                  run_fan_out.
+                - parallel. optional. int. Defaults to 1. With foreachArgs,
+                  run this many child pipelines at the same time.
+                - resultsKey. optional. str. Defaults to pypeResults. With
+                  foreachArgs, save the list of results to this context key.
 
     Returns:
         None
@@ -51,6 +65,20 @@ def run_step(context):
      skip_parse,
      raise_error) = get_arguments(context)
 
+    foreach_args, parallel, results_key = get_fan_out_arguments(context)
+    if foreach_args is not None:
+        run_fan_out(context=context,
+                    pipeline_name=pipeline_name,
+                    foreach_args=foreach_args,
+                    parallel=parallel,
+                    results_key=results_key,
+                    use_parent_context=use_parent_context,
+                    pipe_arg=pipe_arg,
+                    skip_parse=skip_parse,
+                    raise_error=raise_error)
+        logger.debug("done")
+        return
+
     try:
         if use_parent_context:
             logger.info(f"pyping {pipeline_name}, using parent context.")
@@ -126,3 +154,175 @@ def get_arguments(context):
             pipe_arg,
             skip_parse,
             raise_error)
+
+
+def get_fan_out_arguments(context):
+    """Parse fan-out arguments for pype from context.
+
+    Args:
+        context: pypyr.context.Context. context is mandatory.
+
+    Returns:
+        tuple (foreach_args, #iterable. None if not fanning out.
+               parallel, #int
+               results_key #str
+               )
+
+    Raises:
+        ValueError: parallel isn't an integer of 1 or more.
+    """
+    pype = context['pype']
+    foreach_args = pype.get('foreachArgs', None)
+    if foreach_args is None:
+        return None, 1, None
+
+    foreach_args = pypyr.utils.foreach.get_foreach_iterable(context,
+                                                            foreach_args)
+
+    parallel = context.get_formatted_as_type(pype.get('parallel', 1),
+                                             out_type=int)
+    if parallel < 1:
+        raise ValueError(f"pype parallel must be 1 or more, not {parallel}.")
+
+    results_key = pype.get('resultsKey', 'pypeResults')
+
+    return foreach_args, parallel, results_key
+
+
+def run_fan_out(context, pipeline_name, foreach_args, parallel, results_key,
+                use_parent_context, pipe_arg, skip_parse, raise_error):
+    """Run pipeline_name once for each item in foreach_args.
+
+    Up to parallel children run at the same time, on supervised worker
+    threads. Each child runs in its own context, so children don't see each
+    other's changes: a deep copy of context if use_parent_context, otherwise
+    an empty context. Its item is in context['i'].
+
+    The pipeline parses once, so every child runs the same definition even
+    if the file changes while they run.
+
+    context[results_key] is a list with a result for each item, in item
+    order. The result is a dict of the top-level keys the child added or
+    changed, including nested changes. It's None if the child failed.
+
+    If a child fails & raise_error, no more children start, so the results
+    stop at the last item that started. Once the running children finish,
+    the 1st error in item order raises. Otherwise errors just log.
+
+    Args:
+        context: pypyr.context.Context. The parent pipeline's context. Only
+                 results_key changes.
+        pipeline_name: str. Name of the child pipeline.
+        foreach_args: iterable. Run a child for each item.
+        parallel: int. Max children running at the same time.
+        results_key: str. Save the list of results to this context key.
+        use_parent_context: bool. Seed each child with a copy of context.
+        pipe_arg: str. Pass to each child's context_parser.
+        skip_parse: bool. Skip the child's context_parser.
+        raise_error: bool. Raise the 1st child error.
+    """
+    logger.debug("starting")
+    logger.info(f"pyping {pipeline_name} for each of foreachArgs, "
+                f"{parallel} at a time.")
+
+    pipeline_definition = pipelinerunner.get_pipeline_definition(
+        pipeline_name=pipeline_name,
+        working_dir=context.working_dir)
+
+    items = enumerate(foreach_args)
+    items_lock = threading.Lock()
+    stop = threading.Event()
+    results = {}
+    errors = {}
+
+    def run_children():
+        """Run the next child until there are no more, on the worker."""
+        while not stop.is_set():
+            # a timeout on the pype step stops children starting.
+            pypyr.utils.worker.check_cancelled()
+            with items_lock:
+                index, item = next(items, (None, None))
+
+            if index is None:
+                return
+
+            try:
+                results[index] = run_child(
+                    context=context,
+                    pipeline_name=pipeline_name,
+                    pipeline_definition=copy.deepcopy(pipeline_definition),
+                    item=item,
+                    use_parent_context=use_parent_context,
+                    pipe_arg=pipe_arg,
+                    skip_parse=skip_parse)
+            except Exception as err:
+                logger.error(f"Something went wrong pyping {pipeline_name} "
+                             f"for item {index}. {type(err).__name__}: {err}")
+                errors[index] = err
+                if raise_error:
+                    stop.set()
+
+    if parallel == 1:
+        run_children()
+    else:
+        workers = [Worker(run_children, name=f"pypyr-pype-{index}").start()
+                   for index in range(parallel)]
+        for worker in workers:
+            worker.wait()
+            worker.result()
+
+    count = max(results.keys() | errors.keys(), default=-1) + 1
+    context[results_key] = [results.get(index, None)
+                            for index in range(count)]
+
+    logger.info(f"pyped {pipeline_name} {len(results)} times. {len(errors)} "
+                f"failed. Results in {results_key}.")
+
+    if errors:
+        if raise_error:
+            logger.debug("Raising 1st error to caller.")
+            raise errors[min(errors)]
+
+        logger.debug(f"raiseError is False. Swallowing errors in "
+                     f"{pipeline_name}.")
+
+    logger.debug("done")
+
+
+def run_child(context, pipeline_name, pipeline_definition, item,
+              use_parent_context, pipe_arg, skip_parse):
+    """Run one fan-out child pipeline in its own context.
+
+    The child's context is a deep copy, so even changing nested values in
+    place doesn't touch the parent's context or race the other children.
+
+    Args:
+        context: pypyr.context.Context. The parent pipeline's context. Doesn't
+                 change.
+        pipeline_name: str. Name of the child pipeline.
+        pipeline_definition: dict. The child's own copy of the definition.
+        item: the child's item from foreachArgs. Goes in context['i'].
+        use_parent_context: bool. Seed the child with a copy of context.
+        pipe_arg: str. Pass to the child's context_parser.
+        skip_parse: bool. Skip the child's context_parser.
+
+    Returns:
+        dict. Top-level keys the child added or changed, in place or not.
+    """
+    if use_parent_context:
+        seed = context.fork()
+    else:
+        seed = Context()
+        seed.working_dir = context.working_dir
+
+    seed['i'] = item
+    child_context = seed.fork(deep=True)
+
+    pipelinerunner.run_pipeline(pipeline_name=pipeline_name,
+                                pipeline_context_input=pipe_arg,
+                                context=child_context,
+                                parse_input=not skip_parse,
+                                pipeline_definition=pipeline_definition)
+
+    updated, _ = seed.join(child_context)
+    return updated
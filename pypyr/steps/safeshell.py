@@ -5,7 +5,7 @@ environment,variable expansion, and expansion of ~ to a user’s home
 directory.
 """
 import logging
-import subprocess
+import pypyr.utils.subproc
 
 # logger means the log level will be set correctly
 logger = logging.getLogger(__name__)
@@ -29,18 +29,49 @@ def run_step(context):
         cmd: mything --arg1 {key1}
 
     The cmd passed to the shell will be "mything --arg value1"
+
+    cmd splits into args the same way a posix shell would, so quote args
+    with spaces in them: mything "arg with spaces". Alternatively, make
+    context['cmd'] a list, where each item is an arg.
+
+    Optional: context['cmdTimeout'] kills the command if it runs longer than
+    this many seconds, raising subprocess.TimeoutExpired.
+
+    Optional: context['cmdEnv'] is a dict of $ENVs for the command only. A
+    None value removes that $ENV. This doesn't change the environment of
+    pypyr itself, unlike pypyr.steps.env.
+
+    To run more than one command, use context['cmds'] instead of
+    context['cmd']. cmds is a list of commands that run as asyncio
+    sub-processes, up to context['cmdParallel'] at a time. Output streams
+    line by line to the log.
+
+    Set context['cmdCapture'] to save output, returncode & optionally
+    parsed output to context['cmdOut']. See
+    pypyr.utils.subproc.run_context_cmds for the options.
     """
     logger.debug("started")
+    if any((context.get('cmds', None),
+            pypyr.utils.subproc.get_capture(context))):
+        pypyr.utils.subproc.run_context_cmds(context,
+                                             shell=False,
+                                             caller=__name__)
+        logger.debug("done")
+        return
+
     context.assert_key_has_value(key='cmd', caller=__name__)
 
     logger.debug(f"Processing command string: {context['cmd']}")
-    interpolated_string = context.get_formatted('cmd')
+    interpolated_cmd = context.get_formatted('cmd')
 
-    # input string is a command like 'ls -l | grep boom'. Split into list on
-    # spaces to allow for natural shell language input string.
-    args = interpolated_string.split(' ')
+    # input string is a command like 'ls -l "a file"'. Split into args like
+    # the shell would, so quoted args with spaces stay whole.
+    args = pypyr.utils.subproc.get_args(interpolated_cmd)
 
     # check=True throws CalledProcessError if exit code != 0
-    subprocess.run(args, shell=False, check=True)
+    pypyr.utils.subproc.run_args(
+        args,
+        timeout=pypyr.utils.subproc.get_timeout(context),
+        env=pypyr.utils.subproc.get_env(context))
 
     logger.debug("done")
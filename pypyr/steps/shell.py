@@ -5,7 +5,7 @@ at the shell prompt. This includes, for example, quoting or backslash escaping
 filenames with spaces in them. The shell defaults to /bin/sh.
 """
 import logging
-import subprocess
+import pypyr.utils.subproc
 
 # logger means the log level will be set correctly
 logger = logging.getLogger(__name__)
@@ -33,17 +33,55 @@ def run_step(context):
         cmd: mything --arg1 {key1}
 
     The cmd passed to the shell will be "mything --arg value1"
+
+    If context['cmd'] is a list rather than a string, each item is an arg,
+    and the program runs directly without the shell. This is quicker when
+    you don't need shell features like pipes, wildcards or $ENVs.
+
+    Optional: context['cmdTimeout'] kills the command if it runs longer than
+    this many seconds, raising subprocess.TimeoutExpired.
+
+    Optional: context['cmdEnv'] is a dict of $ENVs for the command only. A
+    None value removes that $ENV. This doesn't change the environment of
+    pypyr itself, unlike pypyr.steps.env.
+
+    To run more than one command, use context['cmds'] instead of
+    context['cmd']. cmds is a list of commands that run as asyncio
+    sub-processes, up to context['cmdParallel'] at a time. Output streams
+    line by line to the log.
+
+    Set context['cmdCapture'] to save output, returncode & optionally
+    parsed output to context['cmdOut']. See
+    pypyr.utils.subproc.run_context_cmds for the options.
     """
     logger.debug("started")
+    if any((context.get('cmds', None),
+            pypyr.utils.subproc.get_capture(context))):
+        pypyr.utils.subproc.run_context_cmds(context,
+                                             shell=True,
+                                             caller=__name__)
+        logger.debug("done")
+        return
+
     context.assert_key_has_value(key='cmd', caller=__name__)
 
     # input string is a command like 'ls -l | grep boom'. Split into list on
     # spaces to allow for natural shell language input string.
     logger.debug(f"Processing command string: {context['cmd']}")
 
-    interpolated_string = context.get_formatted('cmd')
+    interpolated_cmd = context.get_formatted('cmd')
+    timeout = pypyr.utils.subproc.get_timeout(context)
+    env = pypyr.utils.subproc.get_env(context)
 
-    # check=True throws CalledProcessError if exit code != 0
-    subprocess.run(interpolated_string, shell=True, check=True)
+    if isinstance(interpolated_cmd, str):
+        # raises CalledProcessError if exit code != 0
+        pypyr.utils.subproc.run_process(interpolated_cmd, shell=True,
+                                        timeout=timeout, env=env)
+    else:
+        # list of args runs directly, saving the fork of the shell.
+        pypyr.utils.subproc.run_args(
+            pypyr.utils.subproc.get_args(interpolated_cmd),
+            timeout=timeout,
+            env=env)
 
     logger.debug("done")
@@ -4,11 +4,21 @@ pipelinerunner uses this to parse and run steps.
 """
 
 import logging
+import time
 from pypyr.dsl import Step
+from pypyr.errors import PipelineDefinitionError, StepTimeoutError
+import pypyr.moduleloader
+from pypyr.utils.worker import Worker
 
 # use pypyr logger to ensure loglevel is set correctly
 logger = logging.getLogger(__name__)
 
+# step groups that can have options in the pipeline's handlers map.
+HANDLER_GROUPS = ('on_success', 'on_failure')
+
+# options a step group can have in handlers.
+HANDLER_OPTIONS = ('parallel', 'timeout', 'stepTimeout')
+
 
 def get_pipeline_steps(pipeline, steps_group):
     """Get the steps attribute of module pipeline.
@@ -47,6 +57,112 @@ def get_pipeline_steps(pipeline, steps_group):
         return None
 
 
+def get_step_module_names(pipeline):
+    """Get the module names of all steps in all step groups of pipeline.
+
+    This is a static lookup - it doesn't run any steps or evaluate any
+    formatting expressions.
+
+    Args:
+        pipeline: dict. Pipeline definition.
+
+    Returns:
+        list of str. Module names in order of appearance in steps,
+        on_success and on_failure. Contains duplicates if the pipeline
+        uses the same step more than once.
+    """
+    logger.debug("starting")
+    module_names = []
+    for steps_group in ('steps', 'on_success', 'on_failure'):
+        steps = pipeline.get(steps_group, None)
+        if not steps:
+            continue
+
+        for step in steps:
+            # complex step is a dict with a name, simple step is the name.
+            module_names.append(Step.get_step_name(step))
+
+    logger.debug("done")
+    return module_names
+
+
+def preload_step_modules(pipeline):
+    """Import all step modules referenced in pipeline, in parallel threads.
+
+    Args:
+        pipeline: dict. Pipeline definition.
+
+    Raises:
+        PyModuleNotFoundError: if any of the step modules are not found.
+    """
+    logger.debug("starting")
+    module_names = get_step_module_names(pipeline)
+    pypyr.moduleloader.preload_modules(module_names)
+    logger.debug("done")
+
+
+def get_handler_options(pipeline, step_group_name):
+    """Get the handlers options for step group from the pipeline.
+
+    In the pipeline yaml:
+        handlers:
+          on_failure:
+            parallel: True # run the group's steps at the same time
+            timeout: 60 # seconds for the whole group
+            stepTimeout: 20 # seconds for each step
+
+    Args:
+        pipeline: dict. Pipeline definition.
+        step_group_name: str. Name of step group, like on_failure.
+
+    Returns:
+        tuple (parallel, timeout, step_timeout). parallel is bool. The
+        timeouts are float seconds, or None for no timeout.
+
+    Raises:
+        PipelineDefinitionError: handlers or its options aren't valid.
+    """
+    handlers = pipeline.get('handlers', None) or {}
+    if not isinstance(handlers, dict):
+        raise PipelineDefinitionError("handlers must be a map of step group "
+                                      "name to options.")
+
+    options = handlers.get(step_group_name, None) or {}
+    if not isinstance(options, dict):
+        raise PipelineDefinitionError(f"handlers {step_group_name} must be a "
+                                      "map of options.")
+
+    return (bool(options.get('parallel', False)),
+            get_timeout(options, 'timeout', step_group_name),
+            get_timeout(options, 'stepTimeout', step_group_name))
+
+
+def get_timeout(options, key, step_group_name):
+    """Get timeout in seconds from options[key].
+
+    Returns:
+        float. None if not set.
+
+    Raises:
+        PipelineDefinitionError: timeout isn't a number more than 0.
+    """
+    timeout = options.get(key, None)
+    if timeout is None:
+        return None
+
+    try:
+        valid = not isinstance(timeout, bool) and float(timeout) > 0
+    except (TypeError, ValueError):
+        valid = False
+
+    if not valid:
+        raise PipelineDefinitionError(
+            f"handlers {step_group_name} {key} must be a number of seconds "
+            f"more than 0, not {timeout}.")
+
+    return float(timeout)
+
+
 def run_failure_step_group(pipeline, context):
     """Run the on_failure step group if it exists.
 
@@ -67,12 +183,16 @@ def run_failure_step_group(pipeline, context):
     logger.debug("done")
 
 
-def run_pipeline_steps(steps, context):
+def run_pipeline_steps(steps, context, start_index=0, checkpoint=None):
     """Run the run_step(context) method of each step in steps.
 
     Args:
         steps: list. Sequence of Steps to execute
         context: pypyr.context.Context. The pypyr context. Will mutate.
+        start_index: int. Skip steps before this index, like when resuming
+                     from a checkpoint.
+        checkpoint: pypyr.checkpoint.Checkpoint. Save context after each
+                    step completes. None means don't.
     """
     logger.debug("starting")
     assert isinstance(
@@ -83,24 +203,174 @@ def run_pipeline_steps(steps, context):
     else:
         step_count = 0
 
-        for step in steps:
+        for step_index, step in enumerate(steps):
+            if step_index < start_index:
+                continue
+
             step_instance = Step(step)
             step_instance.run_step(context)
             step_count += 1
 
+            if checkpoint:
+                checkpoint.save(step_index, context)
+
+        if start_index:
+            logger.info(f"skipped {min(start_index, len(steps))} steps that "
+                        "already completed before the checkpoint.")
+
         logger.debug(f"executed {step_count} steps")
 
     logger.debug("done")
 
 
-def run_step_group(pipeline_definition, step_group_name, context):
-    """Get the specified step group from the pipeline and run its steps."""
+def run_step_group(pipeline_definition, step_group_name, context,
+                   start_index=0, checkpoint=None):
+    """Get the specified step group from the pipeline and run its steps.
+
+    Args:
+        pipeline_definition: dict. Dictionary representing the pipeline.
+        step_group_name: str. Name of step group to run, like steps.
+        context: pypyr.context.Context. The pypyr context. Will mutate.
+        start_index: int. Start at this step in the group.
+        checkpoint: pypyr.checkpoint.Checkpoint. Save context after each
+                    step. None means don't.
+    """
     logger.debug(f"starting {step_group_name}")
     assert step_group_name
 
     steps = get_pipeline_steps(pipeline=pipeline_definition,
                                steps_group=step_group_name)
 
-    run_pipeline_steps(steps=steps, context=context)
+    if steps and step_group_name in HANDLER_GROUPS:
+        parallel, timeout, step_timeout = get_handler_options(
+            pipeline_definition, step_group_name)
+        if parallel or timeout or step_timeout:
+            run_handler_steps(steps=steps,
+                              context=context,
+                              step_group_name=step_group_name,
+                              parallel=parallel,
+                              timeout=timeout,
+                              step_timeout=step_timeout)
+            logger.debug(f"done {step_group_name}")
+            return
+
+    run_pipeline_steps(steps=steps,
+                       context=context,
+                       start_index=start_index,
+                       checkpoint=checkpoint)
 
     logger.debug(f"done {step_group_name}")
+
+
+def run_handler_steps(steps, context, step_group_name, parallel=False,
+                      timeout=None, step_timeout=None):
+    """Run handler steps, in parallel or with timeouts.
+
+    Each step runs on a supervised worker thread in its own fork of context.
+    Once a step finishes, its changes join back into context, even if it
+    raised, just like a step that runs without a worker. A step that runs
+    out of time doesn't join, so its top-level keys don't change context
+    after pypyr moved on. The fork is shallow though, so changing a nested
+    value in place still shows in context. pypyr cancels the step & stops
+    waiting for it. See pypyr.dsl.Step.run_with_timeout for what cancelling
+    stops.
+
+    In parallel, all the steps start at once. Their changes join back in the
+    order of the steps, so if steps set the same key, the last step wins. If
+    any steps fail, the others still finish & all their changes join, then
+    the 1st error in step order raises.
+
+    Args:
+        steps: list. Sequence of steps as in the pipeline yaml.
+        context: pypyr.context.Context. The pypyr context. Will mutate.
+        step_group_name: str. Name of step group, for logs & errors.
+        parallel: bool. Run all the steps at the same time.
+        timeout: float. Seconds for the whole group. None means no limit.
+        step_timeout: float. Seconds for each step. None means no limit.
+
+    Raises:
+        StepTimeoutError: a step or the group ran out of time.
+    """
+    logger.debug("starting")
+    deadline = None if timeout is None else time.monotonic() + timeout
+    step_instances = [Step(step) for step in steps]
+
+    if parallel:
+        logger.info(f"running {len(step_instances)} {step_group_name} steps "
+                    "in parallel.")
+        runs = [start_step(step, context) for step in step_instances]
+        errors = []
+        for step, forked, worker, started in runs:
+            try:
+                finish_step(step, context, forked, worker, started,
+                            step_group_name, timeout, step_timeout, deadline)
+            except Exception as err:
+                logger.error(f"{step_group_name} step {step.name} failed. "
+                             f"{type(err).__name__}: {err}")
+                errors.append(err)
+
+        if errors:
+            raise errors[0]
+    else:
+        for step in step_instances:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise StepTimeoutError(
+                    f"{step_group_name} timeout of {timeout} seconds ran out "
+                    f"before {step.name} started.")
+
+            finish_step(step, context, *start_step(step, context)[1:],
+                        step_group_name, timeout, step_timeout, deadline)
+
+    logger.debug(f"executed {len(step_instances)} steps")
+    logger.debug("done")
+
+
+def start_step(step, context):
+    """Start step on a worker in a fork of context.
+
+    Returns:
+        tuple (step, forked, worker, started) where started is the
+        time.monotonic() when the step started.
+    """
+    forked = context.fork()
+    worker = Worker(step.run_step, forked, name=f"pypyr-{step.name}")
+    return step, forked, worker.start(), time.monotonic()
+
+
+def finish_step(step, context, forked, worker, started, step_group_name,
+                timeout, step_timeout, deadline):
+    """Wait for step on worker to finish, then join its fork into context.
+
+    The fork joins even if the step raised. Only a step that runs out of
+    time doesn't join.
+
+    Raises:
+        StepTimeoutError: step or group ran out of time 1st.
+        Whatever the step raised.
+    """
+    step_deadline = deadline
+    if step_timeout is not None:
+        step_deadline = min(filter(None, (started + step_timeout, deadline)))
+
+    wait = None
+    if step_deadline is not None:
+        wait = max(0, step_deadline - time.monotonic())
+
+    if not worker.wait(wait):
+        logger.debug(f"cancelling {step.name} on thread {worker.name}")
+        worker.cancel()
+        if deadline is not None and step_deadline == deadline:
+            raise StepTimeoutError(
+                f"{step_group_name} didn't finish within its timeout of "
+                f"{timeout} seconds. {step.name} was still running.")
+
+        raise StepTimeoutError(
+            f"{step_group_name} step {step.name} didn't finish within its "
+            f"stepTimeout of {step_timeout} seconds.")
+
+    try:
+        worker.result()
+    finally:
+        # a step that failed in time still keeps what it set, like it would
+        # without the worker.
+        context.join(forked)
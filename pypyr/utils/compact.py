@@ -0,0 +1,283 @@
+"""Compact, read-only storage & memory accounting for big context values.
+
+Large read-only data, like thousands of records loaded from json or yaml,
+takes a lot less memory as CompactDict & tuple rather than dict & list.
+Records with the same keys share a single key index, and the keys are
+interned, so each record only holds its values.
+"""
+from collections.abc import ItemsView, Mapping, ValuesView
+import sys
+import weakref
+
+# types compact leaves as they are. Checked 1st, since most values in loaded
+# data are these, and isinstance against Mapping is slow.
+_SCALAR_TYPES = frozenset((str, int, float, bool, type(None), bytes))
+
+# keys tuple: shared _KeyIndex. Entries go away once no CompactDict uses them.
+_key_indexes = weakref.WeakValueDictionary()
+
+
+class _KeyIndex(dict):
+    """Key: position of its value. Subclass only so it can be a weakref."""
+
+    __slots__ = ('__weakref__',)
+
+
+def _get_key_index(keys):
+    """Get the shared key index for keys.
+
+    Args:
+        keys: tuple. Keys in order.
+
+    Returns:
+        _KeyIndex. The same instance for the same keys, while in use.
+    """
+    index = _key_indexes.get(keys, None)
+    if index is None:
+        index = _KeyIndex(zip(keys, range(len(keys))))
+        _key_indexes[keys] = index
+
+    return index
+
+
+class _ItemsView(ItemsView):
+    """Items of a CompactDict, without looking up each key again."""
+
+    __slots__ = ()
+
+    def __iter__(self):
+        """Iterate (key, value) pairs in order."""
+        return zip(self._mapping._index, self._mapping._values)
+
+
+class _ValuesView(ValuesView):
+    """Values of a CompactDict, without looking up each key again."""
+
+    __slots__ = ()
+
+    def __iter__(self):
+        """Iterate values in order."""
+        return iter(self._mapping._values)
+
+
+class CompactDict(Mapping):
+    """Immutable, memory efficient dict for read-only data.
+
+    Supports everything a read-only dict does: [key], get, in, keys, items,
+    values, len & ==. You can't change it. To change it, make a dict from it
+    with dict(compact_dict).
+
+    All CompactDicts with the same keys in the same order share a single key
+    index, so each one only stores a tuple of its values.
+    """
+
+    __slots__ = ('_index', '_values')
+
+    def __init__(self, items=()):
+        """Initialize from a mapping or iterable of (key, value) pairs.
+
+        Like dict, the last value wins for duplicate keys.
+        """
+        items = dict(items)
+        self._index = _get_key_index(tuple(items))
+        self._values = tuple(items.values())
+
+    @classmethod
+    def _from_keys_values(cls, keys, values):
+        """Create from tuples of unique keys & their values, without copying.
+
+        Args:
+            keys: tuple. Unique keys in order.
+            values: tuple. Value for each key, in the same order.
+
+        Returns:
+            CompactDict.
+        """
+        new = cls.__new__(cls)
+        new._index = _get_key_index(keys)
+        new._values = values
+        return new
+
+    def __getitem__(self, key):
+        """Get value for key. Raises KeyError if key doesn't exist."""
+        return self._values[self._index[key]]
+
+    def __contains__(self, key):
+        """Return True if key exists."""
+        return key in self._index
+
+    def __iter__(self):
+        """Iterate the keys in order."""
+        return iter(self._index)
+
+    def __len__(self):
+        """Get count of keys."""
+        return len(self._values)
+
+    def items(self):
+        """Get a view of the (key, value) pairs."""
+        return _ItemsView(self)
+
+    def values(self):
+        """Get a view of the values."""
+        return _ValuesView(self)
+
+    def __reduce__(self):
+        """Pickle & copy as a dict of the same items."""
+        return (self.__class__, (dict(self),))
+
+    def __repr__(self):
+        """Get repr like CompactDict({'key': 'value'})."""
+        return f"{self.__class__.__name__}({dict(self)!r})"
+
+
+def compact(obj):
+    """Get a compact, read-only copy of obj.
+
+    dicts become CompactDict, lists become tuples & sets become frozensets,
+    all the way down. dict keys are interned, so the same key in many
+    records is stored only once. Everything else stays as is.
+
+    Args:
+        obj: anything. Usually a dict or list loaded from json or yaml.
+
+    Returns:
+        Compact copy of obj. obj itself if there's nothing to compact.
+    """
+    obj_type = type(obj)
+    if obj_type in _SCALAR_TYPES or obj_type is CompactDict:
+        return obj
+
+    if obj_type is dict or isinstance(obj, Mapping):
+        # a mapping's keys are already unique, so no need for dict's checks.
+        return CompactDict._from_keys_values(
+            tuple(sys.intern(k) if type(k) is str else k for k in obj),
+            tuple(compact(v) for v in obj.values()))
+
+    if obj_type is list or obj_type is tuple:
+        return tuple(compact(v) for v in obj)
+
+    if obj_type is set or obj_type is frozenset:
+        return frozenset(compact(v) for v in obj)
+
+    return obj
+
+
+def to_dict(obj):
+    """Get CompactDict as a dict. Use as the default for json.dump.
+
+    Args:
+        obj: CompactDict.
+
+    Returns:
+        dict. Shallow, so nested CompactDicts stay as they are.
+
+    Raises:
+        TypeError: obj isn't a CompactDict.
+    """
+    if isinstance(obj, CompactDict):
+        return dict(obj)
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON "
+                    "serializable")
+
+
+def get_size(obj, seen=None):
+    """Get bytes obj takes in memory, including everything it contains.
+
+    Counts each object only once, even if obj contains it many times. Knows
+    about dict, list, tuple, set, frozenset & CompactDict containers. Other
+    objects count only their own size, not what they reference.
+
+    Args:
+        obj: anything.
+        seen: set. ids of objects already counted. Pass the same set for
+              several objects to count what they share only once.
+
+    Returns:
+        int. bytes.
+    """
+    if seen is None:
+        seen = set()
+
+    size = 0
+    pending = [obj]
+    while pending:
+        current = pending.pop()
+        current_id = id(current)
+        if current_id in seen:
+            continue
+
+        seen.add(current_id)
+        size += sys.getsizeof(current)
+
+        if isinstance(current, CompactDict):
+            pending.append(current._index)
+            pending.append(current._values)
+        elif isinstance(current, dict):
+            pending.extend(current.keys())
+            pending.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            pending.extend(current)
+
+    return size
+
+
+def get_memstats(mapping):
+    """Get bytes each top-level key in mapping takes in memory.
+
+    What several keys share counts toward the 1st key that has it.
+
+    Args:
+        mapping: dict. Like the pypyr context.
+
+    Returns:
+        tuple (total, stats). total is the bytes of mapping & everything in
+        it. stats is a list of (key, bytes), biggest 1st.
+    """
+    seen = {id(mapping)}
+    total = sys.getsizeof(mapping)
+    stats = []
+    for key, value in mapping.items():
+        size = get_size(key, seen) + get_size(value, seen)
+        total += size
+        stats.append((key, size))
+
+    stats.sort(key=lambda stat: stat[1], reverse=True)
+    return total, stats
+
+
+def format_bytes(size):
+    """Format size like 1.5 MiB.
+
+    Args:
+        size: int. bytes.
+
+    Returns:
+        str.
+    """
+    if size < 1024:
+        return f"{size} B"
+
+    for unit in ('KiB', 'MiB', 'GiB'):
+        size /= 1024
+        if size < 1024 or unit == 'GiB':
+            return f"{size:.1f} {unit}"
+
+
+def format_memstats(total, stats):
+    """Format memory stats from get_memstats as a report.
+
+    Args:
+        total: int. Total bytes.
+        stats: list of (key, bytes).
+
+    Returns:
+        list of str. One line each, without newline.
+    """
+    lines = [f"context memory: {format_bytes(total)} in {len(stats)} keys."]
+    for key, size in stats:
+        share = size / total * 100 if total else 0
+        lines.append(f"  {key}: {format_bytes(size)} ({share:.1f}%)")
+
+    return lines
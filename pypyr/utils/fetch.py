@@ -0,0 +1,166 @@
+"""Utility functions for the steps that load files & urls into context.
+
+Load many files at once, in parallel, & merge them into context in a
+deterministic order, so loading 500 config fragments doesn't take 500
+steps.
+"""
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import json
+import logging
+import os
+import pypyr.executors
+import pypyr.utils.compact
+import ruamel.yaml as yaml
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# ways to merge payloads into context.
+MERGE_STRATEGIES = ('update', 'merge')
+
+# a path with any of these is a glob.
+_GLOB_CHARS = frozenset('*?[')
+
+
+def get_paths(paths):
+    """Get the list of file paths from a path, glob or list of these.
+
+    Each glob expands to the files it matches, sorted, so the order doesn't
+    depend on the file system. Otherwise paths stay in the order given.
+
+    A path that exists is always that literal path, even if it has glob
+    characters in it, like cfg[prod].json.
+
+    Args:
+        paths: path-like, or list of path-like. Each can be a glob like
+               config/*.yaml. ** matches any number of directories.
+
+    Returns:
+        list of str.
+
+    Raises:
+        FileNotFoundError: a glob doesn't match any files.
+    """
+    if isinstance(paths, (str, bytes, os.PathLike)):
+        paths = [paths]
+
+    expanded = []
+    for path in paths:
+        path = os.fspath(path)
+        if _GLOB_CHARS.isdisjoint(path) or os.path.exists(path):
+            expanded.append(path)
+            continue
+
+        matches = sorted(glob.glob(path, recursive=True))
+        if not matches:
+            raise FileNotFoundError(f"no files match {path}")
+
+        logger.debug(f"{path} matches {len(matches)} file(s)")
+        expanded.extend(matches)
+
+    return expanded
+
+
+def load_json(path):
+    """Load json file at path.
+
+    Args:
+        path: path-like.
+
+    Returns:
+        Parsed json.
+    """
+    with open(path) as json_file:
+        return json.load(json_file)
+
+
+def load_yaml(path):
+    """Load yaml file at path with the safe loader.
+
+    Args:
+        path: path-like.
+
+    Returns:
+        Parsed yaml.
+    """
+    with open(path) as yaml_file:
+        return yaml.YAML(typ='safe', pure=True).load(yaml_file)
+
+
+def load_all(paths, load, executor=None):
+    """Load all paths with load, in parallel if there's more than 1.
+
+    Args:
+        paths: list of path-like.
+        load: callable. load(path) returns the parsed file. Must be a module
+              level function for the process executor.
+        executor: str. thread or process. Parse with a thread pool, or with
+                  the shared step process pool for cpu bound parsers. None
+                  means 1 at a time.
+
+    Returns:
+        list of payloads, in the same order as paths.
+
+    Raises:
+        The error of the 1st path in list order that failed to load.
+    """
+    if executor is None or len(paths) <= 1:
+        return [load(path) for path in paths]
+
+    logger.debug(f"loading {len(paths)} files with {executor} executor")
+    if executor == 'process':
+        pool = pypyr.executors.get_process_pool()
+        # big chunks, so each worker round-trip parses many small files.
+        chunksize = max(1, len(paths) // (4 * (os.cpu_count() or 1)))
+        return list(pool.map(load, paths, chunksize=chunksize))
+
+    with ThreadPoolExecutor() as pool:
+        return list(pool.map(load, paths))
+
+
+def merge_all(context, payloads, sources, strategy='update', compact=False):
+    """Merge payloads into context, in order.
+
+    Later payloads overwrite the same keys from earlier payloads.
+
+    Args:
+        context: pypyr.context.Context. Merge into this.
+        payloads: list of dict. Parsed files.
+        sources: list of str. Where each payload came from, for errors.
+        strategy: str. update overwrites top level keys, like dict.update.
+                  merge merges nested maps & appends to lists, with
+                  formatting, like pypyr.steps.contextmerge.
+        compact: bool. Compact the values, so big read-only data takes less
+                 memory. See pypyr.utils.compact.
+
+    Returns:
+        int. Count of keys merged.
+
+    Raises:
+        ValueError: strategy isn't update or merge.
+        TypeError: a payload isn't a map at the top level.
+    """
+    if strategy not in MERGE_STRATEGIES:
+        raise ValueError(f"merge strategy must be update or merge, not "
+                         f"{strategy}.")
+
+    count = 0
+    for source, payload in zip(sources, payloads):
+        if not isinstance(payload, MutableMapping):
+            raise TypeError(f"{source} should describe a map at the top "
+                            "level, not a list or a single value.")
+
+        if compact:
+            payload = {k: pypyr.utils.compact.compact(v)
+                       for k, v in payload.items()}
+
+        if strategy == 'merge':
+            context.merge(payload)
+        else:
+            context.update(payload)
+
+        count += len(payload)
+
+    return count
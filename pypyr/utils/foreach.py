@@ -0,0 +1,186 @@
+"""Utility functions for the foreach step decorator.
+
+foreach can be a list, or a streaming source that yields one item at a time
+without loading everything into memory first:
+    foreach: {file: path}       each line of the file.
+    foreach: {jsonl: path}      each json-lines record in the file.
+    foreach: {glob: pattern}    each path that matches the glob.
+    foreach: {range: 10}        0 to 9. Also [start, stop] or
+                                [start, stop, step].
+"""
+from collections.abc import Mapping
+import glob
+import itertools
+import json
+import logging
+from pypyr.errors import PipelineDefinitionError
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+# foreach: {source: value} streaming sources.
+SOURCES = ('file', 'glob', 'jsonl', 'range')
+
+
+def get_source_name(foreach_items):
+    """Get the streaming source name if foreach_items is a source.
+
+    Args:
+        foreach_items: foreach decorator value as it is in the pipeline.
+
+    Returns:
+        str. One of SOURCES. None if foreach_items is not a source.
+
+    Raises:
+        PipelineDefinitionError: foreach_items has more than one source.
+    """
+    if not isinstance(foreach_items, Mapping):
+        return None
+
+    sources = [source for source in SOURCES if source in foreach_items]
+    if not sources:
+        return None
+
+    if len(sources) > 1:
+        raise PipelineDefinitionError(
+            f"foreach can only have one of {', '.join(SOURCES)}. Found "
+            f"{', '.join(sources)}.")
+
+    return sources[0]
+
+
+def get_foreach_iterable(context, foreach_items):
+    """Get the items for foreach to iterate, lazily for streaming sources.
+
+    Formats foreach_items from context. For a streaming source, only its
+    arguments, like the path, format. The items the source yields are not
+    formatted - a line in a file is just text.
+
+    Only a source written in the pipeline counts as a source. A formatting
+    expression like '{mydict}' that evaluates to a dict with a source key
+    iterates the dict as usual.
+
+    Args:
+        context: pypyr.context.Context. Format expressions from this.
+        foreach_items: foreach decorator value as it is in the pipeline.
+
+    Returns:
+        iterable. A list for a list, a lazy iterator for a streaming source.
+        Anything else, like a generator in context, is returned as is.
+
+    Raises:
+        PipelineDefinitionError: invalid streaming source.
+    """
+    source = get_source_name(foreach_items)
+
+    if source is None:
+        return context.get_formatted_iterable(foreach_items)
+
+    foreach = context.get_formatted_iterable(foreach_items)
+    value = foreach[source]
+    encoding = foreach.get('encoding', None)
+    logger.debug(f"foreach streams from {source}: {value}")
+
+    if source == 'file':
+        return iter_file_lines(value, encoding=encoding)
+
+    if source == 'jsonl':
+        return iter_jsonl(value, encoding=encoding)
+
+    if source == 'glob':
+        return glob.iglob(value, recursive=True)
+
+    return get_range(value)
+
+
+def iter_file_lines(path, encoding=None):
+    """Yield each line in the file at path, without line endings.
+
+    Reads one line at a time, so memory stays constant however big the file.
+
+    Args:
+        path: path-like. File to read.
+        encoding: str. File encoding. None means the platform default.
+
+    Yields:
+        str. Each line without the trailing newline.
+    """
+    with open(path, encoding=encoding) as file:
+        for line in file:
+            yield line.rstrip('\r\n')
+
+
+def iter_jsonl(path, encoding=None):
+    """Yield each json-lines record in the file at path.
+
+    Skips blank lines.
+
+    Args:
+        path: path-like. File to read.
+        encoding: str. File encoding. None means the platform default.
+
+    Yields:
+        Each line parsed from json.
+
+    Raises:
+        ValueError: a line isn't valid json. Message includes line number.
+    """
+    with open(path, encoding=encoding) as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+
+            try:
+                yield json.loads(line)
+            except ValueError as err:
+                raise ValueError(
+                    f"{path} line {line_number} isn't valid json: {err}"
+                ) from err
+
+
+def get_range(value):
+    """Get a range from a foreach range source value.
+
+    Args:
+        value: int stop, or list [start, stop] or [start, stop, step].
+
+    Returns:
+        range. This is lazy already.
+
+    Raises:
+        PipelineDefinitionError: value isn't 1 to 3 ints.
+    """
+    args = value if isinstance(value, (list, tuple)) else [value]
+
+    try:
+        if not 1 <= len(args) <= 3:
+            raise ValueError("range takes 1 to 3 ints.")
+
+        return range(*(int(arg) for arg in args))
+    except (TypeError, ValueError) as err:
+        raise PipelineDefinitionError(
+            "foreach range must be stop, [start, stop] or "
+            f"[start, stop, step], as integers. {value} is not a valid "
+            f"range: {err}") from err
+
+
+def iter_batches(iterable, batch_size):
+    """Yield lists of up to batch_size items from iterable.
+
+    Only ever holds one batch in memory, so works for streaming sources.
+
+    Args:
+        iterable: iterable. Items to batch.
+        batch_size: int. Max items per batch. 1 or more.
+
+    Yields:
+        list. The last batch is shorter if iterable doesn't divide evenly by
+        batch_size.
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+
+        yield batch
@@ -0,0 +1,362 @@
+"""Utility functions for fetching urls over http & https.
+
+All fetches in the same process share a pool of keep-alive connections, so
+steps & child pipelines that fetch from the same host don't each pay for a
+new tcp & tls handshake.
+
+With a cache, responses with an ETag or Last-Modified header save to disk.
+The next fetch of the same url asks the server whether it changed, and uses
+the saved body if it didn't.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import hashlib
+import http.client
+import json
+import logging
+import os
+import threading
+import urllib.parse
+from pypyr.errors import HttpError
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# follow these redirect statuses when the response has a Location.
+_REDIRECT_STATUSES = frozenset((301, 302, 303, 307, 308))
+
+# give up after this many redirects in a row.
+MAX_REDIRECTS = 5
+
+# don't send these on to a redirect to another scheme, host or port.
+_CREDENTIAL_HEADERS = frozenset(('authorization',
+                                 'proxy-authorization',
+                                 'cookie'))
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# a pooled connection the server closed in the meantime raises one of these
+# on the next request. Safe to retry on a new connection.
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected,
+                            BrokenPipeError,
+                            ConnectionResetError)
+
+Response = namedtuple('Response', ['url', 'status', 'reason', 'headers',
+                                   'body'])
+
+
+class ConnectionPool(object):
+    """Keep-alive http connections, shared between threads.
+
+    Connections are per scheme, host & port. A connection is in the pool
+    only while idle, so each connection is only ever used by 1 thread at a
+    time.
+
+    Attributes:
+        max_idle: (int) keep up to this many idle connections per host.
+    """
+
+    def __init__(self, max_idle=8):
+        """Initialize the pool. Doesn't open any connections yet."""
+        self.max_idle = max_idle
+        # (scheme, host, port): list of idle connections.
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, scheme, host, port, timeout=None):
+        """Get an idle connection to host, or a new one if none are idle.
+
+        Args:
+            scheme: str. http or https.
+            host: str. Host name.
+            port: int. None means the scheme's default port.
+            timeout: float. Socket timeout in seconds. None means no
+                     timeout.
+
+        Returns:
+            tuple (connection, reused). reused is True if the connection
+            came from the pool, so it might have gone stale.
+        """
+        with self._lock:
+            idle = self._idle.get((scheme, host, port), None)
+            connection = idle.pop() if idle else None
+
+        if connection is not None:
+            connection.timeout = timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(timeout)
+            return connection, True
+
+        connection_class = (http.client.HTTPSConnection if scheme == 'https'
+                            else http.client.HTTPConnection)
+        return connection_class(host, port, timeout=timeout), False
+
+    def put(self, scheme, host, port, connection):
+        """Return connection to the pool once done with it.
+
+        Closes the connection instead if the pool for host is full.
+
+        Args:
+            scheme: str. http or https.
+            host: str. Host name.
+            port: int. Port, as passed to get.
+            connection: http.client.HTTPConnection. Idle connection.
+        """
+        with self._lock:
+            idle = self._idle.setdefault((scheme, host, port), [])
+            if len(idle) < self.max_idle:
+                idle.append(connection)
+                return
+
+        connection.close()
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+# shared by all fetches in this process.
+_pool = ConnectionPool()
+
+
+def get_cache_dir(working_dir):
+    """Get default http cache dir in working_dir.
+
+    Args:
+        working_dir: path. pypyr working dir.
+
+    Returns:
+        str. working_dir/.pypyr/http
+    """
+    return os.path.join(working_dir or '', '.pypyr', 'http')
+
+
+def get_pool():
+    """Get the connection pool all fetches in this process share.
+
+    Returns:
+        ConnectionPool.
+    """
+    return _pool
+
+
+def _send(pool, parts, headers, timeout):
+    """Send GET for url parts on a pooled connection & read the response.
+
+    Retries once on a new connection if a pooled connection went stale.
+
+    Returns:
+        tuple (status, reason, headers, body).
+    """
+    path = parts.path or '/'
+    if parts.query:
+        path = f"{path}?{parts.query}"
+
+    key = (parts.scheme, parts.hostname, parts.port)
+    connection, reused = pool.get(*key, timeout=timeout)
+    try:
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+        except _STALE_CONNECTION_ERRORS:
+            if not reused:
+                raise
+
+            logger.debug(f"pooled connection to {parts.hostname} closed. "
+                         "Reconnecting.")
+            connection.close()
+            connection, _ = pool.get(*key, timeout=timeout)
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+
+        body = response.read()
+    except BaseException:
+        connection.close()
+        raise
+
+    if response.will_close:
+        connection.close()
+    else:
+        pool.put(*key, connection)
+
+    if response.getheader('Content-Encoding', '').lower() == 'gzip':
+        body = gzip.decompress(body)
+
+    return response.status, response.reason, response.headers, body
+
+
+def get_origin(parts):
+    """Get the (scheme, host, port) of the urlsplit parts.
+
+    Args:
+        parts: urllib.parse.SplitResult.
+
+    Returns:
+        tuple of (scheme, host, port). port is the scheme's default port if
+        the url doesn't say.
+    """
+    scheme = parts.scheme.lower()
+    return (scheme,
+            (parts.hostname or '').lower(),
+            parts.port or _DEFAULT_PORTS.get(scheme, None))
+
+
+def request(url, headers=None, timeout=None, pool=None):
+    """GET url, following redirects.
+
+    Asks for gzip & decompresses it, so the returned body is always the
+    plain content.
+
+    A redirect to another scheme, host or port doesn't get the Authorization,
+    Proxy-Authorization & Cookie headers, so credentials for one server don't
+    leak to another.
+
+    Args:
+        url: str. http or https url.
+        headers: dict. Request headers.
+        timeout: float. Socket timeout in seconds. None means no timeout.
+        pool: ConnectionPool. None means the shared pool.
+
+    Returns:
+        Response namedtuple (url, status, reason, headers, body). url is the
+        final url after redirects. body is bytes.
+
+    Raises:
+        HttpError: not an http or https url, or too many redirects.
+        OSError: couldn't connect, or timed out.
+    """
+    pool = pool or _pool
+    request_headers = {'Accept-Encoding': 'gzip'}
+    if headers:
+        request_headers.update(headers)
+
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise HttpError(f"can only fetch http or https urls, not {url}.")
+
+        status, reason, response_headers, body = _send(pool,
+                                                       parts,
+                                                       request_headers,
+                                                       timeout)
+
+        location = response_headers.get('Location', None)
+        if status not in _REDIRECT_STATUSES or not location:
+            return Response(url, status, reason, response_headers, body)
+
+        logger.debug(f"{url} redirects to {location}")
+        url = urllib.parse.urljoin(url, location)
+
+        if get_origin(urllib.parse.urlsplit(url)) != get_origin(parts):
+            credentials = [key for key in request_headers
+                           if key.lower() in _CREDENTIAL_HEADERS]
+            if credentials:
+                logger.debug(f"not sending {', '.join(credentials)} to "
+                             "redirect on another origin.")
+                for key in credentials:
+                    del request_headers[key]
+
+    raise HttpError(f"too many redirects fetching {url}.")
+
+
+def get_cache_key(url, headers):
+    """Get the cache key for url with headers.
+
+    Different headers, like a different Authorization, can mean a different
+    response, so headers are part of the key.
+
+    Args:
+        url: str.
+        headers: dict. Request headers.
+
+    Returns:
+        str. hex digest.
+    """
+    serialized = json.dumps([url, sorted((headers or {}).items())])
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def fetch(url, headers=None, timeout=None, cache=None, pool=None):
+    """Get the body of url.
+
+    With a cache, sends the ETag & Last-Modified of the cached response, and
+    uses the cached body if the server says it's not modified.
+
+    Args:
+        url: str. http or https url.
+        headers: dict. Request headers.
+        timeout: float. Socket timeout in seconds. None means no timeout.
+        cache: pypyr.cache.DiskCache. Save & revalidate responses here. None
+               means don't cache.
+        pool: ConnectionPool. None means the shared pool.
+
+    Returns:
+        bytes. Response body.
+
+    Raises:
+        HttpError: response status isn't 2xx, or see request.
+        OSError: couldn't connect, or timed out.
+    """
+    logger.debug(f"fetching {url}")
+    request_headers = dict(headers) if headers else {}
+    key = cached = None
+    if cache is not None:
+        key = get_cache_key(url, headers)
+        cached = cache.get(key)
+        if cached is not None:
+            if cached['etag']:
+                request_headers['If-None-Match'] = cached['etag']
+            if cached['lastModified']:
+                request_headers['If-Modified-Since'] = cached['lastModified']
+
+    response = request(url,
+                       headers=request_headers,
+                       timeout=timeout,
+                       pool=pool)
+
+    if response.status == 304 and cached is not None:
+        logger.debug(f"{url} not modified. Using cached response.")
+        return cached['body']
+
+    if not 200 <= response.status < 300:
+        raise HttpError(f"GET {response.url} failed: {response.status} "
+                        f"{response.reason}")
+
+    if cache is not None:
+        etag = response.headers.get('ETag', None)
+        last_modified = response.headers.get('Last-Modified', None)
+        if etag or last_modified:
+            cache.set(key, {'url': url,
+                            'etag': etag,
+                            'lastModified': last_modified,
+                            'body': response.body})
+
+    logger.debug(f"fetched {len(response.body)} bytes from {url}")
+    return response.body
+
+
+def fetch_all(urls, parallel=1, **kwargs):
+    """Fetch urls, with up to parallel fetches at the same time.
+
+    Args:
+        urls: list of str. http or https urls.
+        parallel: int. Fetch up to this many urls at the same time.
+        **kwargs: passed to fetch.
+
+    Returns:
+        list of bytes. Response bodies, in the same order as urls.
+
+    Raises:
+        The error of the 1st url in list order that failed. See fetch.
+    """
+    if parallel <= 1 or len(urls) <= 1:
+        return [fetch(url, **kwargs) for url in urls]
+
+    with ThreadPoolExecutor(max_workers=min(parallel, len(urls))) as executor:
+        return list(executor.map(lambda url: fetch(url, **kwargs), urls))
@@ -0,0 +1,880 @@
+"""Utility functions for running sub-processes."""
+import asyncio
+from collections import deque
+from collections.abc import Mapping
+import functools
+import json
+import logging
+import os
+import shlex
+import shutil
+import signal
+import subprocess
+import tempfile
+import ruamel.yaml as yaml
+from pypyr.errors import ContextError
+import pypyr.utils.worker
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+# read sub-process output in chunks of this size.
+READ_CHUNK_SIZE = 64 * 1024
+
+# log output lines longer than this in pieces, rather than buffering forever
+# waiting for a newline that might never come.
+MAX_LINE_LENGTH = 64 * 1024
+
+# formats that cmdParse can parse command output from.
+PARSE_FORMATS = ('json', 'yaml', 'lines')
+
+# (executable, $PATH): resolved path, from _which.
+_which_cache = {}
+
+# start over once the cache has this many executables.
+_WHICH_CACHE_SIZE = 256
+
+
+class RingBuffer(object):
+    """Bounded bytes buffer that keeps only the last max_bytes written to it.
+
+    Use this to capture output from a chatty process without the risk of it
+    eating all your memory.
+
+    If you set spill_dir, once output exceeds max_bytes the buffer also
+    writes everything, from the 1st byte onwards, to a file in spill_dir.
+    Memory still holds only the last max_bytes. Call close when done
+    writing.
+
+    Attributes:
+        max_bytes: (int) keep at most this many bytes. None means unbounded.
+        total_bytes: (int) count of all bytes ever written, including the
+                     ones discarded to stay within max_bytes.
+        spill_path: (str) path of the file with all the output. None if
+                    output never exceeded max_bytes or no spill_dir.
+    """
+
+    def __init__(self, max_bytes=None, spill_dir=None, spill_suffix=None):
+        """Initialize the buffer.
+
+        Args:
+            max_bytes: int. Keep at most this many bytes. None is unbounded.
+            spill_dir: path. Write all output to a new file in this dir
+                       once it exceeds max_bytes. None means don't spill.
+            spill_suffix: str. Spill file name ends with this.
+        """
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.spill_path = None
+        self._spill_dir = spill_dir
+        self._spill_suffix = spill_suffix
+        self._spill_file = None
+        self._chunks = deque()
+        self._size = 0
+
+    @property
+    def truncated(self):
+        """True if some of what was written has been discarded."""
+        return self.total_bytes > self._size
+
+    def write(self, data):
+        """Append data, discarding the oldest bytes if over max_bytes.
+
+        Args:
+            data: bytes.
+        """
+        if not data:
+            return
+
+        self.total_bytes += len(data)
+
+        if self._spill_file is not None:
+            self._spill_file.write(data)
+        elif self._spill_dir is not None and self.max_bytes is not None:
+            if self.total_bytes > self.max_bytes:
+                self._start_spill(data)
+
+        if self.max_bytes is not None and len(data) >= self.max_bytes:
+            # this chunk alone is bigger than max, so it's all that's left.
+            self._chunks.clear()
+            data = data[len(data) - self.max_bytes:]
+            self._size = 0
+
+        self._chunks.append(data)
+        self._size += len(data)
+
+        if self.max_bytes is not None:
+            while self._size > self.max_bytes:
+                overflow = self._size - self.max_bytes
+                oldest = self._chunks[0]
+                if len(oldest) <= overflow:
+                    self._chunks.popleft()
+                    self._size -= len(oldest)
+                else:
+                    self._chunks[0] = oldest[overflow:]
+                    self._size -= overflow
+
+    def _start_spill(self, data):
+        """Create spill file & write everything so far to it, then data."""
+        os.makedirs(self._spill_dir, exist_ok=True)
+        self._spill_file = tempfile.NamedTemporaryFile(
+            mode='wb',
+            dir=self._spill_dir,
+            prefix='pypyr-',
+            suffix=self._spill_suffix,
+            delete=False)
+        self.spill_path = self._spill_file.name
+        logger.debug(f"output bigger than {self.max_bytes} bytes. Writing "
+                     f"all output to {self.spill_path}")
+
+        for chunk in self._chunks:
+            self._spill_file.write(chunk)
+        self._spill_file.write(data)
+
+    def close(self):
+        """Close the spill file, if there is one. Memory stays readable."""
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def getvalue(self):
+        """Return buffer contents as bytes."""
+        return b''.join(self._chunks)
+
+    def get_all(self):
+        """Return all output ever written, from the spill file if need be.
+
+        Returns:
+            bytes.
+
+        Raises:
+            ContextError: output is truncated and there is no spill file.
+        """
+        if self.spill_path:
+            with open(self.spill_path, 'rb') as spill_file:
+                return spill_file.read()
+
+        if self.truncated:
+            raise ContextError(
+                f"output is {self.total_bytes} bytes, which is more than the "
+                f"max of {self.max_bytes} bytes to keep in memory. Increase "
+                "cmdCaptureMaxBytes, or set cmdCaptureSpillDir to write "
+                "output that doesn't fit in memory to a file.")
+
+        return self.getvalue()
+
+    def __len__(self):
+        """Return count of bytes currently in the buffer."""
+        return self._size
+
+
+class CommandResult(object):
+    """Outcome of a sub-process run.
+
+    Attributes:
+        cmd: (str or list) the command as passed to the sub-process.
+        returncode: (int) exit code. None if the command never ran.
+        stdout: (RingBuffer) captured stdout. None if not capturing.
+        stderr: (RingBuffer) captured stderr. None if not capturing.
+    """
+
+    def __init__(self, cmd, returncode=None, stdout=None, stderr=None):
+        """Initialize the class with the given attributes."""
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def to_dict(self, parse=None):
+        """Return result as a dict for pypyr context.
+
+        Output decodes to str, with undecodable bytes replaced.
+
+        Args:
+            parse: str. Parse stdout as one of PARSE_FORMATS into the
+                   parsed key. Only parses if the command succeeded. None
+                   means don't parse.
+
+        Returns:
+            dict with keys cmd, returncode, stdout, stderr, stdoutFile,
+            stderrFile & parsed.
+
+        Raises:
+            ContextError: stdout to parse got truncated.
+        """
+        parsed = None
+        if parse and self.returncode == 0 and self.stdout is not None:
+            parsed = parse_output(self.stdout.get_all(), parse)
+
+        return {
+            'cmd': self.cmd,
+            'returncode': self.returncode,
+            'stdout': (self.stdout.getvalue().decode(errors='replace')
+                       if self.stdout is not None else None),
+            'stderr': (self.stderr.getvalue().decode(errors='replace')
+                       if self.stderr is not None else None),
+            'stdoutFile': (self.stdout.spill_path
+                           if self.stdout is not None else None),
+            'stderrFile': (self.stderr.spill_path
+                           if self.stderr is not None else None),
+            'parsed': parsed
+        }
+
+
+def parse_output(output, parse):
+    """Parse command output.
+
+    Args:
+        output: bytes. Command output.
+        parse: str. One of PARSE_FORMATS:
+               json: parse as json.
+               yaml: parse as yaml.
+               lines: split into list of lines, without line endings.
+
+    Returns:
+        Parsed output.
+
+    Raises:
+        ContextError: parse is not a recognized format.
+    """
+    text = output.decode(errors='replace')
+
+    if parse == 'json':
+        return json.loads(text)
+
+    if parse == 'yaml':
+        return yaml.YAML(typ='safe', pure=True).load(text)
+
+    if parse == 'lines':
+        return text.splitlines()
+
+    raise ContextError(f"cmdParse must be one of {', '.join(PARSE_FORMATS)}. "
+                       f"{parse} is not a valid cmdParse.")
+
+
+def run_coroutine(coro):
+    """Run coro to completion on a new event loop & return its result.
+
+    Args:
+        coro: coroutine to run.
+
+    Returns:
+        Whatever coro returns.
+    """
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(coro)
+    # if this runs on a worker that cancels, like when a step times out,
+    # cancel the task so it kills its sub-processes.
+    unregister = pypyr.utils.worker.on_cancel(
+        functools.partial(loop.call_soon_threadsafe, task.cancel))
+    try:
+        return loop.run_until_complete(task)
+    except BaseException:
+        # like ctrl-c: let the coroutine clean up its sub-processes.
+        if not task.done():
+            task.cancel()
+            loop.run_until_complete(
+                asyncio.gather(task, return_exceptions=True))
+        raise
+    finally:
+        unregister()
+        loop.close()
+
+
+def kill_process(process):
+    """Kill process along with everything it started.
+
+    A shell command's own child processes hold on to its output pipes, so
+    killing only the shell leaves them running, and its output never ends.
+
+    Args:
+        process: asyncio.subprocess.Process or subprocess.Popen. Started
+                 with start_new_session on posix, so its pid is also its
+                 process group id.
+    """
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        # already finished.
+        pass
+
+
+async def stream_output(stream, log_method, prefix, buffer=None):
+    """Log each line of stream as it arrives, optionally also capturing it.
+
+    Reads in chunks rather than with readline, so a line longer than the
+    stream's limit doesn't break reading.
+
+    Args:
+        stream: asyncio.StreamReader. Read from this until EOF.
+        log_method: callable. Logs each line, e.g logger.info.
+        prefix: str. Prefix each logged line with this.
+        buffer: RingBuffer. Write raw output to this too. None means don't
+                capture.
+    """
+    pending = b''
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+
+        if buffer is not None:
+            buffer.write(chunk)
+
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            log_method(f"{prefix}{line.decode(errors='replace').rstrip()}")
+
+        if len(pending) > MAX_LINE_LENGTH:
+            log_method(f"{prefix}{pending.decode(errors='replace')}")
+            pending = b''
+
+    if pending:
+        log_method(f"{prefix}{pending.decode(errors='replace').rstrip()}")
+
+
+async def run_command_async(cmd,
+                            timeout=None,
+                            capture_max_bytes=None,
+                            spill_dir=None,
+                            log_prefix='',
+                            env=None):
+    """Run cmd as sub-process, streaming its output to the log line by line.
+
+    stdout lines log at INFO, stderr lines at ERROR.
+
+    Args:
+        cmd: str or list. A str runs via the shell. A list of args runs
+             directly, without a shell.
+        timeout: float. Kill the command if it runs longer than this many
+                 seconds. None means no timeout.
+        capture_max_bytes: int. Capture the last capture_max_bytes of stdout
+                           and stderr each. None means don't capture. 0 means
+                           capture all output, unbounded.
+        spill_dir: path. When capturing, also write output bigger than
+                   capture_max_bytes in full to files in this dir. None
+                   means don't spill.
+        log_prefix: str. Prefix each logged output line with this.
+        env: dict. Environment for the command. None inherits the current
+             environment.
+
+    Returns:
+        CommandResult.
+
+    Raises:
+        subprocess.TimeoutExpired: command ran longer than timeout.
+    """
+    if capture_max_bytes is None:
+        stdout_buffer = stderr_buffer = None
+    else:
+        max_bytes = capture_max_bytes if capture_max_bytes > 0 else None
+        stdout_buffer = RingBuffer(max_bytes, spill_dir, '.stdout')
+        stderr_buffer = RingBuffer(max_bytes, spill_dir, '.stderr')
+
+    try:
+        return await _run_process(cmd,
+                                  timeout=timeout,
+                                  stdout_buffer=stdout_buffer,
+                                  stderr_buffer=stderr_buffer,
+                                  log_prefix=log_prefix,
+                                  env=env)
+    finally:
+        if stdout_buffer is not None:
+            stdout_buffer.close()
+            stderr_buffer.close()
+
+
+async def _run_process(cmd,
+                       timeout,
+                       stdout_buffer,
+                       stderr_buffer,
+                       log_prefix,
+                       env=None):
+    """Run cmd as sub-process, writing output to log & buffers.
+
+    See run_command_async for args.
+    """
+
+    # own process group, so that kill_process gets everything cmd started.
+    if isinstance(cmd, str):
+        process = await asyncio.create_subprocess_shell(
+            cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=os.name == 'posix',
+            env=env)
+    else:
+        process = await asyncio.create_subprocess_exec(
+            *resolve_executable(cmd, env),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=os.name == 'posix',
+            env=env)
+
+    run_to_exit = asyncio.gather(
+        stream_output(process.stdout, logger.info, log_prefix, stdout_buffer),
+        stream_output(process.stderr, logger.error, log_prefix,
+                      stderr_buffer),
+        process.wait())
+
+    try:
+        await asyncio.wait_for(run_to_exit, timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"{log_prefix}killing command because it ran longer "
+                     f"than timeout of {timeout}s.")
+        kill_process(process)
+        await process.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout) from None
+    except asyncio.CancelledError:
+        kill_process(process)
+        raise
+
+    return CommandResult(cmd=cmd,
+                         returncode=process.returncode,
+                         stdout=stdout_buffer,
+                         stderr=stderr_buffer)
+
+
+async def run_commands_async(cmds,
+                             parallel=1,
+                             timeout=None,
+                             capture_max_bytes=None,
+                             spill_dir=None,
+                             env=None):
+    """Run cmds as sub-processes, with up to parallel running at once.
+
+    Once any command fails, commands that haven't started yet don't start.
+    Commands already running finish.
+
+    Args:
+        cmds: list of cmd. A str cmd runs via the shell. A list of args runs
+              directly, without a shell.
+        parallel: int. Max commands to run at the same time.
+        timeout: float. Timeout in seconds per command. None means no
+                 timeout.
+        capture_max_bytes: int. See run_command_async.
+        spill_dir: path. See run_command_async.
+        env: dict. Environment for all the commands. None inherits the
+             current environment.
+
+    Returns:
+        list of CommandResult or Exception, same order as cmds. A command
+        that didn't start because of an earlier failure has a CommandResult
+        with returncode None.
+    """
+    semaphore = asyncio.Semaphore(parallel)
+    failed = False
+
+    async def run_one(index, cmd):
+        nonlocal failed
+        async with semaphore:
+            if failed:
+                logger.debug(f"not starting cmd {index} because of earlier "
+                             "failure.")
+                return CommandResult(cmd=cmd)
+
+            try:
+                result = await run_command_async(
+                    cmd,
+                    timeout=timeout,
+                    capture_max_bytes=capture_max_bytes,
+                    spill_dir=spill_dir,
+                    log_prefix=f"cmd {index}: ",
+                    env=env)
+            except Exception:
+                failed = True
+                raise
+
+            if result.returncode:
+                failed = True
+
+            return result
+
+    return await asyncio.gather(
+        *(run_one(index, cmd) for index, cmd in enumerate(cmds)),
+        return_exceptions=True)
+
+
+def run_commands(cmds,
+                 parallel=1,
+                 timeout=None,
+                 capture_max_bytes=None,
+                 spill_dir=None,
+                 env=None):
+    """Run cmds as sub-processes, with up to parallel running at once.
+
+    Streams each command's stdout & stderr to the log line by line as it
+    runs, without buffering the whole output in memory.
+
+    Args:
+        cmds: list of cmd. A str cmd runs via the shell. A list of args runs
+              directly, without a shell.
+        parallel: int. Max commands to run at the same time.
+        timeout: float. Timeout in seconds per command. None means no
+                 timeout.
+        capture_max_bytes: int. Capture the last capture_max_bytes of stdout
+                           and stderr for each command. None means don't
+                           capture. 0 means capture everything.
+        spill_dir: path. When capturing, also write output bigger than
+                   capture_max_bytes in full to files in this dir.
+        env: dict. Environment for all the commands. None inherits the
+             current environment.
+
+    Returns:
+        list of CommandResult or Exception, same order as cmds.
+    """
+    return run_coroutine(run_commands_async(
+        cmds,
+        parallel=parallel,
+        timeout=timeout,
+        capture_max_bytes=capture_max_bytes,
+        spill_dir=spill_dir,
+        env=env))
+
+
+def check_results(results):
+    """Raise the 1st error in results, if any.
+
+    Args:
+        results: list of CommandResult or Exception, as from run_commands.
+
+    Raises:
+        subprocess.CalledProcessError: a command exited with non-zero code.
+        subprocess.TimeoutExpired: a command ran longer than its timeout.
+    """
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+
+        if result.returncode:
+            raise subprocess.CalledProcessError(
+                result.returncode,
+                result.cmd,
+                output=(result.stdout.getvalue()
+                        if result.stdout is not None else None),
+                stderr=(result.stderr.getvalue()
+                        if result.stderr is not None else None))
+
+
+def get_args(cmd):
+    """Get cmd as list of args to run directly, without a shell.
+
+    Args:
+        cmd: str or list. A str splits into args like a posix shell would,
+             respecting quotes & escapes. Each item in a list is an arg. An
+             item that is itself a list, like a foreach batch, expands into
+             one arg per item.
+
+    Returns:
+        list of str.
+    """
+    if isinstance(cmd, str):
+        return shlex.split(cmd)
+
+    args = []
+    for arg in cmd:
+        if isinstance(arg, (list, tuple)):
+            args.extend(str(item) for item in arg)
+        else:
+            args.append(str(arg))
+
+    return args
+
+
+def _which(executable, path):
+    """Cache shutil.which, since foreach loops run the same thing a lot.
+
+    Only caches if all the directories in path are absolute, since relative
+    ones like . depend on the working dir, which can change. A cached
+    executable that isn't there anymore looks up again.
+
+    Args:
+        executable: str. Name of executable, without a path.
+        path: str. $PATH to look in.
+
+    Returns:
+        str. Path to executable. None if not found.
+    """
+    if not all(os.path.isabs(directory)
+               for directory in path.split(os.pathsep)):
+        return shutil.which(executable, path=path)
+
+    key = (executable, path)
+    resolved = _which_cache.get(key, None)
+    if resolved is not None and os.path.isfile(resolved):
+        if os.access(resolved, os.X_OK):
+            return resolved
+
+    resolved = shutil.which(executable, path=path)
+    if resolved is not None:
+        if len(_which_cache) >= _WHICH_CACHE_SIZE:
+            _which_cache.clear()
+
+        _which_cache[key] = resolved
+
+    return resolved
+
+
+def resolve_executable(args, env=None):
+    """Get args with the executable as an absolute path looked up in $PATH.
+
+    Otherwise the child process searches $PATH itself, trying to exec each
+    candidate in turn, for every single command.
+
+    Args:
+        args: list of str. 1st item is the executable.
+        env: dict. Look up the executable in this environment's $PATH. None
+             uses the current environment.
+
+    Returns:
+        list of str. Unchanged if the executable already has a path or
+        isn't found, in which case subprocess raises its usual error.
+    """
+    executable = args[0]
+    if os.path.dirname(executable):
+        return args
+
+    environ = os.environ if env is None else env
+    resolved = _which(executable, environ.get('PATH', os.defpath))
+    if resolved is None:
+        return args
+
+    return [resolved, *args[1:]]
+
+
+def run_args(args, timeout=None, env=None):
+    """Run args directly as a sub-process, without a shell.
+
+    Args:
+        args: list of str. 1st item is the executable.
+        timeout: float. Kill the process if it runs longer than this many
+                 seconds. None means no timeout.
+        env: dict. Environment for the process. None inherits the current
+             environment.
+
+    Raises:
+        subprocess.CalledProcessError: exit code not 0.
+        subprocess.TimeoutExpired: ran longer than timeout.
+        FileNotFoundError: executable not found.
+    """
+    run_process(resolve_executable(args, env), timeout=timeout, env=env)
+
+
+def run_process(cmd, shell=False, timeout=None, env=None):
+    """Run cmd as a sub-process & wait for it, like subprocess.run.
+
+    If this runs on a pypyr.utils.worker.Worker that cancels, like when a
+    step times out, kills the process.
+
+    Args:
+        cmd: str or list of str. As for subprocess.run.
+        shell: bool. Run cmd via the shell.
+        timeout: float. Kill the process if it runs longer than this many
+                 seconds. None means no timeout.
+        env: dict. Environment for the process. None inherits the current
+             environment.
+
+    Raises:
+        subprocess.CalledProcessError: exit code not 0.
+        subprocess.TimeoutExpired: ran longer than timeout.
+    """
+    if pypyr.utils.worker.get_current_worker() is None:
+        subprocess.run(cmd, shell=shell, check=True, timeout=timeout,
+                       env=env)
+        return
+
+    # own process group, so that kill_process gets everything cmd started.
+    with subprocess.Popen(cmd,
+                          shell=shell,
+                          env=env,
+                          start_new_session=os.name == 'posix') as process:
+        unregister = pypyr.utils.worker.on_cancel(
+            functools.partial(kill_process, process))
+        try:
+            returncode = process.wait(timeout)
+        except BaseException:
+            kill_process(process)
+            raise
+        finally:
+            unregister()
+
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+
+def get_timeout(context):
+    """Get context['cmdTimeout'] as float seconds.
+
+    Args:
+        context: pypyr.context.Context.
+
+    Returns:
+        float. None if cmdTimeout not in context.
+    """
+    timeout = context.get('cmdTimeout', None)
+    if timeout is None:
+        return None
+
+    return context.get_formatted_as_type(timeout, out_type=float)
+
+
+def get_env(context):
+    """Get environment for sub-processes from context['cmdEnv'].
+
+    cmdEnv is a dict of $ENV name: value. A value of None removes that $ENV.
+    The values interpolate from context & merge over a single copy of the
+    current environment, so the global os.environ doesn't change. This is
+    also safe for steps that run in parallel, since each gets its own env.
+
+    Args:
+        context: pypyr.context.Context.
+
+    Returns:
+        dict. None if cmdEnv not in context, so sub-processes inherit the
+        current environment without copying it.
+
+    Raises:
+        ContextError: cmdEnv isn't a dict.
+    """
+    if context.get('cmdEnv', None) is None:
+        return None
+
+    cmd_env = context.get_formatted('cmdEnv')
+    if not isinstance(cmd_env, Mapping):
+        raise ContextError("cmdEnv must be a map of $ENV names to values, "
+                           f"not {type(cmd_env).__name__}.")
+
+    env = os.environ.copy()
+    for name, value in cmd_env.items():
+        if value is None:
+            env.pop(name, None)
+        else:
+            env[name] = str(value)
+
+    logger.debug(f"sub-processes get {len(cmd_env)} $ENVs from cmdEnv.")
+    return env
+
+
+def get_capture(context):
+    """Get context['cmdCapture'] as bool.
+
+    Args:
+        context: pypyr.context.Context.
+
+    Returns:
+        bool. False if cmdCapture not in context.
+    """
+    return context.get_formatted_as_type(context.get('cmdCapture', None),
+                                         default=False,
+                                         out_type=bool)
+
+
+def run_context_cmds(context, shell, caller):
+    """Run context['cmds'] or context['cmd'] with the cmd* context options.
+
+    This is the multi-command & capture mode of the shell & safeshell steps.
+
+    context['cmds'] is a list of commands. If cmds doesn't exist, runs the
+    single command in context['cmd'] instead. Each command is a str, or a
+    list of args to run without a shell. Each command interpolates from
+    context. Optional context keys:
+        cmdParallel: int. Run up to this many cmds at the same time.
+                     Default 1, i.e one after the other in list order.
+        cmdTimeout: float. Kill a command if it runs longer than this many
+                    seconds. Default None, no timeout.
+        cmdCapture: bool. Save output to context['cmdOut']. Default False.
+        cmdCaptureMaxBytes: int. Keep only the last cmdCaptureMaxBytes of
+                            stdout & stderr per command. 0 is unbounded.
+                            Default 1MiB.
+        cmdCaptureSpillDir: path. Write output bigger than
+                            cmdCaptureMaxBytes in full to a file in this
+                            dir. Default None, don't spill.
+        cmdParse: str. Parse stdout as json, yaml or lines. Default None.
+        cmdEnv: dict. $ENVs for the commands, without changing the global
+                environment. See get_env.
+
+    context['cmdOut'] is a dict with keys cmd, returncode, stdout, stderr,
+    stdoutFile, stderrFile & parsed. For cmds, cmdOut is a list of these
+    dicts, one per cmd in cmds order. returncode is None for a command that
+    didn't run because an earlier one failed, or that timed out.
+
+    Args:
+        context: pypyr.context.Context. Will mutate if cmdCapture.
+        shell: bool. Run str cmds via the shell. If False, str cmds split
+               into args like a posix shell would, but run without a shell.
+               list cmds always run without a shell.
+        caller: str. Name of calling step, for error messages.
+
+    Raises:
+        KeyNotInContextError: neither cmds nor cmd exist.
+        KeyInContextHasNoValueError: cmd exists but is None or empty.
+        ContextError: cmdParse invalid, or output to parse got truncated.
+        ValueError: cmdParallel is less than 1.
+        subprocess.CalledProcessError: a command exited with non-zero code.
+        subprocess.TimeoutExpired: a command ran longer than cmdTimeout.
+    """
+    logger.debug("started")
+    if context.get('cmds', None):
+        is_single = False
+        cmds = context.get_formatted('cmds')
+        if isinstance(cmds, str):
+            cmds = [cmds]
+    else:
+        context.assert_key_has_value(key='cmd', caller=caller)
+        is_single = True
+        cmds = [context.get_formatted('cmd')]
+
+    # a list cmd is always args. str cmd only runs via the shell for shell.
+    cmds = [cmd if shell and isinstance(cmd, str) else get_args(cmd)
+            for cmd in cmds]
+
+    parallel = context.get_formatted_as_type(context.get('cmdParallel', None),
+                                             default=1,
+                                             out_type=int)
+    if parallel < 1:
+        raise ValueError(f"cmdParallel must be 1 or more, not {parallel}.")
+
+    timeout = get_timeout(context)
+    capture = get_capture(context)
+    capture_max_bytes = spill_dir = parse = None
+    if capture:
+        capture_max_bytes = context.get_formatted_as_type(
+            context.get('cmdCaptureMaxBytes', None),
+            default=1024 * 1024,
+            out_type=int)
+
+        spill_dir = context.get('cmdCaptureSpillDir', None)
+        if spill_dir is not None:
+            spill_dir = context.get_formatted('cmdCaptureSpillDir')
+
+        parse = context.get('cmdParse', None)
+        if parse is not None:
+            parse = context.get_formatted('cmdParse')
+            # fail before running anything rather than after.
+            if parse not in PARSE_FORMATS:
+                raise ContextError(
+                    f"cmdParse must be one of {', '.join(PARSE_FORMATS)}. "
+                    f"{parse} is not a valid cmdParse.")
+
+    logger.debug(f"running {len(cmds)} commands, {parallel} at a time.")
+    results = run_commands(cmds,
+                           parallel=parallel,
+                           timeout=timeout,
+                           capture_max_bytes=capture_max_bytes,
+                           spill_dir=spill_dir,
+                           env=get_env(context))
+
+    if capture:
+        # a command that raised, like on timeout, has no output to save.
+        cmd_out = [
+            CommandResult(cmd=cmd).to_dict()
+            if isinstance(result, Exception) else result.to_dict(parse)
+            for cmd, result in zip(cmds, results)]
+        context['cmdOut'] = cmd_out[0] if is_single else cmd_out
+
+    check_results(results)
+    logger.debug("done")
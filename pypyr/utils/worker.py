@@ -0,0 +1,234 @@
+"""Run functions on supervised threads that the caller can stop waiting for.
+
+A python thread can't be killed. What the caller can do is stop waiting for
+it, & cancel it. Cancelling is cooperative: code running on the worker
+registers a callback with on_cancel that stops whatever it's busy with, like
+cancelling its asyncio task or killing its worker process. Worker threads are
+daemon threads, so a worker that never finishes doesn't stop pypyr from
+exiting either.
+"""
+import functools
+import logging
+import threading
+import time
+from pypyr.errors import StepTimeoutError
+import pypyr.log.logger
+import pypyr.resources
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# the Worker running on the current thread, if any.
+_current = threading.local()
+
+
+def get_current_worker():
+    """Get the Worker running on the current thread.
+
+    Returns:
+        Worker. None if the current thread isn't a worker.
+    """
+    return getattr(_current, 'worker', None)
+
+
+def on_cancel(callback):
+    """Call callback if the current thread's worker cancels.
+
+    Does nothing if the current thread isn't a worker. See Worker.on_cancel.
+
+    Args:
+        callback: callable with no args.
+
+    Returns:
+        callable. Call it to unregister callback once whatever it cancels
+        is done.
+    """
+    worker = get_current_worker()
+    if worker is None:
+        return _noop
+
+    return worker.on_cancel(callback)
+
+
+def check_cancelled():
+    """Raise StepTimeoutError if the current thread's worker cancelled.
+
+    Call this between units of work, like loop iterations, so that a
+    cancelled worker stops at the next chance it gets.
+
+    Raises:
+        StepTimeoutError: the worker cancelled.
+    """
+    worker = get_current_worker()
+    if worker is not None and worker.cancelled:
+        raise StepTimeoutError(f"{worker.name} cancelled, because it ran out "
+                               "of time.")
+
+
+def sleep(seconds):
+    """Sleep, waking early if the current thread's worker cancels.
+
+    Off worker threads this is just time.sleep.
+
+    Args:
+        seconds: float. Sleep for this long.
+
+    Raises:
+        StepTimeoutError: the worker cancelled.
+    """
+    worker = get_current_worker()
+    if worker is None:
+        time.sleep(seconds)
+        return
+
+    worker._cancelled.wait(seconds)
+    check_cancelled()
+
+
+def _noop():
+    """Do nothing."""
+
+
+class Worker(object):
+    """Run function on its own daemon thread.
+
+    The thread keeps the log scope of the thread that created the Worker, so
+    its log lines report the same pipeline & step. It can borrow the
+    resource slots that thread holds, 1 worker at a time, so a step can't
+    wait forever on a slot its own caller holds. See pypyr.resources. A
+    worker started on another worker's thread cancels when
+    its parent cancels.
+
+    Attributes:
+        name: (str) thread name, for logs.
+    """
+
+    def __init__(self, function, *args, name=None):
+        """Initialize the worker. Call start to run function(*args)."""
+        self.name = name
+        self._function = function
+        self._args = args
+        self._log_scope = pypyr.log.logger.get_log_scope()
+        self._lendable_resources = pypyr.resources.get_lendable()
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+        self._cancelled = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._unregister_from_parent = _noop
+        self._thread = threading.Thread(target=self._run,
+                                        name=name,
+                                        daemon=True)
+
+    def _run(self):
+        """Run function & save its result or error. Runs on the thread."""
+        _current.worker = self
+        pypyr.resources.set_lendable(self._lendable_resources)
+        try:
+            with pypyr.log.logger.log_scope(**self._log_scope):
+                self._result = self._function(*self._args)
+        except BaseException as err:
+            self._error = err
+        finally:
+            self._unregister_from_parent()
+            self._done.set()
+
+    def start(self):
+        """Start running function on the worker thread.
+
+        Returns:
+            self, so you can chain Worker(...).start().
+        """
+        parent = get_current_worker()
+        if parent is not None:
+            self._unregister_from_parent = parent.on_cancel(self.cancel)
+
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Ask function to stop, by calling its on_cancel callbacks.
+
+        Doesn't wait for function to stop. Safe to call more than once, and
+        from any thread.
+        """
+        with self._lock:
+            if self._cancelled.is_set() or self.done:
+                return
+
+            self._cancelled.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+
+        logger.debug(f"cancelling worker {self.name}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as err:
+                logger.error(f"cancelling worker {self.name} failed. "
+                             f"{type(err).__name__}: {err}")
+
+    @property
+    def cancelled(self):
+        """bool. True once cancel is called."""
+        return self._cancelled.is_set()
+
+    def on_cancel(self, callback):
+        """Call callback when the worker cancels.
+
+        Calls callback straight away if the worker already cancelled.
+
+        Args:
+            callback: callable with no args. It runs on whichever thread
+                      calls cancel, so it must be thread-safe.
+
+        Returns:
+            callable. Call it to unregister callback once whatever it cancels
+            is done.
+        """
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._callbacks.append(callback)
+                return functools.partial(self._remove_callback, callback)
+
+        callback()
+        return _noop
+
+    def _remove_callback(self, callback):
+        """Unregister on_cancel callback, if it's still registered."""
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    @property
+    def done(self):
+        """bool. True if function finished, whether or not it raised."""
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Wait for function to finish.
+
+        Args:
+            timeout: float. Wait up to this many seconds. None means wait
+                     for as long as it takes.
+
+        Returns:
+            bool. True if function finished, False if timeout ran out 1st.
+        """
+        return self._done.wait(timeout)
+
+    def result(self):
+        """Get what function returned, or raise what it raised.
+
+        Only call once done.
+
+        Returns:
+            What function returned.
+        """
+        if self._error is not None:
+            raise self._error
+
+        return self._result
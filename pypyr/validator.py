@@ -0,0 +1,419 @@
+"""pypyr pipeline validator.
+
+Check the whole pipeline definition when it loads, so mistakes like a
+complex step without a name, a while without max or stop, or a step module
+that doesn't exist show up before the 1st step runs, rather than whenever
+the pipeline gets to that step.
+
+Reports all the errors at once, with the line & column in the pipeline yaml.
+"""
+import importlib.util
+import logging
+import ruamel.yaml as yaml
+from pypyr.errors import PipelineDefinitionError
+import pypyr.moduleloader
+import pypyr.resources
+import pypyr.stepsrunner
+import pypyr.utils.foreach
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# step groups pypyr runs.
+STEP_GROUPS = ('steps', 'on_success', 'on_failure')
+
+# keys a complex step can have. Anything else is probably a typo.
+STEP_KEYS = frozenset(('batchSize',
+                       'cache',
+                       'description',
+                       'executor',
+                       'executorKeys',
+                       'foreach',
+                       'in',
+                       'name',
+                       'retry',
+                       'run',
+                       'skip',
+                       'swallow',
+                       'timeout',
+                       'uses',
+                       'while'))
+
+
+def validate_pipeline(pipeline_definition, pipeline_name, pipeline_path=None):
+    """Validate the pipeline definition, raising all errors at once.
+
+    Unknown keys on complex steps only log a warning, since pypyr ignores
+    them anyway.
+
+    Args:
+        pipeline_definition: dict. Parsed pipeline yaml.
+        pipeline_name: str. Name of pipeline, for the error message.
+        pipeline_path: path. The pipeline yaml. Error messages have line &
+                       column positions from this file if it's set.
+
+    Raises:
+        PipelineDefinitionError: pipeline definition has errors. The
+                                 message lists all of them.
+    """
+    logger.debug("starting")
+    errors, warnings = get_problems(pipeline_definition)
+
+    if errors or warnings:
+        positions = get_positions(pipeline_path,
+                                  [path for path, _ in errors + warnings])
+        messages = [format_problem(path, message, position, pipeline_path)
+                    for (path, message), position in zip(errors + warnings,
+                                                         positions)]
+
+        for message in messages[len(errors):]:
+            logger.warning(message)
+
+        if errors:
+            error_lines = '\n'.join(messages[:len(errors)])
+            raise PipelineDefinitionError(
+                f"pipeline {pipeline_name} has {len(errors)} error(s):\n"
+                f"{error_lines}")
+
+    logger.debug("done")
+
+
+def get_problems(pipeline_definition):
+    """Get all the problems with pipeline_definition.
+
+    Args:
+        pipeline_definition: dict. Parsed pipeline yaml.
+
+    Returns:
+        tuple (errors, warnings). Each is a list of (path, message), where
+        path is the tuple of keys & indexes to the offending yaml node.
+    """
+    errors = []
+    warnings = []
+    if not isinstance(pipeline_definition, dict):
+        errors.append(((), "pipeline must be a map with a steps sequence."))
+        return errors, warnings
+
+    for group in STEP_GROUPS:
+        steps = pipeline_definition.get(group, None)
+        if steps is None:
+            continue
+
+        if not isinstance(steps, list):
+            errors.append(((group,), f"{group} must be a sequence of steps."))
+            continue
+
+        for index, step in enumerate(steps):
+            get_step_problems(step, (group, index), errors, warnings)
+
+    get_handlers_problems(pipeline_definition, errors, warnings)
+
+    try:
+        pypyr.resources.get_limits(pipeline_definition.get('resources', None))
+    except PipelineDefinitionError as err:
+        errors.append((('resources',), str(err)))
+
+    return errors, warnings
+
+
+def get_handlers_problems(pipeline_definition, errors, warnings):
+    """Append the problems with the pipeline's handlers map.
+
+    Args:
+        pipeline_definition: dict. Parsed pipeline yaml.
+        errors: list. Append (path, message) errors here.
+        warnings: list. Append (path, message) warnings here.
+    """
+    handlers = pipeline_definition.get('handlers', None)
+    if not handlers:
+        return
+
+    if not isinstance(handlers, dict):
+        errors.append((('handlers',), "handlers must be a map of step group "
+                                      "name to options."))
+        return
+
+    for group, options in handlers.items():
+        path = ('handlers', group)
+        if group not in pypyr.stepsrunner.HANDLER_GROUPS:
+            errors.append((path, "handlers only has options for "
+                                 f"on_success & on_failure, not {group}."))
+            continue
+
+        try:
+            pypyr.stepsrunner.get_handler_options(pipeline_definition, group)
+        except PipelineDefinitionError as err:
+            errors.append((path, str(err)))
+            continue
+
+        for key in options or ():
+            if key not in pypyr.stepsrunner.HANDLER_OPTIONS:
+                warnings.append((path + (key,),
+                                 f"{key} isn't a handlers option, so pypyr "
+                                 "ignores it. Is it a typo?"))
+
+
+def get_step_problems(step, path, errors, warnings):
+    """Append the problems with a single step to errors & warnings.
+
+    Mirrors the checks pypyr.dsl.Step does when it initializes.
+
+    Args:
+        step: str or dict. The step as it is in the pipeline yaml.
+        path: tuple. Path to the step in the pipeline.
+        errors: list. Append (path, message) errors here.
+        warnings: list. Append (path, message) warnings here.
+    """
+    if isinstance(step, str):
+        check_module(step, path, errors)
+        return
+
+    if not isinstance(step, dict):
+        errors.append((path, "step must be a module name or a map with a "
+                             "name."))
+        return
+
+    name = step.get('name', None)
+    if not name or not isinstance(name, str):
+        errors.append((path, "complex step must have a name."))
+    else:
+        check_module(name, path + ('name',), errors)
+
+    for key in step:
+        if key not in STEP_KEYS:
+            warnings.append((path + (key,),
+                             f"{key} isn't a step decorator, so pypyr "
+                             "ignores it. Is it a typo?"))
+
+    in_parameters = step.get('in', None)
+    if in_parameters is not None and not isinstance(in_parameters, dict):
+        errors.append((path + ('in',), "in must be a map."))
+
+    foreach = step.get('foreach', None)
+    if foreach:
+        try:
+            source = pypyr.utils.foreach.get_source_name(foreach)
+            if source == 'range' and '{' not in str(foreach['range']):
+                pypyr.utils.foreach.get_range(foreach['range'])
+        except PipelineDefinitionError as err:
+            errors.append((path + ('foreach',), str(err)))
+
+    batch_size = step.get('batchSize', None)
+    if batch_size is not None:
+        if not foreach:
+            errors.append((path + ('batchSize',),
+                           "batchSize only works with foreach. Set foreach "
+                           "too, or remove batchSize."))
+        else:
+            check_int(batch_size, path + ('batchSize',), 1, errors)
+
+    while_definition = step.get('while', None)
+    if while_definition is not None:
+        if not isinstance(while_definition, dict):
+            errors.append((path + ('while',), "while must be a map."))
+        elif not any((while_definition.get('stop', None),
+                      while_definition.get('max', None))):
+            errors.append((path + ('while',),
+                           "while must have either max or stop, or both."))
+        elif while_definition.get('max', None) is not None:
+            # with stop, max 0 means no max: loop until stop.
+            minimum = 0 if while_definition.get('stop', None) else 1
+            check_int(while_definition['max'], path + ('while', 'max'),
+                      minimum, errors)
+
+    executor = step.get('executor', None)
+    if executor not in (None, 'process'):
+        errors.append((path + ('executor',),
+                       f"executor must be process, or not set at all. "
+                       f"{executor} is not a valid executor."))
+
+    executor_keys = step.get('executorKeys', None)
+    if executor_keys is not None and not isinstance(executor_keys, list):
+        errors.append((path + ('executorKeys',),
+                       "executorKeys must be a sequence of context keys."))
+
+    retry = step.get('retry', None)
+    if retry is not None:
+        if not isinstance(retry, dict):
+            errors.append((path + ('retry',), "retry must be a map."))
+        else:
+            if retry.get('max', None) is not None:
+                check_int(retry['max'], path + ('retry', 'max'), 1, errors)
+
+            for key in ('retryOn', 'stopOn'):
+                if not isinstance(retry.get(key, None) or [], (list, str)):
+                    errors.append((path + ('retry', key),
+                                   f"retry {key} must be a list of error "
+                                   "names."))
+
+    timeout = step.get('timeout', None)
+    if timeout is not None:
+        check_seconds(timeout, path + ('timeout',), errors)
+
+    uses = step.get('uses', None)
+    if uses is not None and not isinstance(uses, (list, str)):
+        errors.append((path + ('uses',),
+                       "uses must be a list of resource names."))
+
+    cache = step.get('cache', None)
+    if cache is not None:
+        if not isinstance(cache, dict):
+            errors.append((path + ('cache',), "cache must be a map."))
+        else:
+            if not isinstance(cache.get('inputs', None) or [], list):
+                errors.append((path + ('cache', 'inputs'),
+                               "cache inputs must be a sequence of context "
+                               "keys."))
+
+            outputs = cache.get('outputs', None)
+            if not outputs or not isinstance(outputs, list):
+                errors.append((path + ('cache',),
+                               "cache outputs must be a sequence of at least "
+                               "one context key."))
+
+
+def check_int(value, path, minimum, errors):
+    """Append error to errors if value isn't an int of at least minimum.
+
+    Formatting expressions only evaluate at runtime, so they always pass.
+
+    Args:
+        value: value as it is in the pipeline yaml.
+        path: tuple. Path to the value in the pipeline.
+        minimum: int. Smallest valid value.
+        errors: list. Append (path, message) error here.
+    """
+    if isinstance(value, str) and '{' in value:
+        return
+
+    try:
+        valid = int(value) >= minimum
+    except (TypeError, ValueError):
+        valid = False
+
+    if not valid:
+        errors.append((path, f"must be an integer of {minimum} or more, not "
+                             f"{value}."))
+
+
+def check_seconds(value, path, errors):
+    """Append error to errors if value isn't a number of seconds above 0.
+
+    Formatting expressions only evaluate at runtime, so they always pass.
+
+    Args:
+        value: value as it is in the pipeline yaml.
+        path: tuple. Path to the value in the pipeline.
+        errors: list. Append (path, message) error here.
+    """
+    if isinstance(value, str) and '{' in value:
+        return
+
+    try:
+        valid = not isinstance(value, bool) and float(value) > 0
+    except (TypeError, ValueError):
+        valid = False
+
+    if not valid:
+        errors.append((path, "must be a number of seconds more than 0, not "
+                             f"{value}."))
+
+
+def check_module(name, path, errors):
+    """Append error to errors if step module name doesn't exist.
+
+    Finds the module without importing it, so step modules only import when
+    the step runs.
+
+    Args:
+        name: str. Absolute module name.
+        path: tuple. Path to the name in the pipeline.
+        errors: list. Append (path, message) error here.
+    """
+    if name in pypyr.moduleloader._module_cache:
+        return
+
+    try:
+        spec = importlib.util.find_spec(name)
+    except Exception:
+        # a parent package that doesn't exist raises rather than None.
+        spec = None
+
+    if spec is None:
+        errors.append((path, f"step module {name} not found. It should be "
+                             "in your working dir or installed to the python "
+                             "path."))
+
+
+def get_positions(pipeline_path, paths):
+    """Get the line & column of each path in the pipeline yaml.
+
+    Only parses the yaml again when there are problems to report, since
+    keeping track of positions makes parsing a lot slower.
+
+    Args:
+        pipeline_path: path. The pipeline yaml. None means no positions.
+        paths: list of tuple. Paths to nodes in the pipeline.
+
+    Returns:
+        list of (line, column) tuples, 1 based. None for each path if the
+        yaml doesn't parse.
+    """
+    if not pipeline_path:
+        return [None] * len(paths)
+
+    try:
+        with open(pipeline_path) as yaml_file:
+            root = yaml.YAML(typ='rt', pure=True).load(yaml_file)
+    except Exception as err:
+        logger.debug(f"can't get positions from {pipeline_path}: {err}")
+        return [None] * len(paths)
+
+    return [get_position(root, path) for path in paths]
+
+
+def get_position(root, path):
+    """Get line & column of the deepest node in path that exists.
+
+    Args:
+        root: ruamel.yaml CommentedMap. Round-trip parsed pipeline.
+        path: tuple. Keys & indexes to node.
+
+    Returns:
+        tuple (line, column), 1 based.
+    """
+    line, column = 0, 0
+    node = root
+    for part in path:
+        try:
+            if isinstance(node, dict):
+                line, column = node.lc.key(part)
+            else:
+                line, column = node.lc.item(part)
+            node = node[part]
+        except Exception:
+            break
+
+    return line + 1, column + 1
+
+
+def format_problem(path, message, position, pipeline_path):
+    """Format problem as file:line:column: path: message.
+
+    Args:
+        path: tuple. Path to node in the pipeline.
+        message: str. What's wrong.
+        position: tuple (line, column). None if unknown.
+        pipeline_path: path. The pipeline yaml.
+
+    Returns:
+        str.
+    """
+    location = ''.join(f'[{part}]' if isinstance(part, int) else f'.{part}'
+                       for part in path).lstrip('.')
+
+    prefix = f"{pipeline_path}:{position[0]}:{position[1]}: " if (
+        position and pipeline_path) else ''
+
+    return f"{prefix}{location}: {message}" if location else (
+        f"{prefix}{message}")
@@ -0,0 +1,23 @@
+"""Step that records which process it ran in, for executor tests."""
+import os
+import time
+
+
+def run_step(context):
+    """Mutate context so the test can see what merged back."""
+    if context.get('raiseMe', False):
+        raise ValueError('arb error from worker')
+
+    if 'sleep' in context:
+        time.sleep(context['sleep'])
+
+    context['seenKeys'] = sorted(context.keys())
+    context['pid'] = os.getpid()
+    if 'changeMe' in context:
+        context['changeMe'].append('changed in worker')
+
+    if 'deleteMe' in context:
+        del context['deleteMe']
+
+    if 'returnUnpicklable' in context:
+        context['unpicklable'] = lambda: None
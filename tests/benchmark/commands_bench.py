@@ -0,0 +1,77 @@
+"""Benchmark running lots of short commands through the shell steps.
+
+Runs the same short command many times, one after the other, each way the
+shell & safeshell steps can run it, plus plain subprocess.run for
+reference. Prints the milliseconds each command takes.
+
+Run from the repo root, on a posix system:
+    python tests/benchmark/commands_bench.py
+    python tests/benchmark/commands_bench.py --runs 5000 --cmd true
+
+Not a test, so pytest doesn't collect it.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# run as a script, so the repo root isn't on the path unless installed.
+sys.path.insert(0, '.')
+
+from pypyr.context import Context  # noqa: E402
+import pypyr.steps.safeshell  # noqa: E402
+import pypyr.steps.shell  # noqa: E402
+
+
+def time_runs(function, runs):
+    """Get the average time for one call of function, in milliseconds.
+
+    The commands' stdout goes to /dev/null while they run, so printing the
+    output doesn't count.
+    """
+    sys.stdout.flush()
+    saved_stdout = os.dup(1)
+    with open(os.devnull, 'w') as devnull:
+        os.dup2(devnull.fileno(), 1)
+
+    try:
+        # warm up caches, like the resolved executable path.
+        function()
+        start = time.perf_counter()
+        for _ in range(runs):
+            function()
+
+        return (time.perf_counter() - start) / runs * 1000
+    finally:
+        os.dup2(saved_stdout, 1)
+        os.close(saved_stdout)
+
+
+def main(args=None):
+    """Print ms/cmd for each way of running cmd."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=2000,
+                        help='commands to run each way. Default 2000.')
+    parser.add_argument('--cmd', default='env',
+                        help='command without args to run. Default env.')
+    parsed = parser.parse_args(args)
+    cmd = parsed.cmd
+
+    ways = {
+        'shell str cmd, via /bin/sh -c': lambda: pypyr.steps.shell.run_step(
+            Context({'cmd': cmd})),
+        'shell list cmd, argv': lambda: pypyr.steps.shell.run_step(
+            Context({'cmd': [cmd]})),
+        'safeshell str cmd, shlex + argv': (
+            lambda: pypyr.steps.safeshell.run_step(Context({'cmd': cmd}))),
+        'plain subprocess.run': lambda: subprocess.run([cmd], check=True),
+    }
+
+    print(f"{parsed.runs} x {cmd}")
+    for name, function in ways.items():
+        print(f"{name:<35} {time_runs(function, parsed.runs):>6.2f} ms/cmd")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark step overhead with & without the static step fast path.
+
+Runs a step that does nothing, so the time is all pypyr's own overhead per
+step run. Each step shape runs twice: as is, and with the fast path switched
+off, which is the path every step took before Step.is_static.
+
+Run from the repo root:
+    python tests/benchmark/steps_bench.py
+    python tests/benchmark/steps_bench.py --runs 50000
+
+Not a test, so pytest doesn't collect it.
+"""
+import argparse
+import sys
+import timeit
+import types
+
+# run as a script, so the repo root isn't on the path unless installed.
+sys.path.insert(0, '.')
+
+from pypyr.context import Context  # noqa: E402
+from pypyr.dsl import Step  # noqa: E402
+
+# a step module that does nothing, without touching the file-system.
+sys.modules['bench_noop'] = types.SimpleNamespace(
+    run_step=lambda context: None)
+
+# step shape: step as it is in the pipeline yaml.
+STEPS = {
+    'simple step': 'bench_noop',
+    'complex step, literal bools': {'name': 'bench_noop',
+                                    'run': True,
+                                    'skip': False,
+                                    'swallow': False},
+    "complex step, '{expr}' run": {'name': 'bench_noop',
+                                   'run': '{doit}'},
+}
+
+
+def time_step(step, runs, repeat):
+    """Get the best time for one run of step, in microseconds."""
+    context = Context({'doit': True})
+    best = min(timeit.repeat(lambda: step.run_step(context),
+                             number=runs,
+                             repeat=repeat))
+    return best / runs * 1e6
+
+
+def main(args=None):
+    """Print us/step for each step shape, fast path on & off."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=200000,
+                        help='step runs per timing. Default 200000.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timings to take the best of. Default 5.')
+    parsed = parser.parse_args(args)
+
+    print(f"{'step':<30} {'slow path':>12} {'fast path':>12}")
+    for name, step_definition in STEPS.items():
+        step = Step(step_definition)
+        fast = time_step(step, parsed.runs, parsed.repeat)
+
+        step.is_static = False
+        step.static_conditionals = None
+        slow = time_step(step, parsed.runs, parsed.repeat)
+
+        print(f"{name:<30} {slow:>9.2f} us {fast:>9.2f} us")
+
+
+if __name__ == '__main__':
+    main()
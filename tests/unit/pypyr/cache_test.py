@@ -0,0 +1,174 @@
+"""cache.py unit tests."""
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+from unittest.mock import patch
+import pytest
+import pypyr.cache
+from pypyr.cache import DiskCache
+
+# ------------------------- keys ---------------------------------------------#
+
+
+def test_get_cache_dir():
+    """Cache dir is in working_dir/.pypyr/cache."""
+    assert pypyr.cache.get_cache_dir('dir') == os.path.join(
+        'dir', '.pypyr', 'cache')
+
+
+def test_get_cache_key_stable():
+    """Same inputs in any order get the same key."""
+    assert pypyr.cache.get_cache_key(
+        'step', 'hash', {'a': 1, 'b': [1, 2]}) == pypyr.cache.get_cache_key(
+        'step', 'hash', {'b': [1, 2], 'a': 1})
+
+
+def test_get_cache_key_changes():
+    """Different step, source or inputs get different keys."""
+    key = pypyr.cache.get_cache_key('step', 'hash', {'a': 1})
+    assert key != pypyr.cache.get_cache_key('other', 'hash', {'a': 1})
+    assert key != pypyr.cache.get_cache_key('step', 'changed', {'a': 1})
+    assert key != pypyr.cache.get_cache_key('step', 'hash', {'a': '1'})
+
+
+def test_get_cache_key_same_across_processes():
+    """Sets key the same whatever the process's str hash seed."""
+    code = ("import pypyr.cache; print(pypyr.cache.get_cache_key('step', "
+            "'hash', {'s': {'one', 'two', 'three', 'four', 'five'}, "
+            "'f': frozenset(['x', 'y', 'z'])}))")
+    keys = {subprocess.run([sys.executable, '-c', code],
+                           env=dict(os.environ, PYTHONHASHSEED=str(seed)),
+                           stdout=subprocess.PIPE,
+                           universal_newlines=True,
+                           check=True).stdout
+            for seed in range(1, 6)}
+
+    assert len(keys) == 1
+
+
+def test_get_key_value():
+    """Containers tag their types & sort where order doesn't matter."""
+    get_key_value = pypyr.cache.get_key_value
+    assert get_key_value({'b': {2, 1}, 'a': (1, 'x', None)}) == [
+        'dict', [['a', ['list', [1, 'x', None]]],
+                 ['b', ['set', [1, 2]]]]]
+    assert get_key_value(b'ab') == ['bytes', '6162']
+    assert get_key_value([1, 2]) == get_key_value((1, 2))
+    assert get_key_value({'a': 1}) != get_key_value([['a', 1]])
+    assert get_key_value({1: 'a'}) != get_key_value({'1': 'a'})
+
+
+def test_get_key_value_pickles_other_types():
+    """Values that aren't json types key as their pickle."""
+    key_value = pypyr.cache.get_key_value(types.SimpleNamespace(a=1))
+    assert key_value[0] == 'pickle'
+
+
+def test_get_cache_key_unpicklable_raises():
+    """Inputs that can't pickle raise."""
+    with pytest.raises(TypeError):
+        pypyr.cache.get_cache_key('step', 'hash', {'a': threading.Lock()})
+
+
+def test_get_module_hash_changes_with_source(tmp_path):
+    """Module hash changes when its source does."""
+    path = tmp_path / 'arbstep.py'
+    path.write_text('a = 1')
+
+    class Module:
+        __file__ = str(path)
+
+    before = pypyr.cache.get_module_hash(Module)
+    assert pypyr.cache.get_module_hash(Module) == before
+
+    path.write_text('a = 22')
+    assert pypyr.cache.get_module_hash(Module) != before
+
+
+def test_get_module_hash_no_file():
+    """Module without source file uses its name."""
+    assert pypyr.cache.get_module_hash(
+        types.ModuleType('arbmodule')) == 'arbmodule'
+# ------------------------- keys ---------------------------------------------#
+
+# ------------------------- DiskCache ----------------------------------------#
+
+
+def test_disk_cache_get_set(tmp_path):
+    """Set values get back, misses are None."""
+    cache = DiskCache(str(tmp_path / 'cache'))
+
+    assert cache.get('k1') is None
+    cache.set('k1', {'out': [1, 2]})
+    assert cache.get('k1') == {'out': [1, 2]}
+    assert DiskCache(str(tmp_path / 'cache')).get('k1') == {'out': [1, 2]}
+
+
+def test_disk_cache_ttl(tmp_path):
+    """Entries older than ttl are misses and deleted."""
+    cache = DiskCache(str(tmp_path))
+    cache.set('k1', 'v1')
+
+    assert cache.get('k1', ttl=60) == 'v1'
+
+    with patch('time.time', return_value=time.time() + 61):
+        assert cache.get('k1', ttl=60) is None
+
+    assert cache.get('k1') is None
+
+
+def test_disk_cache_corrupt_entry_is_miss(tmp_path):
+    """An unreadable entry is a miss."""
+    cache = DiskCache(str(tmp_path))
+    (tmp_path / 'k1.cache').write_bytes(b'arb')
+
+    assert cache.get('k1') is None
+    assert not (tmp_path / 'k1.cache').exists()
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    """Eviction deletes least recently used entries first."""
+    cache = DiskCache(str(tmp_path), max_bytes=0)
+    for key in ('k1', 'k2', 'k3'):
+        cache.set(key, 'x' * 1000)
+
+    # k1 oldest, then k2, k3
+    for age, key in enumerate(('k3', 'k2', 'k1')):
+        timestamp = time.time() - 100 * (age + 1)
+        os.utime(tmp_path / f'{key}.cache', (timestamp, timestamp))
+
+    # using k1 makes k2 least recently used
+    assert cache.get('k1')
+
+    size = os.path.getsize(tmp_path / 'k1.cache')
+    cache.max_bytes = size * 2
+    assert cache.evict() == 1
+
+    assert cache.get('k2') is None
+    assert cache.get('k1')
+    assert cache.get('k3')
+
+
+def test_disk_cache_set_evicts(tmp_path):
+    """Set keeps cache under max_bytes."""
+    cache = DiskCache(str(tmp_path), max_bytes=5000)
+    for i in range(20):
+        cache.set(f'k{i}', 'x' * 1000)
+
+    total = sum(os.path.getsize(tmp_path / name)
+                for name in os.listdir(tmp_path))
+    assert total <= 5000
+    assert cache.get('k19')
+
+
+def test_disk_cache_set_unpicklable_raises(tmp_path):
+    """Set raises on value that can't pickle & leaves no temp file."""
+    cache = DiskCache(str(tmp_path))
+    with pytest.raises(TypeError):
+        cache.set('k1', threading.Lock())
+
+    assert os.listdir(tmp_path) == []
+# ------------------------- DiskCache ----------------------------------------#
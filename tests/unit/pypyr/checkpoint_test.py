@@ -0,0 +1,171 @@
+"""checkpoint.py unit tests."""
+import logging
+import os
+import threading
+from unittest.mock import patch
+import pytest
+from pypyr.errors import CheckpointError
+import pypyr.checkpoint
+from pypyr.checkpoint import Checkpoint
+
+
+def get_checkpoint(tmp_path, pipeline_name='arb', pipeline_hash='hash'):
+    """Get a Checkpoint in tmp_path."""
+    return Checkpoint(path=str(tmp_path / 'ckpt' / f'{pipeline_name}.ckpt'),
+                      pipeline_name=pipeline_name,
+                      pipeline_hash=pipeline_hash)
+
+
+# ------------------------- get_checkpoint_path ------------------------------#
+
+
+def test_get_checkpoint_path():
+    """Path is in working_dir/.pypyr/checkpoints."""
+    assert pypyr.checkpoint.get_checkpoint_path('dir', 'pipe') == os.path.join(
+        'dir', '.pypyr', 'checkpoints', 'pipe.ckpt')
+
+
+def test_get_checkpoint_path_namespaced():
+    """Pipeline name with / goes in sub-dir."""
+    assert pypyr.checkpoint.get_checkpoint_path(
+        'dir', 'ns/pipe') == os.path.join('dir', '.pypyr', 'checkpoints',
+                                          'ns', 'pipe.ckpt')
+
+
+def test_get_pipeline_hash():
+    """Hash is stable over key order & changes with content."""
+    assert pypyr.checkpoint.get_pipeline_hash(
+        {'a': 1, 'b': [1, 2]}) == pypyr.checkpoint.get_pipeline_hash(
+        {'b': [1, 2], 'a': 1})
+    assert pypyr.checkpoint.get_pipeline_hash(
+        {'a': 1}) != pypyr.checkpoint.get_pipeline_hash({'a': 2})
+# ------------------------- get_checkpoint_path ------------------------------#
+
+# ------------------------- Checkpoint ---------------------------------------#
+
+
+def test_checkpoint_load_no_file(tmp_path):
+    """Load without a checkpoint file is None."""
+    assert get_checkpoint(tmp_path).load() is None
+
+
+def test_checkpoint_start_load(tmp_path):
+    """Start writes full snapshot that loads back."""
+    checkpoint = get_checkpoint(tmp_path)
+    checkpoint.start({'a': 1, 'b': {'c': [1, 2]}})
+    checkpoint.close()
+
+    assert get_checkpoint(tmp_path).load() == (-1, {'a': 1,
+                                                    'b': {'c': [1, 2]}})
+
+
+def test_checkpoint_save_diffs(tmp_path):
+    """Save only appends changed & removed keys, and loads replay them."""
+    big = 'x' * 10000
+    checkpoint = get_checkpoint(tmp_path)
+    checkpoint.start({'big': big, 'a': 1})
+    size = os.path.getsize(checkpoint.path)
+
+    checkpoint.save(0, {'big': big, 'a': 2, 'b': 3})
+    checkpoint.save(1, {'big': big, 'b': 3})
+    checkpoint.close()
+
+    # big didn't write again.
+    assert os.path.getsize(checkpoint.path) - size < 500
+    assert get_checkpoint(tmp_path).load() == (1, {'big': big, 'b': 3})
+
+
+def test_checkpoint_save_compacts(tmp_path):
+    """Save writes new snapshot once diffs outgrow the last one."""
+    checkpoint = get_checkpoint(tmp_path)
+    checkpoint.start({'a': 0})
+
+    for i in range(100):
+        checkpoint.save(i, {'a': i, 'big': 'x' * i})
+
+    checkpoint.close()
+
+    assert os.path.getsize(checkpoint.path) < 1000
+    assert get_checkpoint(tmp_path).load() == (99, {'a': 99, 'big': 'x' * 99})
+
+
+def test_checkpoint_unpicklable_skipped(tmp_path):
+    """Values that can't pickle are skipped with a single warning."""
+    checkpoint = get_checkpoint(tmp_path)
+    logger = logging.getLogger('pypyr.checkpoint')
+    with patch.object(logger, 'warning') as mock_logger_warning:
+        checkpoint.start({'a': 1, 'lock': threading.Lock()})
+        checkpoint.save(0, {'a': 2, 'lock': threading.Lock()})
+        checkpoint.close()
+
+    assert mock_logger_warning.call_count == 1
+    assert mock_logger_warning.call_args[0][0].startswith(
+        "context['lock'] can't serialize")
+    assert get_checkpoint(tmp_path).load() == (0, {'a': 2})
+
+
+def test_checkpoint_load_ignores_incomplete_record(tmp_path):
+    """A record cut off mid-write is ignored."""
+    checkpoint = get_checkpoint(tmp_path)
+    checkpoint.start({'a': 1})
+    checkpoint.save(0, {'a': 2})
+    checkpoint.close()
+
+    with open(checkpoint.path, 'ab') as file:
+        file.write(b'\x00\x00\x01\x00abc')
+
+    assert get_checkpoint(tmp_path).load() == (0, {'a': 2})
+
+
+def test_checkpoint_load_not_checkpoint_raises(tmp_path):
+    """Load raises on a file that isn't a checkpoint."""
+    checkpoint = get_checkpoint(tmp_path)
+    os.makedirs(os.path.dirname(checkpoint.path))
+    with open(checkpoint.path, 'wb') as file:
+        file.write(b'arb')
+
+    with pytest.raises(CheckpointError) as err_info:
+        checkpoint.load()
+
+    assert str(err_info.value) == (f"{checkpoint.path} is not a pypyr "
+                                   "checkpoint file.")
+
+
+def test_checkpoint_load_other_pipeline_raises(tmp_path):
+    """Load raises if checkpoint is for a different pipeline."""
+    checkpoint = get_checkpoint(tmp_path)
+    checkpoint.start({'a': 1})
+    checkpoint.close()
+
+    other = Checkpoint(checkpoint.path, 'other', 'hash')
+    with pytest.raises(CheckpointError) as err_info:
+        other.load()
+
+    assert str(err_info.value) == (f"{checkpoint.path} is a checkpoint for "
+                                   "pipeline arb, not other.")
+
+
+def test_checkpoint_load_changed_pipeline_raises(tmp_path):
+    """Load raises if pipeline changed since the checkpoint."""
+    checkpoint = get_checkpoint(tmp_path)
+    checkpoint.start({'a': 1})
+    checkpoint.close()
+
+    with pytest.raises(CheckpointError) as err_info:
+        get_checkpoint(tmp_path, pipeline_hash='changed').load()
+
+    assert str(err_info.value) == (
+        f"pipeline arb changed since the checkpoint at {checkpoint.path}, "
+        "so the steps might not line up any more. Run without --resume to "
+        "start over.")
+
+
+def test_checkpoint_delete(tmp_path):
+    """Delete removes the file & doesn't mind if it's not there."""
+    checkpoint = get_checkpoint(tmp_path)
+    checkpoint.start({'a': 1})
+    checkpoint.delete()
+
+    assert not os.path.exists(checkpoint.path)
+    checkpoint.delete()
+# ------------------------- Checkpoint ---------------------------------------#
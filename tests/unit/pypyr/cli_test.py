@@ -23,7 +23,12 @@ def test_main_pass_with_sysargv_context_positional():
             pipeline_name='blah',
             pipeline_context_input='ctx string',
             working_dir='dir here',
-            log_level=50
+            log_level=50,
+            log_json=False,
+            preload=False,
+            checkpoint=False,
+            resume=False,
+            memstats=False
         )
 
 
@@ -45,7 +50,12 @@ def test_main_pass_with_sysargv_context_positional_flags_last():
             pipeline_name='blah',
             pipeline_context_input='ctx string',
             working_dir='dir here',
-            log_level=50
+            log_level=50,
+            log_json=False,
+            preload=False,
+            checkpoint=False,
+            resume=False,
+            memstats=False
         )
 
 
@@ -61,7 +71,12 @@ def test_main_pass_with_defaults_context_positional():
         pipeline_name='blah',
         pipeline_context_input='ctx string',
         working_dir=os.getcwd(),
-        log_level=20
+        log_level=20,
+        log_json=False,
+        preload=False,
+        checkpoint=False,
+        resume=False,
+        memstats=False
     )
 
 
@@ -76,7 +91,12 @@ def test_main_pass_with_no_context():
         pipeline_name='blah',
         pipeline_context_input=None,
         working_dir=os.getcwd(),
-        log_level=20
+        log_level=20,
+        log_json=False,
+        preload=False,
+        checkpoint=False,
+        resume=False,
+        memstats=False
     )
 
 
@@ -93,7 +113,57 @@ def test_main_pass_with_no_context_other_flags_set():
         pipeline_name='blah',
         pipeline_context_input=None,
         working_dir=os.getcwd(),
-        log_level=11
+        log_level=11,
+        log_json=False,
+        preload=False,
+        checkpoint=False,
+        resume=False,
+        memstats=False
+    )
+
+
+def test_main_pass_with_json_log():
+    """--jsonlog switches on json logging."""
+    arg_list = ['blah',
+                '--jsonlog',
+                '--log',
+                '10']
+
+    with patch('pypyr.pipelinerunner.main') as mock_pipeline_main:
+        pypyr.cli.main(arg_list)
+
+    mock_pipeline_main.assert_called_once_with(
+        pipeline_name='blah',
+        pipeline_context_input=None,
+        working_dir=os.getcwd(),
+        log_level=10,
+        log_json=True,
+        preload=False,
+        checkpoint=False,
+        resume=False,
+        memstats=False
+    )
+
+
+def test_main_pass_with_preload():
+    """--preload switches on step module preloading."""
+    arg_list = ['blah',
+                'ctx string',
+                '--preload']
+
+    with patch('pypyr.pipelinerunner.main') as mock_pipeline_main:
+        pypyr.cli.main(arg_list)
+
+    mock_pipeline_main.assert_called_once_with(
+        pipeline_name='blah',
+        pipeline_context_input='ctx string',
+        working_dir=os.getcwd(),
+        log_level=20,
+        log_json=False,
+        preload=True,
+        checkpoint=False,
+        resume=False,
+        memstats=False
     )
 
 
@@ -145,3 +215,61 @@ def test_trace_log_level():
             assert val == 255
 
     mock_traceback.assert_called_once()
+
+
+def test_main_pass_with_checkpoint_resume():
+    """--checkpoint & --resume pass through to pipeline runner."""
+    arg_list = ['blah',
+                '--checkpoint',
+                '--resume']
+
+    with patch('pypyr.pipelinerunner.main') as mock_pipeline_main:
+        pypyr.cli.main(arg_list)
+
+    mock_pipeline_main.assert_called_once_with(
+        pipeline_name='blah',
+        pipeline_context_input=None,
+        working_dir=os.getcwd(),
+        log_level=20,
+        log_json=False,
+        preload=False,
+        checkpoint=True,
+        resume=True,
+        memstats=False
+    )
+
+
+def test_main_pass_with_memstats():
+    """--memstats passes memstats to pipelinerunner."""
+    arg_list = ['blah', '--memstats']
+
+    with patch('pypyr.pipelinerunner.main') as mock_pipeline_main:
+        pypyr.cli.main(arg_list)
+
+    mock_pipeline_main.assert_called_once_with(
+        pipeline_name='blah',
+        pipeline_context_input=None,
+        working_dir=os.getcwd(),
+        log_level=20,
+        log_json=False,
+        preload=False,
+        checkpoint=False,
+        resume=False,
+        memstats=True
+    )
+
+
+def test_main_plan():
+    """--plan prints plan rather than running the pipeline."""
+    arg_list = ['blah', '--plan']
+
+    with patch('pypyr.plan.main') as mock_plan_main:
+        with patch('pypyr.pipelinerunner.main') as mock_pipeline_main:
+            pypyr.cli.main(arg_list)
+
+    mock_pipeline_main.assert_not_called()
+    mock_plan_main.assert_called_once_with(
+        pipeline_name='blah',
+        working_dir=os.getcwd(),
+        log_level=20,
+        log_json=False)
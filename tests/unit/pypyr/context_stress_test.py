@@ -0,0 +1,100 @@
+"""Stress tests for context shared between concurrent tasks."""
+from concurrent.futures import ThreadPoolExecutor
+import sys
+from pypyr.context import Context
+from pypyr.dsl import Step
+import pytest
+
+# enough tasks & threads that races show up if there are any.
+TASKS = 2000
+WORKERS = 16
+
+
+@pytest.fixture
+def switch_often():
+    """Switch threads as often as possible, so races are more likely."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def run_tasks(task, count=TASKS):
+    """Run task(n) for n in range(count) on a thread pool & get results."""
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        return list(executor.map(task, range(count)))
+
+
+def test_concurrent_steps_in_forks(switch_often):
+    """Steps with in, foreach & while run concurrently each in own fork."""
+    context = Context({'shared': 'value'})
+    step = Step({'name': 'pypyr.steps.contextmerge',
+                 'foreach': ['a', 'b', 'c'],
+                 'while': {'max': 2},
+                 'in': {'contextMerge': {
+                     'result{n}': '{shared}-{n}-{i}-{whileCounter}'}}})
+
+    def task(n):
+        forked = context.fork()
+        forked['n'] = n
+        step.run_step(forked)
+        assert forked['i'] == 'c'
+        assert forked['whileCounter'] == 2
+        assert forked[f'result{n}'] == f'value-{n}-c-2'
+        context.join(forked)
+
+    run_tasks(task)
+
+    for n in range(TASKS):
+        assert context[f'result{n}'] == f'value-{n}-c-2'
+
+    assert context['shared'] == 'value'
+
+
+def test_concurrent_joins_dont_lose_changes(switch_often):
+    """Tasks that add & delete different keys all merge back."""
+    context = Context({f'delete{n}': n for n in range(TASKS)})
+
+    def task(n):
+        forked = context.fork()
+        del forked[f'delete{n}']
+        forked[f'add{n}'] = n
+        context.join(forked)
+
+    run_tasks(task)
+
+    assert context == {f'add{n}': n for n in range(TASKS)}
+
+
+def test_concurrent_read_modify_write_with_lock(switch_often):
+    """Counter & list merge in shared context under lock don't race."""
+    context = Context({'count': 0, 'items': []})
+
+    def task(n):
+        with context.lock:
+            context['count'] += 1
+            context.merge({'items': [n]})
+
+    run_tasks(task)
+
+    assert context['count'] == TASKS
+    assert sorted(context['items']) == list(range(TASKS))
+
+
+def test_concurrent_fork_is_consistent_snapshot(switch_often):
+    """Fork while other tasks change context under lock gets a snapshot."""
+    context = Context({'total': 0})
+
+    def task(n):
+        forked = context.fork()
+        # each task adds a key & total together, so total is always the
+        # count of the other keys in any consistent snapshot.
+        assert forked['total'] == len(forked) - 1
+        with context.lock:
+            context[f'k{n}'] = n
+            context['total'] += 1
+
+    run_tasks(task)
+
+    assert context['total'] == TASKS
+    assert len(context) == TASKS + 1
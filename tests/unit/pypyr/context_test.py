@@ -1,7 +1,12 @@
 """context.py unit tests."""
 from collections.abc import MutableMapping
+import copy
+import pickle
 from pypyr.context import Context, ContextItemInfo
-from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
+from pypyr.errors import (ContextError,
+                          KeyInContextHasNoValueError,
+                          KeyNotInContextError)
+from pypyr.utils.compact import CompactDict
 import pytest
 
 # ------------------- behaves like a dictionary-------------------------------#
@@ -1117,6 +1122,54 @@ def test_get_processed_string_following_literal():
     output = context.get_processed_string(input_string)
     assert output == 'downfollowing literal', (
         "string interpolation incorrect")
+
+
+def test_get_formatted_string_nothing_to_format_is_same():
+    """String without formatting expressions is the same instance."""
+    context = Context({'k1': 'v1'})
+    input_string = ''.join(['arb ', 'string'])
+    assert context.get_formatted_string(input_string) is input_string
+    assert context.get_formatted_string('[sic]"{k1}"') == '{k1}'
+    assert context.get_formatted_string('a {{b}}') == 'a {b}'
+
+
+def test_get_formatted_iterable_immutable_unchanged_is_same():
+    """Tuple, frozenset & CompactDict with nothing to format aren't copied."""
+    context = Context({'k1': 'v1'})
+    compact_dict = CompactDict({'a': ('b', 'c'), 'd': frozenset(('e',))})
+    tuple_in = ('a', 1, compact_dict)
+
+    assert context.get_formatted_iterable(compact_dict) is compact_dict
+    assert context.get_formatted_iterable(tuple_in) is tuple_in
+    assert context.get_formatted_iterable(
+        compact_dict['d']) is compact_dict['d']
+
+
+def test_get_formatted_iterable_immutable_changed_is_copy():
+    """Tuple, frozenset & CompactDict with formatting expressions format."""
+    context = Context({'k1': 'v1', 'k2': 'v2'})
+    compact_dict = CompactDict({'a': ('b', '{k1}'),
+                                '{k2}': 'x',
+                                'f': frozenset(('{k1}',))})
+
+    out = context.get_formatted_iterable(compact_dict)
+
+    assert isinstance(out, CompactDict)
+    assert out == {'a': ('b', 'v1'), 'v2': 'x', 'f': frozenset(('v1',))}
+    assert compact_dict['a'] == ('b', '{k1}')
+
+
+def test_get_formatted_iterable_tuple_with_list_is_copy():
+    """Tuple with a mutable list is a copy, so the list is a copy too."""
+    context = Context()
+    tuple_in = ('a', ['b'])
+
+    out = context.get_formatted_iterable(tuple_in)
+
+    assert out == tuple_in
+    assert out is not tuple_in
+    assert out[1] is not tuple_in[1]
+
 # ------------------- formats ------------------------------------------------#
 
 # ------------------- key info -----------------------------------------------#
@@ -1626,3 +1679,118 @@ def test_set_defaults_pass_nested_with_types():
     }
 
 # ------------------- set_defaults -------------------------------------------#
+
+# ------------------- fork & join --------------------------------------------#
+
+
+def test_context_lock_same_per_context():
+    """Lock is the same for the same context, different for others."""
+    context = Context()
+    assert context.lock is context.lock
+    assert context.lock is not Context().lock
+
+    # re-entrant
+    with context.lock:
+        with context.lock:
+            context['k1'] = 'v1'
+
+
+def test_context_pickles_and_copies_without_lock():
+    """Context with a lock pickles & copies, and the copy gets a new lock."""
+    context = Context({'k1': 'v1'})
+    context.working_dir = 'arb/dir'
+    lock = context.lock
+
+    for out in (pickle.loads(pickle.dumps(context)),
+                copy.deepcopy(context),
+                copy.copy(context)):
+        assert out == {'k1': 'v1'}
+        assert out.working_dir == 'arb/dir'
+        assert out.lock is not lock
+
+
+def test_context_fork_is_shallow_copy():
+    """Fork has same keys & attributes, and changes don't touch parent."""
+    nested = {'a': 'b'}
+    context = Context({'k1': 'v1', 'k2': nested})
+    context.working_dir = 'arb/dir'
+
+    forked = context.fork()
+    assert isinstance(forked, Context)
+    assert forked == context
+    assert forked.working_dir == 'arb/dir'
+    assert forked['k2'] is nested
+
+    forked['k1'] = 'changed'
+    forked['k3'] = 'new'
+    del forked['k2']
+
+    assert context == {'k1': 'v1', 'k2': {'a': 'b'}}
+
+
+def test_context_fork_deep():
+    """Deep fork changes nested values without touching parent."""
+    nested = {'a': 'b'}
+    context = Context({'k1': 'v1', 'k2': nested, 'k3': [1]})
+    context.working_dir = 'arb/dir'
+
+    forked = context.fork(deep=True)
+    assert forked == context
+    assert forked.working_dir == 'arb/dir'
+    assert forked['k2'] is not nested
+
+    forked['k2']['c'] = 'd'
+    forked['k4'] = 'new'
+
+    assert nested == {'a': 'b'}
+    assert context.join(forked) == ({'k2': {'a': 'b', 'c': 'd'},
+                                     'k4': 'new'}, [])
+    assert context == {'k1': 'v1', 'k2': {'a': 'b', 'c': 'd'}, 'k3': [1],
+                       'k4': 'new'}
+
+    # join again only merges nested changes since the last join.
+    forked['k3'].append(2)
+    assert context.join(forked) == ({'k3': [1, 2]}, [])
+
+
+def test_context_join_merges_only_changes():
+    """Join merges keys the fork changed, not stale values from fork time."""
+    context = Context({'k1': 'v1', 'k2': 'v2', 'k3': 'v3'})
+    forked = context.fork()
+
+    # someone else changes k1 & k2 meanwhile
+    context['k1'] = 'parent'
+    context['k2'] = 'parent'
+
+    forked['k2'] = 'fork'
+    forked['k4'] = 'fork'
+    del forked['k3']
+
+    updated, removed = context.join(forked)
+
+    assert updated == {'k2': 'fork', 'k4': 'fork'}
+    assert removed == ['k3']
+    assert context == {'k1': 'parent', 'k2': 'fork', 'k4': 'fork'}
+
+
+def test_context_join_twice_merges_only_new_changes():
+    """Join again only merges what changed since the last join."""
+    context = Context({'k1': 'v1'})
+    forked = context.fork()
+    forked['k1'] = 'fork'
+    context.join(forked)
+
+    context['k1'] = 'parent'
+    forked['k2'] = 'v2'
+    assert context.join(forked) == ({'k2': 'v2'}, [])
+    assert context == {'k1': 'parent', 'k2': 'v2'}
+
+
+def test_context_join_not_a_fork_raises():
+    """Join raises if the context isn't from fork."""
+    with pytest.raises(ContextError) as err:
+        Context().join(Context())
+
+    assert str(err.value) == "can only join a context from fork."
+
+# ------------------- fork & join --------------------------------------------#
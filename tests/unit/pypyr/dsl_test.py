@@ -1,11 +1,19 @@
 """dsl.py unit tests."""
 from copy import deepcopy
 import logging
+import os
+import threading
+import time
+import types
 import pytest
 from unittest.mock import call, patch, MagicMock
 from pypyr.context import Context
-from pypyr.dsl import Step, WhileDecorator
-from pypyr.errors import PipelineDefinitionError, LoopMaxExhaustedError
+from pypyr.dsl import CacheDecorator, RetryDecorator, Step, WhileDecorator
+from pypyr.errors import (KeyNotInContextError,
+                          LoopMaxExhaustedError,
+                          PipelineDefinitionError,
+                          StepTimeoutError)
+import pypyr.resources
 
 
 class DeepCopyMagicMock(MagicMock):
@@ -89,6 +97,8 @@ def test_simple_step_init_defaults(mocked_moduleloader):
     assert not step.skip_me
     assert not step.swallow_me
     assert not step.while_decorator
+    assert step.static_conditionals == (True, False, False)
+    assert step.is_static
 
     mocked_moduleloader.assert_called_once_with('blah')
 
@@ -139,10 +149,93 @@ def test_complex_step_init_with_decorators(mocked_moduleloader):
     assert step.while_decorator.error_on_max
     assert step.while_decorator.sleep == 3
     assert step.while_decorator.max == 4
+    assert step.static_conditionals == (False, True, True)
+    assert not step.is_static
 
     mocked_moduleloader.assert_called_once_with('blah')
 
 
+@patch('pypyr.moduleloader.get_module', return_value='iamamodule')
+def test_complex_step_init_executor(mocked_moduleloader):
+    """Complex step initializes executor decorators."""
+    step = Step({'name': 'blah'})
+    assert step.executor is None
+    assert step.executor_keys is None
+
+    step = Step({'name': 'blah',
+                 'executor': 'process',
+                 'executorKeys': ['k1']})
+    assert step.executor == 'process'
+    assert step.executor_keys == ['k1']
+
+
+@patch('pypyr.moduleloader.get_module', return_value='iamamodule')
+def test_complex_step_init_executor_unknown(mocked_moduleloader):
+    """Complex step with unknown executor raises."""
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        Step({'name': 'blah',
+              'executor': 'arb'})
+
+    assert str(err_info.value) == ("blah executor must be process, or not set "
+                                   "at all. arb is not a valid executor.")
+
+
+@patch('pypyr.moduleloader.get_module', return_value='iamamodule')
+def test_complex_step_init_static_literals(mocked_moduleloader):
+    """Complex step with literal conditionals evaluates these once."""
+    step = Step({'name': 'blah',
+                 'run': 1,
+                 'skip': 0,
+                 'swallow': None,
+                 'in': {}})
+
+    assert step.static_conditionals == (True, False, False)
+    assert step.is_static
+
+
+@patch('pypyr.moduleloader.get_module', return_value='iamamodule')
+def test_complex_step_init_dynamic_conditional(mocked_moduleloader):
+    """Complex step with a formatting expression is not static."""
+    step = Step({'name': 'blah',
+                 'run': True,
+                 'skip': '{key5}'})
+
+    assert step.static_conditionals is None
+    assert not step.is_static
+
+
+@patch('pypyr.moduleloader.get_module', return_value='iamamodule')
+def test_complex_step_init_in_not_static(mocked_moduleloader):
+    """Complex step with in parameters is not static."""
+    step = Step({'name': 'blah',
+                 'in': {'k1': 'v1'}})
+
+    assert step.static_conditionals == (True, False, False)
+    assert not step.is_static
+
+
+@patch('pypyr.moduleloader.get_module', return_value='iamamodule')
+def test_complex_step_init_batch_size(mocked_moduleloader):
+    """Complex step with foreach & batchSize."""
+    step = Step({'name': 'blah',
+                 'foreach': ['a'],
+                 'batchSize': 2})
+
+    assert step.batch_size == 2
+    assert not step.is_static
+
+
+@patch('pypyr.moduleloader.get_module', return_value='iamamodule')
+def test_complex_step_init_batch_size_no_foreach(mocked_moduleloader):
+    """Complex step with batchSize but no foreach raises."""
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        Step({'name': 'blah',
+              'batchSize': 2})
+
+    assert str(err_info.value) == ("blah batchSize only works with foreach. "
+                                   "Set foreach too, or remove batchSize.")
+
+
 # ------------------- Step: init ---------------------------------------------#
 
 # ------------------- Step: run_step: foreach --------------------------------#
@@ -452,6 +545,171 @@ def test_foreach_evaluates_swallow_decorator(mock_invoke, mock_moduleloader):
     # after the looping's done, the i value will be the last iterator value
     assert context['i'] == 'key3'
 
+
+@patch('pypyr.moduleloader.get_module')
+@patch.object(Step, 'invoke_step')
+def test_foreach_batch_size(mock_invoke, mock_moduleloader):
+    """foreach with batchSize loops once per batch with i as list."""
+    step = Step({'name': 'step1',
+                 'foreach': ['{key1}', '{key2}', 'key3', 'key4', 'key5'],
+                 'batchSize': '{batch}'})
+
+    context = get_test_context()
+    context['batch'] = 2
+    batches = []
+    mock_invoke.side_effect = lambda context: batches.append(context['i'])
+
+    logger = logging.getLogger('pypyr.dsl')
+    with patch.object(logger, 'info') as mock_logger_info:
+        step.run_step(context)
+
+    assert mock_logger_info.mock_calls == [
+        call('foreach decorator will loop 3 times.'),
+        call('foreach: running step batch 1 with 2 items'),
+        call('foreach: running step batch 2 with 2 items'),
+        call('foreach: running step batch 3 with 1 items')]
+
+    assert batches == [['value1', 'value2'], ['key3', 'key4'], ['key5']]
+    assert context['i'] == ['key5']
+
+
+@patch('pypyr.moduleloader.get_module')
+@patch.object(Step, 'invoke_step')
+def test_foreach_batch_size_bigger_than_items(mock_invoke, mock_moduleloader):
+    """foreach with batchSize bigger than items loops once."""
+    step = Step({'name': 'step1',
+                 'foreach': ['a', 'b'],
+                 'batchSize': 100})
+
+    context = Context()
+    step.run_step(context)
+
+    mock_invoke.assert_called_once()
+    assert context['i'] == ['a', 'b']
+
+
+@patch('pypyr.moduleloader.get_module')
+@patch.object(Step, 'invoke_step')
+def test_foreach_batch_size_less_than_one(mock_invoke, mock_moduleloader):
+    """foreach with batchSize < 1 raises."""
+    step = Step({'name': 'step1',
+                 'foreach': ['a', 'b'],
+                 'batchSize': '0'})
+
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        step.run_step(Context())
+
+    assert str(err_info.value) == "step1 batchSize must be 1 or more, not 0."
+    mock_invoke.assert_not_called()
+
+
+@patch('pypyr.moduleloader.get_module')
+@patch.object(Step, 'invoke_step')
+def test_foreach_streaming_generator(mock_invoke, mock_moduleloader):
+    """foreach over generator iterates lazily without len."""
+    consumed = []
+
+    def gen():
+        for i in ['one', 'two', 'three']:
+            consumed.append(i)
+            yield i
+
+    step = Step({'name': 'step1',
+                 'foreach': '{gen}'})
+
+    context = Context({'gen': gen()})
+
+    def check_lazy(context):
+        # only consumed up to the current item when the step runs.
+        assert consumed[-1] == context['i']
+
+    mock_invoke.side_effect = check_lazy
+
+    logger = logging.getLogger('pypyr.dsl')
+    with patch.object(logger, 'info') as mock_logger_info:
+        step.run_step(context)
+
+    assert mock_logger_info.mock_calls == [
+        call('foreach decorator will loop until the foreach source runs '
+             'out.'),
+        call('foreach: running step one'),
+        call('foreach: running step two'),
+        call('foreach: running step three')]
+
+    assert mock_invoke.call_count == 3
+    assert context['i'] == 'three'
+
+
+@patch('pypyr.moduleloader.get_module')
+@patch.object(Step, 'invoke_step')
+def test_foreach_streaming_file_batched(mock_invoke,
+                                        mock_moduleloader,
+                                        tmp_path):
+    """foreach over file source in batches."""
+    path = tmp_path / 'in.txt'
+    path.write_text('a\nb\nc\n')
+
+    step = Step({'name': 'step1',
+                 'foreach': {'file': '{path}'},
+                 'batchSize': 2})
+
+    context = Context({'path': str(path)})
+    batches = []
+    mock_invoke.side_effect = lambda context: batches.append(context['i'])
+
+    logger = logging.getLogger('pypyr.dsl')
+    with patch.object(logger, 'info') as mock_logger_info:
+        step.run_step(context)
+
+    assert mock_logger_info.mock_calls == [
+        call('foreach decorator will loop until the foreach source runs '
+             'out.'),
+        call('foreach: running step batch 1 with 2 items'),
+        call('foreach: running step batch 2 with 1 items')]
+
+    assert batches == [['a', 'b'], ['c']]
+
+
+@patch('pypyr.moduleloader.get_module')
+@patch.object(Step, 'invoke_step')
+def test_foreach_range_knows_length(mock_invoke, mock_moduleloader):
+    """foreach over range source reports length up front."""
+    step = Step({'name': 'step1',
+                 'foreach': {'range': [1, 4]}})
+
+    context = Context()
+
+    logger = logging.getLogger('pypyr.dsl')
+    with patch.object(logger, 'info') as mock_logger_info:
+        step.run_step(context)
+
+    assert mock_logger_info.mock_calls == [
+        call('foreach decorator will loop 3 times.'),
+        call('foreach: running step 1'),
+        call('foreach: running step 2'),
+        call('foreach: running step 3')]
+
+    assert mock_invoke.call_count == 3
+    assert context['i'] == 3
+
+
+@patch('pypyr.moduleloader.get_module')
+@patch.object(Step, 'invoke_step')
+def test_foreach_empty_stream(mock_invoke, mock_moduleloader):
+    """foreach over empty stream doesn't run step."""
+    step = Step({'name': 'step1',
+                 'foreach': '{gen}'})
+
+    context = Context({'gen': iter([])})
+
+    logger = logging.getLogger('pypyr.dsl')
+    with patch.object(logger, 'debug') as mock_logger_debug:
+        step.run_step(context)
+
+    mock_invoke.assert_not_called()
+    assert 'i' not in context
+    mock_logger_debug.assert_any_call('foreach decorator looped 0 times.')
+
 # ------------------- Step: run_step: foreach --------------------------------#
 
 # ------------------- Step: run_step: while ----------------------------------#
@@ -701,6 +959,23 @@ def test_invoke_step_pass(mocked_moduleloader):
          'key7': 77})
 
 
+@patch('pypyr.executors.run_step_in_process')
+@patch('pypyr.moduleloader.get_module')
+def test_invoke_step_process_executor(mocked_moduleloader,
+                                      mocked_run_in_process):
+    """invoke_step with executor process runs step in process pool."""
+    step = Step({'name': 'mocked.step',
+                 'executor': 'process',
+                 'executorKeys': ['key1', 'key2']})
+    context = get_test_context()
+    step.invoke_step(context)
+
+    mocked_run_in_process.assert_called_once_with('mocked.step',
+                                                  context,
+                                                  keys=['key1', 'key2'])
+    mocked_moduleloader.return_value.run_step.assert_not_called()
+
+
 @patch('pypyr.moduleloader.get_module', return_value=3)
 def test_invoke_step_no_run_step(mocked_moduleloader):
     """run_pipeline_step fails if no run_step on imported module."""
@@ -1621,6 +1896,309 @@ def test_run_pipeline_steps_simple_with_error(mock_invoke_step,
 
 # ------------------- Step: run_step: swallow --------------------------------#
 
+# ------------------- Step: run_step: static ---------------------------------#
+
+
+@patch('pypyr.moduleloader.get_module')
+@patch.object(Step, 'invoke_step')
+def test_run_step_static_skips_formatting(mock_invoke_step,
+                                          mock_get_module):
+    """Static step runs without formatting or evaluating decorators."""
+    step = Step({'name': 'step1',
+                 'run': True,
+                 'skip': False,
+                 'swallow': False})
+
+    context = get_test_context()
+
+    with patch.object(Context, 'get_formatted_as_type') as mock_format:
+        with patch.object(Step,
+                          'set_step_input_context') as mock_set_input:
+            with patch.object(Step,
+                              'run_foreach_or_conditional') as mock_foreach:
+                step.run_step(context)
+                step.run_step(context)
+
+    mock_format.assert_not_called()
+    mock_set_input.assert_not_called()
+    mock_foreach.assert_not_called()
+    assert mock_invoke_step.call_count == 2
+
+
+@patch('pypyr.moduleloader.get_module')
+@patch.object(Step, 'invoke_step', side_effect=ValueError('arb error here'))
+def test_run_step_static_swallow(mock_invoke_step, mock_get_module):
+    """Static step with literal swallow swallows error."""
+    step = Step({'name': 'step1',
+                 'swallow': True})
+
+    logger = logging.getLogger('pypyr.dsl')
+    with patch.object(Context, 'get_formatted_as_type') as mock_format:
+        with patch.object(logger, 'error') as mock_logger_error:
+            step.run_step(get_test_context())
+
+    mock_format.assert_not_called()
+    mock_logger_error.assert_called_once_with(
+        "step1 Ignoring error because swallow is True "
+        "for this step.\n"
+        "ValueError: arb error here")
+
+
+@patch('pypyr.moduleloader.get_module')
+@patch.object(Step, 'invoke_step')
+def test_run_step_static_skip(mock_invoke_step, mock_get_module):
+    """Static step with literal skip doesn't run."""
+    step = Step({'name': 'step1',
+                 'skip': True})
+
+    with patch.object(Context, 'get_formatted_as_type') as mock_format:
+        step.run_step(get_test_context())
+
+    mock_format.assert_not_called()
+    mock_invoke_step.assert_not_called()
+
+# ------------------- Step: run_step: static ---------------------------------#
+
+# ------------------- Step: run_step: timeout --------------------------------#
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_run_step_timeout_finishes_in_time(mock_get_module):
+    """Step that finishes in time runs on a worker & changes context."""
+    def run_step(context):
+        context['thread'] = threading.current_thread()
+        context['out'] = context['k1']
+        del context['key2']
+
+    mock_get_module.return_value.run_step.side_effect = run_step
+    step = Step({'name': 'step1', 'in': {'k1': 'v1'}, 'timeout': 5})
+    assert step.timeout == 5
+    assert not step.is_static
+
+    context = get_test_context()
+    step.run_step(context)
+
+    assert context['out'] == 'v1'
+    assert context['k1'] == 'v1'
+    assert context['thread'] is not threading.current_thread()
+    assert context['thread'].name == 'pypyr-step1'
+    assert 'key2' not in context
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_run_step_timeout_raises(mock_get_module):
+    """Step that runs out of time raises, cancels & doesn't change context."""
+    release = threading.Event()
+
+    def run_step(context):
+        context['started'] = True
+        release.wait(5)
+
+    mock_get_module.return_value.run_step.side_effect = run_step
+    step = Step({'name': 'step1', 'in': {'k1': 'v1'}, 'timeout': 0.05})
+
+    context = get_test_context()
+    with patch('pypyr.dsl.Worker.cancel') as mock_cancel:
+        try:
+            with pytest.raises(StepTimeoutError) as err:
+                step.run_step(context)
+        finally:
+            release.set()
+
+    assert str(err.value) == ("step1 didn't finish within its timeout of "
+                              "0.05 seconds.")
+    mock_cancel.assert_called_once()
+    # in params apply, but nothing the step did.
+    assert context['k1'] == 'v1'
+    assert 'started' not in context
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_run_step_timeout_swallow(mock_get_module):
+    """Swallow swallows timeout."""
+    release = threading.Event()
+    mock_get_module.return_value.run_step.side_effect = (
+        lambda context: release.wait(5))
+    step = Step({'name': 'step1', 'timeout': '{t}', 'swallow': '{swallow}'})
+
+    context = Context({'t': '0.01', 'swallow': True})
+    logger = logging.getLogger('pypyr.dsl')
+    try:
+        with patch.object(logger, 'error') as mock_logger_error:
+            step.run_step(context)
+    finally:
+        release.set()
+
+    mock_logger_error.assert_called_once_with(
+        "step1 Ignoring error because swallow is True for this step.\n"
+        "StepTimeoutError: step1 didn't finish within its timeout of 0.01 "
+        "seconds.")
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_run_step_timeout_error_raises(mock_get_module):
+    """Error from step on the worker raises as is."""
+    mock_get_module.return_value.run_step.side_effect = ValueError('arb')
+    step = Step({'name': 'step1', 'timeout': 5})
+
+    with pytest.raises(ValueError) as err:
+        step.run_step(get_test_context())
+
+    assert str(err.value) == 'arb'
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_run_step_timeout_error_keeps_changes(mock_get_module):
+    """Step that raises in time keeps what it set, like without timeout."""
+    def run_step(context):
+        context['partial'] = 1
+        del context['key1']
+        raise ValueError('arb')
+
+    mock_get_module.return_value.run_step.side_effect = run_step
+
+    for definition in ({'name': 'step1'}, {'name': 'step1', 'timeout': 5}):
+        context = Context({'key1': 'value1'})
+        with pytest.raises(ValueError):
+            Step(definition).run_step(context)
+
+        assert context == {'partial': 1}
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_run_step_timeout_stops_while(mock_get_module):
+    """Cancelled while loop stops at the next iteration."""
+    counter = []
+
+    def run_step(context):
+        counter.append(context['whileCounter'])
+        time.sleep(0.02)
+
+    mock_get_module.return_value.run_step.side_effect = run_step
+    step = Step({'name': 'step1',
+                 'timeout': 0.05,
+                 'while': {'max': 1000}})
+
+    with pytest.raises(StepTimeoutError):
+        step.run_step(Context())
+
+    count = len(counter)
+    time.sleep(0.1)
+    assert len(counter) == count
+    assert count < 10
+
+
+@pytest.mark.parametrize('timeout', [0, -1, 'arb', True])
+@patch('pypyr.moduleloader.get_module')
+def test_run_step_timeout_invalid_raises(mock_get_module, timeout):
+    """Timeout that isn't a positive number raises."""
+    step = Step({'name': 'step1', 'timeout': timeout})
+
+    with pytest.raises(PipelineDefinitionError) as err:
+        step.run_step(Context())
+
+    assert str(err.value) == ("step1 timeout must be a number of seconds "
+                              f"more than 0, not {timeout}.")
+    mock_get_module.return_value.run_step.assert_not_called()
+
+# ------------------- Step: run_step: timeout --------------------------------#
+
+# ------------------- Step: get_step_name ------------------------------------#
+
+
+def test_get_step_name():
+    """Simple step is its name, complex step has a name."""
+    assert Step.get_step_name('arb.step') == 'arb.step'
+    assert Step.get_step_name({'name': 'arb.step'}) == 'arb.step'
+
+
+def test_complex_step_init_no_name_raises():
+    """Complex step without a name raises PipelineDefinitionError."""
+    with pytest.raises(PipelineDefinitionError) as err:
+        Step({'swallow': True})
+
+    assert str(err.value) == ("complex step must have a name. Step is: "
+                              "{'swallow': True}")
+
+# ------------------- Step: get_step_name ------------------------------------#
+
+# ------------------- Step: run_step: uses -----------------------------------#
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_run_step_uses_holds_resources(mock_get_module):
+    """Step holds the resources it uses while it runs, then releases them."""
+    def run_step(context):
+        context['held'] = set(pypyr.resources.get_held())
+
+    mock_get_module.return_value.run_step.side_effect = run_step
+    step = Step({'name': 'step1', 'uses': ['db', '{res}']})
+    assert step.uses == ['db', '{res}']
+
+    context = Context({'res': 'tar'})
+    with pypyr.resources.declare({'resources': {'db': 1, 'tar': 1}}):
+        step.run_step(context)
+        assert pypyr.resources.get_held() == set()
+
+    assert context['held'] == {'db', 'tar'}
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_run_step_uses_str(mock_get_module):
+    """Uses can be a single resource name."""
+    step = Step({'name': 'step1', 'uses': '{res}'})
+
+    with pypyr.resources.declare({'resources': {'db': 1}}):
+        with patch('pypyr.resources.use',
+                   wraps=pypyr.resources.use) as mock_use:
+            step.run_step(Context({'res': 'db'}))
+
+    mock_use.assert_called_once_with(['db'], user='step1')
+    mock_get_module.return_value.run_step.assert_called_once()
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_run_step_uses_undeclared_raises(mock_get_module):
+    """Step that uses a resource nobody declared doesn't run."""
+    step = Step({'name': 'step1', 'uses': ['db']})
+
+    with pytest.raises(PipelineDefinitionError) as err:
+        step.run_step(Context())
+
+    assert str(err.value) == ("step1 uses resources that no running pipeline "
+                              "declared: db. Declare them in the pipeline's "
+                              "resources.")
+    mock_get_module.return_value.run_step.assert_not_called()
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_run_step_uses_waits_for_resource(mock_get_module):
+    """Step waits for a free slot, inside its timeout."""
+    mock_get_module.return_value.run_step.side_effect = (
+        lambda context: context.__setitem__('ran', True))
+    step = Step({'name': 'step1', 'uses': ['db'], 'timeout': 0.05})
+
+    context = Context()
+    with pypyr.resources.declare({'resources': {'db': 1}}):
+        # take the slot without holding it, so the step can't borrow it.
+        resource = pypyr.resources._resources['db']
+        slot = resource.acquire()
+        try:
+            with pytest.raises(StepTimeoutError):
+                step.run_step(context)
+
+            # the timed out step stopped waiting, though db is still taken.
+            for thread in threading.enumerate():
+                if thread.name == 'pypyr-step1':
+                    thread.join(1)
+                    assert not thread.is_alive()
+        finally:
+            resource.release(slot)
+
+    assert 'ran' not in context
+
+# ------------------- Step: run_step: uses -----------------------------------#
+
 # ------------------- Step: set_step_input_context ---------------------------#
 
 
@@ -1683,6 +2261,432 @@ def test_set_step_input_context_with_in(mocked_moduleloader):
 # ------------------- Step: set_step_input_context ---------------------------#
 # ------------------- Step----------------------------------------------------#
 
+# ------------------- CacheDecorator -----------------------------------------#
+# ------------------- CacheDecorator: init -----------------------------------#
+
+
+def test_cache_init_defaults():
+    """CacheDecorator ctor sets defaults with only outputs set."""
+    cd = CacheDecorator({'outputs': ['out']}, 'arb')
+    assert cd.inputs == []
+    assert cd.outputs == ['out']
+    assert cd.ttl is None
+    assert cd.max_bytes == 100 * 1024 * 1024
+    assert cd.dir is None
+
+
+def test_cache_init_all():
+    """CacheDecorator ctor sets all attributes."""
+    cd = CacheDecorator({'inputs': ['in'],
+                         'outputs': ['out'],
+                         'ttl': '{ttl}',
+                         'maxBytes': 10,
+                         'dir': 'arb/dir'}, 'arb')
+    assert cd.inputs == ['in']
+    assert cd.ttl == '{ttl}'
+    assert cd.max_bytes == 10
+    assert cd.dir == 'arb/dir'
+
+
+def test_cache_init_not_dict_raises():
+    """CacheDecorator ctor raises if not a dict."""
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        CacheDecorator('arb', 'step')
+
+    assert str(err_info.value) == ("step cache decorator must be a dict "
+                                   "(i.e a map) type.")
+
+
+def test_cache_init_no_outputs_raises():
+    """CacheDecorator ctor raises without outputs."""
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        CacheDecorator({'inputs': ['in']}, 'step')
+
+    assert str(err_info.value) == ("step cache outputs must be a list of at "
+                                   "least one context key.")
+
+
+def test_cache_init_inputs_not_list_raises():
+    """CacheDecorator ctor raises if inputs not a list."""
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        CacheDecorator({'inputs': 'in', 'outputs': ['out']}, 'step')
+
+    assert str(err_info.value) == ("step cache inputs must be a list of "
+                                   "context keys.")
+
+
+@patch('pypyr.moduleloader.get_module', return_value='iamamodule')
+def test_step_init_cache(mocked_moduleloader):
+    """Step with cache gets a cache decorator & stays on the fast path."""
+    step = Step({'name': 'step1', 'cache': {'outputs': ['out']}})
+
+    assert step.cache_decorator.outputs == ['out']
+    assert step.is_static
+# ------------------- CacheDecorator: init -----------------------------------#
+
+# ------------------- CacheDecorator: run_cached -----------------------------#
+
+
+def get_counting_module():
+    """Get step module that counts runs & sets out from in."""
+    module = types.ModuleType('arbstep')
+    module.calls = 0
+
+    def run_step(context):
+        module.calls += 1
+        context['out'] = f"{context['in']} {module.calls}"
+
+    module.run_step = run_step
+    return module
+
+
+def get_cached_step(tmp_path, module, **cache):
+    """Get step with cache in tmp_path running module."""
+    cache.setdefault('inputs', ['in'])
+    cache.setdefault('outputs', ['out'])
+    cache.setdefault('dir', str(tmp_path))
+    with patch('pypyr.moduleloader.get_module', return_value=module):
+        return Step({'name': 'arbstep', 'cache': cache})
+
+
+def test_cache_run_step_hit_skips_step(tmp_path):
+    """Same inputs get cached outputs without running step again."""
+    module = get_counting_module()
+    step = get_cached_step(tmp_path, module)
+
+    context = Context({'in': 'a'})
+    step.run_step(context)
+    assert context['out'] == 'a 1'
+
+    context = Context({'in': 'a'})
+    with patch.object(step, 'invoke_step') as mock_invoke:
+        step.run_step(context)
+
+    mock_invoke.assert_not_called()
+    assert context['out'] == 'a 1'
+    assert module.calls == 1
+
+
+def test_cache_run_step_changed_input_misses(tmp_path):
+    """Different inputs run step."""
+    module = get_counting_module()
+    step = get_cached_step(tmp_path, module)
+
+    step.run_step(Context({'in': 'a'}))
+    context = Context({'in': 'b'})
+    step.run_step(context)
+
+    assert context['out'] == 'b 2'
+    assert module.calls == 2
+
+
+def test_cache_run_step_ttl(tmp_path):
+    """Expired outputs run step again."""
+    module = get_counting_module()
+    step = get_cached_step(tmp_path, module, ttl='{ttl}')
+
+    step.run_step(Context({'in': 'a', 'ttl': 60}))
+    step.run_step(Context({'in': 'a', 'ttl': 60}))
+    assert module.calls == 1
+
+    with patch('time.time', return_value=time.time() + 61):
+        step.run_step(Context({'in': 'a', 'ttl': 60}))
+
+    assert module.calls == 2
+
+
+def test_cache_run_step_default_dir(tmp_path):
+    """Cache defaults to working_dir/.pypyr/cache."""
+    module = get_counting_module()
+    with patch('pypyr.moduleloader.get_module', return_value=module):
+        step = Step({'name': 'arbstep',
+                     'cache': {'inputs': ['in'], 'outputs': ['out']}})
+
+    context = Context({'in': 'a'})
+    context.working_dir = str(tmp_path)
+    step.run_step(context)
+
+    assert len(os.listdir(tmp_path / '.pypyr' / 'cache')) == 1
+
+
+def test_cache_run_step_missing_input_raises(tmp_path):
+    """Input not in context raises before step runs."""
+    module = get_counting_module()
+    step = get_cached_step(tmp_path, module)
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        step.run_step(Context())
+
+    assert str(err_info.value) == ("context['in'] doesn't exist. It must "
+                                   "exist for arbstep cache inputs.")
+    assert module.calls == 0
+
+
+def test_cache_run_step_missing_output_raises(tmp_path):
+    """Output the step doesn't set raises."""
+    module = get_counting_module()
+    step = get_cached_step(tmp_path, module, outputs=['out', 'arb'])
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        step.run_step(Context({'in': 'a'}))
+
+    assert str(err_info.value) == ("arbstep cache outputs arb not in context "
+                                   "after the step ran. cache outputs must be "
+                                   "keys the step sets.")
+    assert os.listdir(tmp_path) == []
+
+
+def test_cache_run_step_unpicklable_input_runs(tmp_path):
+    """Input that can't serialize runs the step uncached."""
+    module = get_counting_module()
+    step = get_cached_step(tmp_path, module, inputs=['in', 'lock'])
+
+    for _ in range(2):
+        step.run_step(Context({'in': 'a', 'lock': threading.Lock()}))
+
+    assert module.calls == 2
+    assert os.listdir(tmp_path) == []
+# ------------------- CacheDecorator: run_cached -----------------------------#
+# ------------------- CacheDecorator -----------------------------------------#
+
+# ------------------- RetryDecorator -----------------------------------------#
+# ------------------- RetryDecorator: init -----------------------------------#
+
+
+def test_retry_init_defaults():
+    """RetryDecorator ctor sets defaults."""
+    rd = RetryDecorator({})
+    assert rd.max == 3
+    assert rd.sleep == 0
+    assert rd.backoff == 2
+    assert rd.max_sleep is None
+    assert rd.jitter == 0
+    assert rd.retry_on is None
+    assert rd.stop_on is None
+
+
+def test_retry_init_all_attributes():
+    """RetryDecorator ctor with all props set."""
+    rd = RetryDecorator({'max': 5,
+                         'sleep': 0.5,
+                         'backoff': 3,
+                         'maxSleep': 10,
+                         'jitter': 0.2,
+                         'retryOn': ['ValueError'],
+                         'stopOn': 'KeyError'})
+    assert rd.max == 5
+    assert rd.sleep == 0.5
+    assert rd.backoff == 3
+    assert rd.max_sleep == 10
+    assert rd.jitter == 0.2
+    assert rd.retry_on == ['ValueError']
+    assert rd.stop_on == 'KeyError'
+
+
+def test_retry_init_not_a_dict():
+    """RetryDecorator raises on bad ctor input."""
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        RetryDecorator('arb')
+
+    assert str(err_info.value) == ("retry decorator must be a dict (i.e a "
+                                   "map) type.")
+
+
+def test_retry_init_bad_error_names():
+    """RetryDecorator raises if retryOn isn't a list."""
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        RetryDecorator({'retryOn': {'a': 'b'}})
+
+    assert str(err_info.value) == ("retry retryOn must be a list of error "
+                                   "names.")
+
+# ------------------- RetryDecorator: init -----------------------------------#
+
+# ------------------- RetryDecorator: get_sleeps -----------------------------#
+
+
+def test_retry_get_sleeps_exponential():
+    """Sleep doubles each attempt by default."""
+    rd = RetryDecorator({'max': 5, 'sleep': 0.5})
+    assert rd.get_sleeps(Context(), 5) == [0.5, 1, 2, 4]
+
+
+def test_retry_get_sleeps_max_sleep_substitutions():
+    """maxSleep caps sleeps & all settings substitute."""
+    rd = RetryDecorator({'sleep': '{s}', 'backoff': '{b}', 'maxSleep': '{m}'})
+    assert rd.get_sleeps(Context({'s': 1, 'b': 3, 'm': 5}), 4) == [1, 3, 5]
+
+
+def test_retry_get_sleeps_jitter():
+    """Jitter takes up to its fraction off each sleep."""
+    rd = RetryDecorator({'sleep': 2, 'backoff': 1, 'jitter': 0.5})
+    with patch('random.random', side_effect=[0, 0.5, 1]):
+        assert rd.get_sleeps(Context(), 4) == [2, 1.5, 1]
+
+# ------------------- RetryDecorator: get_sleeps -----------------------------#
+
+# ------------------- RetryDecorator: is_retryable ---------------------------#
+
+
+def test_retry_is_retryable():
+    """Errors match on class name, full name or base classes."""
+    rd = RetryDecorator({})
+    err = KeyNotInContextError('arb')
+
+    assert rd.is_retryable(err, None, None)
+    assert rd.is_retryable(err, {'KeyNotInContextError'}, None)
+    assert rd.is_retryable(err, {'pypyr.errors.KeyNotInContextError'}, None)
+    assert rd.is_retryable(err, {'ContextError'}, None)
+    assert rd.is_retryable(err, {'builtins.Exception'}, None)
+    assert not rd.is_retryable(err, {'ValueError'}, None)
+    assert not rd.is_retryable(err, None, {'pypyr.errors.Error'})
+    assert not rd.is_retryable(err, {'Exception'}, {'ContextError'})
+
+# ------------------- RetryDecorator: is_retryable ---------------------------#
+
+# ------------------- RetryDecorator: retry_loop -----------------------------#
+
+
+@patch('pypyr.utils.worker.sleep')
+def test_retry_loop_succeeds_1st_time(mock_sleep):
+    """Step that works doesn't retry."""
+    rd = RetryDecorator({})
+    mock = MagicMock()
+    context = Context()
+
+    rd.retry_loop(context, mock)
+
+    mock.assert_called_once_with(context)
+    assert context['retryCounter'] == 1
+    mock_sleep.assert_not_called()
+
+
+@patch('pypyr.utils.worker.sleep')
+def test_retry_loop_succeeds_eventually(mock_sleep):
+    """Step retries with backoff until it works."""
+    rd = RetryDecorator({'max': 5, 'sleep': 0.1})
+    counters = []
+
+    def step(context):
+        counters.append(context['retryCounter'])
+        if len(counters) < 3:
+            raise ValueError('arb')
+
+    logger = logging.getLogger('pypyr.dsl')
+    with patch.object(logger, 'warning') as mock_logger_warning:
+        rd.retry_loop(Context(), step)
+
+    assert counters == [1, 2, 3]
+    assert mock_sleep.mock_calls == [call(0.1), call(0.2)]
+    assert mock_logger_warning.mock_calls == [
+        call("retry: attempt 1 of 5 failed. ValueError: arb. Retrying in "
+             "0.1s."),
+        call("retry: attempt 2 of 5 failed. ValueError: arb. Retrying in "
+             "0.2s.")]
+
+
+@patch('pypyr.utils.worker.sleep')
+def test_retry_loop_exhausts(mock_sleep):
+    """Last attempt's error raises."""
+    rd = RetryDecorator({'max': '{max}'})
+    mock = MagicMock(side_effect=[ValueError('1'), ValueError('2')])
+
+    logger = logging.getLogger('pypyr.dsl')
+    with patch.object(logger, 'error') as mock_logger_error:
+        with pytest.raises(ValueError) as err_info:
+            rd.retry_loop(Context({'max': 2}), mock)
+
+    assert str(err_info.value) == '2'
+    assert mock.call_count == 2
+    mock_sleep.assert_called_once_with(0)
+    mock_logger_error.assert_called_once_with(
+        "retry: attempt 2 of 2 failed. No attempts left.")
+
+
+@patch('pypyr.utils.worker.sleep')
+def test_retry_loop_not_retryable(mock_sleep):
+    """Error that isn't in retryOn raises straight away."""
+    rd = RetryDecorator({'retryOn': ['{retryable}'], 'stopOn': 'TypeError'})
+    mock = MagicMock(side_effect=[ValueError('1'), KeyError('2')])
+
+    with pytest.raises(KeyError):
+        rd.retry_loop(Context({'retryable': 'ValueError'}), mock)
+
+    assert mock.call_count == 2
+    mock_sleep.assert_called_once_with(0)
+
+
+def test_retry_loop_max_less_than_1():
+    """Max less than 1 raises."""
+    rd = RetryDecorator({'max': 0})
+    mock = MagicMock()
+
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        rd.retry_loop(Context(), mock)
+
+    assert str(err_info.value) == "retry max must be 1 or more, not 0."
+    mock.assert_not_called()
+
+# ------------------- RetryDecorator: retry_loop -----------------------------#
+
+# ------------------- RetryDecorator: Step -----------------------------------#
+
+
+@patch('pypyr.utils.worker.sleep')
+@patch('pypyr.moduleloader.get_module')
+@patch.object(Step, 'invoke_step', side_effect=[ValueError('arb'), None])
+def test_run_step_retry(mock_invoke_step, mock_get_module, mock_sleep):
+    """Step with retry runs again after error."""
+    step = Step({'name': 'step1', 'retry': {'sleep': 1}})
+    assert step.is_static
+
+    context = get_test_context()
+    step.run_step(context)
+
+    assert mock_invoke_step.call_count == 2
+    mock_sleep.assert_called_once_with(1)
+    assert context['retryCounter'] == 2
+
+
+@patch('pypyr.utils.worker.sleep')
+@patch('pypyr.moduleloader.get_module')
+@patch.object(Step, 'invoke_step', side_effect=ValueError('arb'))
+def test_run_step_retry_then_swallow(mock_invoke_step, mock_get_module,
+                                     mock_sleep):
+    """Swallow applies once all retries fail."""
+    step = Step({'name': 'step1',
+                 'retry': {'max': 2},
+                 'swallow': True})
+
+    logger = logging.getLogger('pypyr.dsl')
+    with patch.object(logger, 'error') as mock_logger_error:
+        step.run_step(get_test_context())
+
+    assert mock_invoke_step.call_count == 2
+    assert mock_logger_error.mock_calls == [
+        call("retry: attempt 2 of 2 failed. No attempts left."),
+        call("step1 Ignoring error because swallow is True for this step.\n"
+             "ValueError: arb")]
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_run_step_retry_sleep_stops_on_timeout(mock_get_module):
+    """Timeout wakes the sleep between attempts & stops retrying."""
+    mock_get_module.return_value.run_step.side_effect = ValueError('arb')
+    step = Step({'name': 'step1',
+                 'retry': {'max': 3, 'sleep': 10},
+                 'timeout': 0.05})
+
+    with pytest.raises(StepTimeoutError):
+        step.run_step(Context())
+
+    # cancel wakes the sleeping worker, so no 2nd attempt.
+    time.sleep(0.05)
+    assert mock_get_module.return_value.run_step.call_count == 1
+
+# ------------------- RetryDecorator: Step -----------------------------------#
+# ------------------- RetryDecorator -----------------------------------------#
+
 # ------------------- WhileDecorator -----------------------------------------#
 # ------------------- WhileDecorator: init -----------------------------------#
 
@@ -8,6 +8,7 @@ from pypyr.errors import (
     PlugInError,
     PipelineDefinitionError,
     PipelineNotFoundError,
+    ProcessExecutorError,
     PyModuleNotFoundError)
 import pytest
 
@@ -109,6 +110,17 @@ def test_plugin_error_raises():
                                     "text right here',)")
 
 
+def test_process_executor_error_raises():
+    """ProcessExecutorError raises with correct message."""
+    # confirm subclassed from pypyr root error
+    assert isinstance(ProcessExecutorError(), PypyrError)
+
+    with pytest.raises(ProcessExecutorError) as err_info:
+        raise ProcessExecutorError("this is error text right here")
+
+    assert str(err_info.value) == "this is error text right here"
+
+
 def test_pymodule_not_found_error_raises():
     """PyModuleNotFoundError error raises with correct message."""
     # confirm subclassed from pypyr root error
@@ -0,0 +1,284 @@
+"""executors.py unit tests."""
+from concurrent.futures import CancelledError
+from concurrent.futures.process import BrokenProcessPool
+import os
+import time
+from unittest.mock import MagicMock, patch
+import pytest
+from pypyr.context import Context
+from pypyr.errors import KeyNotInContextError, ProcessExecutorError
+import pypyr.executors
+from pypyr.utils.worker import Worker
+
+# ------------------------- helpers ------------------------------------------#
+
+
+def get_test_context():
+    """Return a pypyr context for testing."""
+    context = Context({
+        'key1': 'value1',
+        'changeMe': ['original'],
+        'deleteMe': 'arb'
+    })
+    context.working_dir = os.path.join(os.getcwd(), 'tests')
+    return context
+
+
+@pytest.fixture(scope='module', autouse=True)
+def process_pool():
+    """Shut down the process pool once the tests in this module are done."""
+    yield
+    pypyr.executors.shutdown_process_pool()
+
+# ------------------------- helpers ------------------------------------------#
+
+# ------------------------- get_context_diff ---------------------------------#
+
+
+def test_get_context_diff():
+    """Diff has new & changed keys & removed keys."""
+    updated, removed = pypyr.executors.get_context_diff(
+        {'k1': 'v1', 'k2': [1, 2], 'k3': 'v3', 'k4': 'v4'},
+        {'k1': 'v1', 'k2': [1, 2, 3], 'k4': 'v4 changed', 'k5': 'v5'})
+
+    assert updated == {'k2': [1, 2, 3], 'k4': 'v4 changed', 'k5': 'v5'}
+    assert removed == ['k3']
+
+
+def test_get_context_diff_no_change():
+    """Diff is empty when nothing changed."""
+    assert pypyr.executors.get_context_diff({'k1': 'v1'},
+                                            {'k1': 'v1'}) == ({}, [])
+
+# ------------------------- get_context_diff ---------------------------------#
+
+# ------------------------- get_context_snapshot -----------------------------#
+
+
+def test_get_context_snapshot_all():
+    """Snapshot is plain dict of all of context."""
+    snapshot = pypyr.executors.get_context_snapshot(Context({'k1': 'v1',
+                                                             'k2': 'v2'}))
+
+    assert type(snapshot) is dict
+    assert snapshot == {'k1': 'v1', 'k2': 'v2'}
+
+
+def test_get_context_snapshot_keys():
+    """Snapshot with keys only has those keys."""
+    snapshot = pypyr.executors.get_context_snapshot(
+        Context({'k1': 'v1', 'k2': 'v2', 'k3': 'v3'}), ['k1', 'k3'])
+
+    assert snapshot == {'k1': 'v1', 'k3': 'v3'}
+
+
+def test_get_context_snapshot_keys_missing():
+    """Snapshot with key not in context raises."""
+    with pytest.raises(KeyNotInContextError):
+        pypyr.executors.get_context_snapshot(Context({'k1': 'v1'}),
+                                             ['k1', 'k2'])
+
+# ------------------------- get_context_snapshot -----------------------------#
+
+# ------------------------- pickle_context -----------------------------------#
+
+
+def test_pickle_context_unpicklable_lists_keys():
+    """Unpicklable values raise error naming the offending keys."""
+    with pytest.raises(ProcessExecutorError) as err_info:
+        pypyr.executors.pickle_context({'k1': 'v1',
+                                        'k2': lambda: None,
+                                        'k3': (x for x in [])},
+                                       'arb desc')
+
+    msg = str(err_info.value)
+    assert msg.startswith("arb desc can't serialize to pass between "
+                          "processes. Use executorKeys to pass only the keys "
+                          "the step needs, or remove these keys from "
+                          "context:\n")
+    assert '  k2: ' in msg
+    assert '  k3: TypeError' in msg
+    assert 'k1' not in msg
+
+# ------------------------- pickle_context -----------------------------------#
+
+# ------------------------- run_step_in_process ------------------------------#
+
+
+def test_run_step_in_process_merges_diff():
+    """Step runs in another process & changes merge back to context."""
+    context = get_test_context()
+
+    pypyr.executors.run_step_in_process('arbpack.arbprocessstep', context)
+
+    assert context['pid'] != os.getpid()
+    assert context['seenKeys'] == ['changeMe', 'deleteMe', 'key1']
+    assert context['key1'] == 'value1'
+    assert context['changeMe'] == ['original', 'changed in worker']
+    assert 'deleteMe' not in context
+    assert context.working_dir == os.path.join(os.getcwd(), 'tests')
+
+
+def test_run_step_in_process_keys_subset():
+    """Only keys go to the worker, other context stays as is."""
+    context = get_test_context()
+
+    pypyr.executors.run_step_in_process('arbpack.arbprocessstep',
+                                        context,
+                                        keys=['changeMe'])
+
+    assert context['seenKeys'] == ['changeMe']
+    assert context['changeMe'] == ['original', 'changed in worker']
+    # not in the subset, so the worker never saw it to delete it.
+    assert context['deleteMe'] == 'arb'
+    assert context['key1'] == 'value1'
+
+
+def test_run_step_in_process_unpicklable_context():
+    """Unpicklable context raises before going to the worker."""
+    context = get_test_context()
+    context['badKey'] = lambda: None
+
+    with patch('pypyr.executors.get_process_pool') as mock_pool:
+        with pytest.raises(ProcessExecutorError) as err_info:
+            pypyr.executors.run_step_in_process('arbpack.arbprocessstep',
+                                                context)
+
+    mock_pool.assert_not_called()
+    assert str(err_info.value).startswith(
+        "Context for arbpack.arbprocessstep can't serialize")
+    assert '  badKey: ' in str(err_info.value)
+
+
+def test_run_step_in_process_unpicklable_context_not_in_keys():
+    """Unpicklable context is fine if it isn't in keys."""
+    context = get_test_context()
+    context['badKey'] = lambda: None
+
+    pypyr.executors.run_step_in_process('arbpack.arbprocessstep',
+                                        context,
+                                        keys=['key1'])
+
+    assert context['seenKeys'] == ['key1']
+
+
+def test_run_step_in_process_unpicklable_result():
+    """Unpicklable step output raises clear error from the worker."""
+    context = get_test_context()
+    context['returnUnpicklable'] = True
+
+    with pytest.raises(ProcessExecutorError) as err_info:
+        pypyr.executors.run_step_in_process('arbpack.arbprocessstep',
+                                            context)
+
+    assert str(err_info.value).startswith(
+        "Context changes from arbpack.arbprocessstep can't serialize")
+    assert '  unpicklable: ' in str(err_info.value)
+    assert 'pid' not in context
+
+
+def test_run_step_in_process_step_error():
+    """Error in step raises to caller & context doesn't change."""
+    context = get_test_context()
+    context['raiseMe'] = True
+
+    with pytest.raises(ValueError) as err_info:
+        pypyr.executors.run_step_in_process('arbpack.arbprocessstep',
+                                            context)
+
+    assert str(err_info.value) == 'arb error from worker'
+    assert context['deleteMe'] == 'arb'
+
+
+def test_run_step_in_process_broken_pool():
+    """Broken process pool raises & resets pool."""
+    with patch('pypyr.executors.get_process_pool') as mock_pool:
+        mock_pool.return_value.submit.return_value.result.side_effect = (
+            BrokenProcessPool('arb'))
+        with patch('pypyr.executors.shutdown_process_pool') as mock_shutdown:
+            with pytest.raises(ProcessExecutorError) as err_info:
+                pypyr.executors.run_step_in_process('arb.step',
+                                                    get_test_context())
+
+    mock_shutdown.assert_called_once()
+    assert str(err_info.value) == ("The worker process running arb.step died "
+                                   "unexpectedly.")
+
+# ------------------------- run_step_in_process ------------------------------#
+
+# ------------------------- cancel -------------------------------------------#
+
+
+def test_cancel_future_not_started():
+    """Step that hasn't started just doesn't start."""
+    future = MagicMock()
+    future.cancel.return_value = True
+
+    with patch('pypyr.executors.kill_process_pool') as mock_kill:
+        pypyr.executors.cancel_future(future, 'pool', 'arb.step')
+
+    mock_kill.assert_not_called()
+
+
+def test_cancel_future_running_kills_pool():
+    """Running step stops by killing its pool."""
+    future = MagicMock()
+    future.cancel.return_value = False
+    future.done.return_value = False
+
+    with patch('pypyr.executors.kill_process_pool') as mock_kill:
+        pypyr.executors.cancel_future(future, 'pool', 'arb.step')
+
+    mock_kill.assert_called_once_with('pool')
+
+
+def test_cancel_future_done():
+    """Finished step doesn't kill anything."""
+    future = MagicMock()
+    future.cancel.return_value = False
+    future.done.return_value = True
+
+    with patch('pypyr.executors.kill_process_pool') as mock_kill:
+        pypyr.executors.cancel_future(future, 'pool', 'arb.step')
+
+    mock_kill.assert_not_called()
+
+
+def test_kill_process_pool():
+    """Kill stops running steps & the next step gets a new pool."""
+    pool = pypyr.executors.get_process_pool()
+    future = pool.submit(time.sleep, 10)
+    # wait for the pool to start the sleep.
+    while not future.running():
+        time.sleep(0.01)
+
+    start = time.perf_counter()
+    pypyr.executors.kill_process_pool(pool)
+
+    with pytest.raises(BrokenProcessPool):
+        future.result(timeout=5)
+
+    assert time.perf_counter() - start < 5
+    assert pypyr.executors.get_process_pool() is not pool
+
+
+def test_run_step_in_process_cancel_on_worker():
+    """Cancelled worker stops its process step."""
+    context = get_test_context()
+    context['sleep'] = 10
+    worker = Worker(pypyr.executors.run_step_in_process,
+                    'arbpack.arbprocessstep',
+                    context).start()
+
+    time.sleep(0.5)
+    start = time.perf_counter()
+    worker.cancel()
+
+    assert worker.wait(5)
+    assert time.perf_counter() - start < 5
+    with pytest.raises((ProcessExecutorError, CancelledError)):
+        worker.result()
+
+    assert 'pid' not in context
+
+# ------------------------- END cancel ---------------------------------------#
@@ -0,0 +1,173 @@
+"""logger.py unit tests."""
+import json
+import logging
+import pypyr.log.logger
+from unittest.mock import patch
+
+# ------------------------- JsonFormatter ------------------------------------#
+
+
+def get_log_record(msg='arb message', args=None, exc_info=None):
+    """Return a log record for testing."""
+    return logging.LogRecord(name='pypyr.arb',
+                             level=logging.INFO,
+                             pathname='arb/path.py',
+                             lineno=123,
+                             msg=msg,
+                             args=args,
+                             exc_info=exc_info,
+                             func='arbfunc')
+
+
+def test_json_formatter_no_scope():
+    """JsonFormatter writes 1 json line without scope fields."""
+    record = get_log_record('arb %s', args=('msg',))
+
+    out = pypyr.log.logger.JsonFormatter().format(record)
+
+    assert '\n' not in out
+    parsed = json.loads(out)
+    assert parsed['level'] == 'INFO'
+    assert parsed['name'] == 'pypyr.arb'
+    assert parsed['func'] == 'arbfunc'
+    assert parsed['message'] == 'arb msg'
+    assert 'time' in parsed
+    assert 'pipeline' not in parsed
+    assert 'step' not in parsed
+    assert 'iteration' not in parsed
+    assert 'exc_info' not in parsed
+
+
+def test_json_formatter_with_scope():
+    """JsonFormatter writes scope fields & exception info."""
+    try:
+        raise ValueError('arb err')
+    except ValueError as err:
+        record = get_log_record(exc_info=(type(err), err, err.__traceback__))
+
+    record.pipeline = 'arb pipe'
+    record.step = 'arb.step'
+    record.iteration = 3
+
+    parsed = json.loads(pypyr.log.logger.JsonFormatter().format(record))
+
+    assert parsed['pipeline'] == 'arb pipe'
+    assert parsed['step'] == 'arb.step'
+    assert parsed['iteration'] == 3
+    assert 'ValueError: arb err' in parsed['exc_info']
+
+# ------------------------- JsonFormatter ------------------------------------#
+
+# ------------------------- log_scope ----------------------------------------#
+
+
+@patch('pypyr.log.logger._log_scope_enabled', True)
+def test_log_scope_filter_stamps_nested_scope():
+    """LogScopeFilter adds current scope & nested scopes restore on exit."""
+    log_filter = pypyr.log.logger.LogScopeFilter()
+
+    with pypyr.log.logger.log_scope(pipeline='parent', step='s1'):
+        with pypyr.log.logger.log_scope(pipeline='child', iteration=2):
+            inner = get_log_record()
+            assert log_filter.filter(inner)
+
+        outer = get_log_record()
+        assert log_filter.filter(outer)
+
+    after = get_log_record()
+    log_filter.filter(after)
+
+    assert inner.pipeline == 'child'
+    assert inner.step == 's1'
+    assert inner.iteration == 2
+
+    assert outer.pipeline == 'parent'
+    assert outer.step == 's1'
+    assert outer.iteration is None
+
+    assert after.pipeline is None
+    assert after.step is None
+    assert after.iteration is None
+
+
+def test_log_scope_disabled_does_nothing():
+    """log_scope doesn't track anything when json logging is off."""
+    log_filter = pypyr.log.logger.LogScopeFilter()
+
+    with pypyr.log.logger.log_scope(pipeline='arb pipe', step='s1'):
+        record = get_log_record()
+        log_filter.filter(record)
+
+    assert record.pipeline is None
+    assert record.step is None
+
+
+@patch('pypyr.log.logger._log_scope_enabled', True)
+def test_get_log_scope():
+    """get_log_scope gets the current thread's scope."""
+    with pypyr.log.logger.log_scope(pipeline='arb pipe', iteration=3):
+        assert pypyr.log.logger.get_log_scope() == {'pipeline': 'arb pipe',
+                                                    'step': None,
+                                                    'iteration': 3}
+
+
+def test_get_log_scope_disabled():
+    """get_log_scope is empty when json logging is off."""
+    with pypyr.log.logger.log_scope(pipeline='arb pipe'):
+        assert pypyr.log.logger.get_log_scope() == {}
+
+# ------------------------- log_scope ----------------------------------------#
+
+# ------------------------- set_root_logger ----------------------------------#
+
+
+@patch('pypyr.log.logger.set_logging_config')
+def test_set_root_logger_default(mock_config):
+    """set_root_logger uses plain text logging by default."""
+    pypyr.log.logger.set_root_logger(25)
+
+    mock_config.assert_called_once_with(25)
+    assert pypyr.log.logger._queue_listener is None
+
+
+@patch('pypyr.log.logger.set_logging_config')
+def test_set_root_logger_json_queue(mock_config):
+    """set_root_logger with log_json queues records to background writer."""
+    pypyr.log.logger.set_root_logger(25, log_json=True)
+
+    try:
+        mock_config.assert_called_once()
+        args, kwargs = mock_config.call_args
+        assert args == (25,)
+        queue_handler, = kwargs['handlers']
+        assert isinstance(queue_handler, logging.handlers.QueueHandler)
+
+        listener = pypyr.log.logger._queue_listener
+        assert isinstance(listener, logging.handlers.QueueListener)
+        stream_handler, = listener.handlers
+        assert isinstance(stream_handler.formatter,
+                          pypyr.log.logger.JsonFormatter)
+
+        with patch.object(stream_handler, 'emit') as mock_emit:
+            with pypyr.log.logger.log_scope(pipeline='pipe',
+                                            step='arb.step'):
+                queue_handler.handle(get_log_record('hello'))
+            pypyr.log.logger.stop_queue_listener()
+
+        record, = mock_emit.call_args[0]
+        assert record.getMessage() == 'hello'
+        assert record.pipeline == 'pipe'
+        assert record.step == 'arb.step'
+    finally:
+        pypyr.log.logger.stop_queue_listener()
+
+    assert pypyr.log.logger._queue_listener is None
+    assert not pypyr.log.logger._log_scope_enabled
+
+
+def test_stop_queue_listener_without_listener():
+    """stop_queue_listener does nothing when not using a queue."""
+    pypyr.log.logger.stop_queue_listener()
+    assert pypyr.log.logger._queue_listener is None
+
+# ------------------------- set_root_logger ----------------------------------#
@@ -5,6 +5,7 @@ import pypyr.moduleloader
 import pytest
 import os
 import sys
+from unittest.mock import patch
 
 
 # ------------------------- get_module ---------------------------------------#
@@ -46,8 +47,93 @@ def test_get_module_in_package_pass():
 
     sys.path.remove(p)
 
+
+def test_get_module_caches_resolved_module():
+    """get_module only imports once for the same name."""
+    pypyr.moduleloader.clear_module_cache()
+    with patch('importlib.import_module',
+               return_value='arb module') as mock_import:
+        first = pypyr.moduleloader.get_module('arb.cached.module')
+        second = pypyr.moduleloader.get_module('arb.cached.module')
+
+    assert first == 'arb module'
+    assert second == 'arb module'
+    mock_import.assert_called_once_with('arb.cached.module')
+    pypyr.moduleloader.clear_module_cache()
+
+
+def test_get_module_caches_not_found():
+    """get_module does not look for a missing module twice."""
+    pypyr.moduleloader.clear_module_cache()
+    with patch('importlib.import_module',
+               side_effect=ModuleNotFoundError('arb')) as mock_import:
+        with pytest.raises(PyModuleNotFoundError) as err1:
+            pypyr.moduleloader.get_module('arb.missing.module')
+
+        with pytest.raises(PyModuleNotFoundError) as err2:
+            pypyr.moduleloader.get_module('arb.missing.module')
+
+    mock_import.assert_called_once_with('arb.missing.module')
+    assert str(err1.value) == str(err2.value)
+    assert str(err2.value).startswith('arb.missing.module.py should be in '
+                                      'your working dir')
+    pypyr.moduleloader.clear_module_cache()
+
+
+def test_get_module_not_found_cache_clears_on_new_working_dir():
+    """A new working dir gives previously missing modules another chance."""
+    pypyr.moduleloader.clear_module_cache()
+    p = os.path.join(
+        os.getcwd(),
+        'tests',
+        'testfiles')
+    assert p not in sys.path
+    sys.modules.pop('arb', None)
+
+    with pytest.raises(PyModuleNotFoundError):
+        pypyr.moduleloader.get_module('arb')
+
+    pypyr.moduleloader.set_working_directory(p)
+    arb_module = pypyr.moduleloader.get_module('arb')
+
+    assert arb_module.__name__ == 'arb'
+
+    sys.path.remove(p)
+    pypyr.moduleloader.clear_module_cache()
+
 # ------------------------- get_module ---------------------------------------#
 
+# ------------------------- preload_modules ----------------------------------#
+
+
+def test_preload_modules_pass():
+    """preload_modules loads each unique module once."""
+    with patch('pypyr.moduleloader.get_module') as mock_get_module:
+        pypyr.moduleloader.preload_modules(['mod1', 'mod2', 'mod1', 'mod3'])
+
+    assert sorted(c[0][0] for c in mock_get_module.call_args_list) == [
+        'mod1', 'mod2', 'mod3']
+
+
+def test_preload_modules_reports_all_missing():
+    """preload_modules raises for all missing modules at once."""
+    def get_module(name):
+        if name.startswith('missing'):
+            raise PyModuleNotFoundError(name)
+        return name
+
+    with patch('pypyr.moduleloader.get_module', side_effect=get_module):
+        with pytest.raises(PyModuleNotFoundError) as err:
+            pypyr.moduleloader.preload_modules(
+                ['mod1', 'missing1', 'mod2', 'missing2'])
+
+    assert str(err.value) == (
+        "2 module(s) referenced by the pipeline could not load: missing1, "
+        "missing2. These should be in your working dir or installed to the "
+        "python path.")
+
+# ------------------------- preload_modules ----------------------------------#
+
 # ------------------------- get_pipeline_path --------------------------------#
 
 
@@ -106,6 +192,131 @@ def test_get_pipeline_path_raises():
     assert repr(err.value) == f'PipelineNotFoundError(\'{expected_msg}\',)'
 
 
+def write_pipeline(path):
+    """Write an arb pipeline yaml to path, creating dirs on the way."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('steps:\n  - pypyr.steps.echo\n')
+
+
+def test_get_pipeline_path_namespaced_in_subdir(tmpdir):
+    """Find a pipeline in a sub-directory of pipelines by relative name."""
+    pypyr.moduleloader.clear_pipeline_index()
+    working_dir = str(tmpdir)
+    expected_path = os.path.join(working_dir, 'pipelines', 'ns', 'sub',
+                                 'mypipe.yaml')
+    write_pipeline(expected_path)
+
+    path_found = pypyr.moduleloader.get_pipeline_path('ns/sub/mypipe',
+                                                      working_dir)
+
+    assert path_found == expected_path
+
+    with pytest.raises(PipelineNotFoundError):
+        pypyr.moduleloader.get_pipeline_path('mypipe', working_dir)
+
+    pypyr.moduleloader.clear_pipeline_index()
+
+
+def test_get_pipeline_path_from_env_search_path(tmpdir):
+    """Find pipelines in PYPYR_PIPELINE_PATH dirs, in order."""
+    pypyr.moduleloader.clear_pipeline_index()
+    working_dir = os.path.join(str(tmpdir), 'wd')
+    dir1 = os.path.join(str(tmpdir), 'dir1')
+    dir2 = os.path.join(str(tmpdir), 'dir2')
+    write_pipeline(os.path.join(working_dir, 'pipelines', 'inwd.yaml'))
+    write_pipeline(os.path.join(dir1, 'both.yaml'))
+    write_pipeline(os.path.join(dir2, 'both.yaml'))
+    write_pipeline(os.path.join(dir2, 'in2.yaml'))
+    # same name as built-in pypyr pipeline takes precedence over built-in
+    write_pipeline(os.path.join(dir2, 'donothing.yaml'))
+
+    with patch.dict(os.environ,
+                    {'PYPYR_PIPELINE_PATH': f'{dir1}{os.pathsep}{dir2}'}):
+        get_path = pypyr.moduleloader.get_pipeline_path
+        assert get_path('inwd', working_dir) == os.path.join(
+            working_dir, 'pipelines', 'inwd.yaml')
+        assert get_path('both', working_dir) == os.path.join(dir1,
+                                                             'both.yaml')
+        assert get_path('in2', working_dir) == os.path.join(dir2, 'in2.yaml')
+        assert get_path('donothing', working_dir) == os.path.join(
+            dir2, 'donothing.yaml')
+
+        with pytest.raises(PipelineNotFoundError) as err:
+            get_path('unlikelypipeherexyz', working_dir)
+
+    pypyr_path = os.path.join(
+        os.getcwd(),
+        'pypyr',
+        'pipelines')
+    wd_path = os.path.join(working_dir, 'pipelines')
+
+    assert str(err.value) == (f'unlikelypipeherexyz.yaml not found in either '
+                              f'{wd_path}, {dir1}, {dir2} or {pypyr_path}')
+
+    pypyr.moduleloader.clear_pipeline_index()
+
+
+def test_get_pipeline_path_scans_once(tmpdir):
+    """Repeat lookups for indexed pipelines don't touch file-system."""
+    pypyr.moduleloader.clear_pipeline_index()
+    working_dir = str(tmpdir)
+    write_pipeline(os.path.join(working_dir, 'pipelines', 'pipe1.yaml'))
+
+    with patch('os.walk', wraps=os.walk) as mock_walk:
+        with patch('os.path.isfile') as mock_isfile:
+            for _ in range(3):
+                pypyr.moduleloader.get_pipeline_path('pipe1', working_dir)
+                pypyr.moduleloader.get_pipeline_path('donothing',
+                                                     working_dir)
+
+    # once for wd/pipelines, once for pypyr/pipelines
+    assert mock_walk.call_count == 2
+    mock_isfile.assert_not_called()
+
+    pypyr.moduleloader.clear_pipeline_index()
+
+
+def test_get_pipeline_path_rescans_changed_dir_on_miss(tmpdir):
+    """A pipeline added after the 1st scan is found on re-scan."""
+    pypyr.moduleloader.clear_pipeline_index()
+    working_dir = str(tmpdir)
+    write_pipeline(os.path.join(working_dir, 'pipelines', 'pipe1.yaml'))
+
+    pypyr.moduleloader.get_pipeline_path('pipe1', working_dir)
+
+    new_path = os.path.join(working_dir, 'pipelines', 'sub', 'pipe2.yaml')
+    write_pipeline(new_path)
+    # guard against coarse file-system timestamps
+    pipelines_dir = os.path.join(working_dir, 'pipelines')
+    stat = os.stat(pipelines_dir)
+    os.utime(pipelines_dir, ns=(stat.st_atime_ns,
+                                stat.st_mtime_ns + 1000000000))
+
+    assert pypyr.moduleloader.get_pipeline_path(
+        'sub/pipe2', working_dir) == new_path
+
+    pypyr.moduleloader.clear_pipeline_index()
+
+
+def test_get_pipeline_path_outside_index(tmpdir):
+    """Relative names out of pipelines & absolute names still resolve."""
+    pypyr.moduleloader.clear_pipeline_index()
+    working_dir = os.path.join(str(tmpdir), 'wd')
+    write_pipeline(os.path.join(working_dir, 'pipelines', 'inwd.yaml'))
+    other_path = os.path.join(str(tmpdir), 'other', 'p.yaml')
+    write_pipeline(other_path)
+
+    get_path = pypyr.moduleloader.get_pipeline_path
+    assert get_path('../../other/p', working_dir) == other_path
+    assert get_path(os.path.join(str(tmpdir), 'other', 'p'),
+                    working_dir) == other_path
+
+    with pytest.raises(PipelineNotFoundError):
+        get_path('../../other/nope', working_dir)
+
+    pypyr.moduleloader.clear_pipeline_index()
+
 # ------------------------- get_pipeline_path --------------------------------#
 #
 # ------------------------- set_working_dir ----------------------------------#
@@ -119,4 +330,14 @@ def test_set_working_dir():
     assert p in sys.path
     sys.path.remove(p)
 
+
+def test_set_working_dir_no_duplicates():
+    """working dir only added to sys paths once."""
+    p = '/arb/path'
+    assert p not in sys.path
+    pypyr.moduleloader.set_working_directory(p)
+    pypyr.moduleloader.set_working_directory(p)
+    assert sys.path.count(p) == 1
+    sys.path.remove(p)
+
 # ------------------------- set_working_dir ----------------------------------#
@@ -0,0 +1,26 @@
+"""snapshotfile.py unit tests."""
+import pypyr.parser.snapshotfile
+import pypyr.snapshot
+import pytest
+
+
+def test_snapshot_file_open_fails_on_arbitrary_string():
+    """Non path-y input string should fail."""
+    with pytest.raises(FileNotFoundError):
+        pypyr.parser.snapshotfile.get_parsed_context('value 1,value 2')
+
+
+def test_snapshot_file_open_fails_on_empty_string():
+    """Empty input should fail."""
+    with pytest.raises(AssertionError):
+        pypyr.parser.snapshotfile.get_parsed_context(None)
+
+
+def test_snapshot_pass(tmp_path):
+    """Path to snapshot should succeed, keeping types."""
+    path = str(tmp_path / 'context.ctx')
+    pypyr.snapshot.save(path, {'key1': (1, 2), 'key2': {'value2'}})
+
+    context = pypyr.parser.snapshotfile.get_parsed_context(path)
+
+    assert context == {'key1': (1, 2), 'key2': {'value2'}}
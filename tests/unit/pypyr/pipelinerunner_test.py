@@ -1,10 +1,13 @@
 """pipelinerunner.py unit tests."""
 import os
 from pypyr.context import Context
-from pypyr.errors import (ContextError,
+from pypyr.errors import (CheckpointError,
+                          ContextError,
                           KeyNotInContextError,
+                          PipelineDefinitionError,
                           PyModuleNotFoundError)
 import pypyr.pipelinerunner
+import pypyr.resources
 import pytest
 from unittest.mock import call, mock_open, patch
 
@@ -85,21 +88,64 @@ def test_get_parser_context_signature_wrong(mocked_moduleloader):
 # ------------------------- get_pipeline_definition --------------------------#
 
 
-@patch('ruamel.yaml.YAML.load', return_value='mocked pipeline def')
+@patch('os.stat')
+@patch('ruamel.yaml.YAML.load', return_value={'steps': ['pypyr.steps.echo']})
 @patch('pypyr.moduleloader.get_pipeline_path', return_value='arb/path/x.yaml')
 def test_get_pipeline_definition_pass(mocked_get_path,
-                                      mocked_yaml):
+                                      mocked_yaml,
+                                      mocked_stat):
     """get_pipeline_definition passes correct params to all methods."""
+    pypyr.pipelinerunner.clear_pipeline_cache()
     with patch('pypyr.pipelinerunner.open',
                mock_open(read_data='pipe contents')) as mocked_open:
         pipeline_def = pypyr.pipelinerunner.get_pipeline_definition(
             'pipename', '/working/dir')
 
-    assert pipeline_def == 'mocked pipeline def'
+    assert pipeline_def == {'steps': ['pypyr.steps.echo']}
     mocked_get_path.assert_called_once_with(
         pipeline_name='pipename', working_directory='/working/dir')
     mocked_open.assert_called_once_with('arb/path/x.yaml')
     mocked_yaml.assert_called_once_with(mocked_open.return_value)
+    pypyr.pipelinerunner.clear_pipeline_cache()
+
+
+def test_get_pipeline_definition_cached(tmp_path):
+    """Pipeline parses & validates once until the file changes."""
+    pypyr.pipelinerunner.clear_pipeline_cache()
+    (tmp_path / 'pipelines').mkdir()
+    path = tmp_path / 'pipelines' / 'cached.yaml'
+    path.write_text('steps:\n  - name: pypyr.steps.echo\n    in: {a: 1}\n')
+
+    with patch('pypyr.validator.validate_pipeline') as mock_validate:
+        first = pypyr.pipelinerunner.get_pipeline_definition('cached',
+                                                             str(tmp_path))
+        # mutating the returned definition doesn't touch the cache.
+        first['steps'][0]['in']['a'] = 2
+        second = pypyr.pipelinerunner.get_pipeline_definition('cached',
+                                                              str(tmp_path))
+
+    mock_validate.assert_called_once()
+    assert second == {'steps': [{'name': 'pypyr.steps.echo',
+                                 'in': {'a': 1}}]}
+
+    path.write_text('steps:\n  - pypyr.steps.echo\n')
+    os.utime(path, ns=(0, 0))
+    assert pypyr.pipelinerunner.get_pipeline_definition(
+        'cached', str(tmp_path)) == {'steps': ['pypyr.steps.echo']}
+    pypyr.pipelinerunner.clear_pipeline_cache()
+
+
+def test_get_pipeline_definition_invalid_not_cached(tmp_path):
+    """Invalid pipeline raises every time."""
+    pypyr.pipelinerunner.clear_pipeline_cache()
+    (tmp_path / 'pipelines').mkdir()
+    (tmp_path / 'pipelines' / 'invalid.yaml').write_text(
+        'steps:\n  - arb.missing\n')
+
+    for _ in range(2):
+        with pytest.raises(PipelineDefinitionError):
+            pypyr.pipelinerunner.get_pipeline_definition('invalid',
+                                                         str(tmp_path))
 
 
 @patch('pypyr.moduleloader.get_pipeline_path', return_value='arb/path/x.yaml')
@@ -130,7 +176,31 @@ def test_main_pass(mocked_work_dir, mocked_run_pipeline):
     mocked_run_pipeline.assert_called_once_with(
         pipeline_name='arb pipe',
         pipeline_context_input='arb context input',
-        working_dir='arb/dir')
+        working_dir='arb/dir',
+        preload=False,
+        checkpoint=False,
+        resume=False,
+        memstats=False)
+
+
+@patch('pypyr.log.logger.stop_queue_listener')
+@patch('pypyr.log.logger.set_root_logger')
+@patch('pypyr.pipelinerunner.run_pipeline', side_effect=ContextError('arb'))
+@patch('pypyr.moduleloader.set_working_directory')
+def test_main_json_log_stops_listener_on_fail(mocked_work_dir,
+                                              mocked_run_pipeline,
+                                              mocked_set_root_logger,
+                                              mocked_stop_listener):
+    """main sets json logging & stops log listener even on failure."""
+    with pytest.raises(ContextError):
+        pypyr.pipelinerunner.main(pipeline_name='arb pipe',
+                                  pipeline_context_input='arb context input',
+                                  working_dir='arb/dir',
+                                  log_level=77,
+                                  log_json=True)
+
+    mocked_set_root_logger.assert_called_once_with(77, log_json=True)
+    mocked_stop_listener.assert_called_once()
 
 
 @patch('pypyr.pipelinerunner.run_pipeline', side_effect=ContextError('arb'))
@@ -151,7 +221,11 @@ def test_main_fail(mocked_work_dir, mocked_run_pipeline):
     mocked_run_pipeline.assert_called_once_with(
         pipeline_name='arb pipe',
         pipeline_context_input='arb context input',
-        working_dir='arb/dir')
+        working_dir='arb/dir',
+        preload=False,
+        checkpoint=False,
+        resume=False,
+        memstats=False)
 
 # ------------------------- main ---------------------------------------------#
 
@@ -224,7 +298,9 @@ def test_run_pipeline_pass(mocked_work_dir,
     # 1st called steps, then on_success
     expected_run_step_groups = [call(context={},
                                      pipeline_definition='pipe def',
-                                     step_group_name='steps'),
+                                     step_group_name='steps',
+                                     start_index=0,
+                                     checkpoint=None),
                                 call(context={},
                                      pipeline_definition='pipe def',
                                      step_group_name='on_success')]
@@ -232,6 +308,68 @@ def test_run_pipeline_pass(mocked_work_dir,
     mocked_run_step_group.assert_has_calls(expected_run_step_groups)
 
 
+@patch('pypyr.stepsrunner.preload_step_modules')
+@patch('pypyr.stepsrunner.run_step_group')
+@patch('pypyr.pipelinerunner.get_parsed_context',
+       return_value=Context())
+@patch('pypyr.pipelinerunner.get_pipeline_definition', return_value='pipe def')
+def test_run_pipeline_preload(mocked_get_pipe_def,
+                              mocked_get_parsed_context,
+                              mocked_run_step_group,
+                              mocked_preload):
+    """run_pipeline preloads step modules before running steps."""
+    pypyr.pipelinerunner.run_pipeline(
+        pipeline_name='arb pipe',
+        working_dir='arb/dir',
+        preload=True)
+
+    mocked_preload.assert_called_once_with('pipe def')
+    assert mocked_run_step_group.call_count == 2
+
+
+@patch('pypyr.stepsrunner.run_failure_step_group')
+@patch('pypyr.stepsrunner.run_step_group', side_effect=ContextError('arb'))
+@patch('pypyr.pipelinerunner.get_parsed_context',
+       return_value=Context({'k1': 'v1'}))
+@patch('pypyr.pipelinerunner.get_pipeline_definition', return_value='pipe def')
+def test_run_pipeline_memstats_even_on_failure(mocked_get_pipe_def,
+                                               mocked_get_parsed_context,
+                                               mocked_run_step_group,
+                                               mocked_run_failure_group,
+                                               capsys):
+    """run_pipeline prints memstats once done, even if pipeline failed."""
+    with pytest.raises(ContextError):
+        pypyr.pipelinerunner.run_pipeline(
+            pipeline_name='arb pipe',
+            working_dir='arb/dir',
+            memstats=True)
+
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].startswith('context memory: ')
+    assert out[0].endswith(' in 1 keys.')
+    assert out[1].startswith('  k1: ')
+
+
+@patch('pypyr.stepsrunner.run_failure_step_group')
+@patch('pypyr.stepsrunner.preload_step_modules',
+       side_effect=PyModuleNotFoundError('arb'))
+@patch('pypyr.stepsrunner.run_step_group')
+@patch('pypyr.pipelinerunner.get_pipeline_definition', return_value='pipe def')
+def test_run_pipeline_preload_fails_before_steps(mocked_get_pipe_def,
+                                                 mocked_run_step_group,
+                                                 mocked_preload,
+                                                 mocked_run_failure):
+    """run_pipeline raises preload errors without running any steps."""
+    with pytest.raises(PyModuleNotFoundError):
+        pypyr.pipelinerunner.run_pipeline(
+            pipeline_name='arb pipe',
+            working_dir='arb/dir',
+            preload=True)
+
+    mocked_run_step_group.assert_not_called()
+    mocked_run_failure.assert_not_called()
+
+
 @patch('pypyr.stepsrunner.run_step_group')
 @patch('pypyr.pipelinerunner.get_parsed_context',
        return_value=Context())
@@ -256,7 +394,9 @@ def test_run_pipeline_pass_skip_parse_context(mocked_work_dir,
     # 1st called steps, then on_success
     expected_run_step_groups = [call(context={},
                                      pipeline_definition='pipe def',
-                                     step_group_name='steps'),
+                                     step_group_name='steps',
+                                     start_index=0,
+                                     checkpoint=None),
                                 call(context={},
                                      pipeline_definition='pipe def',
                                      step_group_name='on_success')]
@@ -331,7 +471,9 @@ def test_run_pipeline_steps_error(mocked_work_dir,
     # 1st called steps, then on_success
     expected_run_step_groups = [call(context={'c1': 'cv1'},
                                      pipeline_definition='pipe def',
-                                     step_group_name='steps'),
+                                     step_group_name='steps',
+                                     start_index=0,
+                                     checkpoint=None),
                                 call(context={'c1': 'cv1'},
                                      pipeline_definition='pipe def',
                                      step_group_name='on_failure')]
@@ -370,7 +512,9 @@ def test_run_pipeline_steps_error_no_context(mocked_work_dir,
     # 1st called steps, then on_success
     expected_run_step_groups = [call(context={},
                                      pipeline_definition='pipe def',
-                                     step_group_name='steps'),
+                                     step_group_name='steps',
+                                     start_index=0,
+                                     checkpoint=None),
                                 call(context={},
                                      pipeline_definition='pipe def',
                                      step_group_name='on_failure')]
@@ -410,7 +554,9 @@ def test_run_pipeline_with_existing_context_pass(mocked_work_dir,
     expected_run_step_groups = [call(
         context={'1': 'context 1', '2': 'context2', '3': 'new'},
         pipeline_definition='pipe def',
-        step_group_name='steps'),
+        step_group_name='steps',
+        start_index=0,
+        checkpoint=None),
         call(
         context={'1': 'context 1', '2': 'context2', '3': 'new'},
         pipeline_definition='pipe def',
@@ -435,4 +581,140 @@ def test_pipeline_runner_main():
                               pipeline_context_input=None,
                               working_dir=working_dir,
                               log_level=50)
+
+
+CHECKPOINT_PIPELINE = """\
+steps:
+  - name: pypyr.steps.py
+    in:
+      pycode: context['runs'] = context.get('runs', []) + ['step1']
+  - name: pypyr.steps.py
+    in:
+      pycode: |
+        import os
+        assert os.path.exists(os.path.join(context['dir'], 'ok')), 'boom'
+        context['runs'] = context['runs'] + ['step2']
+"""
+
+
+def write_checkpoint_pipeline(tmp_path, pipeline=CHECKPOINT_PIPELINE):
+    """Write checkpoint test pipeline to tmp_path/pipelines/ckpt.yaml."""
+    (tmp_path / 'pipelines').mkdir(exist_ok=True)
+    (tmp_path / 'pipelines' / 'ckpt.yaml').write_text(pipeline)
+
+
+def test_run_pipeline_resume_from_checkpoint(tmp_path):
+    """Resume skips steps that completed before the failure."""
+    write_checkpoint_pipeline(tmp_path)
+    checkpoint_path = tmp_path / '.pypyr' / 'checkpoints' / 'ckpt.ckpt'
+
+    context = Context({'dir': str(tmp_path)})
+    context.working_dir = str(tmp_path)
+    with pytest.raises(AssertionError):
+        pypyr.pipelinerunner.run_pipeline(pipeline_name='ckpt',
+                                          context=context,
+                                          parse_input=False,
+                                          checkpoint=True)
+
+    assert context['runs'] == ['step1']
+    assert checkpoint_path.exists()
+
+    (tmp_path / 'ok').write_text('')
+    context = Context()
+    context.working_dir = str(tmp_path)
+    pypyr.pipelinerunner.run_pipeline(pipeline_name='ckpt',
+                                      context=context,
+                                      resume=True)
+
+    # step1 didn't run again, its output came from the checkpoint.
+    assert context['runs'] == ['step1', 'step2']
+    assert context['dir'] == str(tmp_path)
+    assert not checkpoint_path.exists()
+
+
+def test_run_pipeline_resume_no_checkpoint_starts_over(tmp_path):
+    """Resume without a checkpoint runs all steps."""
+    write_checkpoint_pipeline(tmp_path)
+    (tmp_path / 'ok').write_text('')
+
+    context = Context({'dir': str(tmp_path)})
+    context.working_dir = str(tmp_path)
+    pypyr.pipelinerunner.run_pipeline(pipeline_name='ckpt',
+                                      context=context,
+                                      parse_input=False,
+                                      resume=True)
+
+    assert context['runs'] == ['step1', 'step2']
+    assert not (tmp_path / '.pypyr' / 'checkpoints' / 'ckpt.ckpt').exists()
+
+
+def test_run_pipeline_resume_changed_pipeline_raises(tmp_path):
+    """Resume raises if the pipeline changed since the checkpoint."""
+    write_checkpoint_pipeline(tmp_path)
+
+    context = Context({'dir': str(tmp_path)})
+    context.working_dir = str(tmp_path)
+    with pytest.raises(AssertionError):
+        pypyr.pipelinerunner.run_pipeline(pipeline_name='ckpt',
+                                          context=context,
+                                          parse_input=False,
+                                          checkpoint=True)
+
+    write_checkpoint_pipeline(tmp_path,
+                              CHECKPOINT_PIPELINE + "on_success: []\n")
+    context = Context()
+    context.working_dir = str(tmp_path)
+    with pytest.raises(CheckpointError) as err_info:
+        pypyr.pipelinerunner.run_pipeline(pipeline_name='ckpt',
+                                          context=context,
+                                          resume=True)
+
+    assert str(err_info.value).startswith("pipeline ckpt changed since the "
+                                          "checkpoint at ")
+    assert 'runs' not in context
+
+
+def test_run_pipeline_declares_resources(tmp_path):
+    """Pipeline's resources exist while it runs, for its steps to use."""
+    (tmp_path / 'pipelines').mkdir()
+    (tmp_path / 'pipelines' / 'res.yaml').write_text("""\
+resources:
+  db: 2
+steps:
+  - name: pypyr.steps.py
+    uses: [db]
+    in:
+      pycode: |
+        import pypyr.resources
+        context['held'] = sorted(pypyr.resources.get_held())
+        context['limit'] = pypyr.resources._resources['db'].limit
+""")
+
+    context = Context()
+    context.working_dir = str(tmp_path)
+    pypyr.pipelinerunner.run_pipeline(pipeline_name='res',
+                                      context=context,
+                                      parse_input=False)
+
+    assert context['held'] == ['db']
+    assert context['limit'] == 2
+    assert pypyr.resources._resources == {}
+    assert pypyr.resources.get_held() == set()
+
+
+@patch('pypyr.pipelinerunner.get_pipeline_definition')
+def test_run_pipeline_with_pipeline_definition(mocked_get_pipe_def):
+    """Already loaded pipeline definition runs without loading it again."""
+    context = Context()
+    context.working_dir = 'arb/dir'
+    pypyr.pipelinerunner.run_pipeline(
+        pipeline_name='arb',
+        context=context,
+        parse_input=False,
+        pipeline_definition={'steps': [
+            {'name': 'pypyr.steps.contextsetf',
+             'in': {'contextSetf': {'ran': True}}}]})
+
+    mocked_get_pipe_def.assert_not_called()
+    assert context['ran']
 # ------------------------- integration---------------------------------------#
@@ -0,0 +1,320 @@
+"""plan.py unit tests."""
+import sys
+import pytest
+from unittest.mock import patch
+from pypyr.dsl import Step
+from pypyr.errors import PipelineDefinitionError, PyModuleNotFoundError
+import pypyr.plan
+
+
+def write_pipeline(tmp_path, name, pipeline):
+    """Write pipeline yaml to tmp_path/pipelines/name.yaml."""
+    (tmp_path / 'pipelines').mkdir(exist_ok=True)
+    (tmp_path / 'pipelines' / f'{name}.yaml').write_text(pipeline)
+
+
+def get_step_plan(step):
+    """Get plan of step definition in the current dir."""
+    return pypyr.plan.get_step_plan(Step(step), None, ())
+
+# ------------------------- is_static ----------------------------------------#
+
+
+def test_is_static():
+    """Values without formatting expressions are static."""
+    assert pypyr.plan.is_static(1)
+    assert pypyr.plan.is_static('arb')
+    assert pypyr.plan.is_static({'a': ['b', 2]})
+    assert not pypyr.plan.is_static('{arb}')
+    assert not pypyr.plan.is_static({'a': ['b', '{c}']})
+# ------------------------- is_static ----------------------------------------#
+
+# ------------------------- get_foreach_count --------------------------------#
+
+
+def test_get_foreach_count():
+    """Static lists & ranges count, everything else doesn't."""
+    assert pypyr.plan.get_foreach_count(['a', 'b']) == (2, 'foreach 2 items')
+    assert pypyr.plan.get_foreach_count({'range': [2, 10, 2]}) == (
+        4, 'foreach range of 4')
+    assert pypyr.plan.get_foreach_count('{arb}') == (
+        None, 'foreach items evaluate at runtime')
+    assert pypyr.plan.get_foreach_count(['a', '{b}']) == (
+        None, 'foreach items evaluate at runtime')
+    assert pypyr.plan.get_foreach_count({'file': 'x.txt'}) == (
+        None, 'foreach streams from file x.txt')
+# ------------------------- get_foreach_count --------------------------------#
+
+# ------------------------- get_step_plan ------------------------------------#
+
+
+def test_get_step_plan_simple():
+    """Simple step runs once."""
+    assert get_step_plan('pypyr.steps.echo') == {'name': 'pypyr.steps.echo',
+                                                 'runs': 1,
+                                                 'notes': [],
+                                                 'pype': None,
+                                                 'pypeRuns': None}
+
+
+def test_get_step_plan_run_false():
+    """Static run False or skip True runs 0 times."""
+    assert get_step_plan({'name': 'pypyr.steps.echo',
+                          'run': False,
+                          'foreach': [1, 2]})['runs'] == 0
+    assert get_step_plan({'name': 'pypyr.steps.echo',
+                          'skip': True})['notes'] == ['skip is True']
+
+
+def test_get_step_plan_dynamic_conditionals():
+    """Dynamic run counts as running."""
+    plan = get_step_plan({'name': 'pypyr.steps.echo', 'run': '{arb}'})
+    assert plan['runs'] == 1
+    assert plan['notes'] == ['run, skip or swallow evaluate at runtime']
+
+
+def test_get_step_plan_foreach_batch_while():
+    """foreach, batchSize & while multiply runs."""
+    plan = get_step_plan({'name': 'pypyr.steps.echo',
+                          'foreach': {'range': 10},
+                          'batchSize': 4,
+                          'while': {'max': 2, 'stop': '{done}'},
+                          'swallow': True})
+
+    assert plan['runs'] == 6
+    assert plan['notes'] == ['swallows errors',
+                             'foreach range of 10',
+                             'in batches of 4',
+                             'while up to 2 times until {done}']
+
+
+def test_get_step_plan_while_no_max_unknown():
+    """while without static max has unknown runs."""
+    plan = get_step_plan({'name': 'pypyr.steps.echo',
+                          'while': {'stop': '{done}'}})
+
+    assert plan['runs'] is None
+    assert plan['notes'] == ['while until {done}']
+
+
+def test_get_step_plan_pype_dynamic():
+    """pype with dynamic name doesn't expand."""
+    plan = get_step_plan({'name': 'pypyr.steps.pype',
+                          'in': {'pype': {'name': '{child}'}}})
+
+    assert plan['runs'] == 1
+    assert plan['pype'] is None
+    assert plan['pypeRuns'] == 1
+    assert plan['notes'] == ['pype pipeline name evaluates at runtime']
+
+
+def test_get_step_plan_pype_foreach_args():
+    """pype with foreachArgs runs the child once for each."""
+    plan = get_step_plan({'name': 'pypyr.steps.pype',
+                          'in': {'pype': {'name': '{child}',
+                                          'foreachArgs': {'range': 4}}}})
+
+    assert plan['runs'] == 1
+    assert plan['pypeRuns'] == 4
+    assert plan['notes'] == ['pype pipeline name evaluates at runtime',
+                             'pype foreachArgs range of 4']
+
+    plan = get_step_plan({'name': 'pypyr.steps.pype',
+                          'in': {'pype': {'name': '{child}',
+                                          'foreachArgs': '{regions}'}}})
+    assert plan['pypeRuns'] is None
+    assert plan['notes'][-1] == 'pype foreachArgs items evaluate at runtime'
+# ------------------------- get_step_plan ------------------------------------#
+
+# ------------------------- get_plan -----------------------------------------#
+
+
+def test_get_plan_recurses_into_pype(tmp_path):
+    """Plan includes child pipelines & counts their steps."""
+    write_pipeline(tmp_path, 'parent', """\
+steps:
+  - pypyr.steps.echo
+  - name: pypyr.steps.pype
+    foreach: [a, b]
+    in:
+      pype:
+        name: child
+on_success:
+  - pypyr.steps.echo
+on_failure:
+  - pypyr.steps.echo
+  - pypyr.steps.echo
+""")
+    write_pipeline(tmp_path, 'child', """\
+steps:
+  - name: pypyr.steps.echo
+    foreach: [1, 2, 3]
+""")
+
+    plan = pypyr.plan.get_plan('parent', str(tmp_path))
+
+    # echo + 2 * (pype + 3 child echo) + on_success echo. Not on_failure.
+    assert plan['stepRuns'] == 1 + 2 * 4 + 1
+    assert plan['minStepRuns'] == plan['stepRuns']
+    assert plan['groups']['steps'][1]['pype']['stepRuns'] == 3
+    assert len(plan['groups']['on_failure']) == 2
+
+    assert pypyr.plan.format_plan(plan) == [
+        'pipeline parent: 10 step runs.',
+        '  steps:',
+        '    1. pypyr.steps.echo x1',
+        '    2. pypyr.steps.pype x2 (foreach 2 items)',
+        '      pipeline child: 3 step runs.',
+        '        steps:',
+        '          1. pypyr.steps.echo x3 (foreach 3 items)',
+        '  on_success:',
+        '    1. pypyr.steps.echo x1',
+        '  on_failure:',
+        '    1. pypyr.steps.echo x1',
+        '    2. pypyr.steps.echo x1']
+
+
+def test_get_plan_pype_fan_out(tmp_path):
+    """Child pipeline steps count once for each of foreachArgs."""
+    write_pipeline(tmp_path, 'parent', """\
+steps:
+  - name: pypyr.steps.pype
+    foreach: [a, b]
+    in:
+      pype:
+        name: child
+        foreachArgs: [1, 2, 3]
+        parallel: 2
+  - name: pypyr.steps.pype
+    in:
+      pype:
+        name: child
+        foreachArgs: '{regions}'
+""")
+    write_pipeline(tmp_path, 'child', """\
+steps:
+  - pypyr.steps.echo
+  - pypyr.steps.echo
+""")
+
+    plan = pypyr.plan.get_plan('parent', str(tmp_path))
+
+    # 2 * (pype + 3 * 2 child echo) + pype with unknown fan out.
+    assert plan['stepRuns'] is None
+    assert plan['minStepRuns'] == 2 * (1 + 3 * 2) + 1
+    assert pypyr.plan.get_total_runs(plan['groups']['steps'][0]) == (14, 14)
+    assert pypyr.plan.format_plan(plan)[:3] == [
+        'pipeline parent: at least 15 step runs.',
+        '  steps:',
+        '    1. pypyr.steps.pype x2 (foreach 2 items; pype foreachArgs 3 '
+        'items)']
+
+
+def test_get_plan_recursive_pype_unknown(tmp_path):
+    """Recursive pype stops expanding & makes runs unknown."""
+    write_pipeline(tmp_path, 'loop', """\
+steps:
+  - pypyr.steps.echo
+  - name: pypyr.steps.pype
+    in:
+      pype:
+        name: loop
+""")
+
+    plan = pypyr.plan.get_plan('loop', str(tmp_path))
+
+    assert plan['stepRuns'] is None
+    assert plan['minStepRuns'] == 2
+    assert plan['groups']['steps'][1]['notes'] == [
+        'pype loop is recursive, so not expanded']
+    assert pypyr.plan.format_plan(plan)[0] == ('pipeline loop: at least 2 '
+                                               'step runs.')
+
+
+def test_get_plan_missing_modules_raises(tmp_path):
+    """All missing step modules report at once."""
+    write_pipeline(tmp_path, 'missing', """\
+steps:
+  - arb.missing1
+  - pypyr.steps.echo
+on_failure:
+  - arb.missing2
+""")
+
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        pypyr.plan.get_plan('missing', str(tmp_path))
+
+    assert str(err_info.value).startswith(
+        "pipeline missing has 2 error(s):\n")
+    assert 'step module arb.missing1 not found.' in str(err_info.value)
+    assert 'step module arb.missing2 not found.' in str(err_info.value)
+
+
+def test_get_plan_import_error_raises(tmp_path):
+    """Step modules that exist but don't import raise."""
+    write_pipeline(tmp_path, 'importerror', """\
+steps:
+  - arbimporterror
+""")
+    (tmp_path / 'arbimporterror.py').write_text('import arb.nope\n')
+
+    with patch('sys.path', [str(tmp_path)] + sys.path):
+        with pytest.raises(PyModuleNotFoundError):
+            pypyr.plan.get_plan('importerror', str(tmp_path))
+
+
+def test_get_plan_invalid_decorator_raises(tmp_path):
+    """Invalid step decorators all raise at once, with positions."""
+    write_pipeline(tmp_path, 'invalid', """\
+steps:
+  - name: pypyr.steps.echo
+    foreach: [1]
+    batchSize: 0
+    while: {max: 'a'}
+""")
+    path = tmp_path / 'pipelines' / 'invalid.yaml'
+
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        pypyr.plan.get_plan('invalid', str(tmp_path))
+
+    assert str(err_info.value) == (
+        "pipeline invalid has 2 error(s):\n"
+        f"{path}:4:5: steps[0].batchSize: must be an integer of 1 or more, "
+        "not 0.\n"
+        f"{path}:5:13: steps[0].while.max: must be an integer of 1 or more, "
+        "not a.")
+
+
+def test_get_plan_not_map_raises(tmp_path):
+    """Pipeline that isn't a map raises."""
+    write_pipeline(tmp_path, 'list', "- pypyr.steps.echo\n")
+
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        pypyr.plan.get_plan('list', str(tmp_path))
+
+    assert str(err_info.value) == ("pipeline list has 1 error(s):\n"
+                                   f"{tmp_path / 'pipelines' / 'list.yaml'}"
+                                   ":1:1: pipeline must be a map with a "
+                                   "steps sequence.")
+# ------------------------- get_plan -----------------------------------------#
+
+# ------------------------- main ---------------------------------------------#
+
+
+def test_main_prints_plan(tmp_path, capsys):
+    """main prints the plan without running steps."""
+    write_pipeline(tmp_path, 'arb', """\
+steps:
+  - name: pypyr.steps.echo
+    in:
+      echoMe: boom
+""")
+
+    with patch('pypyr.dsl.Step.run_step') as mock_run_step:
+        pypyr.plan.main('arb', str(tmp_path), 50)
+
+    mock_run_step.assert_not_called()
+    assert capsys.readouterr().out == ('pipeline arb: 1 step runs.\n'
+                                       '  steps:\n'
+                                       '    1. pypyr.steps.echo x1\n')
+# ------------------------- main ---------------------------------------------#
@@ -0,0 +1,359 @@
+"""resources.py unit tests."""
+import logging
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from pypyr.errors import PipelineDefinitionError, StepTimeoutError
+import pypyr.resources
+import pypyr.utils.worker
+from pypyr.utils.worker import Worker
+
+# ------------------------- get_limits ---------------------------------------#
+
+
+def test_get_limits_none():
+    """No resources means no limits."""
+    assert pypyr.resources.get_limits(None) == {}
+    assert pypyr.resources.get_limits({}) == {}
+
+
+def test_get_limits():
+    """Limits convert to int."""
+    assert pypyr.resources.get_limits({'db': 2, 'tar': '4'}) == {'db': 2,
+                                                                 'tar': 4}
+
+
+def test_get_limits_not_map():
+    """Resources must be a map."""
+    with pytest.raises(PipelineDefinitionError) as err:
+        pypyr.resources.get_limits(['db'])
+
+    assert str(err.value) == ("resources must be a map of name to how many "
+                              "steps can use it at once.")
+
+
+@pytest.mark.parametrize('limit', [0, -1, 'arb', None, True])
+def test_get_limits_invalid(limit):
+    """Limit must be an int of 1 or more."""
+    with pytest.raises(PipelineDefinitionError) as err:
+        pypyr.resources.get_limits({'db': limit})
+
+    assert str(err.value) == ("resources db must be an integer of 1 or more, "
+                              f"not {limit}.")
+
+# ------------------------- get_limits ---------------------------------------#
+
+# ------------------------- declare ------------------------------------------#
+
+
+def test_declare_no_resources():
+    """Pipeline without resources declares nothing."""
+    with pypyr.resources.declare({'steps': ['arb']}):
+        assert pypyr.resources._resources == {}
+
+    with pypyr.resources.declare('not a pipeline'):
+        assert pypyr.resources._resources == {}
+
+
+def test_declare_removes_after():
+    """Resources only exist for the with block, even if it raises."""
+    with pytest.raises(ValueError):
+        with pypyr.resources.declare({'resources': {'db': 2}}):
+            resource = pypyr.resources._resources['db']
+            assert resource.limit == 2
+            assert resource.declarations == 1
+            raise ValueError('arb')
+
+    assert pypyr.resources._resources == {}
+
+
+def test_declare_nested_keeps_existing_limit():
+    """Nested declare of the same resource keeps the 1st limit."""
+    logger = logging.getLogger('pypyr.resources')
+    with pypyr.resources.declare({'resources': {'db': 2}}):
+        resource = pypyr.resources._resources['db']
+        with patch.object(logger, 'warning') as mock_warning:
+            with pypyr.resources.declare({'resources': {'db': 3, 'tar': 1}}):
+                assert pypyr.resources._resources['db'] is resource
+                assert resource.limit == 2
+                assert resource.declarations == 2
+                assert pypyr.resources._resources['tar'].limit == 1
+
+        mock_warning.assert_called_once_with(
+            "resource db already has limit 2, so ignoring limit 3.")
+        assert resource.declarations == 1
+        assert 'tar' not in pypyr.resources._resources
+
+    assert pypyr.resources._resources == {}
+
+# ------------------------- declare ------------------------------------------#
+
+# ------------------------- use ----------------------------------------------#
+
+
+def test_use_nothing():
+    """Using no resources doesn't need declared resources."""
+    with pypyr.resources.use([]):
+        pass
+
+
+def test_use_undeclared_raises():
+    """Using a resource nobody declared raises."""
+    with pypyr.resources.declare({'resources': {'db': 1}}):
+        with pytest.raises(PipelineDefinitionError) as err:
+            with pypyr.resources.use(['db', 'tar', 'ftp'], user='step1'):
+                pass
+
+        # didn't hold on to db.
+        assert pypyr.resources._resources['db'].in_use == 0
+
+    assert str(err.value) == ("step1 uses resources that no running pipeline "
+                              "declared: ftp, tar. Declare them in the "
+                              "pipeline's resources.")
+
+
+def test_use_holds_and_releases():
+    """Use holds the resource for the with block, even if it raises."""
+    with pypyr.resources.declare({'resources': {'db': 1}}):
+        resource = pypyr.resources._resources['db']
+        with pytest.raises(ValueError):
+            with pypyr.resources.use(['db']):
+                assert pypyr.resources.get_held() == {'db'}
+                assert resource.in_use == 1
+                raise ValueError('arb')
+
+        assert pypyr.resources.get_held() == set()
+        assert resource.in_use == 0
+
+
+def test_use_nested_same_resource_doesnt_wait():
+    """Nested use of a resource the thread holds doesn't wait for itself."""
+    with pypyr.resources.declare({'resources': {'db': 1}}):
+        with pypyr.resources.use(['db']):
+            with pypyr.resources.use(['db']):
+                assert pypyr.resources.get_held() == {'db'}
+
+            # inner use didn't release what outer use holds.
+            assert pypyr.resources.get_held() == {'db'}
+
+        assert pypyr.resources.get_held() == set()
+
+
+def test_use_limits_parallel_steps():
+    """No more than limit workers use the resource at once."""
+    running = []
+    most = []
+    lock = threading.Lock()
+
+    def use():
+        with pypyr.resources.use(['db'], user='step'):
+            with lock:
+                running.append(1)
+                most.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+    with pypyr.resources.declare({'resources': {'db': 2}}):
+        workers = [Worker(use, name=f'w{i}').start() for i in range(6)]
+        for worker in workers:
+            assert worker.wait(5)
+            worker.result()
+
+    assert max(most) == 2
+
+
+def test_use_worker_doesnt_inherit_held():
+    """Worker doesn't hold what the thread that started it holds."""
+    with pypyr.resources.declare({'resources': {'db': 1}}):
+        with pypyr.resources.use(['db']):
+            worker = Worker(pypyr.resources.get_held, name='w').start()
+            assert worker.wait(1)
+            assert worker.result() == set()
+
+
+def fan_out(workers, user_workers=0):
+    """Start workers that each use db, return the most running at once.
+
+    The 1st user_workers workers each start 2 workers of their own that use
+    db, like a pype child that fans out again.
+    """
+    running = []
+    most = []
+    lock = threading.Lock()
+
+    def use():
+        with pypyr.resources.use(['db'], user='step'):
+            with lock:
+                running.append(1)
+                most.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+    def fan_out_again():
+        children = [Worker(use, name='grandchild').start() for _ in range(2)]
+        for child in children:
+            child.wait()
+            child.result()
+
+    started = [Worker(fan_out_again if index < user_workers else use,
+                      name=f'w{index}').start()
+               for index in range(workers)]
+    for worker in started:
+        assert worker.wait(5)
+        worker.result()
+
+    return max(most)
+
+
+def test_use_workers_borrow_held_slot_limit_1():
+    """Workers take turns with the slot their parent holds, no deadlock."""
+    with pypyr.resources.declare({'resources': {'db': 1}}):
+        resource = pypyr.resources._resources['db']
+        with pypyr.resources.use(['db']):
+            assert fan_out(4, user_workers=2) == 1
+            assert resource.in_use == 1
+
+        assert resource.in_use == 0
+
+
+def test_use_workers_borrow_held_slot_limit_2():
+    """Borrowed slot & free slots together still stay in the limit."""
+    with pypyr.resources.declare({'resources': {'db': 2}}):
+        resource = pypyr.resources._resources['db']
+        with pypyr.resources.use(['db']):
+            assert fan_out(6, user_workers=1) == 2
+
+        assert resource.in_use == 0
+
+
+def test_use_workers_without_held_slot():
+    """Workers of a thread that holds nothing stay in the limit."""
+    with pypyr.resources.declare({'resources': {'db': 2}}):
+        assert fan_out(6, user_workers=2) == 2
+        assert pypyr.resources._resources['db'].in_use == 0
+
+
+def test_use_cancelled_while_waiting_raises():
+    """Worker that cancels while it waits stops waiting & raises."""
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with pypyr.resources.use(['db'], user='holder'):
+            holding.set()
+            release.wait(5)
+
+    def use():
+        with pypyr.resources.use(['api', 'db'], user='step'):
+            pass
+
+    with pypyr.resources.declare({'resources': {'api': 1, 'db': 1}}):
+        api = pypyr.resources._resources['api']
+        db = pypyr.resources._resources['db']
+        holder = Worker(hold, name='holder').start()
+        try:
+            assert holding.wait(1)
+
+            worker = Worker(use, name='w').start()
+            assert not worker.wait(0.05)
+            assert api.in_use == 1
+            worker.cancel()
+
+            # doesn't wait for the holder to let go of db.
+            assert worker.wait(1)
+            assert db.in_use == 1
+            with pytest.raises(StepTimeoutError) as err:
+                worker.result()
+
+            assert str(err.value) == ("w cancelled, because it ran out of "
+                                      "time.")
+            # gave back the api slot it got before waiting for db.
+            assert api.in_use == 0
+        finally:
+            release.set()
+            assert holder.wait(1)
+
+        assert db.in_use == 0
+
+
+def test_use_cancelled_before_waiting_raises():
+    """Worker that already cancelled doesn't start waiting."""
+    def use():
+        pypyr.utils.worker.get_current_worker().cancel()
+        with pypyr.resources.use(['db'], user='step'):
+            pass
+
+    with pypyr.resources.declare({'resources': {'db': 1}}):
+        resource = pypyr.resources._resources['db']
+        slot = resource.acquire()
+        try:
+            worker = Worker(use, name='w').start()
+            assert worker.wait(1)
+            with pytest.raises(StepTimeoutError):
+                worker.result()
+        finally:
+            resource.release(slot)
+
+        assert resource.in_use == 0
+
+# ------------------------- use ----------------------------------------------#
+
+# ------------------------- Resource -----------------------------------------#
+
+
+def test_resource_acquire_release():
+    """Slots count up to the limit & back."""
+    resource = pypyr.resources.Resource('db', 2)
+    slot1 = resource.acquire()
+    slot2 = resource.acquire()
+    assert resource.in_use == 2
+    assert resource._take(None) is None
+
+    resource.release(slot1)
+    assert resource.in_use == 1
+    resource.release(slot2)
+    assert resource.in_use == 0
+
+
+def test_resource_borrow():
+    """Borrowing doesn't take another slot, 1 borrower at a time."""
+    resource = pypyr.resources.Resource('db', 1)
+    lender = resource.acquire()
+
+    borrowed = resource.acquire(lender)
+    assert borrowed.lender is lender
+    assert lender.borrowed
+    assert resource.in_use == 1
+    # nobody else can borrow it, & there's no free slot.
+    assert resource._take(lender) is None
+
+    resource.release(borrowed)
+    assert not lender.borrowed
+    assert resource.in_use == 1
+
+    resource.release(lender)
+    assert resource.in_use == 0
+
+
+def test_resource_release_lender_while_borrowed():
+    """Lender's slot only frees once the borrower is done too."""
+    resource = pypyr.resources.Resource('db', 1)
+    lender = resource.acquire()
+    borrowed = resource.acquire(lender)
+    grandchild = resource.acquire(borrowed)
+
+    resource.release(lender)
+    resource.release(borrowed)
+    assert resource.in_use == 1
+    # released slots don't lend anymore.
+    assert resource._take(lender) is None
+    assert resource._take(borrowed) is None
+
+    resource.release(grandchild)
+    assert resource.in_use == 0
+    assert not lender.borrowed
+
+# ------------------------- Resource -----------------------------------------#
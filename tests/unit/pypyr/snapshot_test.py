@@ -0,0 +1,189 @@
+"""snapshot.py unit tests."""
+import datetime
+import pickle
+import threading
+from unittest.mock import patch
+from pypyr.context import Context
+from pypyr.errors import SnapshotError
+import pypyr.snapshot
+from pypyr.utils.compact import CompactDict
+import pytest
+
+# ------------------------- save & load --------------------------------------#
+
+
+def test_save_load_keeps_types(tmp_path):
+    """Values keep their python types & key order."""
+    path = tmp_path / 'context.ctx'
+    context = Context({
+        'str': 'value',
+        'int': 1,
+        'float': 1.5,
+        'none': None,
+        'tuple': (1, 2),
+        'set': {1, 2},
+        'bytes': b'\x00\x01',
+        'date': datetime.date(2020, 1, 2),
+        'nested': {'list': [1, {'a': (3,)}]},
+        'compact': CompactDict({'k': 'v'}),
+        3: 'int key'})
+
+    size = pypyr.snapshot.save(path, context)
+
+    assert size == path.stat().st_size
+    payload = pypyr.snapshot.load(path)
+    assert payload == context
+    assert list(payload) == list(context)
+    assert type(payload) is dict
+    assert type(payload['tuple']) is tuple
+    assert type(payload['set']) is set
+    assert type(payload['compact']) is CompactDict
+
+
+def test_save_keys(tmp_path):
+    """Save only some keys."""
+    path = tmp_path / 'context.ctx'
+    pypyr.snapshot.save(path, {'a': 1, 'b': 2, 'c': 3}, keys=['c', 'a'])
+
+    assert pypyr.snapshot.load(path) == {'c': 3, 'a': 1}
+
+
+def test_save_key_missing_raises(tmp_path):
+    """Save key not in mapping raises without writing."""
+    path = tmp_path / 'context.ctx'
+    with pytest.raises(KeyError):
+        pypyr.snapshot.save(path, {'a': 1}, keys=['b'])
+
+    assert not path.exists()
+
+
+def test_save_unpicklable_raises(tmp_path):
+    """Save values that can't pickle lists all of them."""
+    path = tmp_path / 'context.ctx'
+    with pytest.raises(SnapshotError) as err:
+        pypyr.snapshot.save(path, {'a': 1,
+                                   'lock': threading.Lock(),
+                                   'func': lambda: None})
+
+    assert str(err.value).startswith(
+        f"can't save these keys to snapshot {path}, because they can't "
+        "serialize:\n  lock: TypeError: ")
+    assert '\n  func: ' in str(err.value)
+    assert not path.exists()
+    assert not list(tmp_path.iterdir())
+
+
+def test_save_overwrites_and_makes_dirs(tmp_path):
+    """Save makes parent dirs & overwrites existing snapshot."""
+    path = tmp_path / 'sub' / 'dir' / 'context.ctx'
+    pypyr.snapshot.save(path, {'a': 1})
+    pypyr.snapshot.save(path, {'b': 2})
+
+    assert pypyr.snapshot.load(path) == {'b': 2}
+    assert [p.name for p in path.parent.iterdir()] == ['context.ctx']
+
+
+def test_save_empty(tmp_path):
+    """Empty mapping round-trips."""
+    path = tmp_path / 'context.ctx'
+    pypyr.snapshot.save(path, {})
+
+    assert pypyr.snapshot.load(path) == {}
+
+
+def test_load_keys(tmp_path):
+    """Load only some keys, without unpickling the others."""
+    path = tmp_path / 'context.ctx'
+    pypyr.snapshot.save(path, {'a': 1, 'b': [2], 'c': 3})
+
+    with patch('pickle.loads', wraps=pickle.loads) as mock_loads:
+        assert pypyr.snapshot.load(path, keys=['c', 'b']) == {'b': [2],
+                                                              'c': 3}
+
+    # index, then b & c only.
+    assert mock_loads.call_count == 3
+
+
+def test_load_keys_missing_raises(tmp_path):
+    """Load keys not in snapshot raises."""
+    path = tmp_path / 'context.ctx'
+    pypyr.snapshot.save(path, {'a': 1})
+
+    with pytest.raises(SnapshotError) as err:
+        pypyr.snapshot.load(path, keys=['a', 'b', 'c'])
+
+    assert str(err.value) == f"snapshot {path} doesn't have these keys: b, c"
+
+# ------------------------- END save & load ----------------------------------#
+
+# ------------------------- load errors --------------------------------------#
+
+
+def test_load_not_found(tmp_path):
+    """Load missing file raises."""
+    with pytest.raises(FileNotFoundError):
+        pypyr.snapshot.load(tmp_path / 'nope.ctx')
+
+
+def test_load_empty_file_raises(tmp_path):
+    """Load empty file raises."""
+    path = tmp_path / 'empty.ctx'
+    path.write_bytes(b'')
+
+    with pytest.raises(SnapshotError) as err:
+        pypyr.snapshot.load(path)
+
+    assert str(err.value) == f"{path} is not a pypyr snapshot."
+
+
+def test_load_not_snapshot_raises(tmp_path):
+    """Load file without magic raises."""
+    path = tmp_path / 'context.json'
+    path.write_text('{"key1": "value1", "key2": "value2"}')
+
+    with pytest.raises(SnapshotError) as err:
+        pypyr.snapshot.load(path)
+
+    assert str(err.value) == f"{path} is not a pypyr snapshot."
+
+
+def test_load_truncated_index_raises(tmp_path):
+    """Load file cut off in the index raises."""
+    path = tmp_path / 'context.ctx'
+    pypyr.snapshot.save(path, {'a': 1})
+    path.write_bytes(path.read_bytes()[:20])
+
+    with pytest.raises(SnapshotError) as err:
+        pypyr.snapshot.load(path)
+
+    assert str(err.value) == f"{path} is corrupt: the index is truncated."
+
+
+def test_load_truncated_value_raises(tmp_path):
+    """Load file cut off in the values raises."""
+    path = tmp_path / 'context.ctx'
+    pypyr.snapshot.save(path, {'a': 1, 'b': 'value'})
+    path.write_bytes(path.read_bytes()[:-2])
+
+    with pytest.raises(SnapshotError) as err:
+        pypyr.snapshot.load(path)
+
+    assert str(err.value) == f"{path} is corrupt: b is truncated."
+
+    # a is before the corruption, so still loads on its own.
+    assert pypyr.snapshot.load(path, keys=['a']) == {'a': 1}
+
+
+def test_load_corrupt_value_raises(tmp_path):
+    """Load value that doesn't unpickle raises."""
+    path = tmp_path / 'context.ctx'
+    pypyr.snapshot.save(path, {'a': 'value'})
+    data = path.read_bytes()
+    path.write_bytes(data[:-3] + b'xxx')
+
+    with pytest.raises(SnapshotError) as err:
+        pypyr.snapshot.load(path)
+
+    assert str(err.value).startswith(f"{path} is corrupt: can't read a. ")
+
+# ------------------------- END load errors ----------------------------------#
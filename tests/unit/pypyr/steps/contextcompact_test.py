@@ -0,0 +1,40 @@
+"""contextcompact.py unit tests."""
+from pypyr.context import Context
+from pypyr.errors import KeyNotInContextError
+import pypyr.steps.contextcompact
+from pypyr.utils.compact import CompactDict
+import pytest
+
+
+def test_context_compact_throws_on_empty_context():
+    """context must exist."""
+    with pytest.raises(KeyNotInContextError):
+        pypyr.steps.contextcompact.run_step(Context())
+
+
+def test_context_compact_throws_on_key_missing():
+    """Key to compact must exist in context."""
+    with pytest.raises(KeyNotInContextError):
+        pypyr.steps.contextcompact.run_step(
+            Context({'contextCompact': ['arbkey']}))
+
+
+def test_context_compact_pass():
+    """contextCompact compacts only the listed keys."""
+    context = Context({
+        'key1': [{'name': 'one', 'value': 1}, {'name': 'two', 'value': 2}],
+        'key2': {'k2': ['v2']},
+        'contextCompact': ['key1']
+    })
+
+    pypyr.steps.contextcompact.run_step(context)
+
+    assert isinstance(context['key1'], tuple)
+    assert isinstance(context['key1'][0], CompactDict)
+    assert context['key1'] == ({'name': 'one', 'value': 1},
+                               {'name': 'two', 'value': 2})
+    assert context['key2'] == {'k2': ['v2']}
+    assert isinstance(context['key2'], dict)
+
+    # formatting expressions still work on compacted values.
+    assert context.get_formatted_string('{key1[1][name]}') == 'two'
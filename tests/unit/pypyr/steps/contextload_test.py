@@ -0,0 +1,80 @@
+"""contextload.py unit tests."""
+import datetime
+from pypyr.context import Context
+from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
+from pypyr.errors import SnapshotError
+import pypyr.snapshot
+import pypyr.steps.contextload
+import pytest
+
+
+def test_contextload_no_path_raises():
+    """No contextLoadPath raises."""
+    context = Context({'k1': 'v1'})
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        pypyr.steps.contextload.run_step(context)
+
+    assert str(err_info.value) == (
+        "context['contextLoadPath'] doesn't exist. It must exist for "
+        "pypyr.steps.contextload.")
+
+
+def test_contextload_empty_path_raises():
+    """Empty contextLoadPath raises."""
+    context = Context({'contextLoadPath': None})
+
+    with pytest.raises(KeyInContextHasNoValueError):
+        pypyr.steps.contextload.run_step(context)
+
+
+def test_contextload_all(tmp_path):
+    """Load all keys from formatted path, overwriting existing keys."""
+    pypyr.snapshot.save(tmp_path / 'in.ctx',
+                        {'k1': 'new', 'k2': datetime.date(2020, 1, 2)})
+    context = Context({'dir': str(tmp_path),
+                       'k1': 'old',
+                       'k3': 'v3',
+                       'contextLoadPath': '{dir}/in.ctx'})
+
+    pypyr.steps.contextload.run_step(context)
+
+    assert context == {'dir': str(tmp_path),
+                       'k1': 'new',
+                       'k2': datetime.date(2020, 1, 2),
+                       'k3': 'v3',
+                       'contextLoadPath': '{dir}/in.ctx'}
+
+
+def test_contextload_keys(tmp_path):
+    """Load only contextLoadKeys, formatted."""
+    pypyr.snapshot.save(tmp_path / 'in.ctx', {'k1': 1, 'k2': 2, 'k3': 3})
+    context = Context({'key': 'k3',
+                       'contextLoadPath': str(tmp_path / 'in.ctx'),
+                       'contextLoadKeys': ['k1', '{key}']})
+
+    pypyr.steps.contextload.run_step(context)
+
+    assert context['k1'] == 1
+    assert 'k2' not in context
+    assert context['k3'] == 3
+
+
+def test_contextload_keys_missing_raises(tmp_path):
+    """contextLoadKeys not in snapshot raises & leaves context alone."""
+    pypyr.snapshot.save(tmp_path / 'in.ctx', {'k1': 1})
+    context = Context({'contextLoadPath': str(tmp_path / 'in.ctx'),
+                       'contextLoadKeys': ['k1', 'k2']})
+
+    with pytest.raises(SnapshotError):
+        pypyr.steps.contextload.run_step(context)
+
+    assert 'k1' not in context
+
+
+def test_contextload_not_found_raises(tmp_path):
+    """Missing snapshot raises."""
+    context = Context({'contextLoadPath': str(tmp_path / 'nope.ctx')})
+
+    with pytest.raises(FileNotFoundError):
+        pypyr.steps.contextload.run_step(context)
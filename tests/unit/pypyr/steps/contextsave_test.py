@@ -0,0 +1,74 @@
+"""contextsave.py unit tests."""
+import threading
+from pypyr.context import Context
+from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
+from pypyr.errors import SnapshotError
+import pypyr.snapshot
+import pypyr.steps.contextsave
+import pytest
+
+
+def test_contextsave_no_path_raises():
+    """No contextSavePath raises."""
+    context = Context({'k1': 'v1'})
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        pypyr.steps.contextsave.run_step(context)
+
+    assert str(err_info.value) == (
+        "context['contextSavePath'] doesn't exist. It must exist for "
+        "pypyr.steps.contextsave.")
+
+
+def test_contextsave_empty_path_raises():
+    """Empty contextSavePath raises."""
+    context = Context({'contextSavePath': None})
+
+    with pytest.raises(KeyInContextHasNoValueError):
+        pypyr.steps.contextsave.run_step(context)
+
+
+def test_contextsave_all(tmp_path):
+    """Save all of context to formatted path."""
+    context = Context({'dir': str(tmp_path),
+                       'k1': (1, 2),
+                       'contextSavePath': '{dir}/out.ctx'})
+
+    pypyr.steps.contextsave.run_step(context)
+
+    assert pypyr.snapshot.load(tmp_path / 'out.ctx') == context
+
+
+def test_contextsave_keys(tmp_path):
+    """Save only contextSaveKeys, formatted."""
+    context = Context({'k1': 'v1',
+                       'k2': {'a': 'b'},
+                       'k3': 'v3',
+                       'key': 'k3',
+                       'contextSavePath': str(tmp_path / 'out.ctx'),
+                       'contextSaveKeys': ['k2', '{key}']})
+
+    pypyr.steps.contextsave.run_step(context)
+
+    assert pypyr.snapshot.load(tmp_path / 'out.ctx') == {'k2': {'a': 'b'},
+                                                         'k3': 'v3'}
+
+
+def test_contextsave_keys_missing_raises(tmp_path):
+    """contextSaveKeys not in context raises."""
+    context = Context({'contextSavePath': str(tmp_path / 'out.ctx'),
+                       'contextSaveKeys': ['nope']})
+
+    with pytest.raises(KeyNotInContextError):
+        pypyr.steps.contextsave.run_step(context)
+
+    assert not (tmp_path / 'out.ctx').exists()
+
+
+def test_contextsave_unpicklable_raises(tmp_path):
+    """Value that can't serialize raises."""
+    context = Context({'lock': threading.Lock(),
+                       'contextSavePath': str(tmp_path / 'out.ctx')})
+
+    with pytest.raises(SnapshotError):
+        pypyr.steps.contextsave.run_step(context)
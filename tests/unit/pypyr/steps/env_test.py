@@ -1,6 +1,7 @@
 """env.py unit tests."""
 import os
 from pypyr.context import Context
+from pypyr.errors import KeyNotInContextError
 import pypyr.steps.env
 import pytest
 from unittest.mock import patch, DEFAULT
@@ -284,6 +285,23 @@ def test_envset_with_string_interpolation():
     del os.environ['ARB_DELETE_ME2']
     del os.environ['ARB_DELETE_ME3']
 
+
+def test_envset_format_error_sets_nothing():
+    """envSet doesn't set any $ENV if a value doesn't format."""
+    context = Context({
+        'key1': 'value1',
+        'envSet': {
+            'ARB_DELETE_ME1': '{key1}',
+            'ARB_DELETE_ME2': '{key2}'
+        }
+    })
+
+    with pytest.raises(KeyNotInContextError):
+        pypyr.steps.env.env_set(context)
+
+    assert 'ARB_DELETE_ME1' not in os.environ
+    assert 'ARB_DELETE_ME2' not in os.environ
+
 # ------------------------- envSet -------------------------------------------#
 
 # ------------------------- envUnset -----------------------------------------#
@@ -1,7 +1,10 @@
 """fetchjson.py unit tests."""
+from unittest.mock import patch
 from pypyr.context import Context
 from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
 import pypyr.steps.fetchjson as filefetcher
+import pypyr.utils.fetch
+from pypyr.utils.compact import CompactDict
 import pytest
 
 
@@ -71,3 +74,92 @@ def test_json_pass_with_path_substitution():
     assert context["key1"] == "value1", "key1 should be value2"
     assert context["key2"] == "value2", "key2 should be value2"
     assert context["key3"] == "value3", "key3 should be value2"
+
+
+def test_json_pass_compact():
+    """fetchJsonCompact compacts the values loaded from json."""
+    context = Context({
+        'fetchJsonPath': './tests/testfiles/testsubst.json',
+        'fetchJsonCompact': True})
+
+    filefetcher.run_step(context)
+
+    assert context['key1'] == '{k1}value !£$% *'
+    value = context['key2_{k2}']
+    assert isinstance(value, CompactDict)
+    assert value['def'] == ('l1', 'l2 {k5}', 'l3')
+
+
+def test_json_pass_list_and_glob():
+    """List of paths & globs merge in order, later files win."""
+    context = Context({
+        'fetchJsonPath': ['./tests/testfiles/test*.json',
+                          './tests/testfiles/test.json']})
+
+    filefetcher.run_step(context)
+
+    # test.json, testsubst.json, then test.json again.
+    assert context['key1'] == 'value1'
+    assert context['key2'] == 'value2'
+    assert context['key2_{k2}']['def'] == ['l1', 'l2 {k5}', 'l3']
+
+
+def test_json_merge_strategy():
+    """fetchJsonMerge merge merges into existing values with formatting."""
+    context = Context({
+        'k1': 'v1',
+        'k2': 'v2',
+        'k3': 'v3',
+        'k4': 'v4',
+        'k5': 'v5',
+        'key2_v2': {'existing': 'value', 'def': ['l0']},
+        'fetchJsonPath': './tests/testfiles/testsubst.json',
+        'fetchJsonMerge': '{mergeStrategy}',
+        'mergeStrategy': 'merge'})
+
+    filefetcher.run_step(context)
+
+    assert context['key1'] == 'v1value !£$% *'
+    assert context['key2_v2'] == {'existing': 'value',
+                                  'k21': 'value',
+                                  'abc': 'v3 def v4',
+                                  'def': ['l0', 'l1', 'l2 v5', 'l3']}
+
+
+def test_json_merge_strategy_bad_raises():
+    """Unknown fetchJsonMerge raises before loading."""
+    context = Context({
+        'fetchJsonPath': './tests/testfiles/test.json',
+        'fetchJsonMerge': 'deep'})
+
+    with patch('pypyr.utils.fetch.load_all') as mock_load:
+        with pytest.raises(ValueError) as err_info:
+            filefetcher.run_step(context)
+
+    assert str(err_info.value) == ("fetchJsonMerge must be update or merge, "
+                                   "not deep.")
+    mock_load.assert_not_called()
+
+
+def test_json_parallel():
+    """Many files parse on threads, unless fetchJsonParallel is off."""
+    paths = ['./tests/testfiles/test.json', './tests/testfiles/test.json']
+    context = Context({'fetchJsonPath': paths})
+
+    with patch('pypyr.utils.fetch.load_all',
+               return_value=[{'a': 1}, {'a': 2}]) as mock_load:
+        filefetcher.run_step(context)
+
+    mock_load.assert_called_once_with(paths,
+                                      pypyr.utils.fetch.load_json,
+                                      executor='thread')
+    assert context['a'] == 2
+
+    context['fetchJsonParallel'] = False
+    with patch('pypyr.utils.fetch.load_all',
+               return_value=[{'a': 1}, {'a': 2}]) as mock_load:
+        filefetcher.run_step(context)
+
+    mock_load.assert_called_once_with(paths,
+                                      pypyr.utils.fetch.load_json,
+                                      executor=None)
@@ -0,0 +1,250 @@
+"""fetchurl.py unit tests."""
+import http.server
+import threading
+from unittest.mock import patch
+from pypyr.context import Context
+from pypyr.errors import HttpError, KeyInContextHasNoValueError
+from pypyr.errors import KeyNotInContextError
+import pypyr.steps.fetchurl as fetchurl
+import pytest
+
+# path: body the local server serves, with an ETag.
+PAGES = {
+    '/a.json': b'{"k1": "a1", "k2": "a2"}',
+    '/b.json': b'{"k2": "b2", "k3": ["b3"]}',
+    '/c.yaml': b'k1: c1\nk4:\n  - c4\n',
+    '/list.json': b'[1, 2]',
+}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Serve PAGES with ETags & 304s."""
+
+    protocol_version = 'HTTP/1.1'
+    # headers & body are separate writes. Don't wait for ack in between.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """Handle GET."""
+        self.server.requests.append((self.path, dict(self.headers)))
+        body = PAGES.get(self.path, None)
+        if body is None:
+            status, body = 404, b''
+        elif self.headers.get('If-None-Match') == f'"{self.path}"':
+            status, body = 304, b''
+        else:
+            status = 200
+
+        self.send_response(status)
+        if status == 200:
+            self.send_header('ETag', f'"{self.path}"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Don't log to stderr."""
+
+
+@pytest.fixture
+def server():
+    """Run the local http server for the test."""
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.daemon_threads = True
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever,
+                              kwargs={'poll_interval': 0.01},
+                              daemon=True)
+    thread.start()
+    httpd.url = f'http://127.0.0.1:{httpd.server_address[1]}'
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get_context(tmp_path, input_dict):
+    """Get context with working_dir in tmp_path."""
+    context = Context(input_dict)
+    context.working_dir = str(tmp_path)
+    return context
+
+
+def test_fetchurl_no_url_raises():
+    """No url raises."""
+    context = Context({'k1': 'v1'})
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        fetchurl.run_step(context)
+
+    assert str(err_info.value) == ("context['fetchUrl'] doesn't exist. It "
+                                   "must exist for pypyr.steps.fetchurl.")
+
+
+def test_fetchurl_empty_url_raises():
+    """Empty url raises."""
+    context = Context({'fetchUrl': None})
+
+    with pytest.raises(KeyInContextHasNoValueError) as err_info:
+        fetchurl.run_step(context)
+
+    assert str(err_info.value) == ("context['fetchUrl'] must have a value "
+                                   "for pypyr.steps.fetchurl.")
+
+
+def test_fetchurl_bad_parse_raises():
+    """Parse not json or yaml raises before fetching."""
+    context = Context({'fetchUrl': 'http://arb/', 'fetchUrlParse': 'xml'})
+
+    with patch('pypyr.utils.http.fetch_all') as mock_fetch:
+        with pytest.raises(ValueError) as err_info:
+            fetchurl.run_step(context)
+
+    assert str(err_info.value) == (
+        "fetchUrlParse must be json or yaml, not xml.")
+    mock_fetch.assert_not_called()
+
+
+def test_fetchurl_json(server, tmp_path):
+    """Single json url merges into context."""
+    context = get_context(tmp_path, {
+        'k1': 'v1',
+        'host': server.url,
+        'fetchUrl': '{host}/a.json'})
+
+    fetchurl.run_step(context)
+
+    assert context['k1'] == 'a1'
+    assert context['k2'] == 'a2'
+    assert context['fetchUrl'] == '{host}/a.json'
+
+
+def test_fetchurl_many_in_order(server, tmp_path):
+    """Many urls merge in url order, so later urls win."""
+    context = get_context(tmp_path, {
+        'host': server.url,
+        'fetchUrl': ['{host}/a.json', '{host}/b.json'],
+        'fetchUrlParallel': 2})
+
+    fetchurl.run_step(context)
+
+    assert context['k1'] == 'a1'
+    assert context['k2'] == 'b2'
+    assert context['k3'] == ['b3']
+
+
+def test_fetchurl_yaml(server, tmp_path):
+    """Yaml parse merges into context."""
+    context = get_context(tmp_path, {
+        'fetchUrl': f'{server.url}/c.yaml',
+        'fetchUrlParse': 'yaml'})
+
+    fetchurl.run_step(context)
+
+    assert context['k1'] == 'c1'
+    assert context['k4'] == ['c4']
+
+
+def test_fetchurl_compact(server, tmp_path):
+    """Compact loads read-only values."""
+    context = get_context(tmp_path, {
+        'fetchUrl': f'{server.url}/b.json',
+        'fetchUrlCompact': True})
+
+    fetchurl.run_step(context)
+
+    assert context['k2'] == 'b2'
+    assert context['k3'] == ('b3',)
+
+
+def test_fetchurl_not_map_raises(server, tmp_path):
+    """Top level list raises."""
+    context = get_context(tmp_path, {'fetchUrl': f'{server.url}/list.json'})
+
+    with pytest.raises(TypeError) as err_info:
+        fetchurl.run_step(context)
+
+    assert str(err_info.value) == (
+        f"{server.url}/list.json should describe a map at the top level, not "
+        "a list or a single value.")
+
+
+def test_fetchurl_404_raises(server, tmp_path):
+    """Error status raises."""
+    context = get_context(tmp_path, {'fetchUrl': f'{server.url}/nope'})
+
+    with pytest.raises(HttpError):
+        fetchurl.run_step(context)
+
+
+def test_fetchurl_cache_revalidates(server, tmp_path):
+    """Second fetch revalidates from cache in working dir."""
+    context = get_context(tmp_path, {'fetchUrl': f'{server.url}/a.json'})
+
+    fetchurl.run_step(context)
+    context['k1'] = 'changed'
+    fetchurl.run_step(context)
+
+    assert context['k1'] == 'a1'
+    assert 'If-None-Match' not in server.requests[0][1]
+    assert server.requests[1][1]['If-None-Match'] == '"/a.json"'
+    assert list((tmp_path / '.pypyr' / 'http').iterdir())
+
+
+def test_fetchurl_no_cache(server, tmp_path):
+    """Cache off doesn't save or revalidate."""
+    context = get_context(tmp_path, {'fetchUrl': f'{server.url}/a.json',
+                                     'fetchUrlCache': False})
+
+    fetchurl.run_step(context)
+    fetchurl.run_step(context)
+
+    assert 'If-None-Match' not in server.requests[1][1]
+    assert not (tmp_path / '.pypyr').exists()
+
+
+def test_fetchurl_args():
+    """Headers, timeout & parallel format & pass to fetch_all."""
+    context = Context({'token': 'secret',
+                       'fetchUrl': ['http://arb/1', 'http://arb/2'],
+                       'fetchUrlHeaders': {'Authorization': 'Bearer {token}'},
+                       'fetchUrlTimeout': '2.5',
+                       'fetchUrlParallel': '3',
+                       'fetchUrlCache': False})
+
+    with patch('pypyr.utils.http.fetch_all',
+               return_value=[b'{"a": 1}', b'{"b": 2}']) as mock_fetch:
+        fetchurl.run_step(context)
+
+    mock_fetch.assert_called_once_with(['http://arb/1', 'http://arb/2'],
+                                       parallel=3,
+                                       headers={'Authorization':
+                                                'Bearer secret'},
+                                       timeout=2.5,
+                                       cache=None)
+    assert context['a'] == 1
+    assert context['b'] == 2
+
+
+def test_fetchurl_merge_strategy():
+    """fetchUrlMerge merge merges into existing values."""
+    context = Context({'k3': ['existing'],
+                       'fetchUrl': ['http://arb/1', 'http://arb/2'],
+                       'fetchUrlMerge': 'merge',
+                       'fetchUrlCache': False})
+
+    with patch('pypyr.utils.http.fetch_all',
+               return_value=[b'{"k3": ["b3"]}', b'{"k3": ["c3"]}']):
+        fetchurl.run_step(context)
+
+    assert context['k3'] == ['existing', 'b3', 'c3']
+
+
+def test_fetchurl_merge_strategy_bad_raises():
+    """Unknown fetchUrlMerge raises."""
+    context = Context({'fetchUrl': 'http://arb/', 'fetchUrlMerge': 'deep'})
+
+    with pytest.raises(ValueError) as err_info:
+        fetchurl.run_step(context)
+
+    assert str(err_info.value) == (
+        "fetchUrlMerge must be update or merge, not deep.")
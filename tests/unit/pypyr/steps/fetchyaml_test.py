@@ -1,7 +1,10 @@
 """fetchyaml.py unit tests."""
+from unittest.mock import patch
 from pypyr.context import Context
 from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
 import pypyr.steps.fetchyaml as filefetcher
+import pypyr.utils.fetch
+from pypyr.utils.compact import CompactDict
 import pytest
 
 
@@ -87,3 +90,88 @@ def test_fetchyaml_list_fails():
 
     with pytest.raises(TypeError):
         filefetcher.run_step(context)
+
+
+def test_fetchyaml_pass_compact():
+    """fetchYamlCompact compacts the values loaded from yaml."""
+    context = Context({
+        'fetchYamlPath': './tests/testfiles/dict.yaml',
+        'fetchYamlCompact': '{compact}',
+        'compact': True})
+
+    filefetcher.run_step(context)
+
+    assert context['key2'] == 'value2'
+    assert isinstance(context['key4'], CompactDict)
+    assert context['key4']['k42'] == ('k42list1', 'k42list2', 'k42list3')
+    assert context['key5'] == ('k5list1', 'k5list2')
+
+
+def test_fetchyaml_pass_list_and_glob():
+    """List of paths & globs merge in order, on the process pool."""
+    context = Context({
+        'fetchYamlPath': ['./tests/testfiles/dict.yaml',
+                          './tests/testfiles/test*.yaml']})
+
+    filefetcher.run_step(context)
+
+    # dict.yaml, test.yaml, then testsubst.yaml.
+    assert context['key1'] == 'value1'
+    assert context['key2'] == 'blah'
+    assert context['key4']['k43'] is True
+    assert context['key'] == '{k1}value1 !£$%# *'
+    assert context['key2{k2}'] == 'blah'
+
+
+def test_fetchyaml_merge_strategy():
+    """fetchYamlMerge merge merges nested maps & lists into context."""
+    context = Context({
+        'key4': {'k40': 'existing', 'k42': ['k42list0']},
+        'key5': ['k5list0'],
+        'fetchYamlPath': './tests/testfiles/dict.yaml',
+        'fetchYamlMerge': 'merge'})
+
+    filefetcher.run_step(context)
+
+    assert context['key4']['k40'] == 'existing'
+    assert context['key4']['k41'] == 'k41value'
+    assert context['key4']['k42'] == ['k42list0', 'k42list1', 'k42list2',
+                                      'k42list3']
+    assert context['key5'] == ['k5list0', 'k5list1', 'k5list2']
+
+
+def test_fetchyaml_merge_strategy_bad_raises():
+    """Unknown fetchYamlMerge raises."""
+    context = Context({
+        'fetchYamlPath': './tests/testfiles/dict.yaml',
+        'fetchYamlMerge': 'deep'})
+
+    with pytest.raises(ValueError) as err_info:
+        filefetcher.run_step(context)
+
+    assert str(err_info.value) == ("fetchYamlMerge must be update or merge, "
+                                   "not deep.")
+
+
+def test_fetchyaml_parallel():
+    """Many files parse on processes, unless fetchYamlParallel is off."""
+    paths = ['./tests/testfiles/dict.yaml', './tests/testfiles/dict.yaml']
+    context = Context({'fetchYamlPath': paths})
+
+    with patch('pypyr.utils.fetch.load_all',
+               return_value=[{'a': 1}, {'a': 2}]) as mock_load:
+        filefetcher.run_step(context)
+
+    mock_load.assert_called_once_with(paths,
+                                      pypyr.utils.fetch.load_yaml,
+                                      executor='process')
+    assert context['a'] == 2
+
+    context['fetchYamlParallel'] = False
+    with patch('pypyr.utils.fetch.load_all',
+               return_value=[{'a': 1}, {'a': 2}]) as mock_load:
+        filefetcher.run_step(context)
+
+    mock_load.assert_called_once_with(paths,
+                                      pypyr.utils.fetch.load_yaml,
+                                      executor=None)
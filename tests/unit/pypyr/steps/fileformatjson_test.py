@@ -4,6 +4,7 @@ import json
 from pypyr.context import Context
 from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
 import pypyr.steps.fileformatjson as fileformat
+from pypyr.utils.compact import CompactDict
 import pytest
 
 
@@ -188,3 +189,23 @@ def test_fileformatjson_pass_with_path_substitutions():
 def teardown_module(module):
     """Teardown"""
     os.rmdir('./tests/testfiles/out/')
+
+
+def test_fileformatjson_pass_with_compact_values(tmp_path):
+    """Compacted context values write out as maps & sequences."""
+    in_path = tmp_path / 'in.json'
+    in_path.write_text('{"a": "{k1}", "b": "{k2}"}')
+    out_path = tmp_path / 'out.json'
+    context = Context({
+        'k1': CompactDict({'x': ('y', 'z'), 'w': CompactDict({'v': 1})}),
+        'k2': ('l1', 'l2'),
+        'fileFormatJsonIn': str(in_path),
+        'fileFormatJsonOut': str(out_path)})
+
+    fileformat.run_step(context)
+
+    with open(out_path) as outfile:
+        outcontents = json.load(outfile)
+
+    assert outcontents == {'a': {'x': ['y', 'z'], 'w': {'v': 1}},
+                           'b': ['l1', 'l2']}
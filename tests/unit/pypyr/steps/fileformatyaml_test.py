@@ -3,6 +3,7 @@ import os
 from pypyr.context import Context
 from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
 import pypyr.steps.fileformatyaml as fileformat
+from pypyr.utils.compact import CompactDict
 import pytest
 import ruamel.yaml as yaml
 
@@ -204,3 +205,23 @@ def test_fileformatyaml_pass_with_path_substitutions():
 def teardown_module(module):
     """Teardown"""
     os.rmdir('./tests/testfiles/out/')
+
+
+def test_fileformatyaml_pass_with_compact_values(tmp_path):
+    """Compacted context values write out as maps & sequences."""
+    in_path = tmp_path / 'in.yaml'
+    in_path.write_text("a: '{k1}'\nb: '{k2}'\n")
+    out_path = tmp_path / 'out.yaml'
+    context = Context({
+        'k1': CompactDict({'x': ('y', 'z'), 'w': CompactDict({'v': 1})}),
+        'k2': ('l1', 'l2'),
+        'fileFormatYamlIn': str(in_path),
+        'fileFormatYamlOut': str(out_path)})
+
+    fileformat.run_step(context)
+
+    with open(out_path) as outfile:
+        outcontents = yaml.YAML(typ='safe', pure=True).load(outfile)
+
+    assert outcontents == {'a': {'x': ['y', 'z'], 'w': {'v': 1}},
+                           'b': ['l1', 'l2']}
@@ -1,9 +1,12 @@
 """tar.py unit tests."""
 import logging
+import threading
+import time
 import pytest
 from unittest.mock import call, patch
 from pypyr.context import Context
 from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
+import pypyr.pipelinerunner
 import pypyr.steps.pype as pype
 
 # ------------------------ get_arguments --------------------------------------
@@ -267,3 +270,286 @@ def test_pype_use_parent_context_with_swallow(mock_run_pipeline):
     mock_logger_error.assert_called_once_with(
         'Something went wrong pyping pipe name. RuntimeError: whoops')
     # ------------------------ run_step --------------------------------------
+
+# ------------------------ fan out --------------------------------------------
+
+
+def test_pype_get_fan_out_arguments_none():
+    """No foreachArgs means no fan out."""
+    context = Context({'pype': {'name': 'pipe name', 'parallel': 3}})
+
+    assert pype.get_fan_out_arguments(context) == (None, 1, None)
+
+
+def test_pype_get_fan_out_arguments_formats():
+    """foreachArgs & parallel format from context."""
+    context = Context({'items': ['a', 'b'],
+                       'n': '4',
+                       'pype': {'name': 'pipe name',
+                                'foreachArgs': '{items}',
+                                'parallel': '{n}',
+                                'resultsKey': 'out'}})
+
+    assert pype.get_fan_out_arguments(context) == (['a', 'b'], 4, 'out')
+
+
+def test_pype_get_fan_out_arguments_defaults():
+    """parallel defaults to 1 & resultsKey to pypeResults."""
+    context = Context({'pype': {'name': 'pipe name',
+                                'foreachArgs': {'range': 3}}})
+
+    foreach_args, parallel, results_key = pype.get_fan_out_arguments(context)
+
+    assert list(foreach_args) == [0, 1, 2]
+    assert parallel == 1
+    assert results_key == 'pypeResults'
+
+
+def test_pype_get_fan_out_arguments_parallel_invalid():
+    """parallel must be 1 or more."""
+    context = Context({'pype': {'name': 'pipe name',
+                                'foreachArgs': ['a'],
+                                'parallel': 0}})
+
+    with pytest.raises(ValueError) as err_info:
+        pype.get_fan_out_arguments(context)
+
+    assert str(err_info.value) == "pype parallel must be 1 or more, not 0."
+
+
+def child_pipeline(pipeline_name, pipeline_context_input, context,
+                   parse_input, pipeline_definition):
+    """Stand-in for run_pipeline that records what the child saw."""
+    context['seen'] = (context['i'], 'parent' in context,
+                       pipeline_definition['steps'])
+    context['out'] = context['i'] * 2
+
+
+@patch('pypyr.pipelinerunner.run_pipeline', side_effect=child_pipeline)
+@patch('pypyr.pipelinerunner.get_pipeline_definition',
+       return_value={'steps': ['step']})
+def test_pype_fan_out_use_parent_context(mock_get_pipe_def,
+                                         mock_run_pipeline):
+    """Each child gets its own fork of context, results in item order."""
+    context = Context({'parent': 'value',
+                       'pype': {'name': 'pipe name',
+                                'foreachArgs': [1, 2, 3],
+                                'parallel': 2}})
+    context.working_dir = 'arb/dir'
+
+    pype.run_step(context)
+
+    # parsed once only, but each child has its own copy.
+    mock_get_pipe_def.assert_called_once_with(pipeline_name='pipe name',
+                                              working_dir='arb/dir')
+    definitions = [kwargs['pipeline_definition']
+                   for _, kwargs in mock_run_pipeline.call_args_list]
+    assert len(definitions) == 3
+    assert len({id(definition) for definition in definitions}) == 3
+
+    assert context['pypeResults'] == [
+        {'seen': (1, True, ['step']), 'out': 2},
+        {'seen': (2, True, ['step']), 'out': 4},
+        {'seen': (3, True, ['step']), 'out': 6}]
+
+    # children's changes don't leak into the parent.
+    assert 'i' not in context
+    assert 'out' not in context
+    assert context['parent'] == 'value'
+
+
+@patch('pypyr.pipelinerunner.run_pipeline', side_effect=child_pipeline)
+@patch('pypyr.pipelinerunner.get_pipeline_definition',
+       return_value={'steps': ['step']})
+def test_pype_fan_out_no_parent_context(mock_get_pipe_def, mock_run_pipeline):
+    """Without parent context the child only gets its item."""
+    context = Context({'parent': 'value',
+                       'pype': {'name': 'pipe name',
+                                'pipeArg': 'arg',
+                                'foreachArgs': [1],
+                                'useParentContext': False,
+                                'skipParse': False,
+                                'resultsKey': 'out'}})
+    context.working_dir = 'arb/dir'
+
+    pype.run_step(context)
+
+    assert context['out'] == [{'seen': (1, False, ['step']), 'out': 2}]
+    child_context = mock_run_pipeline.call_args[1]['context']
+    assert child_context.working_dir == 'arb/dir'
+    assert mock_run_pipeline.call_args[1]['pipeline_context_input'] == 'arg'
+    assert mock_run_pipeline.call_args[1]['parse_input']
+
+
+@patch('pypyr.pipelinerunner.get_pipeline_definition',
+       return_value={'steps': ['step']})
+def test_pype_fan_out_parallel_limit(mock_get_pipe_def):
+    """No more than parallel children run at once, on other threads."""
+    running = []
+    most = []
+    threads = set()
+    lock = threading.Lock()
+
+    def run_pipeline(context, **kwargs):
+        with lock:
+            running.append(1)
+            most.append(len(running))
+            threads.add(threading.current_thread())
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+
+    context = Context({'pype': {'name': 'pipe name',
+                                'foreachArgs': list(range(8)),
+                                'parallel': 3}})
+    context.working_dir = 'arb/dir'
+
+    with patch('pypyr.pipelinerunner.run_pipeline', side_effect=run_pipeline):
+        pype.run_step(context)
+
+    assert max(most) == 3
+    assert len(threads) == 3
+    assert threading.current_thread() not in threads
+    assert context['pypeResults'] == [{}] * 8
+
+
+@patch('pypyr.pipelinerunner.get_pipeline_definition',
+       return_value={'steps': ['step']})
+def test_pype_fan_out_error_stops_and_raises(mock_get_pipe_def):
+    """1st error raises once running children finish, no more start."""
+    def run_pipeline(context, **kwargs):
+        if context['i'] in (1, 2):
+            raise ValueError(f"boom {context['i']}")
+
+        context['ok'] = context['i']
+
+    context = Context({'pype': {'name': 'pipe name',
+                                'foreachArgs': [0, 1, 2, 3, 4]}})
+    context.working_dir = 'arb/dir'
+
+    logger = logging.getLogger('pypyr.steps.pype')
+    with patch('pypyr.pipelinerunner.run_pipeline',
+               side_effect=run_pipeline) as mock_run_pipeline:
+        with patch.object(logger, 'error') as mock_logger_error:
+            with pytest.raises(ValueError) as err_info:
+                pype.run_step(context)
+
+    assert str(err_info.value) == 'boom 1'
+    assert mock_run_pipeline.call_count == 2
+    mock_logger_error.assert_called_once_with(
+        'Something went wrong pyping pipe name for item 1. ValueError: '
+        'boom 1')
+    assert context['pypeResults'] == [{'ok': 0}, None]
+
+
+@patch('pypyr.pipelinerunner.get_pipeline_definition',
+       return_value={'steps': ['step']})
+def test_pype_fan_out_swallow(mock_get_pipe_def):
+    """raiseError False runs all children & logs the errors."""
+    def run_pipeline(context, **kwargs):
+        if context['i'] == 1:
+            raise ValueError('boom')
+
+        context['ok'] = context['i']
+
+    context = Context({'pype': {'name': 'pipe name',
+                                'foreachArgs': [0, 1, 2],
+                                'parallel': 2,
+                                'raiseError': False}})
+    context.working_dir = 'arb/dir'
+
+    with patch('pypyr.pipelinerunner.run_pipeline', side_effect=run_pipeline):
+        pype.run_step(context)
+
+    assert context['pypeResults'] == [{'ok': 0}, None, {'ok': 2}]
+
+
+def test_pype_fan_out_pipeline(tmp_path):
+    """Fan out runs a real child pipeline for each item."""
+    (tmp_path / 'pipelines').mkdir()
+    (tmp_path / 'pipelines' / 'child.yaml').write_text("""\
+steps:
+  - name: pypyr.steps.py
+    in:
+      pycode: context['squared'] = context['i'] * context['i']
+""")
+
+    context = Context({'pype': {'name': 'child',
+                                'foreachArgs': {'range': 5},
+                                'parallel': 2}})
+    context.working_dir = str(tmp_path)
+    pype.run_step(context)
+
+    assert [result['squared'] for result in context['pypeResults']] == [
+        0, 1, 4, 9, 16]
+    assert 'squared' not in context
+
+
+def test_pype_fan_out_nested_changes_isolated(tmp_path):
+    """Children merging into a nested dict don't touch parent or others."""
+    (tmp_path / 'pipelines').mkdir()
+    (tmp_path / 'pipelines' / 'child.yaml').write_text("""\
+steps:
+  - name: pypyr.steps.contextmerge
+    in:
+      contextMerge:
+        shared:
+          '{i}': x
+""")
+
+    shared = {'base': 'value'}
+    context = Context({'shared': shared,
+                       'pype': {'name': 'child',
+                                'foreachArgs': ['a', 'b', 'c'],
+                                'parallel': 3}})
+    context.working_dir = str(tmp_path)
+    pype.run_step(context)
+
+    assert context['shared'] is shared
+    assert shared == {'base': 'value'}
+    assert [result['shared'] for result in context['pypeResults']] == [
+        {'base': 'value', 'a': 'x'},
+        {'base': 'value', 'b': 'x'},
+        {'base': 'value', 'c': 'x'}]
+
+
+def test_pype_fan_out_uses_resource_limit(tmp_path):
+    """Children that use a resource the pype step holds take turns."""
+    (tmp_path / 'pipelines').mkdir()
+    (tmp_path / 'pipelines' / 'parent.yaml').write_text("""\
+resources:
+  db: 1
+steps:
+  - name: pypyr.steps.pype
+    uses: [db]
+    timeout: 5
+    in:
+      pype:
+        name: child
+        foreachArgs: {range: 4}
+        parallel: 4
+""")
+    (tmp_path / 'pipelines' / 'child.yaml').write_text("""\
+steps:
+  - name: pypyr.steps.py
+    uses: [db]
+    in:
+      pycode: |
+        import time
+        context['start'] = time.monotonic()
+        time.sleep(0.05)
+        context['end'] = time.monotonic()
+""")
+
+    context = Context()
+    context.working_dir = str(tmp_path)
+    pypyr.pipelinerunner.run_pipeline(pipeline_name='parent',
+                                      context=context,
+                                      parse_input=False)
+
+    runs = sorted((result['start'], result['end'])
+                  for result in context['pypeResults'])
+    assert len(runs) == 4
+    for (_, end), (next_start, _) in zip(runs, runs[1:]):
+        assert end <= next_start
+# ------------------------ fan out --------------------------------------------
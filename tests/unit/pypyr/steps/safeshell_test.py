@@ -2,8 +2,10 @@
 from pypyr.context import Context
 from pypyr.errors import KeyNotInContextError
 import pypyr.steps.safeshell
+import os
 import pytest
 import subprocess
+from unittest.mock import patch
 
 
 def test_shell_single_word():
@@ -54,3 +56,75 @@ def test_empty_context_cmd_throw():
     assert repr(err_info.value) == ("KeyNotInContextError(\"context['cmd'] "
                                     "doesn't exist. It must exist for "
                                     "pypyr.steps.safeshell.\",)")
+
+
+def test_safeshell_timeout_throws():
+    """Command running longer than cmdTimeout throws TimeoutExpired."""
+    with pytest.raises(subprocess.TimeoutExpired):
+        context = Context({'cmd': 'sleep 5', 'cmdTimeout': 0.1})
+        pypyr.steps.safeshell.run_step(context)
+# ---------------------- cmds -------------------------------------------------
+
+
+def test_safeshell_cmds():
+    """Multiple cmds run & capture output to cmdOut."""
+    context = Context({'k1': 'one',
+                       'cmds': ['echo {k1}', 'echo two'],
+                       'cmdParallel': 2,
+                       'cmdCapture': True})
+    pypyr.steps.safeshell.run_step(context)
+
+    assert [out['stdout'] for out in context['cmdOut']] == ['one\n',
+                                                            'two\n']
+
+
+def test_safeshell_cmds_error_throws():
+    """Failing cmd in cmds throws CalledProcessError."""
+    with pytest.raises(subprocess.CalledProcessError):
+        context = Context({'cmds': ['echo one', '/bin/false']})
+        pypyr.steps.safeshell.run_step(context)
+# ---------------------- END cmds ---------------------------------------------
+
+
+def test_safeshell_capture():
+    """Single cmd with cmdCapture saves output to cmdOut."""
+    context = Context({'cmd': 'echo one',
+                       'cmdCapture': True,
+                       'cmdParse': 'lines'})
+    pypyr.steps.safeshell.run_step(context)
+
+    assert context['cmdOut']['returncode'] == 0
+    assert context['cmdOut']['parsed'] == ['one']
+
+
+def test_safeshell_quoted_args():
+    """Quoted args with spaces stay whole."""
+    context = Context({'k1': 'b c',
+                       'cmd': 'echo "{k1}" d\\ e',
+                       'cmdTimeout': 5})
+    with patch('pypyr.utils.subproc.run_args') as mock_run_args:
+        pypyr.steps.safeshell.run_step(context)
+
+    mock_run_args.assert_called_once_with(['echo', 'b c', 'd e'],
+                                          timeout=5,
+                                          env=None)
+
+
+def test_safeshell_list_cmd():
+    """List cmd runs each item as an arg."""
+    context = Context({'cmd': ['ls', '{k1}'], 'k1': 'a b'})
+    with patch('pypyr.utils.subproc.run_args') as mock_run_args:
+        pypyr.steps.safeshell.run_step(context)
+
+    mock_run_args.assert_called_once_with(['ls', 'a b'],
+                                          timeout=None,
+                                          env=None)
+
+
+def test_safeshell_cmd_env():
+    """Safeshell runs with cmdEnv without changing os.environ."""
+    context = Context({'cmd': ['sh', '-c', 'test "$ARB_ENV_1" = y'],
+                       'cmdEnv': {'ARB_ENV_1': 'y'}})
+    pypyr.steps.safeshell.run_step(context)
+
+    assert 'ARB_ENV_1' not in os.environ
@@ -2,8 +2,10 @@
 from pypyr.context import Context
 from pypyr.errors import KeyNotInContextError
 import pypyr.steps.shell
+import os
 import pytest
 import subprocess
+from unittest.mock import patch
 
 
 def test_shell_single_word():
@@ -65,3 +67,71 @@ def test_empty_context_cmd_throw():
     assert repr(err_info.value) == ("KeyNotInContextError(\"context['cmd'] "
                                     "doesn't exist. It must exist for "
                                     "pypyr.steps.shell.\",)")
+
+
+def test_shell_timeout_throws():
+    """Command running longer than cmdTimeout throws TimeoutExpired."""
+    with pytest.raises(subprocess.TimeoutExpired):
+        context = Context({'cmd': 'sleep 5', 'cmdTimeout': 0.1})
+        pypyr.steps.shell.run_step(context)
+# ---------------------- cmds -------------------------------------------------
+
+
+def test_shell_cmds():
+    """Multiple cmds run & capture output to cmdOut."""
+    context = Context({'k1': 'one',
+                       'cmds': ['echo {k1}', 'echo two'],
+                       'cmdParallel': 2,
+                       'cmdCapture': True})
+    pypyr.steps.shell.run_step(context)
+
+    assert [out['stdout'] for out in context['cmdOut']] == ['one\n',
+                                                            'two\n']
+
+
+def test_shell_cmds_error_throws():
+    """Failing cmd in cmds throws CalledProcessError."""
+    with pytest.raises(subprocess.CalledProcessError):
+        context = Context({'cmds': ['echo one', 'exit 1']})
+        pypyr.steps.shell.run_step(context)
+# ---------------------- END cmds ---------------------------------------------
+
+
+def test_shell_capture():
+    """Single cmd with cmdCapture saves output to cmdOut."""
+    context = Context({'cmd': 'echo one; echo two',
+                       'cmdCapture': True,
+                       'cmdParse': 'lines'})
+    pypyr.steps.shell.run_step(context)
+
+    assert context['cmdOut']['returncode'] == 0
+    assert context['cmdOut']['parsed'] == ['one', 'two']
+
+
+def test_shell_list_cmd_runs_without_shell():
+    """List cmd runs as args without the shell."""
+    context = Context({'k1': 'deleteme.arb',
+                       'cmd': ['touch', '{k1}']})
+    with patch('pypyr.utils.subproc.run_args') as mock_run_args:
+        pypyr.steps.shell.run_step(context)
+
+    mock_run_args.assert_called_once_with(['touch', 'deleteme.arb'],
+                                          timeout=None,
+                                          env=None)
+
+
+def test_shell_list_cmd_error_throws():
+    """List cmd returning 1 should throw CalledProcessError."""
+    with pytest.raises(subprocess.CalledProcessError):
+        context = Context({'cmd': ['false']})
+        pypyr.steps.shell.run_step(context)
+
+
+def test_shell_cmd_env():
+    """Shell runs with cmdEnv without changing os.environ."""
+    context = Context({'v': 'y',
+                       'cmd': 'test "$ARB_ENV_1" = y',
+                       'cmdEnv': {'ARB_ENV_1': '{v}'}})
+    pypyr.steps.shell.run_step(context)
+
+    assert 'ARB_ENV_1' not in os.environ
@@ -1,10 +1,12 @@
 """stepsrunner.py unit tests."""
 import logging
+import threading
 import pytest
-from unittest.mock import call, patch
+from unittest.mock import call, MagicMock, patch
 from pypyr.context import Context
 from pypyr.dsl import Step
-from pypyr.errors import ContextError
+from pypyr.errors import (ContextError, PipelineDefinitionError,
+                          StepTimeoutError)
 import pypyr.stepsrunner
 
 # ------------------------- test context--------------------------------------#
@@ -105,6 +107,48 @@ def test_get_pipeline_steps_none():
         "sg4: sequence has no elements. So it won't do anything.")
 # ------------------------- get_pipeline_steps--------------------------------#
 
+# ------------------------- get_step_module_names ----------------------------#
+
+
+def test_get_step_module_names():
+    """Simple & complex step names from all step groups, in order."""
+    pipeline = {
+        'context_parser': 'arb.parser',
+        'steps': ['step1',
+                  {'name': 'step2', 'in': {'k1': 'v1'}},
+                  'step1'],
+        'on_success': None,
+        'on_failure': [{'name': 'fail1'}, 'fail2']
+    }
+
+    assert pypyr.stepsrunner.get_step_module_names(pipeline) == [
+        'step1', 'step2', 'step1', 'fail1', 'fail2']
+
+
+def test_get_step_module_names_empty():
+    """No step groups returns empty list."""
+    assert pypyr.stepsrunner.get_step_module_names({}) == []
+
+
+def test_get_step_module_names_complex_step_no_name():
+    """Complex step without a name raises PipelineDefinitionError."""
+    with pytest.raises(PipelineDefinitionError) as err:
+        pypyr.stepsrunner.get_step_module_names(
+            {'steps': ['step1', {'in': {'a': 'b'}}]})
+
+    assert str(err.value) == ("complex step must have a name. Step is: "
+                              "{'in': {'a': 'b'}}")
+
+
+@patch('pypyr.moduleloader.preload_modules')
+def test_preload_step_modules(mock_preload):
+    """preload_step_modules preloads all step module names."""
+    pypyr.stepsrunner.preload_step_modules({'steps': ['step1', 'step2'],
+                                            'on_failure': ['step3']})
+
+    mock_preload.assert_called_once_with(['step1', 'step2', 'step3'])
+# ------------------------- get_step_module_names ----------------------------#
+
 # ------------------------- run_failure_step_group----------------------------#
 
 
@@ -569,6 +613,24 @@ def test_run_pipeline_steps_simple(mock_run_step, mock_module):
     mock_run_step.assert_called_once_with({'k1': 'v1'})
 
 
+@patch('pypyr.moduleloader.get_module', return_value='arbmodule')
+@patch.object(Step, 'run_step')
+def test_run_pipeline_steps_start_index_checkpoint(mock_run_step,
+                                                   mock_module):
+    """Steps before start_index skip & checkpoint saves after each step."""
+    mock_checkpoint = MagicMock()
+    context = Context({'k1': 'v1'})
+
+    pypyr.stepsrunner.run_pipeline_steps(['step1', 'step2', 'step3'],
+                                         context,
+                                         start_index=1,
+                                         checkpoint=mock_checkpoint)
+
+    assert mock_run_step.call_count == 2
+    assert mock_checkpoint.save.mock_calls == [call(1, context),
+                                               call(2, context)]
+
+
 # ------------------------- run_pipeline_steps--------------------------------#
 
 # ------------------------- run_step_group------------------------------------#
@@ -589,5 +651,259 @@ def test_run_step_group_pass(mock_run_steps):
          'in':
             {'in3k1_1': 'v3k1', 'in3k1_2': 'v3k2'}},
         'step4'
-    ], context=Context())
+    ], context=Context(), start_index=0, checkpoint=None)
 # ------------------------- run_step_group------------------------------------#
+
+# ------------------------- handlers -----------------------------------------#
+
+
+def get_py_step(code):
+    """Get a pypyr.steps.py step that runs code."""
+    return {'name': 'pypyr.steps.py', 'in': {'pycode': code}}
+
+
+def test_get_handler_options_default():
+    """No handlers means sequential without timeouts."""
+    assert pypyr.stepsrunner.get_handler_options(
+        {'on_success': ['arb']}, 'on_success') == (False, None, None)
+    assert pypyr.stepsrunner.get_handler_options(
+        {'handlers': {'on_failure': None}}, 'on_failure') == (False, None,
+                                                              None)
+
+
+def test_get_handler_options():
+    """Handler options for group parse."""
+    pipeline = {'handlers': {'on_failure': {'parallel': True,
+                                            'timeout': 5,
+                                            'stepTimeout': '1.5'},
+                             'on_success': {'timeout': 3}}}
+
+    assert pypyr.stepsrunner.get_handler_options(
+        pipeline, 'on_failure') == (True, 5.0, 1.5)
+    assert pypyr.stepsrunner.get_handler_options(
+        pipeline, 'on_success') == (False, 3.0, None)
+
+
+@pytest.mark.parametrize('timeout', [0, -1, 'arb', True, [1]])
+def test_get_handler_options_bad_timeout_raises(timeout):
+    """Timeout that isn't a positive number raises."""
+    with pytest.raises(PipelineDefinitionError) as err:
+        pypyr.stepsrunner.get_handler_options(
+            {'handlers': {'on_success': {'stepTimeout': timeout}}},
+            'on_success')
+
+    assert str(err.value) == ("handlers on_success stepTimeout must be a "
+                              "number of seconds more than 0, not "
+                              f"{timeout}.")
+
+
+def test_get_handler_options_not_map_raises():
+    """Handlers & options must be maps."""
+    with pytest.raises(PipelineDefinitionError) as err:
+        pypyr.stepsrunner.get_handler_options({'handlers': ['a']},
+                                              'on_success')
+
+    assert str(err.value) == ("handlers must be a map of step group name to "
+                              "options.")
+
+    with pytest.raises(PipelineDefinitionError) as err:
+        pypyr.stepsrunner.get_handler_options(
+            {'handlers': {'on_success': 'a'}}, 'on_success')
+
+    assert str(err.value) == "handlers on_success must be a map of options."
+
+
+@patch('pypyr.stepsrunner.run_handler_steps')
+@patch('pypyr.stepsrunner.run_pipeline_steps')
+def test_run_step_group_no_handler_options(mock_run_steps, mock_handlers):
+    """Handler group without options runs like any other group."""
+    pypyr.stepsrunner.run_step_group(
+        pipeline_definition={'on_success': ['arb'],
+                             'handlers': {'on_failure': {'parallel': True}}},
+        step_group_name='on_success',
+        context=Context())
+
+    mock_run_steps.assert_called_once_with(steps=['arb'],
+                                           context=Context(),
+                                           start_index=0,
+                                           checkpoint=None)
+    mock_handlers.assert_not_called()
+
+
+@patch('pypyr.stepsrunner.run_handler_steps')
+@patch('pypyr.stepsrunner.run_pipeline_steps')
+def test_run_step_group_handler_options(mock_run_steps, mock_handlers):
+    """Handler group with options runs with run_handler_steps."""
+    context = Context()
+    pypyr.stepsrunner.run_step_group(
+        pipeline_definition={'on_failure': ['arb'],
+                             'handlers': {'on_failure': {'parallel': True,
+                                                         'timeout': 2}}},
+        step_group_name='on_failure',
+        context=context)
+
+    mock_handlers.assert_called_once_with(steps=['arb'],
+                                          context=context,
+                                          step_group_name='on_failure',
+                                          parallel=True,
+                                          timeout=2.0,
+                                          step_timeout=None)
+    mock_run_steps.assert_not_called()
+
+
+def test_run_handler_steps_sequential_with_timeout():
+    """Sequential steps with timeout run in order & change context."""
+    context = Context({'out': []})
+    pypyr.stepsrunner.run_handler_steps(
+        steps=[get_py_step("context['out'].append(1); context['a'] = 1"),
+               get_py_step("context['out'].append(context['a'] + 1)")],
+        context=context,
+        step_group_name='on_success',
+        step_timeout=5)
+
+    assert context['out'] == [1, 2]
+    assert context['a'] == 1
+
+
+def test_run_handler_steps_parallel():
+    """Parallel steps run at the same time & join in step order."""
+    barrier = threading.Barrier(3, timeout=5)
+    context = Context({'barrier': barrier})
+    pypyr.stepsrunner.run_handler_steps(
+        steps=[get_py_step("context['barrier'].wait(); context['k'] = 1"),
+               get_py_step("context['barrier'].wait(); context['k'] = 2; "
+                           "context['b'] = 2"),
+               get_py_step("context['barrier'].wait(); context['c'] = 3")],
+        context=context,
+        step_group_name='on_failure',
+        parallel=True)
+
+    # the barrier only opens if all 3 steps wait on it at once.
+    assert context['k'] == 2
+    assert context['b'] == 2
+    assert context['c'] == 3
+
+
+def test_run_handler_steps_step_timeout():
+    """Step that doesn't finish in time raises & doesn't change context."""
+    release = threading.Event()
+    context = Context({'release': release})
+    try:
+        with pytest.raises(StepTimeoutError) as err:
+            pypyr.stepsrunner.run_handler_steps(
+                steps=[get_py_step("context['release'].wait(5); "
+                                   "context['late'] = True"),
+                       get_py_step("context['never'] = True")],
+                context=context,
+                step_group_name='on_success',
+                timeout=10,
+                step_timeout=0.05)
+    finally:
+        release.set()
+
+    assert str(err.value) == ("on_success step pypyr.steps.py didn't finish "
+                              "within its stepTimeout of 0.05 seconds.")
+    assert 'late' not in context
+    assert 'never' not in context
+
+
+def test_run_handler_steps_group_timeout():
+    """Group that doesn't finish in time raises."""
+    release = threading.Event()
+    context = Context({'release': release})
+    try:
+        with pytest.raises(StepTimeoutError) as err:
+            pypyr.stepsrunner.run_handler_steps(
+                steps=[get_py_step("context['a'] = 1"),
+                       get_py_step("context['release'].wait(5)")],
+                context=context,
+                step_group_name='on_failure',
+                timeout=0.05,
+                step_timeout=10)
+    finally:
+        release.set()
+
+    assert str(err.value) == ("on_failure didn't finish within its timeout "
+                              "of 0.05 seconds. pypyr.steps.py was still "
+                              "running.")
+    # 1st step finished in time, so it joined.
+    assert context['a'] == 1
+
+
+@patch('pypyr.stepsrunner.time.monotonic', side_effect=[0, 0, 0, 0.5, 2])
+def test_run_handler_steps_group_timeout_before_step(mock_time):
+    """Sequential group out of time doesn't start next step."""
+    context = Context()
+    with pytest.raises(StepTimeoutError) as err:
+        pypyr.stepsrunner.run_handler_steps(
+            steps=[get_py_step("context['a'] = 1"),
+                   get_py_step("context['b'] = 1")],
+            context=context,
+            step_group_name='on_success',
+            timeout=1)
+
+    assert str(err.value) == ("on_success timeout of 1 seconds ran out "
+                              "before pypyr.steps.py started.")
+    assert context == {'a': 1, 'pycode': "context['a'] = 1"}
+
+
+def test_run_handler_steps_parallel_errors():
+    """Parallel steps all finish, then the 1st error in step order raises."""
+    context = Context()
+    with patch.object(logging.getLogger('pypyr.stepsrunner'),
+                      'error') as mock_logger_error:
+        with pytest.raises(ValueError) as err:
+            pypyr.stepsrunner.run_handler_steps(
+                steps=[get_py_step("context['a'] = 1"),
+                       get_py_step("raise ValueError('one')"),
+                       get_py_step("raise KeyError('two')"),
+                       get_py_step("context['b'] = 2")],
+                context=context,
+                step_group_name='on_failure',
+                parallel=True)
+
+    assert str(err.value) == 'one'
+    assert context['a'] == 1
+    assert context['b'] == 2
+    assert mock_logger_error.mock_calls == [
+        call("on_failure step pypyr.steps.py failed. ValueError: one"),
+        call("on_failure step pypyr.steps.py failed. KeyError: 'two'")]
+
+
+def test_run_handler_steps_parallel_errors_keep_changes():
+    """Failed parallel steps keep what they set before, in step order."""
+    context = Context({'gone': 'value'})
+    with pytest.raises(ValueError) as err:
+        pypyr.stepsrunner.run_handler_steps(
+            steps=[get_py_step("context['k'] = 1; raise ValueError('one')"),
+                   get_py_step("context['k'] = 2; del context['gone']; "
+                               "raise KeyError('two')"),
+                   get_py_step("context['c'] = 3")],
+            context=context,
+            step_group_name='on_failure',
+            parallel=True)
+
+    assert str(err.value) == 'one'
+    assert context['k'] == 2
+    assert context['c'] == 3
+    assert 'gone' not in context
+
+
+def test_run_failure_step_group_swallows_timeout():
+    """Failure handler timeout logs & swallows."""
+    release = threading.Event()
+    context = Context({'release': release})
+    pipeline = {'on_failure': [get_py_step("context['release'].wait(5)")],
+                'handlers': {'on_failure': {'timeout': 0.05}}}
+
+    try:
+        with patch.object(logging.getLogger('pypyr.stepsrunner'),
+                          'error') as mock_logger_error:
+            pypyr.stepsrunner.run_failure_step_group(pipeline, context)
+    finally:
+        release.set()
+
+    assert mock_logger_error.call_count == 2
+    assert isinstance(mock_logger_error.call_args[0][0], StepTimeoutError)
+
+# ------------------------- END handlers -------------------------------------#
@@ -0,0 +1,200 @@
+"""compact.py unit tests."""
+import copy
+import json
+import pickle
+import sys
+import pytest
+from pypyr.utils.compact import (CompactDict,
+                                 compact,
+                                 format_bytes,
+                                 format_memstats,
+                                 get_memstats,
+                                 get_size,
+                                 to_dict)
+
+# ----------------- CompactDict -----------------------------------------------
+
+
+def test_compact_dict_reads_like_dict():
+    """CompactDict supports all the read-only dict operations."""
+    d = CompactDict({'k1': 'v1', 'k2': 2, 'k3': None})
+
+    assert d['k1'] == 'v1'
+    assert d.get('k2') == 2
+    assert d.get('k4', 'default') == 'default'
+    assert 'k3' in d
+    assert 'k4' not in d
+    assert list(d) == ['k1', 'k2', 'k3']
+    assert list(d.items()) == [('k1', 'v1'), ('k2', 2), ('k3', None)]
+    assert len(d) == 3
+    assert d == {'k1': 'v1', 'k2': 2, 'k3': None}
+    assert {'k1': 'v1', 'k2': 2, 'k3': None} == d
+    assert d != {'k1': 'v1'}
+    assert repr(d) == "CompactDict({'k1': 'v1', 'k2': 2, 'k3': None})"
+
+    with pytest.raises(KeyError):
+        d['k4']
+
+
+def test_compact_dict_is_read_only():
+    """CompactDict can't change."""
+    d = CompactDict({'k1': 'v1'})
+
+    with pytest.raises(TypeError):
+        d['k1'] = 'changed'
+
+    with pytest.raises(AttributeError):
+        d.update({'k1': 'changed'})
+
+    with pytest.raises(AttributeError):
+        d.arb = 'arb'
+
+
+def test_compact_dict_from_pairs_last_duplicate_wins():
+    """CompactDict from pairs keeps last value for duplicate key, like dict."""
+    d = CompactDict([('k1', 'v1'), ('k2', 'v2'), ('k1', 'v3')])
+    assert list(d.items()) == [('k1', 'v3'), ('k2', 'v2')]
+
+
+def test_compact_dict_same_keys_share_index():
+    """CompactDicts with the same keys share the key index."""
+    d1 = CompactDict({'k1': 1, 'k2': 2})
+    d2 = CompactDict({'k1': 3, 'k2': 4})
+    d3 = CompactDict({'k2': 4, 'k1': 3})
+
+    assert d1._index is d2._index
+    assert d1._index is not d3._index
+    assert d2 == d3
+
+
+def test_compact_dict_pickles_and_copies():
+    """CompactDict round trips through pickle & copy."""
+    d = CompactDict({'k1': [1, 2], 'k2': CompactDict({'a': 'b'})})
+
+    for out in (pickle.loads(pickle.dumps(d)),
+                copy.deepcopy(d),
+                copy.copy(d)):
+        assert isinstance(out, CompactDict)
+        assert out == d
+        assert isinstance(out['k2'], CompactDict)
+
+    assert copy.deepcopy(d)['k1'] is not d['k1']
+
+
+def test_compact_dict_json_with_to_dict():
+    """json.dump writes CompactDict with default to_dict."""
+    d = CompactDict({'k1': (1, 2), 'k2': CompactDict({'a': 'b'})})
+    assert json.dumps(d, default=to_dict) == (
+        '{"k1": [1, 2], "k2": {"a": "b"}}')
+
+
+def test_to_dict_not_compact_raises():
+    """to_dict raises TypeError like json does for other types."""
+    with pytest.raises(TypeError) as err:
+        to_dict(object())
+
+    assert str(err.value) == "Object of type object is not JSON serializable"
+# ----------------- END CompactDict -------------------------------------------
+
+# ----------------- compact ---------------------------------------------------
+
+
+def test_compact_nested():
+    """compact converts all the way down & keeps values equal."""
+    obj = {'k1': [{'a': 1, 'b': ['x', 'y']}, {'a': 2, 'b': []}],
+           'k2': {'set': {1, 2}, 'tuple': (3, [4])},
+           'k3': 'str',
+           'k4': b'bytes'}
+
+    out = compact(obj)
+
+    assert isinstance(out, CompactDict)
+    assert isinstance(out['k1'], tuple)
+    assert isinstance(out['k1'][0], CompactDict)
+    assert out['k1'][0]['b'] == ('x', 'y')
+    assert out['k1'][0]._index is out['k1'][1]._index
+    assert out['k2']['set'] == frozenset((1, 2))
+    assert out['k2']['tuple'] == (3, (4,))
+    assert out['k3'] is obj['k3']
+    assert out['k4'] is obj['k4']
+
+    # input doesn't change
+    assert obj['k1'][0]['b'] == ['x', 'y']
+
+
+def test_compact_interns_keys():
+    """compact interns str keys."""
+    key = ''.join(['arb', 'key', 'not', 'interned'])
+
+    out = compact({key: 1})
+    assert next(iter(out)) is sys.intern('arbkeynotinterned')
+
+
+def test_compact_already_compact_is_same():
+    """compact returns compact input & scalars as is."""
+    d = CompactDict({'a': 1})
+    assert compact(d) is d
+    assert compact(1.5) == 1.5
+    assert compact(None) is None
+
+
+def test_compact_takes_less_memory():
+    """compact records take less memory than dicts & lists."""
+    records = [{'id': i, 'name': 'name', 'tags': ['a', 'b']}
+               for i in range(1000)]
+
+    assert get_size(compact(records)) < get_size(records) * 0.7
+# ----------------- END compact -----------------------------------------------
+
+# ----------------- memory accounting -----------------------------------------
+
+
+def test_get_size_counts_contents():
+    """get_size includes what containers contain."""
+    value = ['abc', 'def']
+    assert get_size(value) == sum(map(sys.getsizeof, (value, 'abc', 'def')))
+
+
+def test_get_size_counts_shared_once():
+    """get_size counts an object in obj many times only once."""
+    shared = 'x' * 1000
+    value = [shared, shared]
+    assert get_size(value) == sum(map(sys.getsizeof, (value, shared)))
+
+    seen = set()
+    get_size(shared, seen)
+    assert get_size([shared], seen) == sys.getsizeof([shared])
+
+
+def test_get_memstats():
+    """get_memstats sorts keys by size, shared counts toward 1st key."""
+    shared = 'x' * 1000
+    mapping = {'small': 1, 'big': ['y' * 5000], 'a': shared, 'b': shared}
+
+    total, stats = get_memstats(mapping)
+
+    assert [key for key, _ in stats] == ['big', 'a', 'small', 'b']
+    stats = dict(stats)
+    assert stats['b'] == sys.getsizeof('b')
+    assert stats['a'] == sys.getsizeof('a') + sys.getsizeof(shared)
+    assert total == sys.getsizeof(mapping) + sum(stats.values())
+
+
+def test_format_bytes():
+    """format_bytes picks the biggest unit under 1024."""
+    assert format_bytes(0) == '0 B'
+    assert format_bytes(1023) == '1023 B'
+    assert format_bytes(1536) == '1.5 KiB'
+    assert format_bytes(5 * 1024 * 1024) == '5.0 MiB'
+    assert format_bytes(3 * 1024 ** 4) == '3072.0 GiB'
+
+
+def test_format_memstats():
+    """format_memstats has a total line then a line per key."""
+    assert format_memstats(2048, [('k1', 1536), ('k2', 512)]) == [
+        'context memory: 2.0 KiB in 2 keys.',
+        '  k1: 1.5 KiB (75.0%)',
+        '  k2: 512 B (25.0%)']
+
+    assert format_memstats(0, []) == ['context memory: 0 B in 0 keys.']
+# ----------------- END memory accounting -------------------------------------
@@ -0,0 +1,182 @@
+"""fetch.py unit tests."""
+import pathlib
+from unittest.mock import patch
+from pypyr.context import Context
+import pypyr.utils.fetch
+import pytest
+
+
+@pytest.fixture
+def files(tmp_path):
+    """Write json & yaml fragments to tmp_path."""
+    (tmp_path / 'sub').mkdir()
+    for name, content in (('b.json', '{"k": "b"}'),
+                          ('a.json', '{"k": "a"}'),
+                          ('sub/c.json', '{"k": "c"}'),
+                          ('a.yaml', 'k: a\nlist: [1]\n'),
+                          ('b.yaml', 'k: b\nlist: [2]\n'),
+                          ('list.yaml', '- 1\n- 2\n')):
+        (tmp_path / name).write_text(content)
+
+    return tmp_path
+
+# ------------------------- get_paths ----------------------------------------#
+
+
+def test_get_paths_single():
+    """Single path is a list of 1, even if it doesn't exist."""
+    assert pypyr.utils.fetch.get_paths('arb/nope.json') == ['arb/nope.json']
+
+
+def test_get_paths_path_like():
+    """Path-like converts to str."""
+    assert pypyr.utils.fetch.get_paths(pathlib.Path('arb')) == ['arb']
+
+
+def test_get_paths_glob_sorted(files):
+    """Glob expands in sorted order."""
+    assert pypyr.utils.fetch.get_paths(f'{files}/*.json') == [
+        f'{files}/a.json', f'{files}/b.json']
+
+
+def test_get_paths_recursive_glob(files):
+    """** matches any number of directories."""
+    assert pypyr.utils.fetch.get_paths(f'{files}/**/*.json') == [
+        f'{files}/a.json', f'{files}/b.json', f'{files}/sub/c.json']
+
+
+def test_get_paths_list_keeps_order(files):
+    """List keeps order, with each glob expanded in place."""
+    assert pypyr.utils.fetch.get_paths([f'{files}/b.yaml',
+                                        f'{files}/*.json',
+                                        f'{files}/a.yaml']) == [
+        f'{files}/b.yaml',
+        f'{files}/a.json',
+        f'{files}/b.json',
+        f'{files}/a.yaml']
+
+
+def test_get_paths_literal_path_with_glob_chars(files):
+    """Path that exists is literal, even with glob chars in it."""
+    (files / 'cfg[prod].json').write_text('{"k": "prod"}')
+    (files / 'what?.json').write_text('{"k": "what"}')
+
+    assert pypyr.utils.fetch.get_paths([f'{files}/cfg[prod].json',
+                                        f'{files}/what?.json']) == [
+        f'{files}/cfg[prod].json', f'{files}/what?.json']
+
+
+def test_get_paths_glob_no_match_raises(files):
+    """Glob that matches nothing raises."""
+    with pytest.raises(FileNotFoundError) as err:
+        pypyr.utils.fetch.get_paths(f'{files}/*.toml')
+
+    assert str(err.value) == f"no files match {files}/*.toml"
+
+# ------------------------- END get_paths ------------------------------------#
+
+# ------------------------- load_all -----------------------------------------#
+
+
+def test_load_all_sequential(files):
+    """No executor loads in order."""
+    paths = [f'{files}/b.json', f'{files}/a.json']
+    assert pypyr.utils.fetch.load_all(paths, pypyr.utils.fetch.load_json) == [
+        {'k': 'b'}, {'k': 'a'}]
+
+
+def test_load_all_thread(files):
+    """Thread executor loads in path order."""
+    paths = [f'{files}/b.json', f'{files}/a.json', f'{files}/sub/c.json'] * 5
+    assert pypyr.utils.fetch.load_all(paths,
+                                      pypyr.utils.fetch.load_json,
+                                      executor='thread') == [
+        {'k': 'b'}, {'k': 'a'}, {'k': 'c'}] * 5
+
+
+def test_load_all_process(files):
+    """Process executor loads in path order on the shared process pool."""
+    paths = [f'{files}/b.yaml', f'{files}/a.yaml'] * 5
+    assert pypyr.utils.fetch.load_all(paths,
+                                      pypyr.utils.fetch.load_yaml,
+                                      executor='process') == [
+        {'k': 'b', 'list': [2]}, {'k': 'a', 'list': [1]}] * 5
+
+
+def test_load_all_single_no_pool(files):
+    """Single path doesn't use a pool."""
+    with patch('pypyr.executors.get_process_pool') as mock_pool:
+        assert pypyr.utils.fetch.load_all([f'{files}/a.yaml'],
+                                          pypyr.utils.fetch.load_yaml,
+                                          executor='process') == [
+            {'k': 'a', 'list': [1]}]
+
+    mock_pool.assert_not_called()
+
+
+def test_load_all_raises(files):
+    """Error in any file raises."""
+    with pytest.raises(FileNotFoundError):
+        pypyr.utils.fetch.load_all([f'{files}/a.json', f'{files}/nope.json'],
+                                   pypyr.utils.fetch.load_json,
+                                   executor='thread')
+
+# ------------------------- END load_all -------------------------------------#
+
+# ------------------------- merge_all ----------------------------------------#
+
+
+def test_merge_all_update():
+    """Update overwrites top level keys in order."""
+    context = Context({'k': 'v', 'n': {'a': 1}, 'other': 'x'})
+    count = pypyr.utils.fetch.merge_all(context,
+                                        [{'k': 'one', 'n': {'b': 2}},
+                                         {'k': 'two'}],
+                                        ['1', '2'])
+
+    assert count == 3
+    assert context == {'k': 'two', 'n': {'b': 2}, 'other': 'x'}
+
+
+def test_merge_all_merge():
+    """Merge merges nested maps & lists, with formatting."""
+    context = Context({'k': 'v', 'n': {'a': 1}, 'l': [0]})
+    pypyr.utils.fetch.merge_all(context,
+                                [{'n': {'b': 2}, 'l': [1]},
+                                 {'n': {'c': '{k}'}, 'l': [2]}],
+                                ['1', '2'],
+                                strategy='merge')
+
+    assert context == {'k': 'v', 'n': {'a': 1, 'b': 2, 'c': 'v'},
+                       'l': [0, 1, 2]}
+
+
+def test_merge_all_compact():
+    """Compact makes values read-only."""
+    context = Context()
+    pypyr.utils.fetch.merge_all(context, [{'l': [1, 2]}], ['1'],
+                                compact=True)
+
+    assert context == {'l': (1, 2)}
+
+
+def test_merge_all_bad_strategy_raises():
+    """Unknown strategy raises."""
+    with pytest.raises(ValueError) as err:
+        pypyr.utils.fetch.merge_all(Context(), [], [], strategy='deep')
+
+    assert str(err.value) == (
+        "merge strategy must be update or merge, not deep.")
+
+
+def test_merge_all_not_map_raises():
+    """Payload that isn't a map raises with its source."""
+    context = Context()
+    with pytest.raises(TypeError) as err:
+        pypyr.utils.fetch.merge_all(context, [{'a': 1}, [1, 2]],
+                                    ['1.json', '2.json'])
+
+    assert str(err.value) == ("2.json should describe a map at the top level, "
+                              "not a list or a single value.")
+
+# ------------------------- END merge_all ------------------------------------#
@@ -0,0 +1,182 @@
+"""foreach.py unit tests."""
+import os
+import pytest
+from pypyr.context import Context
+from pypyr.errors import PipelineDefinitionError
+import pypyr.utils.foreach as foreach
+
+
+# ----------------- get_source_name -------------------------------------------
+def test_get_source_name_list():
+    """List is not a source."""
+    assert foreach.get_source_name(['file']) is None
+
+
+def test_get_source_name_dict_without_source():
+    """Dict without source key is not a source."""
+    assert foreach.get_source_name({'arb': 1}) is None
+
+
+def test_get_source_name():
+    """Dict with 1 source key is that source."""
+    assert foreach.get_source_name({'file': 'x', 'encoding': 'y'}) == 'file'
+    assert foreach.get_source_name({'range': 1}) == 'range'
+
+
+def test_get_source_name_many_raises():
+    """Dict with more than 1 source key raises."""
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        foreach.get_source_name({'glob': 'x', 'file': 'y'})
+
+    assert str(err_info.value) == ("foreach can only have one of file, glob, "
+                                   "jsonl, range. Found file, glob.")
+# ----------------- END get_source_name ---------------------------------------
+
+# ----------------- get_foreach_iterable --------------------------------------
+
+
+def test_get_foreach_iterable_list_formats():
+    """List formats from context as before."""
+    context = Context({'k1': 'v1'})
+    assert foreach.get_foreach_iterable(context, ['{k1}', 'b']) == ['v1', 'b']
+
+
+def test_get_foreach_iterable_generator_as_is():
+    """Generator in context returns as is without consuming it."""
+    generator = (i for i in range(3))
+    context = Context({'gen': generator})
+
+    assert foreach.get_foreach_iterable(context, '{gen}') is generator
+
+
+def test_get_foreach_iterable_file(tmp_path):
+    """File source yields lines lazily, without formatting them."""
+    path = tmp_path / 'in.txt'
+    path.write_text('one {k1}\ntwo\r\n\nthree')
+    context = Context({'dir': str(tmp_path)})
+
+    items = foreach.get_foreach_iterable(context,
+                                         {'file': '{dir}/in.txt',
+                                          'encoding': 'utf-8'})
+
+    assert not isinstance(items, list)
+    assert list(items) == ['one {k1}', 'two', '', 'three']
+
+
+def test_get_foreach_iterable_jsonl(tmp_path):
+    """jsonl source yields parsed records, skipping blank lines."""
+    path = tmp_path / 'in.jsonl'
+    path.write_text('{"a": 1}\n\n["b"]\n"c"\n')
+
+    items = foreach.get_foreach_iterable(Context(), {'jsonl': str(path)})
+
+    assert list(items) == [{'a': 1}, ['b'], 'c']
+
+
+def test_get_foreach_iterable_jsonl_invalid(tmp_path):
+    """jsonl source raises with line number on invalid json."""
+    path = tmp_path / 'in.jsonl'
+    path.write_text('{"a": 1}\nnope\n')
+
+    items = foreach.get_foreach_iterable(Context(), {'jsonl': str(path)})
+
+    assert next(items) == {'a': 1}
+    with pytest.raises(ValueError) as err_info:
+        next(items)
+
+    assert str(err_info.value).startswith(f"{path} line 2 isn't valid json:")
+
+
+def test_get_foreach_iterable_glob(tmp_path):
+    """glob source yields matching paths, recursively with **."""
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'a.txt').write_text('')
+    (tmp_path / 'sub' / 'b.txt').write_text('')
+    (tmp_path / 'c.arb').write_text('')
+    context = Context({'dir': str(tmp_path)})
+
+    items = foreach.get_foreach_iterable(context, {'glob': '{dir}/**/*.txt'})
+
+    assert sorted(items) == [os.path.join(str(tmp_path), 'a.txt'),
+                             os.path.join(str(tmp_path), 'sub', 'b.txt')]
+
+
+def test_get_foreach_iterable_range():
+    """range source returns a range, formatting its args."""
+    context = Context({'stop': '6'})
+
+    assert foreach.get_foreach_iterable(context,
+                                        {'range': 3}) == range(3)
+    assert foreach.get_foreach_iterable(context,
+                                        {'range': [1, '{stop}', 2]}) == range(
+                                            1, 6, 2)
+
+
+def test_get_foreach_iterable_formatted_dict_not_source():
+    """Dict from a formatting expression iterates as a dict, not a source."""
+    context = Context({'d1': {'range': 3, 'other': 1},
+                       'd2': {'glob': 'x', 'file': 'y'}})
+
+    d1_items = foreach.get_foreach_iterable(context, '{d1}')
+    assert list(d1_items) == ['range', 'other']
+
+    d2_items = foreach.get_foreach_iterable(context, '{d2}')
+    assert list(d2_items) == ['glob', 'file']
+# ----------------- END get_foreach_iterable ----------------------------------
+
+# ----------------- get_range -------------------------------------------------
+
+
+def test_get_range():
+    """get_range handles stop, [start, stop] & [start, stop, step]."""
+    assert foreach.get_range(2) == range(2)
+    assert foreach.get_range('2') == range(2)
+    assert foreach.get_range([1, 3]) == range(1, 3)
+    assert foreach.get_range((5, 0, -1)) == range(5, 0, -1)
+
+
+def test_get_range_invalid_raises():
+    """get_range raises on non-int args."""
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        foreach.get_range('arb')
+
+    assert str(err_info.value).startswith(
+        "foreach range must be stop, [start, stop] or [start, stop, step], "
+        "as integers. arb is not a valid range:")
+
+
+def test_get_range_too_many_args_raises():
+    """get_range raises on more than 3 args."""
+    with pytest.raises(PipelineDefinitionError):
+        foreach.get_range([1, 2, 3, 4])
+
+    with pytest.raises(PipelineDefinitionError):
+        foreach.get_range([])
+# ----------------- END get_range ---------------------------------------------
+
+# ----------------- iter_batches ----------------------------------------------
+
+
+def test_iter_batches():
+    """iter_batches yields lists of up to batch_size."""
+    assert list(foreach.iter_batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_iter_batches_lazy():
+    """iter_batches only consumes 1 batch at a time."""
+    consumed = []
+
+    def gen():
+        for i in range(10):
+            consumed.append(i)
+            yield i
+
+    batches = foreach.iter_batches(gen(), 3)
+    assert next(batches) == [0, 1, 2]
+    assert consumed == [0, 1, 2]
+
+
+def test_iter_batches_empty():
+    """iter_batches on empty yields nothing."""
+    assert list(foreach.iter_batches([], 2)) == []
+# ----------------- END iter_batches ------------------------------------------
@@ -0,0 +1,476 @@
+"""http.py unit tests. Runs against a local http server."""
+import gzip
+import http.server
+import threading
+from unittest.mock import patch
+from pypyr.cache import DiskCache
+from pypyr.errors import HttpError
+import pypyr.utils.http
+from pypyr.utils.http import ConnectionPool
+import pytest
+
+# path: (headers, body) the local server serves.
+PAGES = {
+    '/data.json': ({'Content-Type': 'application/json',
+                    'ETag': '"v1"'},
+                   b'{"k1": "v1"}'),
+    '/modified': ({'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'},
+                  b'modified body'),
+    '/plain': ({}, b'plain body'),
+    '/gzip': ({'Content-Encoding': 'gzip'}, gzip.compress(b'unzipped')),
+}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Serve PAGES, redirects, 304s & 404s. Keep-alive, for the pool."""
+
+    protocol_version = 'HTTP/1.1'
+    # headers & body are separate writes. Don't wait for ack in between.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """Handle GET."""
+        self.server.requests.append((self.path, dict(self.headers)))
+        self.server.connections.add(self.client_address)
+
+        if self.path == '/redirect':
+            self.send(302, {'Location': '/plain'})
+            return
+
+        if self.path == '/redirect-other':
+            # same server, but localhost is another host to the client.
+            port = self.server.server_address[1]
+            self.send(302, {'Location': f'http://localhost:{port}/plain'})
+            return
+
+        if self.path == '/loop':
+            self.send(302, {'Location': '/loop'})
+            return
+
+        page = PAGES.get(self.path, None)
+        if page is None:
+            self.send(404)
+            return
+
+        headers, body = page
+        etag = headers.get('ETag', None)
+        if etag and self.headers.get('If-None-Match') == etag:
+            self.send(304)
+            return
+
+        modified = headers.get('Last-Modified', None)
+        if modified and self.headers.get('If-Modified-Since') == modified:
+            self.send(304)
+            return
+
+        self.send(200, headers, body)
+
+    def send(self, status, headers=None, body=b''):
+        """Send response with status, headers & body."""
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Don't log to stderr."""
+
+
+@pytest.fixture
+def server():
+    """Run the local http server for the test. Yields base url."""
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.daemon_threads = True
+    httpd.requests = []
+    httpd.connections = set()
+    thread = threading.Thread(target=httpd.serve_forever,
+                              kwargs={'poll_interval': 0.01},
+                              daemon=True)
+    thread.start()
+    httpd.url = f'http://127.0.0.1:{httpd.server_address[1]}'
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def pool():
+    """Connection pool just for the test."""
+    connection_pool = ConnectionPool()
+    yield connection_pool
+    connection_pool.close()
+
+# ------------------------- request ------------------------------------------#
+
+
+def test_request_pass(server, pool):
+    """Request gets status, headers & body."""
+    response = pypyr.utils.http.request(f'{server.url}/data.json', pool=pool)
+
+    assert response.url == f'{server.url}/data.json'
+    assert response.status == 200
+    assert response.reason == 'OK'
+    assert response.headers['ETag'] == '"v1"'
+    assert response.body == b'{"k1": "v1"}'
+
+
+def test_request_sends_headers(server, pool):
+    """Request sends headers & asks for gzip."""
+    pypyr.utils.http.request(f'{server.url}/plain',
+                             headers={'X-Arb': 'arb value'},
+                             pool=pool)
+
+    path, headers = server.requests[0]
+    assert path == '/plain'
+    assert headers['X-Arb'] == 'arb value'
+    assert headers['Accept-Encoding'] == 'gzip'
+
+
+def test_request_query(server, pool):
+    """Request keeps the query string."""
+    response = pypyr.utils.http.request(f'{server.url}/plain?a=b', pool=pool)
+
+    assert response.status == 404
+    assert server.requests[0][0] == '/plain?a=b'
+
+
+def test_request_gzip(server, pool):
+    """Gzip response decompresses."""
+    response = pypyr.utils.http.request(f'{server.url}/gzip', pool=pool)
+
+    assert response.body == b'unzipped'
+
+
+def test_request_follows_redirect(server, pool):
+    """Redirect follows Location."""
+    response = pypyr.utils.http.request(f'{server.url}/redirect', pool=pool)
+
+    assert response.url == f'{server.url}/plain'
+    assert response.status == 200
+    assert response.body == b'plain body'
+
+
+def test_request_redirect_same_origin_keeps_auth(server, pool):
+    """Redirect to the same origin still sends the credentials."""
+    pypyr.utils.http.request(f'{server.url}/redirect',
+                             headers={'Authorization': 'Bearer arb'},
+                             pool=pool)
+
+    assert [path for path, _ in server.requests] == ['/redirect', '/plain']
+    assert server.requests[1][1]['Authorization'] == 'Bearer arb'
+
+
+def test_request_redirect_other_origin_drops_auth(server, pool):
+    """Redirect to another host doesn't get the credentials."""
+    headers = {'authorization': 'Bearer arb',
+               'Proxy-Authorization': 'Basic arb',
+               'Cookie': 'a=b',
+               'X-Arb': 'arb value'}
+    response = pypyr.utils.http.request(f'{server.url}/redirect-other',
+                                        headers=headers,
+                                        pool=pool)
+
+    assert response.status == 200
+    assert response.url.startswith('http://localhost:')
+
+    first_headers = server.requests[0][1]
+    assert first_headers['authorization'] == 'Bearer arb'
+    assert first_headers['Cookie'] == 'a=b'
+
+    path, redirect_headers = server.requests[1]
+    assert path == '/plain'
+    assert 'authorization' not in redirect_headers
+    assert 'Proxy-Authorization' not in redirect_headers
+    assert 'Cookie' not in redirect_headers
+    assert redirect_headers['X-Arb'] == 'arb value'
+    # didn't change the caller's headers.
+    assert headers['authorization'] == 'Bearer arb'
+
+
+def test_get_origin():
+    """Origin fills in the default port & ignores case."""
+    get_origin = pypyr.utils.http.get_origin
+    split = pypyr.utils.http.urllib.parse.urlsplit
+
+    http_origin = get_origin(split('http://Arb.com/a'))
+    assert http_origin == ('http', 'arb.com', 80)
+    assert get_origin(split('http://arb.com:80/b')) == http_origin
+    assert get_origin(split('https://arb.com/a')) != http_origin
+    assert get_origin(split('http://arb.com:8080/a')) != http_origin
+    assert get_origin(split('HTTPS://arb.com/c')) == ('https', 'arb.com', 443)
+
+
+def test_request_too_many_redirects(server, pool):
+    """Redirect loop raises."""
+    with pytest.raises(HttpError) as err:
+        pypyr.utils.http.request(f'{server.url}/loop', pool=pool)
+
+    assert str(err.value) == (
+        f"too many redirects fetching {server.url}/loop.")
+    assert len(server.requests) == pypyr.utils.http.MAX_REDIRECTS + 1
+
+
+def test_request_not_http_raises():
+    """Non http url raises."""
+    with pytest.raises(HttpError) as err:
+        pypyr.utils.http.request('file:///etc/hosts')
+
+    assert str(err.value) == (
+        "can only fetch http or https urls, not file:///etc/hosts.")
+
+
+def test_request_reuses_connection(server, pool):
+    """Requests to the same host reuse the keep-alive connection."""
+    for _ in range(5):
+        pypyr.utils.http.request(f'{server.url}/plain', pool=pool)
+
+    assert len(server.requests) == 5
+    assert len(server.connections) == 1
+
+
+def test_request_shared_pool_by_default(server):
+    """Requests without pool use the shared pool."""
+    shared = pypyr.utils.http.get_pool()
+    assert isinstance(shared, ConnectionPool)
+
+    with patch.object(shared, 'get', wraps=shared.get) as mock_get:
+        pypyr.utils.http.request(f'{server.url}/plain')
+
+    mock_get.assert_called_once_with('http', '127.0.0.1',
+                                     server.server_address[1], timeout=None)
+    shared.close()
+
+
+def test_request_reconnects_stale_connection(server, pool):
+    """Pooled connection the server closed reconnects & retries."""
+    pypyr.utils.http.request(f'{server.url}/plain', pool=pool)
+
+    # the server reset the pooled connection, like after an idle timeout.
+    stale = pool._idle[('http', '127.0.0.1', server.server_address[1])][0]
+    with patch.object(stale, 'request',
+                      side_effect=ConnectionResetError('reset')):
+        response = pypyr.utils.http.request(f'{server.url}/plain', pool=pool)
+
+    assert response.body == b'plain body'
+    assert stale.sock is None
+    assert len(server.requests) == 2
+    assert len(server.connections) == 2
+
+
+def test_request_new_connection_error_raises(pool):
+    """Error on a new connection raises without retry."""
+    with patch('http.client.HTTPConnection.request',
+               side_effect=ConnectionResetError('reset')) as mock_request:
+        with pytest.raises(ConnectionResetError):
+            pypyr.utils.http.request('http://127.0.0.1:1/plain', pool=pool)
+
+    mock_request.assert_called_once()
+    assert not pool._idle
+
+# ------------------------- END request --------------------------------------#
+
+# ------------------------- ConnectionPool -----------------------------------#
+
+
+def test_pool_get_new():
+    """Get on empty pool makes a new connection for the scheme."""
+    pool = ConnectionPool()
+    connection, reused = pool.get('http', 'arbhost', 8080, timeout=3)
+    assert not reused
+    assert type(connection).__name__ == 'HTTPConnection'
+    assert connection.host == 'arbhost'
+    assert connection.port == 8080
+    assert connection.timeout == 3
+
+    connection, reused = pool.get('https', 'arbhost', None)
+    assert not reused
+    assert type(connection).__name__ == 'HTTPSConnection'
+    assert connection.port == 443
+
+
+def test_pool_put_get_reuses():
+    """Get after put reuses the idle connection for the same host only."""
+    pool = ConnectionPool()
+    connection, _ = pool.get('http', 'arbhost', None)
+    pool.put('http', 'arbhost', None, connection)
+
+    other, reused = pool.get('http', 'otherhost', None)
+    assert not reused
+    assert other is not connection
+
+    same, reused = pool.get('http', 'arbhost', None, timeout=5)
+    assert reused
+    assert same is connection
+    assert same.timeout == 5
+
+
+def test_pool_put_full_closes():
+    """Put on a full pool closes the connection."""
+    pool = ConnectionPool(max_idle=1)
+    first, _ = pool.get('http', 'arbhost', None)
+    second, _ = pool.get('http', 'arbhost', None)
+    pool.put('http', 'arbhost', None, first)
+
+    with patch.object(second, 'close') as mock_close:
+        pool.put('http', 'arbhost', None, second)
+
+    mock_close.assert_called_once()
+
+
+def test_pool_close():
+    """Close closes & forgets all idle connections."""
+    pool = ConnectionPool()
+    connection, _ = pool.get('http', 'arbhost', None)
+    pool.put('http', 'arbhost', None, connection)
+
+    with patch.object(connection, 'close') as mock_close:
+        pool.close()
+
+    mock_close.assert_called_once()
+    assert not pool._idle
+
+# ------------------------- END ConnectionPool -------------------------------#
+
+# ------------------------- fetch --------------------------------------------#
+
+
+def test_fetch_no_cache(server, pool):
+    """Fetch without cache gets body & doesn't revalidate."""
+    url = f'{server.url}/data.json'
+    assert pypyr.utils.http.fetch(url, pool=pool) == b'{"k1": "v1"}'
+    assert pypyr.utils.http.fetch(url, pool=pool) == b'{"k1": "v1"}'
+
+    assert 'If-None-Match' not in server.requests[1][1]
+
+
+def test_fetch_error_status_raises(server, pool):
+    """Fetch 404 raises."""
+    with pytest.raises(HttpError) as err:
+        pypyr.utils.http.fetch(f'{server.url}/nope', pool=pool)
+
+    assert str(err.value) == f"GET {server.url}/nope failed: 404 Not Found"
+
+
+def test_fetch_etag_cache(server, pool, tmp_path):
+    """Fetch with cache revalidates with If-None-Match & uses 304 body."""
+    cache = DiskCache(str(tmp_path))
+    url = f'{server.url}/data.json'
+
+    assert pypyr.utils.http.fetch(url, cache=cache,
+                                  pool=pool) == b'{"k1": "v1"}'
+    assert pypyr.utils.http.fetch(url, cache=cache,
+                                  pool=pool) == b'{"k1": "v1"}'
+
+    assert 'If-None-Match' not in server.requests[0][1]
+    assert server.requests[1][1]['If-None-Match'] == '"v1"'
+    assert 'If-Modified-Since' not in server.requests[1][1]
+
+
+def test_fetch_last_modified_cache(server, pool, tmp_path):
+    """Fetch with cache revalidates with If-Modified-Since."""
+    cache = DiskCache(str(tmp_path))
+    url = f'{server.url}/modified'
+
+    assert pypyr.utils.http.fetch(url, cache=cache,
+                                  pool=pool) == b'modified body'
+    assert pypyr.utils.http.fetch(url, cache=cache,
+                                  pool=pool) == b'modified body'
+
+    assert server.requests[1][1]['If-Modified-Since'] == (
+        'Wed, 21 Oct 2015 07:28:00 GMT')
+
+
+def test_fetch_cache_changed(server, pool, tmp_path):
+    """Fetch with stale cache entry gets & saves the new body."""
+    cache = DiskCache(str(tmp_path))
+    url = f'{server.url}/data.json'
+    key = pypyr.utils.http.get_cache_key(url, None)
+    cache.set(key, {'url': url,
+                    'etag': '"v0"',
+                    'lastModified': None,
+                    'body': b'old'})
+
+    assert pypyr.utils.http.fetch(url, cache=cache,
+                                  pool=pool) == b'{"k1": "v1"}'
+
+    assert server.requests[0][1]['If-None-Match'] == '"v0"'
+    assert cache.get(key)['etag'] == '"v1"'
+    assert cache.get(key)['body'] == b'{"k1": "v1"}'
+
+
+def test_fetch_cache_no_validator_not_saved(server, pool, tmp_path):
+    """Response without ETag or Last-Modified doesn't save to cache."""
+    cache = DiskCache(str(tmp_path))
+    url = f'{server.url}/plain'
+
+    pypyr.utils.http.fetch(url, cache=cache, pool=pool)
+
+    assert cache.get(pypyr.utils.http.get_cache_key(url, None)) is None
+
+
+def test_get_cache_key_headers():
+    """Cache key depends on url & headers, not header order."""
+    key = pypyr.utils.http.get_cache_key('http://arb/', {'a': '1', 'b': '2'})
+
+    assert key == pypyr.utils.http.get_cache_key('http://arb/',
+                                                 {'b': '2', 'a': '1'})
+    assert key != pypyr.utils.http.get_cache_key('http://arb/', {'a': '1'})
+    assert key != pypyr.utils.http.get_cache_key('http://arb2/',
+                                                 {'a': '1', 'b': '2'})
+    assert pypyr.utils.http.get_cache_key('http://arb/', None) == (
+        pypyr.utils.http.get_cache_key('http://arb/', {}))
+
+
+def test_get_cache_dir():
+    """Cache dir is in working dir."""
+    assert pypyr.utils.http.get_cache_dir('/arb') == '/arb/.pypyr/http'
+    assert pypyr.utils.http.get_cache_dir(None) == '.pypyr/http'
+
+# ------------------------- END fetch ----------------------------------------#
+
+# ------------------------- fetch_all ----------------------------------------#
+
+
+def test_fetch_all_in_order(server, pool):
+    """Fetch all gets bodies in url order."""
+    urls = [f'{server.url}/plain',
+            f'{server.url}/data.json',
+            f'{server.url}/gzip'] * 4
+
+    bodies = pypyr.utils.http.fetch_all(urls, parallel=4, pool=pool)
+
+    assert bodies == [b'plain body', b'{"k1": "v1"}', b'unzipped'] * 4
+    assert len(server.requests) == 12
+    # parallel fetches need their own connections, but no more than that.
+    assert 1 < len(server.connections) <= 4
+
+
+def test_fetch_all_sequential(server, pool):
+    """Fetch all with parallel 1 fetches one at a time on 1 connection."""
+    urls = [f'{server.url}/plain', f'{server.url}/gzip']
+
+    bodies = pypyr.utils.http.fetch_all(urls, parallel=1, pool=pool)
+
+    assert bodies == [b'plain body', b'unzipped']
+    assert len(server.connections) == 1
+
+
+def test_fetch_all_raises(server, pool):
+    """Fetch all raises if any fetch fails."""
+    urls = [f'{server.url}/plain', f'{server.url}/nope']
+
+    with pytest.raises(HttpError):
+        pypyr.utils.http.fetch_all(urls, parallel=2, pool=pool)
+
+
+def test_fetch_all_kwargs():
+    """Fetch all passes kwargs to fetch."""
+    with patch('pypyr.utils.http.fetch', return_value=b'x') as mock_fetch:
+        bodies = pypyr.utils.http.fetch_all(['a'], parallel=3, timeout=4)
+
+    assert bodies == [b'x']
+    mock_fetch.assert_called_once_with('a', timeout=4)
+
+# ------------------------- END fetch_all ------------------------------------#
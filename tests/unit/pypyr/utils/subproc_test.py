@@ -0,0 +1,666 @@
+"""subproc.py unit tests."""
+import asyncio
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from unittest.mock import patch
+import pytest
+from pypyr.context import Context
+from pypyr.errors import ContextError, KeyNotInContextError
+import pypyr.utils.subproc as subproc
+from pypyr.utils.worker import Worker
+
+
+# ----------------- RingBuffer ------------------------------------------------
+def test_ring_buffer_unbounded():
+    """RingBuffer with no max keeps everything."""
+    buffer = subproc.RingBuffer()
+    buffer.write(b'one')
+    buffer.write(b'')
+    buffer.write(b'two')
+
+    assert buffer.getvalue() == b'onetwo'
+    assert len(buffer) == 6
+    assert buffer.total_bytes == 6
+    assert not buffer.truncated
+
+
+def test_ring_buffer_keeps_last_bytes():
+    """RingBuffer discards oldest bytes over max."""
+    buffer = subproc.RingBuffer(5)
+    buffer.write(b'abc')
+    buffer.write(b'def')
+
+    assert buffer.getvalue() == b'bcdef'
+    assert len(buffer) == 5
+    assert buffer.total_bytes == 6
+    assert buffer.truncated
+
+    buffer.write(b'gh')
+    assert buffer.getvalue() == b'defgh'
+
+
+def test_ring_buffer_chunk_bigger_than_max():
+    """RingBuffer keeps tail of single chunk bigger than max."""
+    buffer = subproc.RingBuffer(3)
+    buffer.write(b'a')
+    buffer.write(b'bcdefg')
+
+    assert buffer.getvalue() == b'efg'
+    assert buffer.total_bytes == 7
+    assert buffer.truncated
+
+
+def test_ring_buffer_spill(tmp_path):
+    """RingBuffer writes all output to spill file once over max."""
+    buffer = subproc.RingBuffer(4, spill_dir=str(tmp_path / 'sub'),
+                                spill_suffix='.out')
+    buffer.write(b'abc')
+    assert buffer.spill_path is None
+
+    buffer.write(b'def')
+    buffer.write(b'gh')
+    buffer.close()
+
+    assert buffer.getvalue() == b'efgh'
+    assert buffer.spill_path.startswith(str(tmp_path / 'sub'))
+    assert buffer.spill_path.endswith('.out')
+    with open(buffer.spill_path, 'rb') as spill_file:
+        assert spill_file.read() == b'abcdefgh'
+
+    assert buffer.get_all() == b'abcdefgh'
+
+
+def test_ring_buffer_get_all_not_truncated():
+    """RingBuffer get_all returns memory when not truncated."""
+    buffer = subproc.RingBuffer(4, spill_dir='arb')
+    buffer.write(b'abcd')
+    buffer.close()
+
+    assert buffer.spill_path is None
+    assert buffer.get_all() == b'abcd'
+
+
+def test_ring_buffer_get_all_truncated_raises():
+    """RingBuffer get_all raises when truncated without spill."""
+    buffer = subproc.RingBuffer(2)
+    buffer.write(b'abc')
+
+    with pytest.raises(ContextError) as err_info:
+        buffer.get_all()
+
+    assert str(err_info.value) == (
+        "output is 3 bytes, which is more than the max of 2 bytes to keep in "
+        "memory. Increase cmdCaptureMaxBytes, or set cmdCaptureSpillDir to "
+        "write output that doesn't fit in memory to a file.")
+# ----------------- END RingBuffer --------------------------------------------
+
+# ----------------- parse_output ----------------------------------------------
+
+
+def test_parse_output_json():
+    """parse_output parses json."""
+    assert subproc.parse_output(b'{"a": [1, 2]}', 'json') == {'a': [1, 2]}
+
+
+def test_parse_output_yaml():
+    """parse_output parses yaml."""
+    assert subproc.parse_output(b'a:\n  - 1\n  - b', 'yaml') == {
+        'a': [1, 'b']}
+
+
+def test_parse_output_lines():
+    """parse_output splits lines."""
+    assert subproc.parse_output(b'one\ntwo\r\n', 'lines') == ['one', 'two']
+
+
+def test_parse_output_invalid():
+    """parse_output raises on unknown format."""
+    with pytest.raises(ContextError) as err_info:
+        subproc.parse_output(b'', 'xml')
+
+    assert str(err_info.value) == ("cmdParse must be one of json, yaml, "
+                                   "lines. xml is not a valid cmdParse.")
+# ----------------- END parse_output ------------------------------------------
+
+# ----------------- run_commands ----------------------------------------------
+
+
+def test_run_commands_streams_to_log():
+    """run_commands logs stdout at info & stderr at error per line."""
+    with patch.object(subproc.logger, 'info') as mock_info:
+        with patch.object(subproc.logger, 'error') as mock_error:
+            results = subproc.run_commands(
+                ['echo one; echo two', 'echo three 1>&2'])
+
+    mock_info.assert_any_call('cmd 0: one')
+    mock_info.assert_any_call('cmd 0: two')
+    mock_error.assert_called_once_with('cmd 1: three')
+
+    assert [result.returncode for result in results] == [0, 0]
+    assert results[0].stdout is None
+    subproc.check_results(results)
+
+
+def test_run_commands_capture_bounded():
+    """run_commands captures only the tail of output."""
+    results = subproc.run_commands(['printf 0123456789'],
+                                   capture_max_bytes=4)
+
+    assert results[0].stdout.getvalue() == b'6789'
+    assert results[0].stdout.truncated
+    assert results[0].to_dict() == {'cmd': 'printf 0123456789',
+                                    'returncode': 0,
+                                    'stdout': '6789',
+                                    'stderr': '',
+                                    'stdoutFile': None,
+                                    'stderrFile': None,
+                                    'parsed': None}
+
+
+def test_run_commands_capture_unbounded():
+    """run_commands captures everything with capture_max_bytes 0."""
+    results = subproc.run_commands(['printf 0123456789'],
+                                   capture_max_bytes=0)
+
+    assert results[0].stdout.getvalue() == b'0123456789'
+    assert not results[0].stdout.truncated
+
+
+def test_run_commands_no_shell():
+    """run_commands runs arg lists without the shell."""
+    results = subproc.run_commands([['echo', '$HOME']],
+                                   capture_max_bytes=0)
+
+    assert results[0].stdout.getvalue() == b'$HOME\n'
+
+
+def test_run_commands_parallel():
+    """run_commands runs commands at the same time with parallel."""
+    # each waits for the other to create its file, so this only completes
+    # if both run at once.
+    cmds = ['touch {0}/a && while [ ! -f {0}/b ]; do sleep 0.01; done',
+            'touch {0}/b && while [ ! -f {0}/a ]; do sleep 0.01; done']
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        results = subproc.run_commands([cmd.format(temp_dir) for cmd in cmds],
+                                       parallel=2,
+                                       timeout=10)
+
+    subproc.check_results(results)
+
+
+def test_run_commands_failure_stops_pending():
+    """run_commands doesn't start pending commands after a failure."""
+    results = subproc.run_commands(['exit 3', 'echo two'],
+                                   capture_max_bytes=0)
+
+    assert results[0].returncode == 3
+    assert results[1].returncode is None
+
+    with pytest.raises(subprocess.CalledProcessError) as err_info:
+        subproc.check_results(results)
+
+    assert err_info.value.returncode == 3
+    assert err_info.value.cmd == 'exit 3'
+
+
+def test_run_commands_timeout():
+    """run_commands kills command that runs past timeout."""
+    with patch.object(subproc.logger, 'error') as mock_error:
+        results = subproc.run_commands(['sleep 5'], timeout=0.1)
+
+    assert isinstance(results[0], subprocess.TimeoutExpired)
+    mock_error.assert_called_once_with(
+        'cmd 0: killing command because it ran longer than timeout of 0.1s.')
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        subproc.check_results(results)
+
+
+def test_kill_process_already_done():
+    """kill_process doesn't raise if process already finished."""
+    async def run_and_kill():
+        process = await asyncio.create_subprocess_exec(
+            'true', start_new_session=True)
+        await process.wait()
+        subproc.kill_process(process)
+        return process.returncode
+
+    assert subproc.run_coroutine(run_and_kill()) == 0
+
+
+def test_stream_output_long_line():
+    """stream_output logs very long line without newline in pieces."""
+    with patch.object(subproc, 'MAX_LINE_LENGTH', 4):
+        with patch.object(subproc.logger, 'info') as mock_info:
+            subproc.run_commands(['printf 0123456789'])
+
+    assert mock_info.call_count >= 1
+    logged = ''.join(call[0][0][len('cmd 0: '):]
+                     for call in mock_info.call_args_list)
+    assert logged == '0123456789'
+
+
+def test_run_commands_cancel_on_worker():
+    """Cancelled worker kills its commands."""
+    worker = Worker(subproc.run_commands, ['sleep 5']).start()
+    time.sleep(0.1)
+    start = time.perf_counter()
+    worker.cancel()
+
+    assert worker.wait(5)
+    assert time.perf_counter() - start < 2
+    with pytest.raises(asyncio.CancelledError):
+        worker.result()
+# ----------------- END run_commands ------------------------------------------
+
+# ----------------- run_context_cmds ------------------------------------------
+
+
+def test_run_context_cmds_no_cmds_raises():
+    """run_context_cmds raises if cmds not in context."""
+    with pytest.raises(KeyNotInContextError):
+        subproc.run_context_cmds(Context(), shell=True, caller='arb')
+
+
+@pytest.mark.parametrize('parallel', [0, -1, '0'])
+@patch('pypyr.utils.subproc.run_commands')
+def test_run_context_cmds_parallel_invalid_raises(mock_run_commands,
+                                                  parallel):
+    """cmdParallel less than 1 raises rather than never running anything."""
+    context = Context({'cmds': ['echo one'], 'cmdParallel': parallel})
+
+    with pytest.raises(ValueError) as err:
+        subproc.run_context_cmds(context, shell=True, caller='arb')
+
+    assert str(err.value) == (f"cmdParallel must be 1 or more, not "
+                              f"{int(parallel)}.")
+    mock_run_commands.assert_not_called()
+
+
+def test_run_context_cmds_capture():
+    """run_context_cmds interpolates cmds & saves output to cmdOut."""
+    context = Context({'k1': 'one',
+                       'cmds': ['echo {k1}', 'echo two 1>&2'],
+                       'cmdParallel': '2',
+                       'cmdCapture': True})
+
+    with patch.object(logging.getLogger('pypyr.utils.subproc'), 'error'):
+        subproc.run_context_cmds(context, shell=True, caller='arb')
+
+    assert context['cmdOut'] == [
+        {'cmd': 'echo one', 'returncode': 0, 'stdout': 'one\n',
+         'stderr': '', 'stdoutFile': None, 'stderrFile': None,
+         'parsed': None},
+        {'cmd': 'echo two 1>&2', 'returncode': 0, 'stdout': '',
+         'stderr': 'two\n', 'stdoutFile': None, 'stderrFile': None,
+         'parsed': None}]
+
+
+def test_run_context_cmds_no_capture():
+    """run_context_cmds doesn't set cmdOut without cmdCapture."""
+    context = Context({'cmds': ['true']})
+    subproc.run_context_cmds(context, shell=True, caller='arb')
+
+    assert 'cmdOut' not in context
+
+
+def test_run_context_cmds_capture_on_failure():
+    """run_context_cmds saves cmdOut before raising."""
+    context = Context({'cmds': ['echo one; exit 1', 'echo two'],
+                       'cmdCapture': True,
+                       'cmdCaptureMaxBytes': 2})
+
+    with pytest.raises(subprocess.CalledProcessError):
+        subproc.run_context_cmds(context, shell=True, caller='arb')
+
+    assert context['cmdOut'] == [
+        {'cmd': 'echo one; exit 1', 'returncode': 1, 'stdout': 'e\n',
+         'stderr': '', 'stdoutFile': None, 'stderrFile': None,
+         'parsed': None},
+        {'cmd': 'echo two', 'returncode': None, 'stdout': None,
+         'stderr': None, 'stdoutFile': None, 'stderrFile': None,
+         'parsed': None}]
+
+
+def test_run_context_cmds_timeout():
+    """run_context_cmds raises TimeoutExpired on cmdTimeout."""
+    context = Context({'cmds': 'sleep 5',
+                       'cmdTimeout': 0.1,
+                       'cmdCapture': True})
+
+    with patch.object(logging.getLogger('pypyr.utils.subproc'), 'error'):
+        with pytest.raises(subprocess.TimeoutExpired):
+            subproc.run_context_cmds(context, shell=True, caller='arb')
+
+    assert context['cmdOut'] == [{'cmd': 'sleep 5',
+                                  'returncode': None,
+                                  'stdout': None,
+                                  'stderr': None,
+                                  'stdoutFile': None,
+                                  'stderrFile': None,
+                                  'parsed': None}]
+
+
+def test_run_context_cmds_single_cmd_capture_parse():
+    """run_context_cmds captures single cmd to cmdOut dict & parses it."""
+    context = Context({'k1': 'b',
+                       'cmd': 'echo \'{{"a": "{k1}"}}\'',
+                       'cmdCapture': 'True',
+                       'cmdParse': 'json'})
+    subproc.run_context_cmds(context, shell=True, caller='arb')
+
+    assert context['cmdOut'] == {'cmd': 'echo \'{"a": "b"}\'',
+                                 'returncode': 0,
+                                 'stdout': '{"a": "b"}\n',
+                                 'stderr': '',
+                                 'stdoutFile': None,
+                                 'stderrFile': None,
+                                 'parsed': {'a': 'b'}}
+
+
+def test_run_context_cmds_single_cmd_no_cmd_raises():
+    """run_context_cmds raises if neither cmds nor cmd in context."""
+    with pytest.raises(KeyNotInContextError) as err_info:
+        subproc.run_context_cmds(Context({'cmdCapture': True}),
+                                 shell=True,
+                                 caller='arb')
+
+    assert str(err_info.value) == ("context['cmd'] doesn't exist. It must "
+                                   "exist for arb.")
+
+
+def test_run_context_cmds_invalid_parse_raises_before_run():
+    """run_context_cmds raises on invalid cmdParse without running cmd."""
+    context = Context({'cmd': 'arb',
+                       'cmdCapture': True,
+                       'cmdParse': 'xml'})
+
+    with patch.object(subproc, 'run_commands') as mock_run:
+        with pytest.raises(ContextError):
+            subproc.run_context_cmds(context, shell=True, caller='arb')
+
+    mock_run.assert_not_called()
+    assert 'cmdOut' not in context
+
+
+def test_run_context_cmds_parse_skipped_on_failure():
+    """run_context_cmds doesn't parse output of failed cmd."""
+    context = Context({'cmd': 'echo not json; exit 2',
+                       'cmdCapture': True,
+                       'cmdParse': 'json'})
+
+    with pytest.raises(subprocess.CalledProcessError):
+        subproc.run_context_cmds(context, shell=True, caller='arb')
+
+    assert context['cmdOut']['returncode'] == 2
+    assert context['cmdOut']['parsed'] is None
+
+
+def test_run_context_cmds_spill_parse(tmp_path):
+    """run_context_cmds parses full output from spill file."""
+    context = Context({'spillDir': str(tmp_path),
+                       'cmd': 'seq 1 100',
+                       'cmdCapture': True,
+                       'cmdCaptureMaxBytes': 10,
+                       'cmdCaptureSpillDir': '{spillDir}',
+                       'cmdParse': 'lines'})
+
+    subproc.run_context_cmds(context, shell=True, caller='arb')
+
+    out = context['cmdOut']
+    assert out['stdout'] == '98\n99\n100\n'
+    assert out['stdoutFile'].startswith(str(tmp_path))
+    assert out['stderrFile'] is None
+    assert out['parsed'] == [str(i) for i in range(1, 101)]
+
+
+def test_run_context_cmds_truncated_parse_raises():
+    """run_context_cmds raises if output to parse got truncated."""
+    context = Context({'cmd': 'seq 1 100',
+                       'cmdCapture': True,
+                       'cmdCaptureMaxBytes': 10,
+                       'cmdParse': 'lines'})
+
+    with pytest.raises(ContextError):
+        subproc.run_context_cmds(context, shell=True, caller='arb')
+
+
+def test_run_context_cmds_no_shell_splits_str():
+    """run_context_cmds without shell splits str cmds & keeps quotes."""
+    context = Context({'k1': 'b c',
+                       'cmds': ['echo "{k1}"  $HOME', ['echo', '{k1}']],
+                       'cmdCapture': True})
+    subproc.run_context_cmds(context, shell=False, caller='arb')
+
+    assert [out['cmd'] for out in context['cmdOut']] == [
+        ['echo', 'b c', '$HOME'],
+        ['echo', 'b c']]
+    assert [out['stdout'] for out in context['cmdOut']] == ['b c $HOME\n',
+                                                            'b c\n']
+
+
+def test_run_context_cmds_shell_list_runs_without_shell():
+    """run_context_cmds with shell runs list cmd as args."""
+    context = Context({'cmd': ['echo', '$HOME'],
+                       'cmdCapture': True})
+    subproc.run_context_cmds(context, shell=True, caller='arb')
+
+    assert context['cmdOut']['stdout'] == '$HOME\n'
+
+
+def test_get_capture():
+    """get_capture gets cmdCapture as bool."""
+    assert not subproc.get_capture(Context())
+    assert not subproc.get_capture(Context({'cmdCapture': 'False'}))
+    assert subproc.get_capture(Context({'cmdCapture': True}))
+
+
+def test_get_args_str():
+    """get_args splits str like posix shell."""
+    assert subproc.get_args('ls -a "b c" d\\ e') == ['ls', '-a', 'b c',
+                                                     'd e']
+
+
+def test_get_args_list():
+    """get_args makes each list item a str arg."""
+    assert subproc.get_args(['ls', 1, 'b c']) == ['ls', '1', 'b c']
+
+
+def test_get_args_list_expands_nested_list():
+    """get_args expands list item, like a foreach batch, into args."""
+    assert subproc.get_args(['rm', '-f', ['a', 'b c'], ('d',)]) == [
+        'rm', '-f', 'a', 'b c', 'd']
+
+
+def test_resolve_executable():
+    """resolve_executable looks up executable on PATH."""
+    args = subproc.resolve_executable(['sh', '-c', 'true'])
+
+    assert os.path.isabs(args[0])
+    assert os.path.basename(args[0]) == 'sh'
+    assert args[1:] == ['-c', 'true']
+
+
+def test_resolve_executable_with_path_unchanged():
+    """resolve_executable leaves executable with path as is."""
+    args = ['./arb', 'a']
+    assert subproc.resolve_executable(args) is args
+
+
+def test_resolve_executable_not_found_unchanged():
+    """resolve_executable leaves unknown executable for subprocess."""
+    args = ['arb-unlikely-to-exist-pypyr']
+    assert subproc.resolve_executable(args) is args
+
+
+def write_executable(directory, name='arb-exe'):
+    """Write an executable file called name in directory. Returns path."""
+    directory.mkdir(parents=True, exist_ok=True)
+    executable = directory / name
+    executable.write_text('#!/bin/sh\n')
+    executable.chmod(0o755)
+    return str(executable)
+
+
+def test_which_caches_absolute_path(tmp_path):
+    """Look up executable on an absolute PATH once only."""
+    expected = write_executable(tmp_path / 'bin')
+    path = str(tmp_path / 'bin')
+    subproc._which_cache.clear()
+
+    with patch('shutil.which', return_value=expected) as mock_which:
+        assert subproc._which('arb-exe', path) == expected
+        assert subproc._which('arb-exe', path) == expected
+
+    mock_which.assert_called_once_with('arb-exe', path=path)
+    subproc._which_cache.clear()
+
+
+def test_which_removed_executable_looks_up_again(tmp_path):
+    """Cached executable that's gone resolves again from PATH."""
+    first = write_executable(tmp_path / 'first')
+    second = write_executable(tmp_path / 'second')
+    path = os.pathsep.join((str(tmp_path / 'first'),
+                            str(tmp_path / 'second')))
+    subproc._which_cache.clear()
+
+    assert subproc._which('arb-exe', path) == first
+    os.remove(first)
+    assert subproc._which('arb-exe', path) == second
+    os.remove(second)
+    assert subproc._which('arb-exe', path) is None
+    subproc._which_cache.clear()
+
+
+def test_which_relative_path_follows_working_dir(tmp_path, monkeypatch):
+    """Relative PATH entries don't cache, since the working dir changes."""
+    write_executable(tmp_path / 'a' / 'bin')
+    (tmp_path / 'b').mkdir()
+    subproc._which_cache.clear()
+
+    monkeypatch.chdir(tmp_path / 'a')
+    assert subproc._which('arb-exe', 'bin') == os.path.join('bin', 'arb-exe')
+
+    monkeypatch.chdir(tmp_path / 'b')
+    assert subproc._which('arb-exe', 'bin') is None
+    assert subproc._which_cache == {}
+
+
+@patch('subprocess.run')
+def test_run_args(mock_run):
+    """run_args runs resolved args."""
+    with patch.object(subproc, 'resolve_executable',
+                      return_value=['/bin/arb', 'a']) as mock_resolve:
+        subproc.run_args(['arb', 'a'], timeout=1.5)
+
+    mock_resolve.assert_called_once_with(['arb', 'a'], None)
+    mock_run.assert_called_once_with(['/bin/arb', 'a'],
+                                     shell=False,
+                                     check=True,
+                                     timeout=1.5,
+                                     env=None)
+
+
+def test_run_args_error():
+    """run_args raises CalledProcessError on non-zero exit."""
+    with pytest.raises(subprocess.CalledProcessError):
+        subproc.run_args(['false'])
+
+
+def test_get_timeout():
+    """get_timeout gets cmdTimeout as float or None."""
+    assert subproc.get_timeout(Context()) is None
+    assert subproc.get_timeout(Context({'cmdTimeout': '1.5'})) == 1.5
+    assert subproc.get_timeout(Context({'k': 2, 'cmdTimeout': '{k}'})) == 2
+
+
+def test_get_env_none():
+    """get_env is None without cmdEnv, so no copy of the environment."""
+    assert subproc.get_env(Context()) is None
+    assert subproc.get_env(Context({'cmdEnv': None})) is None
+
+
+def test_get_env_merges_over_environ():
+    """get_env formats cmdEnv over a copy of os.environ, None unsets."""
+    context = Context({'k1': 'v1',
+                       'cmdEnv': {'ARB_ENV_1': '{k1}',
+                                  'ARB_ENV_2': 2,
+                                  'ARB_ENV_3': None}})
+
+    with patch.dict(os.environ, {'ARB_ENV_3': 'unset me', 'ARB_ENV_4': 'x'}):
+        env = subproc.get_env(context)
+        assert os.environ['ARB_ENV_3'] == 'unset me'
+        assert 'ARB_ENV_1' not in os.environ
+
+    assert env['ARB_ENV_1'] == 'v1'
+    assert env['ARB_ENV_2'] == '2'
+    assert env['ARB_ENV_4'] == 'x'
+    assert 'ARB_ENV_3' not in env
+
+
+def test_get_env_not_a_map_raises():
+    """get_env raises ContextError if cmdEnv isn't a dict."""
+    with pytest.raises(ContextError) as err:
+        subproc.get_env(Context({'cmdEnv': ['a']}))
+
+    assert str(err.value) == ("cmdEnv must be a map of $ENV names to values, "
+                              "not list.")
+
+
+def test_run_context_cmds_env():
+    """run_context_cmds runs cmds with cmdEnv, leaving os.environ as is."""
+    context = Context({'cmds': ['echo $ARB_ENV_1', ['printenv', 'ARB_ENV_1']],
+                       'cmdEnv': {'ARB_ENV_1': 'scoped'},
+                       'cmdCapture': True})
+
+    subproc.run_context_cmds(context, shell=True, caller='arb')
+
+    assert [out['stdout'] for out in context['cmdOut']] == ['scoped\n',
+                                                            'scoped\n']
+    assert 'ARB_ENV_1' not in os.environ
+
+
+def test_run_args_env():
+    """run_args runs with env & looks up the executable in env's PATH."""
+    env = {'PATH': os.environ['PATH'], 'ARB_ENV_1': 'y'}
+    subproc.run_args(['sh', '-c', 'test "$ARB_ENV_1" = y'], env=env)
+
+    with pytest.raises(FileNotFoundError):
+        subproc.run_args(['true'], env={'PATH': ''})
+
+
+def test_run_process_on_worker():
+    """run_process on a worker runs & checks the exit code."""
+    worker = Worker(subproc.run_process, 'exit 0', True).start()
+    assert worker.wait(5)
+    assert worker.result() is None
+
+    worker = Worker(subproc.run_process, ['false']).start()
+    assert worker.wait(5)
+    with pytest.raises(subprocess.CalledProcessError):
+        worker.result()
+
+    worker = Worker(subproc.run_process, ['sleep', '5'], False, 0.05).start()
+    assert worker.wait(5)
+    with pytest.raises(subprocess.TimeoutExpired):
+        worker.result()
+
+
+def test_run_process_cancel_on_worker():
+    """Cancelled worker kills its process."""
+    worker = Worker(subproc.run_process, ['sleep', '5']).start()
+    time.sleep(0.1)
+    start = time.perf_counter()
+    worker.cancel()
+
+    assert worker.wait(5)
+    assert time.perf_counter() - start < 2
+    with pytest.raises(subprocess.CalledProcessError) as err:
+        worker.result()
+
+    assert err.value.returncode == -9
+# ----------------- END run_context_cmds --------------------------------------
@@ -0,0 +1,204 @@
+"""worker.py unit tests."""
+import threading
+from unittest.mock import MagicMock, patch
+from pypyr.errors import StepTimeoutError
+import pypyr.log.logger
+import pypyr.utils.worker
+from pypyr.utils.worker import Worker
+import pytest
+
+# ------------------------- Worker -------------------------------------------#
+
+
+def test_worker_result():
+    """Worker runs function with args on its own daemon thread."""
+    def function(a, b):
+        return a + b, threading.current_thread()
+
+    worker = Worker(function, 1, 2, name='arb').start()
+
+    assert worker.wait(5)
+    assert worker.done
+    result, thread = worker.result()
+    assert result == 3
+    assert thread is not threading.current_thread()
+    assert thread.name == 'arb'
+    assert thread.daemon
+
+
+def test_worker_error_raises_on_result():
+    """Error on the worker raises from result."""
+    def function():
+        raise ValueError('arb')
+
+    worker = Worker(function).start()
+
+    assert worker.wait(5)
+    with pytest.raises(ValueError) as err:
+        worker.result()
+
+    assert str(err.value) == 'arb'
+
+
+def test_worker_wait_timeout():
+    """Wait returns False if function doesn't finish in time."""
+    event = threading.Event()
+    worker = Worker(event.wait, 5).start()
+
+    assert not worker.wait(0.01)
+    assert not worker.done
+
+    event.set()
+    assert worker.wait(5)
+    assert worker.result() is True
+
+
+@patch('pypyr.log.logger._log_scope_enabled', True)
+def test_worker_keeps_log_scope():
+    """Worker thread has the log scope of the thread that made it."""
+    with pypyr.log.logger.log_scope(pipeline='arb pipe', step='s1'):
+        worker = Worker(pypyr.log.logger.get_log_scope)
+
+    # scope captured when the worker initializes, not when it starts.
+    worker.start()
+    assert worker.wait(5)
+    assert worker.result() == {'pipeline': 'arb pipe',
+                               'step': 's1',
+                               'iteration': None}
+
+# ------------------------- END Worker ---------------------------------------#
+
+# ------------------------- cancel -------------------------------------------#
+
+
+def test_worker_cancel_calls_callbacks_once():
+    """Cancel calls the callbacks code on the worker registered, once."""
+    release = threading.Event()
+    callback = MagicMock()
+
+    def function():
+        pypyr.utils.worker.on_cancel(callback)
+        pypyr.utils.worker.on_cancel(release.set)
+        release.wait(5)
+        return pypyr.utils.worker.get_current_worker()
+
+    worker = Worker(function).start()
+    while not worker._callbacks:
+        assert not worker.wait(0.001)
+
+    worker.cancel()
+    worker.cancel()
+
+    assert worker.wait(5)
+    assert worker.cancelled
+    assert worker.result() is worker
+    callback.assert_called_once_with()
+
+
+def test_worker_on_cancel_after_cancel_calls_now():
+    """Callback registered after cancel runs straight away."""
+    worker = Worker(print)
+    worker.cancel()
+    callback = MagicMock()
+
+    worker.on_cancel(callback)()
+
+    callback.assert_called_once_with()
+
+
+def test_worker_on_cancel_unregister():
+    """Unregistered callback doesn't run on cancel."""
+    worker = Worker(print)
+    callback = MagicMock()
+    worker.on_cancel(callback)()
+
+    worker.cancel()
+
+    callback.assert_not_called()
+
+
+def test_worker_cancel_callback_error_logs():
+    """Error in 1 callback logs & the others still run."""
+    worker = Worker(print, name='arb')
+    callback = MagicMock()
+    worker.on_cancel(MagicMock(side_effect=ValueError('boom')))
+    worker.on_cancel(callback)
+
+    with patch.object(pypyr.utils.worker.logger, 'error') as mock_error:
+        worker.cancel()
+
+    mock_error.assert_called_once_with(
+        "cancelling worker arb failed. ValueError: boom")
+    callback.assert_called_once_with()
+
+
+def test_worker_cancel_after_done_does_nothing():
+    """Cancel once function finished doesn't cancel."""
+    worker = Worker(print).start()
+    assert worker.wait(5)
+
+    worker.cancel()
+
+    assert not worker.cancelled
+
+
+def test_worker_child_cancels_with_parent():
+    """Worker started on another worker cancels when the parent does."""
+    release = threading.Event()
+    children = []
+
+    def child():
+        release.wait(5)
+        pypyr.utils.worker.check_cancelled()
+
+    def parent():
+        children.append(Worker(child, name='child').start())
+        children[0].wait(5)
+
+    parent_worker = Worker(parent).start()
+    while not children:
+        assert not parent_worker.wait(0.001)
+
+    parent_worker.cancel()
+    release.set()
+
+    child_worker = children[0]
+    assert child_worker.wait(5)
+    assert child_worker.cancelled
+    with pytest.raises(StepTimeoutError) as err:
+        child_worker.result()
+
+    assert str(err.value) == "child cancelled, because it ran out of time."
+    assert parent_worker.wait(5)
+
+
+def test_on_cancel_not_on_worker():
+    """on_cancel & check_cancelled do nothing off worker threads."""
+    callback = MagicMock()
+    pypyr.utils.worker.on_cancel(callback)()
+    pypyr.utils.worker.check_cancelled()
+
+    assert pypyr.utils.worker.get_current_worker() is None
+    callback.assert_not_called()
+
+
+def test_sleep_wakes_on_cancel():
+    """Sleep on a worker wakes & raises when the worker cancels."""
+    worker = Worker(pypyr.utils.worker.sleep, 10, name='arb').start()
+    assert not worker.wait(0.01)
+
+    worker.cancel()
+
+    assert worker.wait(5)
+    with pytest.raises(StepTimeoutError):
+        worker.result()
+
+
+@patch('time.sleep')
+def test_sleep_not_on_worker(mock_sleep):
+    """Sleep off worker threads is time.sleep."""
+    pypyr.utils.worker.sleep(1.5)
+
+    mock_sleep.assert_called_once_with(1.5)
+
+# ------------------------- END cancel ---------------------------------------#
@@ -0,0 +1,315 @@
+"""validator.py unit tests."""
+import logging
+import pytest
+from unittest.mock import patch
+from pypyr.errors import PipelineDefinitionError
+import pypyr.validator
+
+
+def get_errors(pipeline):
+    """Get just the error messages for pipeline."""
+    errors, _ = pypyr.validator.get_problems(pipeline)
+    return errors
+
+# ------------------------- get_problems -------------------------------------#
+
+
+def test_get_problems_valid():
+    """Valid pipeline has no problems."""
+    assert pypyr.validator.get_problems({
+        'context_parser': 'arb',
+        'steps': ['pypyr.steps.echo',
+                  {'name': 'pypyr.steps.echo',
+                   'description': 'arb',
+                   'in': {'echoMe': 'a'},
+                   'foreach': {'range': '{stop}'},
+                   'batchSize': '{size}',
+                   'while': {'stop': '{done}', 'max': 3},
+                   'executor': 'process',
+                   'executorKeys': ['a'],
+                   'cache': {'inputs': ['a'], 'outputs': ['b']},
+                   'run': '{run}',
+                   'skip': False,
+                   'swallow': True}],
+        'on_success': None,
+        'on_failure': []}) == ([], [])
+
+
+def test_get_problems_while_max_0_with_stop():
+    """while max 0 with stop means loop until stop, so it's valid."""
+    assert get_errors({'steps': [
+        {'name': 'pypyr.steps.echo',
+         'while': {'max': 0, 'stop': '{x}'}},
+        {'name': 'pypyr.steps.echo',
+         'while': {'max': -1, 'stop': '{x}'}},
+        {'name': 'pypyr.steps.echo',
+         'while': {'max': 'arb', 'stop': '{x}'}},
+    ]}) == [
+        (('steps', 1, 'while', 'max'), "must be an integer of 0 or more, not "
+                                       "-1."),
+        (('steps', 2, 'while', 'max'), "must be an integer of 0 or more, not "
+                                       "arb."),
+    ]
+
+
+def test_get_problems_not_map():
+    """Pipeline must be a map."""
+    assert get_errors(['a']) == [((), "pipeline must be a map with a steps "
+                                      "sequence.")]
+
+
+def test_get_problems_group_not_list():
+    """Step groups must be lists."""
+    assert get_errors({'steps': 'pypyr.steps.echo'}) == [
+        (('steps',), "steps must be a sequence of steps.")]
+
+
+def test_get_problems_all_step_errors():
+    """All step errors report, not just the 1st."""
+    assert get_errors({'steps': [
+        1,
+        {'in': {}},
+        {'name': 'pypyr.steps.echo',
+         'in': 'arb',
+         'batchSize': 2,
+         'while': {'sleep': 1},
+         'executor': 'thread',
+         'executorKeys': 'a',
+         'cache': {'inputs': 'a'}},
+        {'name': 'pypyr.steps.echo',
+         'foreach': {'range': 'x'},
+         'while': 'arb',
+         'cache': 'arb'},
+        {'name': 'pypyr.steps.echo',
+         'foreach': {'file': 'a', 'glob': 'b'},
+         'batchSize': 0,
+         'while': {'max': -1}},
+    ]}) == [
+        (('steps', 0), "step must be a module name or a map with a name."),
+        (('steps', 1), "complex step must have a name."),
+        (('steps', 2, 'in'), "in must be a map."),
+        (('steps', 2, 'batchSize'), "batchSize only works with foreach. Set "
+                                    "foreach too, or remove batchSize."),
+        (('steps', 2, 'while'), "while must have either max or stop, or "
+                                "both."),
+        (('steps', 2, 'executor'), "executor must be process, or not set at "
+                                   "all. thread is not a valid executor."),
+        (('steps', 2, 'executorKeys'), "executorKeys must be a sequence of "
+                                       "context keys."),
+        (('steps', 2, 'cache', 'inputs'), "cache inputs must be a sequence of "
+                                          "context keys."),
+        (('steps', 2, 'cache'), "cache outputs must be a sequence of at "
+                                "least one context key."),
+        (('steps', 3, 'foreach'), "foreach range must be stop, [start, stop] "
+                                  "or [start, stop, step], as integers. x is "
+                                  "not a valid range: invalid literal for "
+                                  "int() with base 10: 'x'"),
+        (('steps', 3, 'while'), "while must be a map."),
+        (('steps', 3, 'cache'), "cache must be a map."),
+        (('steps', 4, 'foreach'), "foreach can only have one of file, glob, "
+                                  "jsonl, range. Found file, glob."),
+        (('steps', 4, 'batchSize'), "must be an integer of 1 or more, not 0."),
+        (('steps', 4, 'while', 'max'), "must be an integer of 1 or more, not "
+                                       "-1."),
+    ]
+
+
+def test_get_problems_missing_modules():
+    """Step modules that don't exist are errors in every group."""
+    assert get_errors({'steps': ['arb.missing'],
+                       'on_failure': [{'name': 'arbmissing'}]}) == [
+        (('steps', 0), "step module arb.missing not found. It should be in "
+                       "your working dir or installed to the python path."),
+        (('on_failure', 0, 'name'), "step module arbmissing not found. It "
+                                    "should be in your working dir or "
+                                    "installed to the python path.")]
+
+
+def test_get_problems_unknown_key_warns():
+    """Unknown step keys are warnings, not errors."""
+    assert pypyr.validator.get_problems(
+        {'steps': [{'name': 'pypyr.steps.echo', 'forech': [1]}]}) == (
+        [], [(('steps', 0, 'forech'), "forech isn't a step decorator, so "
+                                      "pypyr ignores it. Is it a typo?")])
+
+
+def test_check_module_uses_module_cache():
+    """Modules already loaded don't look up again."""
+    with patch.dict('pypyr.moduleloader._module_cache', {'arb.x': 'module'}):
+        with patch('importlib.util.find_spec') as mock_find_spec:
+            errors = []
+            pypyr.validator.check_module('arb.x', (), errors)
+
+    mock_find_spec.assert_not_called()
+    assert errors == []
+# ------------------------- get_problems -------------------------------------#
+
+# ------------------------- validate_pipeline --------------------------------#
+
+
+def test_validate_pipeline_positions(tmp_path):
+    """Errors have file, line & column."""
+    path = tmp_path / 'arb.yaml'
+    path.write_text("""\
+steps:
+  - pypyr.steps.echo
+  - arb.missing
+  - name: pypyr.steps.echo
+    while:
+      sleep: 1
+on_failure:
+  - in: {}
+""")
+    pipeline = {'steps': ['pypyr.steps.echo',
+                          'arb.missing',
+                          {'name': 'pypyr.steps.echo',
+                           'while': {'sleep': 1}}],
+                'on_failure': [{'in': {}}]}
+
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        pypyr.validator.validate_pipeline(pipeline, 'arb', str(path))
+
+    assert str(err_info.value) == (
+        "pipeline arb has 3 error(s):\n"
+        f"{path}:3:5: steps[1]: step module arb.missing not found. It should "
+        "be in your working dir or installed to the python path.\n"
+        f"{path}:5:5: steps[2].while: while must have either max or stop, "
+        "or both.\n"
+        f"{path}:8:5: on_failure[0]: complex step must have a name.")
+
+
+def test_validate_pipeline_no_path():
+    """Errors without a path have no positions."""
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        pypyr.validator.validate_pipeline({'steps': [{}]}, 'arb')
+
+    assert str(err_info.value) == ("pipeline arb has 1 error(s):\n"
+                                   "steps[0]: complex step must have a name.")
+
+
+def test_validate_pipeline_warnings_log(tmp_path):
+    """Warnings log with positions & don't raise."""
+    path = tmp_path / 'arb.yaml'
+    path.write_text("steps:\n  - name: pypyr.steps.echo\n    swalow: True\n")
+
+    logger = logging.getLogger('pypyr.validator')
+    with patch.object(logger, 'warning') as mock_logger_warning:
+        pypyr.validator.validate_pipeline(
+            {'steps': [{'name': 'pypyr.steps.echo', 'swalow': True}]},
+            'arb',
+            str(path))
+
+    mock_logger_warning.assert_called_once_with(
+        f"{path}:3:5: steps[0].swalow: swalow isn't a step decorator, so "
+        "pypyr ignores it. Is it a typo?")
+
+
+def test_validate_pipeline_valid_doesnt_parse_positions():
+    """Valid pipeline doesn't parse yaml again for positions."""
+    with patch('pypyr.validator.get_positions') as mock_positions:
+        pypyr.validator.validate_pipeline({'steps': ['pypyr.steps.echo']},
+                                          'arb',
+                                          'arb/path.yaml')
+
+    mock_positions.assert_not_called()
+# ------------------------- validate_pipeline --------------------------------#
+
+# ------------------------- timeout ------------------------------------------#
+
+
+@pytest.mark.parametrize('timeout', [0, -1.5, 'arb', True])
+def test_get_problems_step_timeout(timeout):
+    """Step timeout must be a number of seconds more than 0."""
+    assert get_errors({'steps': [{'name': 'pypyr.steps.echo',
+                                  'timeout': timeout}]}) == [
+        (('steps', 0, 'timeout'), "must be a number of seconds more than 0, "
+                                  f"not {timeout}.")]
+
+
+def test_get_problems_step_timeout_valid():
+    """Step timeout can be a number or a formatting expression."""
+    assert pypyr.validator.get_problems({'steps': [
+        {'name': 'pypyr.steps.echo', 'timeout': 1.5},
+        {'name': 'pypyr.steps.echo', 'timeout': '2'},
+        {'name': 'pypyr.steps.echo', 'timeout': '{t}'}]}) == ([], [])
+
+
+def test_get_problems_step_retry():
+    """Retry must be a map with a valid max & error names."""
+    assert get_errors({'steps': [
+        {'name': 'pypyr.steps.echo', 'retry': 'arb'},
+        {'name': 'pypyr.steps.echo', 'retry': {'max': 0,
+                                               'retryOn': {'a': 'b'},
+                                               'stopOn': 'ValueError'}},
+        {'name': 'pypyr.steps.echo', 'retry': {'max': '{max}',
+                                               'retryOn': ['ValueError']}}]}
+    ) == [
+        (('steps', 0, 'retry'), "retry must be a map."),
+        (('steps', 1, 'retry', 'max'), "must be an integer of 1 or more, not "
+                                       "0."),
+        (('steps', 1, 'retry', 'retryOn'), "retry retryOn must be a list of "
+                                           "error names.")]
+
+
+def test_get_problems_step_uses():
+    """Uses must be a list or a single resource name."""
+    assert get_errors({'steps': [
+        {'name': 'pypyr.steps.echo', 'uses': ['db']},
+        {'name': 'pypyr.steps.echo', 'uses': 'db'},
+        {'name': 'pypyr.steps.echo', 'uses': {'db': 1}}]}) == [
+        (('steps', 2, 'uses'), "uses must be a list of resource names.")]
+
+
+def test_get_problems_resources():
+    """Resources must be a map of name to limit."""
+    assert pypyr.validator.get_problems({
+        'steps': ['pypyr.steps.echo'],
+        'resources': {'db': 2, 'tar': '4'}}) == ([], [])
+
+    assert get_errors({'steps': ['pypyr.steps.echo'],
+                       'resources': {'db': 0}}) == [
+        (('resources',), "resources db must be an integer of 1 or more, not "
+                         "0.")]
+
+# ------------------------- END timeout --------------------------------------#
+
+# ------------------------- handlers -----------------------------------------#
+
+
+def test_get_problems_handlers_valid():
+    """Valid handlers have no problems."""
+    assert pypyr.validator.get_problems({
+        'steps': ['pypyr.steps.echo'],
+        'handlers': {'on_success': {'timeout': 1},
+                     'on_failure': {'parallel': True,
+                                    'stepTimeout': 0.5}}}) == ([], [])
+
+
+def test_get_problems_handlers():
+    """Handlers errors & unknown options report."""
+    errors, warnings = pypyr.validator.get_problems({
+        'steps': ['pypyr.steps.echo'],
+        'handlers': {'steps': {'timeout': 1},
+                     'on_success': {'timeout': 'arb'},
+                     'on_failure': {'paralel': True}}})
+
+    assert errors == [
+        (('handlers', 'steps'), "handlers only has options for on_success & "
+                                "on_failure, not steps."),
+        (('handlers', 'on_success'), "handlers on_success timeout must be a "
+                                     "number of seconds more than 0, not "
+                                     "arb.")]
+    assert warnings == [
+        (('handlers', 'on_failure', 'paralel'),
+         "paralel isn't a handlers option, so pypyr ignores it. Is it a "
+         "typo?")]
+
+
+def test_get_problems_handlers_not_map():
+    """Handlers must be a map."""
+    assert get_errors({'steps': ['pypyr.steps.echo'],
+                       'handlers': ['on_success']}) == [
+        (('handlers',), "handlers must be a map of step group name to "
+                        "options.")]
+
+# ------------------------- END handlers -------------------------------------#